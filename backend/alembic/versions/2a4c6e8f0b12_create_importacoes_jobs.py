@@ -0,0 +1,56 @@
+"""
+Create importacoes_jobs table
+
+Revision ID: 2a4c6e8f0b12
+Revises: 1d7c9a3e4f10
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "2a4c6e8f0b12"
+down_revision = "1d7c9a3e4f10"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    if sa.inspect(connection).has_table("importacoes_jobs"):
+        return
+    op.create_table(
+        "importacoes_jobs",
+        sa.Column("id", sa.String(length=36), primary_key=True),
+        sa.Column("periodo_id", sa.Integer(), sa.ForeignKey("revisoes_periodos.id"), nullable=False),
+        sa.Column("nome_arquivo", sa.String(length=255), nullable=False),
+        sa.Column("caminho_arquivo", sa.Text(), nullable=False),
+        sa.Column("tamanho_bytes", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("status", sa.String(length=20), nullable=False, server_default="Pendente"),
+        sa.Column("bytes_processados", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("linhas_lidas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("linhas_importadas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("linhas_rejeitadas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("erros", sa.Text(), nullable=True),
+        sa.Column("alertas", sa.Text(), nullable=True),
+        sa.Column("mensagem", sa.Text(), nullable=True),
+        sa.Column("cancelamento_solicitado", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("worker", sa.String(length=120), nullable=True),
+        sa.Column("criado_em", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column("iniciado_em", sa.DateTime(), nullable=True),
+        sa.Column("finalizado_em", sa.DateTime(), nullable=True),
+        sa.Column("atualizado_em", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_importacoes_jobs_id", "importacoes_jobs", ["id"])
+    op.create_index("ix_importacoes_jobs_periodo_id", "importacoes_jobs", ["periodo_id"])
+    op.create_index("ix_importacoes_jobs_status", "importacoes_jobs", ["status"])
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    if sa.inspect(connection).has_table("importacoes_jobs"):
+        op.drop_index("ix_importacoes_jobs_status", table_name="importacoes_jobs")
+        op.drop_index("ix_importacoes_jobs_periodo_id", table_name="importacoes_jobs")
+        op.drop_index("ix_importacoes_jobs_id", table_name="importacoes_jobs")
+        op.drop_table("importacoes_jobs")
@@ -0,0 +1,43 @@
+"""
+Create dados_versoes and add cache column to relatorios_rvu_logs
+
+Revision ID: 3b5d7f9a1c23
+Revises: 2a4c6e8f0b12
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "3b5d7f9a1c23"
+down_revision = "2a4c6e8f0b12"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("dados_versoes"):
+        op.create_table(
+            "dados_versoes",
+            sa.Column("recurso", sa.String(length=100), primary_key=True),
+            sa.Column("versao", sa.BigInteger(), nullable=False, server_default="0"),
+            sa.Column("atualizado_em", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        )
+    if inspector.has_table("relatorios_rvu_logs"):
+        col_names = [c["name"] for c in inspector.get_columns("relatorios_rvu_logs")]
+        if "cache" not in col_names:
+            op.add_column("relatorios_rvu_logs", sa.Column("cache", sa.String(length=10), nullable=True))
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if inspector.has_table("relatorios_rvu_logs"):
+        col_names = [c["name"] for c in inspector.get_columns("relatorios_rvu_logs")]
+        if "cache" in col_names:
+            op.drop_column("relatorios_rvu_logs", "cache")
+    if inspector.has_table("dados_versoes"):
+        op.drop_table("dados_versoes")
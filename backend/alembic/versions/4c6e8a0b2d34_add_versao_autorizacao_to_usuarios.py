@@ -0,0 +1,37 @@
+"""
+Add versao_autorizacao to usuarios
+
+Revision ID: 4c6e8a0b2d34
+Revises: 3b5d7f9a1c23
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "4c6e8a0b2d34"
+down_revision = "3b5d7f9a1c23"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if inspector.has_table("usuarios"):
+        col_names = [c["name"] for c in inspector.get_columns("usuarios")]
+        if "versao_autorizacao" not in col_names:
+            op.add_column(
+                "usuarios",
+                sa.Column("versao_autorizacao", sa.Integer(), nullable=False, server_default="0"),
+            )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if inspector.has_table("usuarios"):
+        col_names = [c["name"] for c in inspector.get_columns("usuarios")]
+        if "versao_autorizacao" in col_names:
+            op.drop_column("usuarios", "versao_autorizacao")
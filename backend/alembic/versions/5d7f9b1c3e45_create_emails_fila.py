@@ -0,0 +1,52 @@
+"""
+Create emails_fila table
+
+Revision ID: 5d7f9b1c3e45
+Revises: 4c6e8a0b2d34
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "5d7f9b1c3e45"
+down_revision = "4c6e8a0b2d34"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    if sa.inspect(connection).has_table("emails_fila"):
+        return
+    op.create_table(
+        "emails_fila",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("notificacao_id", sa.String(length=36), sa.ForeignKey("notificacoes.id"), nullable=True),
+        sa.Column("usuario_id", sa.Integer(), sa.ForeignKey("usuarios.id"), nullable=True),
+        sa.Column("destinatario", sa.String(length=255), nullable=False),
+        sa.Column("assunto", sa.String(length=255), nullable=False),
+        sa.Column("corpo", sa.Text(), nullable=False),
+        sa.Column("corpo_html", sa.Text(), nullable=True),
+        sa.Column("status", sa.String(length=20), nullable=False, server_default="Pendente"),
+        sa.Column("tentativas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("proxima_tentativa_em", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column("ultimo_erro", sa.Text(), nullable=True),
+        sa.Column("worker", sa.String(length=120), nullable=True),
+        sa.Column("criado_em", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column("enviado_em", sa.DateTime(), nullable=True),
+        sa.Column("atualizado_em", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_emails_fila_id", "emails_fila", ["id"])
+    op.create_index("ix_emails_fila_notificacao_id", "emails_fila", ["notificacao_id"])
+    op.create_index("ix_emails_fila_status_proxima", "emails_fila", ["status", "proxima_tentativa_em"])
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    if sa.inspect(connection).has_table("emails_fila"):
+        op.drop_index("ix_emails_fila_status_proxima", table_name="emails_fila")
+        op.drop_index("ix_emails_fila_notificacao_id", table_name="emails_fila")
+        op.drop_index("ix_emails_fila_id", table_name="emails_fila")
+        op.drop_table("emails_fila")
@@ -0,0 +1,56 @@
+"""
+Normalize notificacoes_destinatarios.status and add inbox index
+
+Revision ID: 6e8a0c2d4f56
+Revises: 5d7f9b1c3e45
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "6e8a0c2d4f56"
+down_revision = "5d7f9b1c3e45"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("notificacoes_destinatarios"):
+        return
+    # Status passa a ser sempre minúsculo: filtros deixam de usar lower(status)
+    op.execute(
+        """
+        UPDATE notificacoes_destinatarios
+        SET status = CASE LOWER(TRIM(status))
+            WHEN 'pending' THEN 'pendente'
+            WHEN 'read' THEN 'lida'
+            WHEN 'lido' THEN 'lida'
+            WHEN 'archived' THEN 'arquivada'
+            WHEN 'arquivado' THEN 'arquivada'
+            ELSE LOWER(TRIM(status))
+        END
+        WHERE status <> LOWER(TRIM(status))
+           OR LOWER(TRIM(status)) IN ('pending', 'read', 'lido', 'archived', 'arquivado')
+        """
+    )
+    index_names = [i["name"] for i in inspector.get_indexes("notificacoes_destinatarios")]
+    if "ix_notif_dest_usuario_status_criado" not in index_names:
+        op.create_index(
+            "ix_notif_dest_usuario_status_criado",
+            "notificacoes_destinatarios",
+            ["usuario_id", "status", "criado_em"],
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("notificacoes_destinatarios"):
+        return
+    index_names = [i["name"] for i in inspector.get_indexes("notificacoes_destinatarios")]
+    if "ix_notif_dest_usuario_status_criado" in index_names:
+        op.drop_index("ix_notif_dest_usuario_status_criado", table_name="notificacoes_destinatarios")
@@ -0,0 +1,46 @@
+"""
+Store cronograma evidences by SHA-256 outside the database
+
+Revision ID: 7f9b1d3e5a67
+Revises: 6e8a0c2d4f56
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "7f9b1d3e5a67"
+down_revision = "6e8a0c2d4f56"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("cronogramas_tarefas_evidencias"):
+        return
+    columns = [c["name"] for c in inspector.get_columns("cronogramas_tarefas_evidencias")]
+    if "sha256" not in columns:
+        op.add_column("cronogramas_tarefas_evidencias", sa.Column("sha256", sa.String(length=64), nullable=True))
+    # Conteúdo passa a ficar no store; BYTEA só para linhas ainda não migradas
+    op.alter_column("cronogramas_tarefas_evidencias", "conteudo", existing_type=sa.LargeBinary(), nullable=True)
+    index_names = [i["name"] for i in inspector.get_indexes("cronogramas_tarefas_evidencias")]
+    if "ix_cronogramas_tarefas_evidencias_sha256" not in index_names:
+        op.create_index(
+            "ix_cronogramas_tarefas_evidencias_sha256",
+            "cronogramas_tarefas_evidencias",
+            ["sha256"],
+        )
+
+
+def downgrade() -> None:
+    # Não restaura NOT NULL em conteudo: linhas migradas para o store não têm BYTEA
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("cronogramas_tarefas_evidencias"):
+        return
+    index_names = [i["name"] for i in inspector.get_indexes("cronogramas_tarefas_evidencias")]
+    if "ix_cronogramas_tarefas_evidencias_sha256" in index_names:
+        op.drop_index("ix_cronogramas_tarefas_evidencias_sha256", table_name="cronogramas_tarefas_evidencias")
@@ -0,0 +1,36 @@
+"""
+Index auditoria_logs on (data_evento, id) for keyset pagination
+
+Revision ID: 8a0c2e4f6b78
+Revises: 7f9b1d3e5a67
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "8a0c2e4f6b78"
+down_revision = "7f9b1d3e5a67"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("auditoria_logs"):
+        return
+    index_names = [i["name"] for i in inspector.get_indexes("auditoria_logs")]
+    if "ix_auditoria_logs_data_evento_id" not in index_names:
+        op.create_index("ix_auditoria_logs_data_evento_id", "auditoria_logs", ["data_evento", "id"])
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("auditoria_logs"):
+        return
+    index_names = [i["name"] for i in inspector.get_indexes("auditoria_logs")]
+    if "ix_auditoria_logs_data_evento_id" in index_names:
+        op.drop_index("ix_auditoria_logs_data_evento_id", table_name="auditoria_logs")
@@ -0,0 +1,52 @@
+"""
+Full-text (tsvector) and trigram search indexes for auditoria_logs and notificacoes
+
+Revision ID: 9b1d3f5a7c89
+Revises: 8a0c2e4f6b78
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "9b1d3f5a7c89"
+down_revision = "8a0c2e4f6b78"
+branch_labels = None
+depends_on = None
+
+# Mesma expressão de app/busca.py (expressao_sql)
+ALVOS = {
+    "auditoria_logs": "(coalesce(acao, '') || ' ' || coalesce(entidade, '') || ' ' || coalesce(detalhes, ''))",
+    "notificacoes": "(coalesce(titulo, '') || ' ' || coalesce(mensagem, ''))",
+}
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    # Sem privilégio para criar a extensão, a busca segue só com tsvector
+    op.execute(
+        "DO $$ BEGIN CREATE EXTENSION IF NOT EXISTS pg_trgm; "
+        "EXCEPTION WHEN OTHERS THEN RAISE NOTICE 'pg_trgm indisponível: %', SQLERRM; END $$"
+    )
+    for tabela, expr in ALVOS.items():
+        if not inspector.has_table(tabela):
+            continue
+        op.execute(
+            f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS busca_tsv tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('portuguese'::regconfig, {expr})) STORED"
+        )
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{tabela}_busca_tsv ON {tabela} USING GIN (busca_tsv)")
+        op.execute(
+            "DO $$ BEGIN IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN "
+            f"CREATE INDEX IF NOT EXISTS ix_{tabela}_busca_trgm ON {tabela} USING GIN ({expr} gin_trgm_ops); "
+            "END IF; END $$"
+        )
+
+
+def downgrade() -> None:
+    for tabela in ALVOS:
+        op.execute(f"DROP INDEX IF EXISTS ix_{tabela}_busca_trgm")
+        op.execute(f"DROP INDEX IF EXISTS ix_{tabela}_busca_tsv")
+        op.execute(f"ALTER TABLE IF EXISTS {tabela} DROP COLUMN IF EXISTS busca_tsv")
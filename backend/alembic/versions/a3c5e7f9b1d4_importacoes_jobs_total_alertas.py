@@ -0,0 +1,36 @@
+"""
+Add importacoes_jobs.total_alertas (import reports keep only the first messages)
+
+Revision ID: a3c5e7f9b1d4
+Revises: f1d3a5c7e9b2
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "a3c5e7f9b1d4"
+down_revision = "f1d3a5c7e9b2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("importacoes_jobs"):
+        return
+    columns = [c["name"] for c in inspector.get_columns("importacoes_jobs")]
+    if "total_alertas" not in columns:
+        op.add_column("importacoes_jobs", sa.Column("total_alertas", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("importacoes_jobs"):
+        return
+    columns = [c["name"] for c in inspector.get_columns("importacoes_jobs")]
+    if "total_alertas" in columns:
+        op.drop_column("importacoes_jobs", "total_alertas")
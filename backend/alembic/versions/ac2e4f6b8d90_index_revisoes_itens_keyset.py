@@ -0,0 +1,60 @@
+"""
+Composite indexes on revisoes_itens for keyset pagination, filters and text search
+
+Revision ID: ac2e4f6b8d90
+Revises: 9b1d3f5a7c89
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "ac2e4f6b8d90"
+down_revision = "9b1d3f5a7c89"
+branch_labels = None
+depends_on = None
+
+# (periodo_id, chave de ordenação, id); mesma expressão de models.REVISAO_ITEM_VENCIMENTO_SQL
+INDICES = {
+    "ix_revisoes_itens_periodo_vencimento": [
+        "periodo_id",
+        sa.text("coalesce(data_fim_revisada, data_fim_depreciacao, DATE '9999-12-31')"),
+        "id",
+    ],
+    "ix_revisoes_itens_periodo_numero": ["periodo_id", "numero_imobilizado", "id"],
+    "ix_revisoes_itens_periodo_valor": ["periodo_id", "valor_contabil", "id"],
+    "ix_revisoes_itens_periodo_classe": ["periodo_id", "classe", "id"],
+    "ix_revisoes_itens_periodo_centro_custo": ["periodo_id", "centro_custo", "id"],
+    "ix_revisoes_itens_periodo_status": ["periodo_id", "status", "id"],
+}
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("revisoes_itens"):
+        return
+    index_names = [i["name"] for i in inspector.get_indexes("revisoes_itens")]
+    for nome, colunas in INDICES.items():
+        if nome not in index_names:
+            op.create_index(nome, "revisoes_itens", colunas)
+    # Busca por trecho de número/descrição; sem pg_trgm segue com varredura do período
+    op.execute(
+        "DO $$ BEGIN IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN "
+        "CREATE INDEX IF NOT EXISTS ix_revisoes_itens_busca_trgm ON revisoes_itens "
+        "USING GIN ((numero_imobilizado || ' ' || descricao) gin_trgm_ops); "
+        "END IF; END $$"
+    )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("revisoes_itens"):
+        return
+    op.execute("DROP INDEX IF EXISTS ix_revisoes_itens_busca_trgm")
+    index_names = [i["name"] for i in inspector.get_indexes("revisoes_itens")]
+    for nome in INDICES:
+        if nome in index_names:
+            op.drop_index(nome, table_name="revisoes_itens")
@@ -0,0 +1,46 @@
+"""
+Add revisoes_itens.atualizado_em for incremental (changed-since) sync
+
+Revision ID: bd3f5a7c9e01
+Revises: ac2e4f6b8d90
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "bd3f5a7c9e01"
+down_revision = "ac2e4f6b8d90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("revisoes_itens"):
+        return
+    columns = [c["name"] for c in inspector.get_columns("revisoes_itens")]
+    if "atualizado_em" not in columns:
+        # Default estável: linhas existentes recebem o instante da migração sem reescrever a tabela
+        op.add_column(
+            "revisoes_itens",
+            sa.Column("atualizado_em", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        )
+    index_names = [i["name"] for i in inspector.get_indexes("revisoes_itens")]
+    if "ix_revisoes_itens_periodo_atualizado" not in index_names:
+        op.create_index("ix_revisoes_itens_periodo_atualizado", "revisoes_itens", ["periodo_id", "atualizado_em"])
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("revisoes_itens"):
+        return
+    index_names = [i["name"] for i in inspector.get_indexes("revisoes_itens")]
+    if "ix_revisoes_itens_periodo_atualizado" in index_names:
+        op.drop_index("ix_revisoes_itens_periodo_atualizado", table_name="revisoes_itens")
+    columns = [c["name"] for c in inspector.get_columns("revisoes_itens")]
+    if "atualizado_em" in columns:
+        op.drop_column("revisoes_itens", "atualizado_em")
@@ -0,0 +1,44 @@
+"""
+Composite indexes on revisoes_delegacoes for the joined delegation listing
+
+Revision ID: ce4a6b8d0f12
+Revises: bd3f5a7c9e01
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "ce4a6b8d0f12"
+down_revision = "bd3f5a7c9e01"
+branch_labels = None
+depends_on = None
+
+# Paginação por id dentro do período e NOT EXISTS (periodo_id, ativo_id) dos revertidos órfãos
+INDICES = {
+    "ix_revisoes_delegacoes_periodo_keyset": ["periodo_id", "id"],
+    "ix_revisoes_delegacoes_periodo_ativo": ["periodo_id", "ativo_id"],
+}
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("revisoes_delegacoes"):
+        return
+    index_names = [i["name"] for i in inspector.get_indexes("revisoes_delegacoes")]
+    for nome, colunas in INDICES.items():
+        if nome not in index_names:
+            op.create_index(nome, "revisoes_delegacoes", colunas)
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("revisoes_delegacoes"):
+        return
+    index_names = [i["name"] for i in inspector.get_indexes("revisoes_delegacoes")]
+    for nome in INDICES:
+        if nome in index_names:
+            op.drop_index(nome, table_name="revisoes_delegacoes")
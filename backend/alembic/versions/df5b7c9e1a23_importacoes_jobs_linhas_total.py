@@ -0,0 +1,36 @@
+"""
+Add importacoes_jobs.linhas_total (row-based progress for XLSX uploads)
+
+Revision ID: df5b7c9e1a23
+Revises: ce4a6b8d0f12
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "df5b7c9e1a23"
+down_revision = "ce4a6b8d0f12"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("importacoes_jobs"):
+        return
+    columns = [c["name"] for c in inspector.get_columns("importacoes_jobs")]
+    if "linhas_total" not in columns:
+        op.add_column("importacoes_jobs", sa.Column("linhas_total", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("importacoes_jobs"):
+        return
+    columns = [c["name"] for c in inspector.get_columns("importacoes_jobs")]
+    if "linhas_total" in columns:
+        op.drop_column("importacoes_jobs", "linhas_total")
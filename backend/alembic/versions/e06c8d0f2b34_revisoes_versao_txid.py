@@ -0,0 +1,68 @@
+"""
+Add versao_txid (commit-safe change marker) to revisoes_itens and revisoes_delegacoes
+
+Revision ID: e06c8d0f2b34
+Revises: df5b7c9e1a23
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "e06c8d0f2b34"
+down_revision = "df5b7c9e1a23"
+branch_labels = None
+depends_on = None
+
+TABELAS = (
+    ("revisoes_itens", "ix_revisoes_itens_periodo_versao", ["periodo_id", "versao_txid"]),
+    ("revisoes_delegacoes", "ix_revisoes_delegacoes_periodo_revisor_versao", ["periodo_id", "revisor_id", "versao_txid"]),
+)
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    # txid da transação que gravou a linha; a sincronização compara com o xmin do snapshot
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION fn_revisao_versao_txid() RETURNS trigger AS $$
+        BEGIN
+            NEW.versao_txid := txid_current();
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for tabela, indice, colunas in TABELAS:
+        if not inspector.has_table(tabela):
+            continue
+        columns = [c["name"] for c in inspector.get_columns(tabela)]
+        if "versao_txid" not in columns:
+            # Linhas existentes ficam NULL: só entram na carga completa
+            op.add_column(tabela, sa.Column("versao_txid", sa.BigInteger(), nullable=True))
+        index_names = [i["name"] for i in inspector.get_indexes(tabela)]
+        if indice not in index_names:
+            op.create_index(indice, tabela, colunas)
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{tabela}_versao ON {tabela}")
+        op.execute(
+            f"CREATE TRIGGER trg_{tabela}_versao BEFORE INSERT OR UPDATE ON {tabela} "
+            "FOR EACH ROW EXECUTE PROCEDURE fn_revisao_versao_txid()"
+        )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    for tabela, indice, _ in TABELAS:
+        if not inspector.has_table(tabela):
+            continue
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{tabela}_versao ON {tabela}")
+        index_names = [i["name"] for i in inspector.get_indexes(tabela)]
+        if indice in index_names:
+            op.drop_index(indice, table_name=tabela)
+        columns = [c["name"] for c in inspector.get_columns(tabela)]
+        if "versao_txid" in columns:
+            op.drop_column(tabela, "versao_txid")
+    op.execute("DROP FUNCTION IF EXISTS fn_revisao_versao_txid()")
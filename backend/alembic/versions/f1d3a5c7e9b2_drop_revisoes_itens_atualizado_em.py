@@ -0,0 +1,45 @@
+"""
+Drop revisoes_itens.atualizado_em (replaced by versao_txid in the incremental sync)
+
+Revision ID: f1d3a5c7e9b2
+Revises: e06c8d0f2b34
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "f1d3a5c7e9b2"
+down_revision = "e06c8d0f2b34"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("revisoes_itens"):
+        return
+    index_names = [i["name"] for i in inspector.get_indexes("revisoes_itens")]
+    if "ix_revisoes_itens_periodo_atualizado" in index_names:
+        op.drop_index("ix_revisoes_itens_periodo_atualizado", table_name="revisoes_itens")
+    columns = [c["name"] for c in inspector.get_columns("revisoes_itens")]
+    if "atualizado_em" in columns:
+        op.drop_column("revisoes_itens", "atualizado_em")
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if not inspector.has_table("revisoes_itens"):
+        return
+    columns = [c["name"] for c in inspector.get_columns("revisoes_itens")]
+    if "atualizado_em" not in columns:
+        op.add_column(
+            "revisoes_itens",
+            sa.Column("atualizado_em", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        )
+    index_names = [i["name"] for i in inspector.get_indexes("revisoes_itens")]
+    if "ix_revisoes_itens_periodo_atualizado" not in index_names:
+        op.create_index("ix_revisoes_itens_periodo_atualizado", "revisoes_itens", ["periodo_id", "atualizado_em"])
@@ -0,0 +1,396 @@
+"""
+Armazenamento de evidências (anexos de tarefas de cronograma) fora do banco.
+
+O conteúdo é endereçado pelo SHA-256: arquivos iguais são gravados uma única
+vez e a linha em cronogramas_tarefas_evidencias guarda só a chave (`sha256`).
+O upload é copiado em blocos para um temporário enquanto o hash é calculado;
+o download é servido em streaming, com ETag (o próprio hash) e HTTP Range.
+
+Linhas antigas com o conteúdo em BYTEA continuam legíveis; para movê-las
+para o store use `python scripts/migrar_evidencias.py` (ver migrar_bytea).
+
+Excluir uma evidência não apaga o blob: outro upload do mesmo conteúdo pode
+estar reaproveitando a chave naquele instante (dedup), antes de gravar a sua
+linha. Blobs sem referência são removidos depois, com carência, por
+`python scripts/coletar_evidencias_orfas.py` (ver coletar_orfaos).
+
+Configurável via variáveis de ambiente:
+- EVIDENCIAS_STORE: local | s3 (default: local)
+- EVIDENCIAS_DIR: diretório do store local (default: ./data/evidencias)
+- EVIDENCIAS_S3_BUCKET / EVIDENCIAS_S3_PREFIX: bucket e prefixo das chaves (s3)
+- EVIDENCIAS_S3_ENDPOINT: endpoint S3-compatível (MinIO, stand-in local etc.);
+  credenciais pelas variáveis padrão AWS_* (requer boto3)
+"""
+
+import abc
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+import sqlalchemy as sa
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+EVIDENCIAS_STORE = os.getenv("EVIDENCIAS_STORE", "local").strip().lower()
+EVIDENCIAS_DIR = os.getenv("EVIDENCIAS_DIR") or os.path.join(os.getcwd(), "data", "evidencias")
+EVIDENCIAS_S3_BUCKET = os.getenv("EVIDENCIAS_S3_BUCKET")
+EVIDENCIAS_S3_PREFIX = (os.getenv("EVIDENCIAS_S3_PREFIX") or "evidencias/").strip()
+EVIDENCIAS_S3_ENDPOINT = os.getenv("EVIDENCIAS_S3_ENDPOINT")
+
+BLOCO = 1024 * 1024
+
+
+class BlobStore(abc.ABC):
+    """Interface: blobs imutáveis identificados pelo SHA-256 do conteúdo."""
+
+    @abc.abstractmethod
+    def salvar(self, fileobj) -> tuple[str, int]:
+        """Grava o stream (deduplicado) e devolve (sha256, tamanho)."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def abrir(self, chave: str, inicio: int = 0, fim: Optional[int] = None) -> Iterator[bytes]:
+        """Itera os bytes [inicio, fim] (fim inclusivo; None = até o final)."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def existe(self, chave: str) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def modificado_em(self, chave: str) -> Optional[float]:
+        """Última gravação (epoch); um upload deduplicado também a renova. None se não existe."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def listar(self) -> Iterator[tuple[str, float]]:
+        """(chave, modificado_em) de todos os blobs."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def remover(self, chave: str):
+        raise NotImplementedError
+
+
+def _copiar_com_hash(fileobj, destino) -> tuple[str, int]:
+    h = hashlib.sha256()
+    tamanho = 0
+    while True:
+        bloco = fileobj.read(BLOCO)
+        if not bloco:
+            break
+        h.update(bloco)
+        destino.write(bloco)
+        tamanho += len(bloco)
+    return h.hexdigest(), tamanho
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+
+    def _path(self, chave: str) -> str:
+        return os.path.join(self.base_dir, chave[:2], chave[2:4], chave)
+
+    def salvar(self, fileobj) -> tuple[str, int]:
+        os.makedirs(self.base_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".upload_", dir=self.base_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                chave, tamanho = _copiar_com_hash(fileobj, out)
+            destino = self._path(chave)
+            if os.path.exists(destino):
+                os.remove(tmp)  # já armazenado (dedup)
+                os.utime(destino)  # renova a carência da coleta de órfãos
+            else:
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                os.replace(tmp, destino)
+            return chave, tamanho
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def abrir(self, chave: str, inicio: int = 0, fim: Optional[int] = None) -> Iterator[bytes]:
+        with open(self._path(chave), "rb") as fh:
+            fh.seek(inicio)
+            restante = None if fim is None else fim - inicio + 1
+            while restante is None or restante > 0:
+                bloco = fh.read(BLOCO if restante is None else min(BLOCO, restante))
+                if not bloco:
+                    break
+                if restante is not None:
+                    restante -= len(bloco)
+                yield bloco
+
+    def existe(self, chave: str) -> bool:
+        return os.path.exists(self._path(chave))
+
+    def modificado_em(self, chave: str) -> Optional[float]:
+        try:
+            return os.path.getmtime(self._path(chave))
+        except OSError:
+            return None
+
+    def listar(self) -> Iterator[tuple[str, float]]:
+        if not os.path.isdir(self.base_dir):
+            return
+        for raiz, _, arquivos in os.walk(self.base_dir):
+            for nome in arquivos:
+                if len(nome) == 64 and not nome.startswith("."):
+                    try:
+                        yield nome, os.path.getmtime(os.path.join(raiz, nome))
+                    except OSError:
+                        pass
+
+    def remover(self, chave: str):
+        try:
+            os.remove(self._path(chave))
+        except OSError:
+            pass
+
+
+class S3BlobStore(BlobStore):
+    """Bucket S3 ou compatível (endpoint configurável)."""
+
+    def __init__(self, bucket: str, prefixo: str = "", endpoint_url: Optional[str] = None):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("EVIDENCIAS_STORE=s3 requer o pacote boto3") from e
+        self.bucket = bucket
+        self.prefixo = prefixo
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def _key(self, chave: str) -> str:
+        return f"{self.prefixo}{chave}"
+
+    def salvar(self, fileobj) -> tuple[str, int]:
+        # O hash (nome do objeto) só é conhecido ao final: copia para um temporário local antes
+        with tempfile.TemporaryFile() as tmp:
+            chave, tamanho = _copiar_com_hash(fileobj, tmp)
+            if not self.existe(chave):
+                tmp.seek(0)
+                self.client.upload_fileobj(tmp, self.bucket, self._key(chave))
+            else:
+                # Cópia sobre si mesmo renova o LastModified (carência da coleta de órfãos)
+                self.client.copy_object(
+                    Bucket=self.bucket,
+                    Key=self._key(chave),
+                    CopySource={"Bucket": self.bucket, "Key": self._key(chave)},
+                    MetadataDirective="REPLACE",
+                )
+        return chave, tamanho
+
+    def abrir(self, chave: str, inicio: int = 0, fim: Optional[int] = None) -> Iterator[bytes]:
+        extra = {}
+        if inicio or fim is not None:
+            extra["Range"] = f"bytes={inicio}-{'' if fim is None else fim}"
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(chave), **extra)["Body"]
+        try:
+            yield from body.iter_chunks(BLOCO)
+        finally:
+            body.close()
+
+    def existe(self, chave: str) -> bool:
+        return self.modificado_em(chave) is not None
+
+    def modificado_em(self, chave: str) -> Optional[float]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(chave))["LastModified"].timestamp()
+        except Exception:
+            return None
+
+    def listar(self) -> Iterator[tuple[str, float]]:
+        for pagina in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self.prefixo):
+            for obj in pagina.get("Contents", []):
+                yield obj["Key"][len(self.prefixo):], obj["LastModified"].timestamp()
+
+    def remover(self, chave: str):
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=self._key(chave))
+        except Exception:
+            logger.warning("Evidências: falha ao remover %s do S3", chave, exc_info=True)
+
+
+_store: Optional[BlobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> BlobStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            if EVIDENCIAS_STORE == "s3":
+                if not EVIDENCIAS_S3_BUCKET:
+                    raise RuntimeError("EVIDENCIAS_S3_BUCKET não configurado")
+                _store = S3BlobStore(EVIDENCIAS_S3_BUCKET, EVIDENCIAS_S3_PREFIX, EVIDENCIAS_S3_ENDPOINT)
+            else:
+                _store = LocalBlobStore(EVIDENCIAS_DIR)
+        return _store
+
+
+# -----------------------------
+# Download com Range / ETag
+# -----------------------------
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _intervalo(range_header: Optional[str], tamanho: int) -> Optional[tuple[int, int]]:
+    """(inicio, fim) do header Range; None = arquivo inteiro. 416 se insatisfazível."""
+    if not range_header:
+        return None
+    m = _RANGE.match(range_header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None  # múltiplos intervalos ou formato desconhecido: responde 200 completo
+    if m.group(1):
+        inicio = int(m.group(1))
+        fim = min(int(m.group(2)), tamanho - 1) if m.group(2) else tamanho - 1
+    else:
+        sufixo = int(m.group(2))
+        inicio = max(tamanho - sufixo, 0)
+        fim = tamanho - 1
+    if inicio >= tamanho or inicio > fim:
+        raise HTTPException(status_code=416, detail="Intervalo inválido", headers={"Content-Range": f"bytes */{tamanho}"})
+    return inicio, fim
+
+
+def resposta_blob(
+    request: Request,
+    *,
+    etag: str,
+    tamanho: int,
+    media_type: str,
+    filename: str,
+    abrir,
+    existe: Optional[Callable[[], bool]] = None,
+) -> Response:
+    """Resposta 200/206/304; `abrir(inicio, fim)` devolve o iterador de bytes.
+
+    `existe` é consultado antes de montar a resposta: um blob ausente no store
+    vira 404 em vez de uma resposta 200 que quebra no meio do streaming.
+    """
+    if existe is not None and not existe():
+        logger.error("Evidências: blob %s ausente no store", etag)
+        raise HTTPException(status_code=404, detail="Conteúdo do arquivo não encontrado no armazenamento")
+    etag_header = f'"{etag}"'
+    headers = {
+        "ETag": etag_header,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=0, must-revalidate",
+        "Content-Disposition": f"attachment; filename=\"{filename}\"",
+    }
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or etag_header in [t.strip() for t in inm.split(",")]):
+        return Response(status_code=304, headers={k: headers[k] for k in ("ETag", "Cache-Control")})
+    intervalo = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range.strip() == etag_header:
+        intervalo = _intervalo(request.headers.get("range"), tamanho)
+    if intervalo is None:
+        headers["Content-Length"] = str(tamanho)
+        return StreamingResponse(abrir(0, None), media_type=media_type, headers=headers)
+    inicio, fim = intervalo
+    headers["Content-Range"] = f"bytes {inicio}-{fim}/{tamanho}"
+    headers["Content-Length"] = str(fim - inicio + 1)
+    return StreamingResponse(abrir(inicio, fim), status_code=206, media_type=media_type, headers=headers)
+
+
+def abrir_bytes(conteudo: bytes):
+    """Adaptador para linhas legadas (BYTEA) no formato de resposta_blob."""
+    def abrir(inicio: int, fim: Optional[int]):
+        yield conteudo[inicio:] if fim is None else conteudo[inicio:fim + 1]
+    return abrir
+
+
+# -----------------------------
+# Migração BYTEA -> store
+# -----------------------------
+def migrar_bytea(db: Session, lote: int = 50, limite: Optional[int] = None) -> int:
+    """Move o conteúdo das evidências ainda em BYTEA para o store, em lotes.
+
+    Cada linha só tem `conteudo` limpo depois de gravada no store e com o
+    sha256 preenchido no mesmo commit; pode ser interrompida e reexecutada.
+    """
+    store = get_store()
+    movidas = 0
+    while limite is None or movidas < limite:
+        rows = db.execute(
+            sa.text(
+                "SELECT id, conteudo FROM cronogramas_tarefas_evidencias "
+                "WHERE sha256 IS NULL AND conteudo IS NOT NULL ORDER BY id LIMIT :lote"
+            ),
+            {"lote": lote if limite is None else min(lote, limite - movidas)},
+        ).all()
+        if not rows:
+            break
+        for ev_id, conteudo in rows:
+            chave, tamanho = store.salvar(io.BytesIO(bytes(conteudo)))
+            db.execute(
+                sa.text(
+                    "UPDATE cronogramas_tarefas_evidencias "
+                    "SET sha256 = :sha, tamanho_bytes = :tam, conteudo = NULL WHERE id = :id"
+                ),
+                {"sha": chave, "tam": tamanho, "id": ev_id},
+            )
+        db.commit()
+        movidas += len(rows)
+        logger.info("Evidências: %d movida(s) para o store", movidas)
+    return movidas
+
+
+# -----------------------------
+# Coleta de blobs órfãos
+# -----------------------------
+def coletar_orfaos(db: Session, carencia_horas: float = 24, lote: int = 500) -> int:
+    """Remove do store os blobs que nenhuma evidência referencia.
+
+    Só considera blobs sem gravação há `carencia_horas`: o upload grava (ou
+    renova, no dedup) o blob antes de inserir a linha, então um blob recente
+    sem referência pode ser um upload em andamento. A data é conferida de novo
+    logo antes da remoção.
+    """
+    store = get_store()
+    limite = time.time() - carencia_horas * 3600
+    consulta = sa.text(
+        "SELECT DISTINCT sha256 FROM cronogramas_tarefas_evidencias WHERE sha256 IN :chaves"
+    ).bindparams(sa.bindparam("chaves", expanding=True))
+
+    removidos = 0
+
+    def _processar(chaves: list[str]):
+        nonlocal removidos
+        referenciadas = set(db.execute(consulta, {"chaves": chaves}).scalars())
+        db.rollback()
+        for chave in chaves:
+            if chave in referenciadas:
+                continue
+            modificado = store.modificado_em(chave)
+            if modificado is None or modificado >= limite:
+                continue
+            store.remover(chave)
+            removidos += 1
+
+    pendentes: list[str] = []
+    for chave, modificado in store.listar():
+        if modificado < limite:
+            pendentes.append(chave)
+        if len(pendentes) >= lote:
+            _processar(pendentes)
+            pendentes = []
+    if pendentes:
+        _processar(pendentes)
+    if removidos:
+        logger.info("Evidências: %d blob(s) órfão(s) removido(s)", removidos)
+    return removidos
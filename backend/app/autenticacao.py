@@ -0,0 +1,288 @@
+"""
+Verificação de senha fora do loop e controle de tentativas de login.
+
+bcrypt é CPU-bound (centenas de ms por verificação): roda num executor
+dedicado e limitado, para que um pico de logins não ocupe o threadpool das
+demais rotas. Quando a fila enche, o login responde 503 em vez de acumular
+requisições. Métricas de fila/tempo em metricas_bcrypt().
+
+As tentativas de login ficam atrás de LoginThrottleStore: em memória (padrão,
+por processo) ou em banco (tabela login_tentativas), para valer entre
+workers. O banco pode ser o da aplicação ou outro SQLite/PostgreSQL.
+
+Configurável via variáveis de ambiente:
+- BCRYPT_ROUNDS: custo dos novos hashes (default: 12); hashes com custo
+  diferente são regerados no login bem-sucedido
+- BCRYPT_WORKERS: threads do executor (default: 2)
+- BCRYPT_MAX_FILA: verificações simultâneas (executando + aguardando) antes de recusar (default: 32)
+- LOGIN_MAX_TENTATIVAS: falhas até o bloqueio (default: 3)
+- LOGIN_BLOQUEIO_MINUTOS: duração do bloqueio (default: 15)
+- LOGIN_THROTTLE_STORE: memory | db (default: memory)
+- LOGIN_THROTTLE_URL: URL SQLAlchemy do store db (default: banco da aplicação)
+"""
+
+import abc
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+import bcrypt
+import sqlalchemy as sa
+from fastapi import HTTPException
+
+from .database import engine as app_engine
+
+logger = logging.getLogger("uvicorn.error")
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = max(1, int(os.getenv("BCRYPT_WORKERS", "2")))
+BCRYPT_MAX_FILA = max(1, int(os.getenv("BCRYPT_MAX_FILA", "32")))
+LOGIN_MAX_TENTATIVAS = int(os.getenv("LOGIN_MAX_TENTATIVAS", "3"))
+LOGIN_BLOQUEIO_MINUTOS = int(os.getenv("LOGIN_BLOQUEIO_MINUTOS", "15"))
+LOGIN_THROTTLE_STORE = os.getenv("LOGIN_THROTTLE_STORE", "memory").strip().lower()
+LOGIN_THROTTLE_URL = os.getenv("LOGIN_THROTTLE_URL")
+
+
+# -----------------------------
+# bcrypt em executor dedicado
+# -----------------------------
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_vagas = threading.BoundedSemaphore(BCRYPT_MAX_FILA)
+_metricas_lock = threading.Lock()
+_metricas = {
+    "pendentes": 0,
+    "executando": 0,
+    "concluidas": 0,
+    "recusadas": 0,
+    "espera_total_ms": 0.0,
+    "execucao_total_ms": 0.0,
+}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+        return _executor
+
+
+def _medir(funcao, enfileirado_em: float, *args):
+    inicio = time.perf_counter()
+    with _metricas_lock:
+        _metricas["pendentes"] -= 1
+        _metricas["executando"] += 1
+        _metricas["espera_total_ms"] += (inicio - enfileirado_em) * 1000
+    try:
+        return funcao(*args)
+    finally:
+        with _metricas_lock:
+            _metricas["executando"] -= 1
+            _metricas["concluidas"] += 1
+            _metricas["execucao_total_ms"] += (time.perf_counter() - inicio) * 1000
+        _vagas.release()
+
+
+def _submeter(funcao, *args):
+    if not _vagas.acquire(blocking=False):
+        with _metricas_lock:
+            _metricas["recusadas"] += 1
+        raise HTTPException(status_code=503, detail="Servidor ocupado. Tente novamente em instantes.")
+    with _metricas_lock:
+        _metricas["pendentes"] += 1
+    try:
+        return _get_executor().submit(_medir, funcao, time.perf_counter(), *args)
+    except Exception:
+        with _metricas_lock:
+            _metricas["pendentes"] -= 1
+        _vagas.release()
+        raise
+
+
+def _checkpw(senha: str, senha_hash: str) -> bool:
+    try:
+        return bcrypt.checkpw(senha.encode("utf-8"), (senha_hash or "").encode("utf-8"))
+    except ValueError:
+        # hash vazio/corrompido
+        return False
+
+
+def _hashpw(senha: str) -> str:
+    return bcrypt.hashpw(senha.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("utf-8")
+
+
+async def verificar_senha_async(senha: str, senha_hash: str) -> bool:
+    return await asyncio.wrap_future(_submeter(_checkpw, senha, senha_hash))
+
+
+async def hash_senha_async(senha: str) -> str:
+    return await asyncio.wrap_future(_submeter(_hashpw, senha))
+
+
+def verificar_senha(senha: str, senha_hash: str) -> bool:
+    """Versão bloqueante para rotas síncronas (mesmo executor e limites)."""
+    return _submeter(_checkpw, senha, senha_hash).result()
+
+
+def hash_senha(senha: str) -> str:
+    return _submeter(_hashpw, senha).result()
+
+
+def precisa_rehash(senha_hash: str) -> bool:
+    """True se o hash foi gerado com custo diferente de BCRYPT_ROUNDS."""
+    try:
+        return int((senha_hash or "").split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+def metricas_bcrypt() -> dict:
+    with _metricas_lock:
+        m = dict(_metricas)
+    concluidas = m["concluidas"] or 1
+    return {
+        "workers": BCRYPT_WORKERS,
+        "capacidade": BCRYPT_MAX_FILA,
+        "fila": m["pendentes"],
+        "executando": m["executando"],
+        "concluidas": m["concluidas"],
+        "recusadas": m["recusadas"],
+        "espera_media_ms": round(m["espera_total_ms"] / concluidas, 2),
+        "execucao_media_ms": round(m["execucao_total_ms"] / concluidas, 2),
+    }
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+# -----------------------------
+# Controle de tentativas
+# -----------------------------
+class LoginThrottleStore(abc.ABC):
+    """Interface dos stores de tentativas de login (chave = identificador normalizado)."""
+
+    @abc.abstractmethod
+    def bloqueado_ate(self, chave: str) -> Optional[datetime]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def registrar_falha(self, chave: str, agora: datetime) -> Optional[datetime]:
+        """Conta uma falha; devolve o fim do bloqueio se o limite foi atingido."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def limpar(self, chave: str):
+        raise NotImplementedError
+
+
+class MemoriaThrottleStore(LoginThrottleStore):
+    """Por processo: com vários workers cada um tem sua contagem."""
+
+    def __init__(self):
+        self._dados: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def bloqueado_ate(self, chave: str) -> Optional[datetime]:
+        with self._lock:
+            return (self._dados.get(chave) or {}).get("blocked_until")
+
+    def registrar_falha(self, chave: str, agora: datetime) -> Optional[datetime]:
+        with self._lock:
+            la = self._dados.setdefault(chave, {"count": 0, "blocked_until": None})
+            la["count"] += 1
+            if la["count"] >= LOGIN_MAX_TENTATIVAS:
+                la["blocked_until"] = agora + timedelta(minutes=LOGIN_BLOQUEIO_MINUTOS)
+            return la["blocked_until"]
+
+    def limpar(self, chave: str):
+        with self._lock:
+            self._dados.pop(chave, None)
+
+
+class BancoThrottleStore(LoginThrottleStore):
+    """Tabela login_tentativas (SQLite ou PostgreSQL); contagem atômica via upsert."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def garantir_tabela(self):
+        with self.engine.begin() as conn:
+            conn.execute(sa.text(
+                """
+                CREATE TABLE IF NOT EXISTS login_tentativas (
+                    chave VARCHAR(255) PRIMARY KEY,
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    bloqueado_ate TIMESTAMP NULL,
+                    atualizado_em TIMESTAMP NOT NULL
+                )
+                """
+            ))
+
+    def bloqueado_ate(self, chave: str) -> Optional[datetime]:
+        with self.engine.connect() as conn:
+            valor = conn.execute(
+                sa.text("SELECT bloqueado_ate FROM login_tentativas WHERE chave = :chave"), {"chave": chave}
+            ).scalar()
+        if isinstance(valor, str):  # SQLite devolve texto
+            valor = datetime.fromisoformat(valor)
+        return valor
+
+    def registrar_falha(self, chave: str, agora: datetime) -> Optional[datetime]:
+        bloqueio = agora + timedelta(minutes=LOGIN_BLOQUEIO_MINUTOS)
+        with self.engine.begin() as conn:
+            conn.execute(
+                sa.text(
+                    """
+                    INSERT INTO login_tentativas (chave, tentativas, bloqueado_ate, atualizado_em)
+                    VALUES (:chave, 1, CASE WHEN 1 >= :maximo THEN :bloqueio END, :agora)
+                    ON CONFLICT (chave) DO UPDATE SET
+                        tentativas = login_tentativas.tentativas + 1,
+                        bloqueado_ate = CASE WHEN login_tentativas.tentativas + 1 >= :maximo
+                                             THEN :bloqueio ELSE login_tentativas.bloqueado_ate END,
+                        atualizado_em = :agora
+                    """
+                ),
+                {"chave": chave, "maximo": LOGIN_MAX_TENTATIVAS, "bloqueio": bloqueio, "agora": agora},
+            )
+        return self.bloqueado_ate(chave)
+
+    def limpar(self, chave: str):
+        with self.engine.begin() as conn:
+            conn.execute(sa.text("DELETE FROM login_tentativas WHERE chave = :chave"), {"chave": chave})
+
+
+def _criar_store() -> LoginThrottleStore:
+    if LOGIN_THROTTLE_STORE == "db":
+        engine = sa.create_engine(LOGIN_THROTTLE_URL, pool_pre_ping=True) if LOGIN_THROTTLE_URL else app_engine
+        store = BancoThrottleStore(engine)
+        try:
+            store.garantir_tabela()
+        except Exception:
+            logger.warning("login_tentativas indisponível; usando controle de tentativas em memória", exc_info=True)
+            return MemoriaThrottleStore()
+        return store
+    return MemoriaThrottleStore()
+
+
+_store: Optional[LoginThrottleStore] = None
+_store_lock = threading.Lock()
+
+
+def get_login_throttle() -> LoginThrottleStore:
+    """Store configurado, criado no primeiro uso (evita acessar o banco no import)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = _criar_store()
+        return _store
@@ -0,0 +1,154 @@
+"""
+Busca textual em auditoria_logs e notificacoes.
+
+Cada tabela tem a coluna gerada `busca_tsv` (to_tsvector na configuração
+BUSCA_CONFIG sobre a concatenação dos campos pesquisáveis) com índice GIN e,
+se a extensão pg_trgm estiver disponível, um índice GIN trigram sobre a mesma
+concatenação, que atende ILIKE '%termo%' sem varrer a tabela.
+
+filtro() escolhe o operador pelo termo:
+- palavras (só letras/dígitos, >= 3 caracteres): busca textual com prefixo
+  (palavra:*) ou substring via trigram, com relevância por ts_rank;
+- identificadores e trechos (ex.: LOGIN_SUCESSO, evidencia_id=12) ou termos
+  curtos: ILIKE na concatenação (índice trigram quando existir).
+Sem a coluna gerada (DDL não aplicado) cai para ILIKE nos campos, como antes.
+
+Configurável via variáveis de ambiente:
+- BUSCA_CONFIG: configuração de text search do PostgreSQL (default: portuguese)
+- BUSCA_CAPACIDADES_TTL_SECONDS: validade da detecção de colunas/índices (default: 300)
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+BUSCA_CONFIG = re.sub(r"[^a-z_]", "", os.getenv("BUSCA_CONFIG", "portuguese").strip().lower()) or "portuguese"
+BUSCA_CAPACIDADES_TTL_SECONDS = int(os.getenv("BUSCA_CAPACIDADES_TTL_SECONDS", "300"))
+
+# Tabela -> campos pesquisáveis (ordem define a expressão indexada)
+ALVOS = {
+    "auditoria_logs": ("acao", "entidade", "detalhes"),
+    "notificacoes": ("titulo", "mensagem"),
+}
+
+_PALAVRA = re.compile(r"\w+", re.UNICODE)
+
+
+def expressao_sql(tabela: str, prefixo: str = "") -> str:
+    """Concatenação dos campos; a mesma expressão do índice trigram (prefixo qualifica as colunas)."""
+    return "(" + " || ' ' || ".join(f"coalesce({prefixo}{c}, '')" for c in ALVOS[tabela]) + ")"
+
+
+def ddl(tabela: str) -> list[str]:
+    """Comandos idempotentes da coluna gerada e dos índices de busca de uma tabela."""
+    expr = expressao_sql(tabela)
+    return [
+        # Coluna gerada: reescreve a tabela na primeira execução
+        f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS busca_tsv tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('{BUSCA_CONFIG}'::regconfig, {expr})) STORED",
+        f"CREATE INDEX IF NOT EXISTS ix_{tabela}_busca_tsv ON {tabela} USING GIN (busca_tsv)",
+        # Sem privilégio para a extensão, segue só com a busca textual
+        "DO $$ BEGIN CREATE EXTENSION IF NOT EXISTS pg_trgm; "
+        "EXCEPTION WHEN OTHERS THEN RAISE NOTICE 'pg_trgm indisponível: %', SQLERRM; END $$",
+        "DO $$ BEGIN IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN "
+        f"CREATE INDEX IF NOT EXISTS ix_{tabela}_busca_trgm ON {tabela} USING GIN ({expr} gin_trgm_ops); "
+        "END IF; END $$",
+    ]
+
+
+# -----------------------------
+# Detecção do que está disponível no banco
+# -----------------------------
+_capacidades: Optional[tuple[float, dict]] = None
+_capacidades_lock = threading.Lock()
+
+
+def capacidades(db: Session) -> dict:
+    """{tabela: {"tsv": bool, "trgm": bool}} com cache por processo."""
+    global _capacidades
+    agora = time.monotonic()
+    with _capacidades_lock:
+        if _capacidades and agora - _capacidades[0] < BUSCA_CAPACIDADES_TTL_SECONDS:
+            return _capacidades[1]
+    caps = {t: {"tsv": False, "trgm": False} for t in ALVOS}
+    try:
+        colunas = db.execute(
+            sa.text(
+                "SELECT table_name FROM information_schema.columns "
+                "WHERE column_name = 'busca_tsv' AND table_name IN :tabelas"
+            ).bindparams(sa.bindparam("tabelas", expanding=True)),
+            {"tabelas": list(ALVOS)},
+        ).scalars().all()
+        indices = db.execute(
+            sa.text("SELECT indexname FROM pg_indexes WHERE indexname IN :nomes").bindparams(
+                sa.bindparam("nomes", expanding=True)
+            ),
+            {"nomes": [f"ix_{t}_busca_trgm" for t in ALVOS]},
+        ).scalars().all()
+        for t in ALVOS:
+            caps[t]["tsv"] = t in colunas
+            caps[t]["trgm"] = f"ix_{t}_busca_trgm" in indices
+    except Exception:
+        logger.warning("Busca: falha ao detectar índices; usando ILIKE", exc_info=True)
+    with _capacidades_lock:
+        _capacidades = (agora, caps)
+    return caps
+
+
+def invalidar_capacidades():
+    global _capacidades
+    with _capacidades_lock:
+        _capacidades = None
+
+
+# -----------------------------
+# Filtro e relevância
+# -----------------------------
+def escapar_like(termo: str) -> str:
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _e_palavras(termo: str) -> bool:
+    palavras = termo.split()
+    return len(termo) >= 3 and bool(palavras) and all(_PALAVRA.fullmatch(p) and "_" not in p for p in palavras)
+
+
+def filtro(db: Session, modelo, q: Optional[str]):
+    """(critério WHERE, expressão de relevância ou None) para o termo `q` sobre o modelo.
+
+    Devolve (None, None) para termo vazio.
+    """
+    termo = (q or "").strip()
+    if not termo:
+        return None, None
+    tabela = modelo.__tablename__
+    caps = capacidades(db).get(tabela, {})
+    like = f"%{escapar_like(termo)}%"
+    if not caps.get("tsv"):
+        # Fallback: campos originais (sem índice de busca)
+        return sa.or_(*(getattr(modelo, c).ilike(like) for c in ALVOS[tabela])), None
+
+    texto = sa.literal_column(expressao_sql(tabela, prefixo=f"{tabela}."))
+    if not _e_palavras(termo):
+        return texto.ilike(like), None
+
+    tsv = sa.literal_column(f"{tabela}.busca_tsv")
+    consulta = sa.func.to_tsquery(
+        sa.literal_column(f"'{BUSCA_CONFIG}'::regconfig"),
+        " & ".join(f"{p}:*" for p in termo.split()),
+    )
+    criterio = tsv.op("@@")(consulta)
+    if caps.get("trgm"):
+        # Substring dentro de palavras (ex.: 'cesso' em LOGIN_SUCESSO) também pelo índice trigram
+        criterio = sa.or_(criterio, texto.ilike(like))
+    # numeric arredondado: valor estável para cursores de paginação
+    rank = sa.func.round(sa.cast(sa.func.ts_rank(tsv, consulta), sa.Numeric), 6)
+    return criterio, rank
@@ -0,0 +1,137 @@
+"""
+GET condicional (ETag / If-None-Match) para listagens de leitura frequente.
+
+O ETag de uma resposta é calculado sem executar a consulta da rota: combina o
+caminho e a query string, a credencial do cliente (Authorization e
+X-Company-Id, pois o conteúdo depende das empresas permitidas ao usuário) e a
+versão dos recursos lidos pela rota (contadores de app/versoes.py,
+incrementados a cada escrita confirmada). Se o cliente já tem essa versão,
+a resposta é 304 Not Modified, sem tocar nas tabelas da listagem.
+
+A versão é lida antes de a rota executar: uma escrita concorrente pode, no
+máximo, associar dados novos a um ETag antigo, e a próxima requisição (já com a
+versão nova) busca tudo de novo.
+
+Configurável via variáveis de ambiente:
+- CACHE_HTTP_ENABLED: True/False (default: True)
+- CACHE_HTTP_REFERENCIAS_MAX_AGE: segundos em que o navegador pode reutilizar
+  cadastros de referência sem revalidar (default: 0, sempre revalida)
+"""
+
+import hashlib
+import logging
+import os
+import re
+from typing import NamedTuple, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+
+from .database import SessionLocal
+from .versoes import obter_versoes
+
+logger = logging.getLogger(__name__)
+
+CACHE_HTTP_ENABLED = os.getenv("CACHE_HTTP_ENABLED", "true").strip().lower() in {"1", "true", "yes", "on"}
+CACHE_HTTP_REFERENCIAS_MAX_AGE = int(os.getenv("CACHE_HTTP_REFERENCIAS_MAX_AGE", "0"))
+
+# O que define as empresas visíveis ao usuário: as tabelas de usuários e grupos e a
+# versão global de autorização (dependencies.VERSAO_AUTORIZACAO_GLOBAL)
+RECURSOS_ACESSO = ("usuarios", "grupos_permissao", "grupo_empresa", "grupo_usuario", "grupo_transacao", "autorizacao")
+
+_CONTROLE_REFERENCIAS = (
+    f"private, max-age={CACHE_HTTP_REFERENCIAS_MAX_AGE}, must-revalidate"
+    if CACHE_HTTP_REFERENCIAS_MAX_AGE > 0
+    else "private, no-cache"
+)
+# Itens mudam durante a revisão: sempre revalidar (o 304 é barato)
+_CONTROLE_ITENS = "private, no-cache"
+
+
+class Politica(NamedTuple):
+    caminho: re.Pattern
+    recursos: tuple  # tabelas em versoes.RECURSOS_VERSIONADOS
+    cache_control: str
+
+
+POLITICAS = (
+    Politica(re.compile(r"^/companies/?$"), ("companies",), _CONTROLE_REFERENCIAS),
+    Politica(re.compile(r"^/unidades_gerenciais/?$"), ("unidades_gerenciais",), _CONTROLE_REFERENCIAS),
+    Politica(re.compile(r"^/centros_custos/?$"), ("centros_custos",), _CONTROLE_REFERENCIAS),
+    Politica(re.compile(r"^/classes_contabeis/?$"), ("classes_contabeis",), _CONTROLE_REFERENCIAS),
+    Politica(re.compile(r"^/contas_contabeis/?$"), ("contas_contabeis",), _CONTROLE_REFERENCIAS),
+    # /changes também: o ETag inclui a marca `since` da query, e um 304 mantém no cliente a
+    # resposta anterior (mesma marca), então nenhuma alteração posterior fica de fora
+    Politica(
+        re.compile(r"^/revisoes/itens/\d+(/pagina|/changes)?/?$"),
+        ("revisoes_itens", "revisoes_delegacoes", "revisoes_periodos"),
+        _CONTROLE_ITENS,
+    ),
+    Politica(
+        re.compile(r"^/revisoes/delegacoes/\d+(/pagina|/resumo)?/?$"),
+        ("revisoes_delegacoes", "revisoes_itens", "revisoes_periodos"),
+        _CONTROLE_ITENS,
+    ),
+)
+
+
+def politica(request: Request) -> Optional[Politica]:
+    if request.method != "GET":
+        return None
+    for p in POLITICAS:
+        if p.caminho.match(request.url.path):
+            return p
+    return None
+
+
+def _versoes(recursos: tuple) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        return obter_versoes(db, recursos + RECURSOS_ACESSO)
+    finally:
+        db.close()
+
+
+def etag(request: Request, versoes: dict) -> str:
+    partes = [
+        request.url.path,
+        "&".join(sorted(request.url.query.split("&"))) if request.url.query else "",
+        request.headers.get("authorization", ""),
+        request.headers.get("x-company-id", ""),
+        ";".join(f"{r}={v}" for r, v in sorted(versoes.items())),
+    ]
+    return '"' + hashlib.sha256("\n".join(partes).encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _corresponde(if_none_match: Optional[str], tag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Comparação fraca (RFC 9110): ignora o prefixo W/ que proxies podem acrescentar
+    candidatos = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in candidatos or tag in candidatos
+
+
+async def requisicao_condicional(request: Request, call_next):
+    p = politica(request) if CACHE_HTTP_ENABLED else None
+    # Sem credencial a rota responde 401: nada a validar
+    if p is None or not request.headers.get("authorization"):
+        return await call_next(request)
+    try:
+        versoes = await run_in_threadpool(_versoes, p.recursos)
+    except Exception:
+        logger.warning("Cache HTTP: falha ao obter versões de %s", request.url.path, exc_info=True)
+        versoes = None
+    if versoes is None:
+        return await call_next(request)
+
+    tag = etag(request, versoes)
+    headers = {"ETag": tag, "Cache-Control": p.cache_control, "Vary": "Authorization, X-Company-Id"}
+    if _corresponde(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers=headers)
+
+    response = await call_next(request)
+    if response.status_code == 200:
+        for nome, valor in headers.items():
+            response.headers[nome] = valor
+    return response
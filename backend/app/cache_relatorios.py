@@ -0,0 +1,189 @@
+"""
+Cache de relatórios RVU em disco.
+
+A chave combina tipo do relatório, filtros normalizados, empresas permitidas
+ao usuário e a versão dos dados envolvidos (app/versoes.py). Como a versão
+muda a cada escrita confirmada em itens/delegações/períodos/usuários, uma
+entrada nunca é invalidada explicitamente: ela apenas deixa de ser
+encontrada e sai pelo LRU.
+
+Uma entrada é servida pelo handle aberto em obter()/gravar_arquivo(): se o LRU
+de outra requisição remover o arquivo nesse meio tempo, o conteúdo continua
+legível pelo handle (POSIX) e o download não é truncado.
+
+Configurável via variáveis de ambiente:
+- RELATORIOS_CACHE_ENABLED: True/False (default: True)
+- RELATORIOS_CACHE_DIR: diretório dos artefatos (default: <tmp>/assetlife_relatorios_cache)
+- RELATORIOS_CACHE_MAX_MB: tamanho máximo total antes da remoção dos menos usados (default: 512)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime
+from typing import BinaryIO, NamedTuple, Optional
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
+
+from .versoes import obter_versoes
+
+logger = logging.getLogger(__name__)
+
+RELATORIOS_CACHE_ENABLED = os.getenv("RELATORIOS_CACHE_ENABLED", "true").strip().lower() in {"1", "true", "yes", "on"}
+RELATORIOS_CACHE_DIR = os.getenv("RELATORIOS_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "assetlife_relatorios_cache")
+RELATORIOS_CACHE_MAX_BYTES = int(os.getenv("RELATORIOS_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+RECURSOS_RELATORIOS = ("revisoes_itens", "revisoes_delegacoes", "revisoes_periodos", "usuarios")
+
+# Tamanho dos blocos lidos do arquivo ao enviar uma entrada
+RELATORIOS_CACHE_CHUNK_BYTES = 256 * 1024
+
+_lock = threading.Lock()
+
+
+class EntradaCache(NamedTuple):
+    arquivo: BinaryIO  # aberto; fechado por resposta() ao fim do envio
+    tamanho: int
+    media_type: str
+    filename: Optional[str]
+
+
+def _normalizar(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, str):
+        return valor.strip()
+    return valor
+
+
+def chave(db: Session, tipo: str, params: dict, empresas: list[int]) -> Optional[str]:
+    """Chave do relatório ou None quando o cache não pode ser usado."""
+    if not RELATORIOS_CACHE_ENABLED:
+        return None
+    versoes = obter_versoes(db, RECURSOS_RELATORIOS)
+    if versoes is None:
+        return None
+    base = {
+        "tipo": tipo,
+        "params": {k: _normalizar(v) for k, v in sorted(params.items()) if v not in (None, "")},
+        "empresas": sorted(int(e) for e in empresas or []),
+        "versoes": versoes,
+    }
+    return hashlib.sha256(json.dumps(base, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _paths(k: str) -> tuple[str, str]:
+    return os.path.join(RELATORIOS_CACHE_DIR, f"{k}.bin"), os.path.join(RELATORIOS_CACHE_DIR, f"{k}.meta")
+
+
+def obter(k: Optional[str]) -> Optional[EntradaCache]:
+    if not k:
+        return None
+    data_path, meta_path = _paths(k)
+    arquivo = None
+    try:
+        with open(meta_path, "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        arquivo = open(data_path, "rb")
+        os.utime(data_path)  # marca como usado recentemente (LRU por mtime)
+    except (OSError, ValueError):
+        if arquivo is not None:
+            arquivo.close()
+        return None  # removida pelo LRU: o relatório é gerado de novo
+    return _entrada(arquivo, meta.get("media_type") or "application/octet-stream", meta.get("filename"))
+
+
+def _entrada(arquivo: BinaryIO, media_type: str, filename: Optional[str]) -> EntradaCache:
+    return EntradaCache(arquivo, os.fstat(arquivo.fileno()).st_size, media_type, filename)
+
+
+def gravar_bytes(k: str, conteudo: bytes, media_type: str, filename: Optional[str] = None):
+    """Guarda conteúdo já entregue pela rota (não devolve entrada para envio)."""
+    fd, tmp = tempfile.mkstemp(prefix="assetlife_cache_")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(conteudo)
+    entrada = gravar_arquivo(k, tmp, media_type, filename)
+    if entrada:
+        entrada.arquivo.close()
+
+
+def gravar_arquivo(k: str, origem: str, media_type: str, filename: Optional[str] = None) -> Optional[EntradaCache]:
+    """Move o arquivo gerado para o cache; em caso de falha devolve None e remove a origem."""
+    data_path, meta_path = _paths(k)
+    try:
+        os.makedirs(RELATORIOS_CACHE_DIR, exist_ok=True)
+        tmp_data = f"{data_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.move(origem, tmp_data)
+        os.replace(tmp_data, data_path)
+        tmp_meta = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as fh:
+            json.dump({"media_type": media_type, "filename": filename}, fh)
+        os.replace(tmp_meta, meta_path)
+        # Aberto antes da limpeza do LRU, que pode remover esta mesma entrada
+        arquivo = open(data_path, "rb")
+    except OSError:
+        logger.warning("Cache de relatórios: falha ao gravar %s", k, exc_info=True)
+        for p in (origem, data_path):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+        return None
+    _aplicar_limite()
+    return _entrada(arquivo, media_type, filename)
+
+
+def resposta(entrada: EntradaCache) -> StreamingResponse:
+    """Envia a entrada pelo handle já aberto e o fecha ao terminar."""
+    headers = {"Content-Length": str(entrada.tamanho)}
+    if entrada.filename:
+        headers["Content-Disposition"] = f'attachment; filename="{entrada.filename}"'
+
+    def blocos():
+        try:
+            while True:
+                bloco = entrada.arquivo.read(RELATORIOS_CACHE_CHUNK_BYTES)
+                if not bloco:
+                    break
+                yield bloco
+        finally:
+            entrada.arquivo.close()
+
+    # A tarefa em segundo plano cobre o cliente que desconecta antes do primeiro bloco
+    return StreamingResponse(
+        blocos(), media_type=entrada.media_type, headers=headers, background=BackgroundTask(entrada.arquivo.close)
+    )
+
+
+def _aplicar_limite():
+    """Remove as entradas menos usadas até o total ficar abaixo de 90% do limite."""
+    with _lock:
+        try:
+            entradas = []
+            total = 0
+            with os.scandir(RELATORIOS_CACHE_DIR) as it:
+                for e in it:
+                    if e.name.endswith(".bin") and e.is_file():
+                        st = e.stat()
+                        entradas.append((st.st_mtime, st.st_size, e.path))
+                        total += st.st_size
+            if total <= RELATORIOS_CACHE_MAX_BYTES:
+                return
+            alvo = int(RELATORIOS_CACHE_MAX_BYTES * 0.9)
+            for _mtime, size, path in sorted(entradas):
+                if total <= alvo:
+                    break
+                for p in (path[:-4] + ".meta", path):
+                    try:
+                        os.remove(p)
+                    except OSError:
+                        pass
+                total -= size
+        except OSError:
+            logger.warning("Cache de relatórios: falha na limpeza", exc_info=True)
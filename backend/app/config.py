@@ -53,3 +53,6 @@ SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-in-prod")
 ALGORITHM = "HS256"
 JWT_EXPIRE_MINUTES = 60 * 8  # 8 horas
 RESET_TOKEN_EXPIRE_MINUTES = 30  # 30 minutos
+# Snapshot de autorização (admin, empresas, versão) nas claims do JWT; ver app/dependencies.py
+JWT_AUTHZ_CLAIMS = os.getenv("JWT_AUTHZ_CLAIMS", "false").strip().lower() in {"1", "true", "yes", "on"}
+JWT_AUTHZ_MAX_EMPRESAS = int(os.getenv("JWT_AUTHZ_MAX_EMPRESAS", "200"))
@@ -0,0 +1,189 @@
+"""
+Filtros compartilhados sobre revisoes_itens e diagnóstico opcional de consultas.
+
+FiltroItens apenas compõe cláusulas sobre uma Query que já tenha o JOIN com
+revisoes_periodos; nada é executado até a rota consumir `.query`.
+
+O diagnóstico (EXPLAIN ANALYZE com estimativa x linhas reais e tempos) é
+ligado por requisição com o header `X-Query-Diagnostics: 1`, apenas para
+administradores. O resultado vai para o log e volta no header de resposta
+`X-Query-Diagnostics` (ver middleware em main.py).
+"""
+
+import json
+import logging
+from datetime import date
+from typing import Optional
+
+import sqlalchemy as sa
+from fastapi import Request
+from sqlalchemy.orm import Query, Session
+
+from .dependencies import is_admin_user
+from .models import (
+    RevisaoItem as RevisaoItemModel,
+    RevisaoPeriodo as RevisaoPeriodoModel,
+    RevisaoDelegacao as RevisaoDelegacaoModel,
+)
+
+logger = logging.getLogger("uvicorn.error")
+
+DIAGNOSTICO_HEADER = "X-Query-Diagnostics"
+
+
+class FiltroItens:
+    """Encadeia os filtros usuais de itens de revisão (valores vazios são ignorados)."""
+
+    def __init__(self, query: Query):
+        self.query = query
+
+    def _filtrar(self, *criterios) -> "FiltroItens":
+        self.query = self.query.filter(*criterios)
+        return self
+
+    def empresas_permitidas(self, empresa_ids: Optional[list[int]]) -> "FiltroItens":
+        if empresa_ids:
+            self._filtrar(RevisaoPeriodoModel.empresa_id.in_(empresa_ids))
+        return self
+
+    def empresa(self, empresa_id: Optional[int]) -> "FiltroItens":
+        if empresa_id:
+            self._filtrar(RevisaoPeriodoModel.empresa_id == int(empresa_id))
+        return self
+
+    def ug(self, ug_id: Optional[int], incluir_globais: bool = False) -> "FiltroItens":
+        """UG do período; com incluir_globais também aceita períodos sem UG."""
+        if ug_id:
+            if incluir_globais:
+                self._filtrar(sa.or_(RevisaoPeriodoModel.ug_id == int(ug_id), RevisaoPeriodoModel.ug_id.is_(None)))
+            else:
+                self._filtrar(RevisaoPeriodoModel.ug_id == int(ug_id))
+        return self
+
+    def classe(self, classe) -> "FiltroItens":
+        # Campo String na base importada; o front pode enviar int ou 'Todos'
+        if classe and str(classe).lower() not in ("todos", ""):
+            self._filtrar(RevisaoItemModel.classe == str(classe))
+        return self
+
+    def centro_custo(self, centro_custo: Optional[str]) -> "FiltroItens":
+        if centro_custo:
+            self._filtrar(RevisaoItemModel.centro_custo == centro_custo)
+        return self
+
+    def revisor_delegado(self, revisor_id: Optional[int]) -> "FiltroItens":
+        """Itens com delegação ativa para o revisor."""
+        if revisor_id:
+            self.query = self.query.join(
+                RevisaoDelegacaoModel,
+                sa.and_(
+                    RevisaoDelegacaoModel.ativo_id == RevisaoItemModel.id,
+                    RevisaoDelegacaoModel.status == 'Ativo',
+                    RevisaoDelegacaoModel.revisor_id == int(revisor_id),
+                ),
+            )
+        return self
+
+    def responsavel_periodo(self, usuario_id: Optional[int]) -> "FiltroItens":
+        if usuario_id:
+            self._filtrar(RevisaoPeriodoModel.responsavel_id == int(usuario_id))
+        return self
+
+    def periodo(self, periodo_id: Optional[int]) -> "FiltroItens":
+        if periodo_id:
+            self._filtrar(RevisaoItemModel.periodo_id == int(periodo_id))
+        return self
+
+    def inicio_depreciacao(self, inicio: Optional[date], fim: Optional[date]) -> "FiltroItens":
+        if inicio:
+            self._filtrar(RevisaoItemModel.data_inicio_depreciacao >= inicio)
+        if fim:
+            self._filtrar(RevisaoItemModel.data_inicio_depreciacao <= fim)
+        return self
+
+    def status(self, status: Optional[str]) -> "FiltroItens":
+        if status and status != 'Todos':
+            self._filtrar(RevisaoItemModel.status == status)
+        return self
+
+
+class Diagnostico:
+    """Coleta EXPLAIN ANALYZE das consultas de uma requisição."""
+
+    def __init__(self, request: Request):
+        self.request = request
+        self.resultados: list[dict] = []
+        request.state.diagnosticos_consulta = self.resultados
+
+    def explicar(self, db: Session, query, rotulo: str) -> Optional[dict]:
+        stmt = query.statement if isinstance(query, Query) else query
+        try:
+            compiled = stmt.compile(dialect=db.get_bind().dialect, compile_kwargs={"render_postcompile": True})
+            # Savepoint: EXPLAIN ANALYZE executa a consulta; falhas não contaminam a transação da rota
+            with db.begin_nested():
+                plano = db.connection().exec_driver_sql(
+                    f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {compiled}", compiled.params
+                ).scalar()
+            if isinstance(plano, str):
+                plano = json.loads(plano)
+            raiz = plano[0]
+            info = {
+                "rotulo": rotulo,
+                "linhas_estimadas": raiz["Plan"].get("Plan Rows"),
+                "linhas_reais": raiz["Plan"].get("Actual Rows"),
+                "custo_total": raiz["Plan"].get("Total Cost"),
+                "no_raiz": raiz["Plan"].get("Node Type"),
+                "planejamento_ms": raiz.get("Planning Time"),
+                "execucao_ms": raiz.get("Execution Time"),
+            }
+        except Exception as e:
+            info = {"rotulo": rotulo, "erro": e.__class__.__name__}
+        self.resultados.append(info)
+        logger.info("Diagnóstico de consulta %s", json.dumps(info, default=str))
+        return info
+
+
+def diagnostico_consulta(request: Request, db: Session, current_user) -> Optional[Diagnostico]:
+    """Diagnostico se o header foi enviado por um administrador; caso contrário None."""
+    if request is None:
+        return None
+    if (request.headers.get(DIAGNOSTICO_HEADER) or "").strip().lower() not in {"1", "true", "yes", "on"}:
+        return None
+    if not is_admin_user(db, current_user):
+        return None
+    return Diagnostico(request)
+
+
+def diagnosticar(request: Request, db: Session, current_user, query, rotulo: str) -> Optional[dict]:
+    """Atalho: executa o diagnóstico da consulta quando habilitado para a requisição."""
+    diag = diagnostico_consulta(request, db, current_user)
+    if diag is None:
+        return None
+    return diag.explicar(db, query, rotulo)
+
+
+def estimar_linhas(db: Session, query=None, tabela: Optional[str] = None) -> Optional[int]:
+    """Total aproximado sem COUNT(*): estatísticas do planner.
+
+    Sem consulta (tabela inteira) usa pg_class.reltuples da tabela; com filtros
+    usa a estimativa de linhas do EXPLAIN (sem ANALYZE: nada é executado).
+    None quando a estimativa não está disponível (ex.: tabela nunca analisada).
+    """
+    try:
+        if query is None:
+            total = db.execute(
+                sa.text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:tabela)"),
+                {"tabela": tabela},
+            ).scalar()
+            return int(total) if total is not None and total >= 0 else None
+        stmt = query.statement if isinstance(query, Query) else query
+        compiled = stmt.compile(dialect=db.get_bind().dialect, compile_kwargs={"render_postcompile": True})
+        # Savepoint: uma falha no EXPLAIN não contamina a transação da rota
+        with db.begin_nested():
+            plano = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        return int(plano[0]["Plan"]["Plan Rows"])
+    except Exception:
+        logger.debug("Estimativa de linhas indisponível", exc_info=True)
+        return None
@@ -1,11 +1,16 @@
-from fastapi import Depends, HTTPException, Header
+from fastapi import Depends, HTTPException, Header, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError, OperationalError
 from typing import Optional, List
 import logging
-from .database import SessionLocal
+import os
+import threading
+import time
+import sqlalchemy as sa
+from .database import SessionLocal, engine
+from .versoes import incrementar as incrementar_versoes
 from .models import (
     Usuario as UsuarioModel, 
     Company as CompanyModel,
@@ -15,7 +20,7 @@ from .models import (
     Transacao as TransacaoModel, 
     GrupoTransacao as GrupoTransacaoModel
 )
-from .config import SECRET_KEY, ALGORITHM
+from .config import SECRET_KEY, ALGORITHM, JWT_AUTHZ_CLAIMS, JWT_AUTHZ_MAX_EMPRESAS
 
 security = HTTPBearer()
 
@@ -30,13 +35,21 @@ def get_db():
     finally:
         db.close()
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    token = credentials.credentials
+# Tokens de uso específico levam a claim "typ" (ex.: ticket do /events/stream)
+# e não autenticam as demais rotas.
+TIPO_TOKEN_EVENTOS = "eventos"
+
+
+def _decodificar_token(credentials: HTTPAuthorizationCredentials) -> tuple[int, dict]:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = int(payload.get("sub"))
-    except (JWTError, ValueError):
+        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        if payload.get("typ"):
+            raise ValueError("token de uso específico")
+        return int(payload.get("sub")), payload
+    except (JWTError, ValueError, TypeError):
         raise HTTPException(status_code=401, detail="Token inválido")
+
+def _carregar_usuario(request: Request, db: Session, user_id: int, payload: dict) -> UsuarioModel:
     try:
         user = db.query(UsuarioModel).filter(UsuarioModel.id == user_id).first()
     except OperationalError:
@@ -47,68 +60,263 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         raise HTTPException(status_code=500, detail="Erro interno ao validar usuário")
     if not user:
         raise HTTPException(status_code=401, detail="Usuário não encontrado")
+    # Contexto de autorização memoizado no estado da requisição (semeado pelas claims, se válidas)
+    user._estado_requisicao = request.state
+    ctx = _contexto_das_claims(db, user_id, payload)
+    if ctx is not None and ctx.empresa_direta == user.empresa_id:
+        request.state.autorizacao = ctx
     return user
 
-def is_admin_user(db: Session, current_user: UsuarioModel) -> bool:
-    q = (
-        db.query(GrupoPermissaoModel.nome)
-        .join(GrupoUsuarioModel, GrupoUsuarioModel.grupo_id == GrupoPermissaoModel.id)
-        .filter(GrupoUsuarioModel.usuario_id == current_user.id)
+def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+    user_id, payload = _decodificar_token(credentials)
+    return _carregar_usuario(request, db, user_id, payload)
+
+
+class UsuarioToken:
+    """Usuário autenticado só pelas claims do token: expõe apenas id e empresa_id."""
+
+    def __init__(self, id: int, empresa_id: Optional[int]):
+        self.id = id
+        self.empresa_id = empresa_id
+
+
+def get_current_principal(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+    """Como get_current_user, mas sem consultar o banco quando o token traz um
+    snapshot de autorização com versão atual. Para rotas de leitura que usam
+    somente id/empresa_id do usuário e as funções de autorização abaixo."""
+    user_id, payload = _decodificar_token(credentials)
+    ctx = _contexto_das_claims(db, user_id, payload)
+    if ctx is None:
+        return _carregar_usuario(request, db, user_id, payload)
+    principal = UsuarioToken(user_id, ctx.empresa_direta)
+    principal._estado_requisicao = request.state
+    request.state.autorizacao = ctx
+    return principal
+
+# -----------------------------
+# Contexto de autorização
+# -----------------------------
+# Grupos, flag de admin, empresas e rotas liberadas do usuário, montados uma
+# vez e reaproveitados: memoizados na requisição (request.state.autorizacao)
+# e num cache do processo por usuário com TTL (AUTH_CACHE_TTL_SECONDS,
+# default 60; 0 desliga). As rotas /permissoes/... e os cadastros de usuários
+# e empresas invalidam o cache ao gravar; o TTL limita a defasagem entre
+# processos.
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
+_auth_cache: dict = {}
+_auth_cache_lock = threading.Lock()
+
+
+class ContextoAutorizacao:
+    __slots__ = ("usuario_id", "empresa_direta", "admin", "grupo_ids", "empresa_ids", "rotas")
+
+    def __init__(self, usuario_id: int, empresa_direta: Optional[int], admin: bool,
+                 grupo_ids: Optional[List[int]], empresa_ids: List[int], rotas: Optional[frozenset]):
+        self.usuario_id = usuario_id
+        self.empresa_direta = empresa_direta
+        self.admin = admin
+        self.grupo_ids = grupo_ids
+        self.empresa_ids = empresa_ids
+        self.rotas = rotas
+
+
+def _montar_contexto(db: Session, user: UsuarioModel) -> ContextoAutorizacao:
+    grupos = (
+        db.query(GrupoUsuarioModel.grupo_id, GrupoPermissaoModel.nome)
+        .outerjoin(GrupoPermissaoModel, GrupoPermissaoModel.id == GrupoUsuarioModel.grupo_id)
+        .filter(GrupoUsuarioModel.usuario_id == user.id)
+        .all()
     )
-    for (nome,) in q.all():
-        if nome and "admin" in str(nome).lower():
-            return True
-    return False
+    grupo_ids = sorted({g for g, _nome in grupos})
+    admin = any(nome and "admin" in str(nome).lower() for _g, nome in grupos)
+    rotas = frozenset()
+    if admin:
+        empresa_ids = [row[0] for row in db.query(CompanyModel.id).order_by(CompanyModel.id).all()]
+    else:
+        empresas = set()
+        if grupo_ids:
+            empresas = {
+                row[0] for row in db.query(GrupoEmpresaModel.empresa_id).filter(GrupoEmpresaModel.grupo_id.in_(grupo_ids))
+            }
+            rotas = frozenset(
+                row[0] for row in db.query(TransacaoModel.rota)
+                .join(GrupoTransacaoModel, GrupoTransacaoModel.transacao_id == TransacaoModel.id)
+                .filter(GrupoTransacaoModel.grupo_id.in_(grupo_ids))
+            )
+        # Merge com a empresa direta do usuário, se houver
+        if user.empresa_id is not None:
+            empresas.add(user.empresa_id)
+        empresa_ids = sorted(empresas)
+    return ContextoAutorizacao(user.id, user.empresa_id, admin, grupo_ids, empresa_ids, rotas)
+
+
+def get_authorization_context(db: Session, user: UsuarioModel, completo: bool = False) -> ContextoAutorizacao:
+    """Contexto de autorização do usuário (requisição -> cache do processo -> banco).
+
+    Com completo=True ignora um contexto parcial (claims do token) e garante grupos e rotas.
+    """
+    estado = getattr(user, "_estado_requisicao", None)
+    ctx = getattr(estado, "autorizacao", None) if estado is not None else getattr(user, "_autorizacao", None)
+    if ctx is not None and ctx.usuario_id == user.id and not (completo and ctx.rotas is None):
+        return ctx
+    ctx = None
+    agora = time.monotonic()
+    if AUTH_CACHE_TTL_SECONDS > 0:
+        with _auth_cache_lock:
+            entrada = _auth_cache.get(user.id)
+        if entrada and entrada[0] > agora and entrada[1].empresa_direta == user.empresa_id:
+            ctx = entrada[1]
+    if ctx is None:
+        ctx = _montar_contexto(db, user)
+        if AUTH_CACHE_TTL_SECONDS > 0:
+            with _auth_cache_lock:
+                _auth_cache[user.id] = (agora + AUTH_CACHE_TTL_SECONDS, ctx)
+    if estado is not None:
+        estado.autorizacao = ctx
+    else:
+        user._autorizacao = ctx
+    return ctx
+
+
+def reload_authorization_context(db: Session, user: UsuarioModel) -> ContextoAutorizacao:
+    """Recalcula o contexto no banco, ignorando os caches, e atualiza o cache do processo
+    (ex.: conexões longas que notam uma nova versão de autorização)."""
+    ctx = _montar_contexto(db, user)
+    if AUTH_CACHE_TTL_SECONDS > 0:
+        with _auth_cache_lock:
+            _auth_cache[user.id] = (time.monotonic() + AUTH_CACHE_TTL_SECONDS, ctx)
+    return ctx
+
+
+def invalidate_authorization_cache(usuario_id: Optional[int] = None):
+    """Descarta o contexto em cache de um usuário (ou de todos) e avança a
+    versão de autorização, para que snapshots em tokens já emitidos deixem de valer.
+
+    Chamar depois do commit da alteração (a versão é gravada em conexão própria).
+    """
+    with _auth_cache_lock:
+        if usuario_id is None:
+            _auth_cache.clear()
+            _versao_cache.clear()
+        else:
+            _auth_cache.pop(usuario_id, None)
+            _versao_cache.pop(usuario_id, None)
+    if usuario_id is None:
+        incrementar_versoes([VERSAO_AUTORIZACAO_GLOBAL])
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                sa.text("UPDATE usuarios SET versao_autorizacao = COALESCE(versao_autorizacao, 0) + 1 WHERE id = :id"),
+                {"id": int(usuario_id)},
+            )
+    except Exception:
+        logging.getLogger("uvicorn.error").warning("Falha ao avançar versão de autorização do usuário %s", usuario_id, exc_info=True)
+
+
+# -----------------------------
+# Snapshot de autorização no JWT
+# -----------------------------
+# Com JWT_AUTHZ_CLAIMS ligado, o login inclui no token: admin ("adm"), empresas
+# permitidas ("emp"), empresa direta ("ed") e a versão de autorização ("av" =
+# "<global>.<usuário>"). A versão global (dados_versoes, recurso "autorizacao")
+# avança em qualquer alteração de permissões; a do usuário
+# (usuarios.versao_autorizacao) em troca de senha e mudanças no próprio usuário
+# ou nos seus grupos. A versão atual fica em cache no processo pelo mesmo TTL
+# do contexto; token com versão diferente volta a ser validado no banco.
+VERSAO_AUTORIZACAO_GLOBAL = "autorizacao"
+
+_versao_cache: dict = {}
+
+
+def authorization_version(db: Session, usuario_id: int, usar_cache: bool = True) -> Optional[str]:
+    """Versão atual da autorização do usuário; None se indisponível ou usuário inexistente."""
+    agora = time.monotonic()
+    if usar_cache and AUTH_CACHE_TTL_SECONDS > 0:
+        with _auth_cache_lock:
+            entrada = _versao_cache.get(usuario_id)
+        if entrada and entrada[0] > agora:
+            return entrada[1]
+    try:
+        row = db.execute(
+            sa.text(
+                """
+                SELECT u.versao_autorizacao,
+                       COALESCE((SELECT versao FROM dados_versoes WHERE recurso = :recurso), 0)
+                FROM usuarios u
+                WHERE u.id = :id
+                """
+            ),
+            {"id": int(usuario_id), "recurso": VERSAO_AUTORIZACAO_GLOBAL},
+        ).first()
+    except SQLAlchemyError:
+        logging.getLogger("uvicorn.error").warning("Versão de autorização indisponível", exc_info=True)
+        db.rollback()
+        return None
+    versao = f"{int(row[1])}.{int(row[0] or 0)}" if row else None
+    if AUTH_CACHE_TTL_SECONDS > 0:
+        with _auth_cache_lock:
+            _versao_cache[usuario_id] = (agora + AUTH_CACHE_TTL_SECONDS, versao)
+    return versao
+
+
+def authorization_claims(db: Session, user: UsuarioModel) -> dict:
+    """Claims extras do token de login (vazio quando o snapshot está desligado ou não cabe)."""
+    if not JWT_AUTHZ_CLAIMS:
+        return {}
+    ctx = get_authorization_context(db, user, completo=True)
+    versao = authorization_version(db, user.id, usar_cache=False)
+    if versao is None or len(ctx.empresa_ids) > JWT_AUTHZ_MAX_EMPRESAS:
+        return {}
+    return {"adm": 1 if ctx.admin else 0, "emp": list(ctx.empresa_ids), "ed": user.empresa_id, "av": versao}
+
+
+def _contexto_das_claims(db: Session, usuario_id: int, payload: dict) -> Optional[ContextoAutorizacao]:
+    if not JWT_AUTHZ_CLAIMS or "av" not in payload:
+        return None
+    if authorization_version(db, usuario_id) != payload.get("av"):
+        return None
+    try:
+        empresas = sorted(int(e) for e in payload.get("emp") or [])
+        direta = payload.get("ed")
+        direta = int(direta) if direta is not None else None
+    except (TypeError, ValueError):
+        return None
+    return ContextoAutorizacao(usuario_id, direta, bool(payload.get("adm")), None, empresas, None)
+
+
+def is_admin_user(db: Session, current_user: UsuarioModel) -> bool:
+    return get_authorization_context(db, current_user).admin
 
 def get_allowed_company_ids(db: Session, current_user: UsuarioModel) -> List[int]:
-    if is_admin_user(db, current_user):
-        return [row[0] for row in db.query(CompanyModel.id).order_by(CompanyModel.id).all()]
-
-    # grupos do usuário
-    links = db.query(GrupoUsuarioModel).filter(GrupoUsuarioModel.usuario_id == current_user.id).all()
-    grupo_ids = [l.grupo_id for l in links]
-    # empresas vinculadas aos grupos
-    emp_links = db.query(GrupoEmpresaModel).filter(GrupoEmpresaModel.grupo_id.in_(grupo_ids)).all()
-    empresas_ids = {e.empresa_id for e in emp_links}
-    
-    # Merge com a empresa direta do usuário, se houver
-    if current_user.empresa_id is not None:
-        empresas_ids.add(current_user.empresa_id)
-        
-    return sorted(empresas_ids)
+    return list(get_authorization_context(db, current_user).empresa_ids)
 
 def check_permission(db: Session, user: UsuarioModel, route: str):
-    if is_admin_user(db, user):
-        return
+    ctx = get_authorization_context(db, user)
+    if ctx.admin:
+        return True
+    if ctx.rotas is None:
+        # Contexto vindo das claims do token não traz grupos/rotas
+        ctx = get_authorization_context(db, user, completo=True)
+    if route in ctx.rotas:
+        return True
 
     # Check if transaction exists
-    transacao = db.query(TransacaoModel).filter(TransacaoModel.rota == route).first()
+    transacao = db.query(TransacaoModel.id).filter(TransacaoModel.rota == route).first()
     if not transacao:
         # If the transaction is not defined in the system, we might want to block by default
         # or allow if it's not meant to be protected. 
         # But for "edit" restriction, we expect it to exist.
         raise HTTPException(status_code=403, detail="Permissão não configurada")
     
-    # Get user groups
-    user_groups = db.query(GrupoUsuarioModel.grupo_id).filter(GrupoUsuarioModel.usuario_id == user.id).all()
-    group_ids = [ug.grupo_id for ug in user_groups]
-    
-    if not group_ids:
+    if not ctx.grupo_ids:
         raise HTTPException(status_code=403, detail="Acesso negado (sem grupo)")
-        
-    # Check link
-    has_perm = db.query(GrupoTransacaoModel).filter(
-        GrupoTransacaoModel.grupo_id.in_(group_ids),
-        GrupoTransacaoModel.transacao_id == transacao.id
-    ).first()
-    
-    if not has_perm:
-        raise HTTPException(status_code=403, detail="Acesso negado")
-    return True
+    raise HTTPException(status_code=403, detail="Acesso negado")
 
 def get_header_company_id(
     x_company_id: Optional[str] = Header(None, alias="X-Company-Id"),
-    current_user: UsuarioModel = Depends(get_current_user),
+    current_user: UsuarioModel = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ) -> Optional[int]:
     if not x_company_id:
@@ -0,0 +1,141 @@
+"""
+Matemática da depreciação linear usada pelo simulador e pelos relatórios RVU.
+
+O cronograma é sempre o mesmo: `meses` parcelas mensais a partir de `inicio`
+(datas via add_months), parcela = round(valor / meses, 2) e o último mês
+absorve o saldo remanescente. Como a parcela é fixa, qualquer soma sobre um
+intervalo de meses tem resposta direta: basta contar quantos meses caem no
+intervalo e aplicar a correção do último mês. Os valores são tratados em
+centavos (inteiros) para reproduzir exatamente o arredondamento do cálculo
+mês a mês.
+
+As funções escalares recebem datas; as variantes *_lote operam sobre arrays
+NumPy com (ano, mês, dia) por linha para processar muitos itens de uma vez.
+"""
+
+import calendar
+from datetime import date
+from typing import Iterator
+
+import numpy as np
+
+
+def add_months(d: date, months: int) -> date:
+    year = d.year + (d.month - 1 + months) // 12
+    month = (d.month - 1 + months) % 12 + 1
+    day = min(d.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+def months_diff(start: date, end: date) -> int:
+    return (end.year - start.year) * 12 + (end.month - start.month)
+
+
+def centavos(valor) -> int:
+    return int(round(float(valor or 0) * 100))
+
+
+def parcela_centavos(saldo_centavos: int, meses: int) -> int:
+    """Parcela mensal em centavos: round(saldo / meses, 2), como no cálculo original."""
+    if meses <= 0:
+        return 0
+    # round() do Python (meio-par sobre o float exato); np.round pode divergir no meio centavo
+    return int(round(round((saldo_centavos / 100) / meses, 2) * 100))
+
+
+def meses_antes(inicio: date, ref: date, inclusive: bool = False) -> int:
+    """Quantidade de meses i >= 0 com add_months(inicio, i) < ref (ou <= ref).
+
+    As datas da série são crescentes: todos os meses anteriores ao mês de ref
+    contam, e no próprio mês de ref compara-se o dia que a série assume ali.
+    """
+    k = months_diff(inicio, ref)
+    dia_k = min(inicio.day, calendar.monthrange(ref.year, ref.month)[1])
+    extra = (dia_k <= ref.day) if inclusive else (dia_k < ref.day)
+    return max(k + int(extra), 0)
+
+
+def soma_intervalo_centavos(valor_centavos: int, meses: int, a: int, b: int) -> int:
+    """Soma das parcelas i em [a, b) de uma série de `meses` parcelas, em centavos."""
+    if meses <= 0:
+        return 0
+    a = min(max(a, 0), meses)
+    b = min(max(b, 0), meses)
+    if b <= a:
+        return 0
+    mensal = parcela_centavos(valor_centavos, meses)
+    ultimo = valor_centavos - (meses - 1) * mensal
+    if b == meses:
+        return (b - a - 1) * mensal + ultimo
+    return (b - a) * mensal
+
+
+def depreciacao_ate(valor_centavos: int, inicio: date, meses: int, ref: date) -> int:
+    """Depreciação acumulada nos meses anteriores a `ref`, em centavos."""
+    return soma_intervalo_centavos(valor_centavos, meses, 0, meses_antes(inicio, ref))
+
+
+def depreciacao_janela(valor_centavos: int, inicio: date, meses: int, janela_inicio: date, janela_fim: date) -> int:
+    """Depreciação dos meses em [janela_inicio, janela_fim], em centavos."""
+    return soma_intervalo_centavos(
+        valor_centavos,
+        meses,
+        meses_antes(inicio, janela_inicio),
+        meses_antes(inicio, janela_fim, inclusive=True),
+    )
+
+
+def cronograma_mensal(valor, inicio: date, meses: int, desde: int = 0) -> Iterator[tuple[int, date, float, float, float]]:
+    """Linhas (i, data, saldo_inicial, depreciacao_mes, saldo_final) a partir do mês `desde`.
+
+    Cada linha é calculada diretamente pelo índice, sem acumular os meses anteriores.
+    """
+    vc = centavos(valor)
+    if meses <= 0:
+        return
+    mensal = parcela_centavos(vc, meses)
+    for i in range(max(desde, 0), meses):
+        saldo_inicial = vc - i * mensal
+        dep = saldo_inicial if i == meses - 1 else mensal
+        yield i, add_months(inicio, i), saldo_inicial / 100, dep / 100, (saldo_inicial - dep) / 100
+
+
+# -----------------------------
+# Variantes vetorizadas (NumPy)
+# -----------------------------
+_DIAS_MES = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int64)
+
+
+def datas_lote(datas, n: int) -> np.ndarray:
+    """Matriz (n, 3) com ano, mês e dia de cada data."""
+    return np.array([(d.year, d.month, d.day) for d in datas], dtype=np.int64).reshape(n, 3)
+
+
+def dias_no_mes_lote(ano: np.ndarray, mes: np.ndarray) -> np.ndarray:
+    bissexto = ((ano % 4 == 0) & (ano % 100 != 0)) | (ano % 400 == 0)
+    return _DIAS_MES[mes - 1] + ((mes == 2) & bissexto)
+
+
+def meses_antes_lote(inicio: np.ndarray, ref: np.ndarray, inclusive: bool = False) -> np.ndarray:
+    """meses_antes() para matrizes (n, 3) de datas."""
+    k = (ref[:, 0] - inicio[:, 0]) * 12 + (ref[:, 1] - inicio[:, 1])
+    dia_k = np.minimum(inicio[:, 2], dias_no_mes_lote(ref[:, 0], ref[:, 1]))
+    extra = (dia_k <= ref[:, 2]) if inclusive else (dia_k < ref[:, 2])
+    return np.maximum(k + extra, 0)
+
+
+def parcela_centavos_lote(saldo_centavos: np.ndarray, meses: np.ndarray) -> np.ndarray:
+    return np.fromiter(
+        (parcela_centavos(c, n) for c, n in zip(saldo_centavos.tolist(), meses.tolist())),
+        dtype=np.int64,
+        count=len(meses),
+    )
+
+
+def soma_intervalo_lote(a: np.ndarray, b: np.ndarray, meses: np.ndarray, mensal: np.ndarray, ultimo: np.ndarray) -> np.ndarray:
+    """soma_intervalo_centavos() com parcela e último mês já calculados por item."""
+    a = np.clip(a, 0, meses)
+    b = np.clip(b, 0, meses)
+    qtd = np.maximum(b - a, 0)
+    tem_ultimo = (a <= meses - 1) & (meses - 1 < b)
+    return (qtd - tem_ultimo) * mensal + tem_ultimo * ultimo
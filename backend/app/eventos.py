@@ -0,0 +1,260 @@
+"""
+Eventos em tempo real (Server-Sent Events) para notificações e supervisão.
+
+As rotas publicam, após o commit, eventos pequenos (ids e status) com
+publicar(). Com PostgreSQL os eventos passam por NOTIFY no canal
+`assetlife_eventos` e cada worker tem uma thread em LISTEN que os entrega às
+conexões SSE locais; sem PostgreSQL (ou com EVENTOS_BACKEND=memory) a entrega
+é só no processo que publicou.
+
+Cada conexão tem uma fila limitada: um cliente lento que a deixa encher tem
+os eventos pendentes descartados e recebe um único `resync` (o front recarrega
+a tela), em vez de acumular memória no servidor. O número de conexões por
+worker é limitado; acima dele /events/stream responde 503.
+
+Escopo: eventos com empresa_id chegam a administradores e a usuários com a
+empresa liberada; eventos de notificação apenas aos destinatários. A conexão
+é aberta com um ticket curto (POST /events/ticket), nunca com o JWT de login,
+e a versão de autorização do usuário é reavaliada a cada intervalo de
+heartbeat: se mudou, o escopo da assinatura é recalculado.
+
+Configurável via variáveis de ambiente:
+- EVENTOS_BACKEND: auto | postgres | memory (default: auto = postgres se o banco for PostgreSQL)
+- EVENTOS_MAX_CONEXOES: conexões SSE simultâneas por worker (default: 500)
+- EVENTOS_FILA: eventos pendentes por conexão antes do resync (default: 100)
+- EVENTOS_HEARTBEAT_SEGUNDOS: intervalo do comentário de keep-alive (default: 15)
+- EVENTOS_MAX_IDS: ids de itens por evento; acima disso vai só o total (default: 200)
+- EVENTOS_TICKET_SEGUNDOS: validade do ticket de conexão ao stream (default: 60)
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import select
+import threading
+from typing import Iterable, Optional
+
+import sqlalchemy as sa
+
+from .database import SessionLocal, engine
+from .models import NotificacaoDestinatario as NotificacaoDestinatarioModel
+
+logger = logging.getLogger("uvicorn.error")
+
+EVENTOS_BACKEND = os.getenv("EVENTOS_BACKEND", "auto").strip().lower()
+EVENTOS_MAX_CONEXOES = max(1, int(os.getenv("EVENTOS_MAX_CONEXOES", "500")))
+EVENTOS_FILA = max(1, int(os.getenv("EVENTOS_FILA", "100")))
+EVENTOS_HEARTBEAT_SEGUNDOS = float(os.getenv("EVENTOS_HEARTBEAT_SEGUNDOS", "15"))
+EVENTOS_MAX_IDS = int(os.getenv("EVENTOS_MAX_IDS", "200"))
+EVENTOS_TICKET_SEGUNDOS = max(5, int(os.getenv("EVENTOS_TICKET_SEGUNDOS", "60")))
+
+CANAL = "assetlife_eventos"
+
+TIPO_NOTIFICACAO = "notificacao"
+TIPO_ITEM_STATUS = "item_status"
+TIPO_COMENTARIO = "comentario"
+TIPO_RESYNC = "resync"
+
+_sequencia = itertools.count(1)
+
+
+def _usar_postgres() -> bool:
+    if EVENTOS_BACKEND == "memory":
+        return False
+    if EVENTOS_BACKEND == "postgres":
+        return True
+    return engine.dialect.name == "postgresql"
+
+
+class Assinatura:
+    """Uma conexão SSE: fila limitada consumida no event loop da requisição."""
+
+    def __init__(self, usuario_id: int, empresa_ids: Iterable[int], admin: bool):
+        self.usuario_id = usuario_id
+        self.empresa_ids = frozenset(empresa_ids or [])
+        self.admin = admin
+        self.loop = asyncio.get_running_loop()
+        self.fila: asyncio.Queue = asyncio.Queue(maxsize=EVENTOS_FILA)
+        self.descartados = 0
+
+    def atualizar_escopo(self, empresa_ids: Iterable[int], admin: bool):
+        self.empresa_ids = frozenset(empresa_ids or [])
+        self.admin = admin
+
+    def ve_empresa(self, empresa_id: Optional[int]) -> bool:
+        return self.admin or empresa_id is None or empresa_id in self.empresa_ids
+
+    def entregar(self, evento: dict):
+        """Chamado de qualquer thread; a inserção acontece no loop da conexão."""
+        try:
+            self.loop.call_soon_threadsafe(self._colocar, evento)
+        except RuntimeError:
+            pass  # loop encerrado: a conexão já está saindo
+
+    def _colocar(self, evento: dict):
+        if self.fila.full():
+            # Backpressure: descarta o atrasado e pede ao cliente para recarregar
+            self.descartados += self.fila.qsize()
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.fila.put_nowait({"tipo": TIPO_RESYNC, "descartados": self.descartados})
+            return
+        self.fila.put_nowait(evento)
+
+
+_assinaturas: set[Assinatura] = set()
+_assinaturas_lock = threading.Lock()
+
+
+class LimiteConexoes(Exception):
+    pass
+
+
+def assinar(usuario_id: int, empresa_ids: Iterable[int], admin: bool) -> Assinatura:
+    """Registra a conexão; LimiteConexoes se o worker já está no limite."""
+    with _assinaturas_lock:
+        if len(_assinaturas) >= EVENTOS_MAX_CONEXOES:
+            raise LimiteConexoes()
+        a = Assinatura(usuario_id, empresa_ids, admin)
+        _assinaturas.add(a)
+    _garantir_ouvinte()
+    return a
+
+
+def cancelar(assinatura: Assinatura):
+    with _assinaturas_lock:
+        _assinaturas.discard(assinatura)
+
+
+def conexoes_ativas() -> int:
+    with _assinaturas_lock:
+        return len(_assinaturas)
+
+
+def formatar_sse(evento: dict) -> str:
+    tipo = evento.get("tipo") or "mensagem"
+    dados = json.dumps(evento, ensure_ascii=False, default=str)
+    return f"id: {next(_sequencia)}\nevent: {tipo}\ndata: {dados}\n\n"
+
+
+# -----------------------------
+# Entrega
+# -----------------------------
+def _destinatarios_conectados(notificacao_id: str, usuario_ids: set[int]) -> set[int]:
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(NotificacaoDestinatarioModel.usuario_id)
+            .filter(
+                NotificacaoDestinatarioModel.notificacao_id == notificacao_id,
+                NotificacaoDestinatarioModel.usuario_id.in_(sorted(usuario_ids)),
+            )
+            .all()
+        )
+        return {int(r[0]) for r in rows}
+    finally:
+        db.close()
+
+
+def _despachar(evento: dict):
+    with _assinaturas_lock:
+        locais = list(_assinaturas)
+    if not locais:
+        return
+    if evento.get("tipo") == TIPO_NOTIFICACAO:
+        # Só os destinatários conectados a este worker (uma consulta por evento)
+        alvo = _destinatarios_conectados(evento["id"], {a.usuario_id for a in locais})
+        for a in locais:
+            if a.usuario_id in alvo:
+                a.entregar(evento)
+        return
+    empresa_id = evento.get("empresa_id")
+    for a in locais:
+        if a.ve_empresa(empresa_id):
+            a.entregar(evento)
+
+
+def publicar(tipo: str, **dados):
+    """Publica um evento (chamar após o commit); falhas são só registradas."""
+    evento = {"tipo": tipo, **dados}
+    ids = evento.get("ids")
+    if ids is not None:
+        evento["total"] = len(ids)
+        if len(ids) > EVENTOS_MAX_IDS:
+            evento["ids"] = None  # payload do NOTIFY é limitado; o cliente recarrega
+    try:
+        if _usar_postgres():
+            with engine.begin() as conn:
+                conn.execute(
+                    sa.text("SELECT pg_notify(:canal, :dados)"),
+                    {"canal": CANAL, "dados": json.dumps(evento, ensure_ascii=False, default=str)},
+                )
+        else:
+            _despachar(evento)
+    except Exception:
+        logger.warning("Falha ao publicar evento %s", tipo, exc_info=True)
+
+
+def publicar_status_itens(empresa_id: Optional[int], periodo_id: Optional[int], status_por_item: dict):
+    """Agrupa {item_id: status} por status e publica um evento por status."""
+    grupos: dict[str, list[int]] = {}
+    for item_id, status in status_por_item.items():
+        if status in ("Revisado", "Aprovado", "Revertido"):
+            grupos.setdefault(status, []).append(int(item_id))
+    for status, ids in grupos.items():
+        publicar(TIPO_ITEM_STATUS, empresa_id=empresa_id, periodo_id=periodo_id, status=status, ids=sorted(ids))
+
+
+# -----------------------------
+# LISTEN (PostgreSQL)
+# -----------------------------
+_ouvinte: Optional[threading.Thread] = None
+_ouvinte_lock = threading.Lock()
+_parar = threading.Event()
+
+
+def _escutar():
+    while not _parar.is_set():
+        conn = None
+        try:
+            raw = engine.raw_connection()
+            raw.detach()  # conexão dedicada, fora do pool
+            conn = raw.driver_connection
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CANAL}")
+            while not _parar.is_set():
+                if select.select([conn], [], [], 5)[0]:
+                    conn.poll()
+                    while conn.notifies:
+                        notificacao = conn.notifies.pop(0)
+                        try:
+                            _despachar(json.loads(notificacao.payload))
+                        except Exception:
+                            logger.warning("Evento inválido ou falha na entrega", exc_info=True)
+        except Exception:
+            logger.warning("LISTEN %s interrompido; reconectando", CANAL, exc_info=True)
+            _parar.wait(5)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+def _garantir_ouvinte():
+    global _ouvinte
+    if not _usar_postgres():
+        return
+    with _ouvinte_lock:
+        if _ouvinte is None or not _ouvinte.is_alive():
+            _parar.clear()
+            _ouvinte = threading.Thread(target=_escutar, name="eventos-listen", daemon=True)
+            _ouvinte.start()
+
+
+def shutdown():
+    _parar.set()
@@ -0,0 +1,261 @@
+"""
+Gravação de auditoria em lotes (auditoria_logs e auditoria_rvu).
+
+registrar() só coloca o evento numa fila em memória e retorna; uma thread
+grava os eventos pendentes com um INSERT multi-linha por tabela quando a fila
+atinge AUDITORIA_LOTE eventos ou a cada AUDITORIA_INTERVALO_MS. O horário do
+evento é preservado: data_evento = NOW() do banco menos o tempo que o evento
+esperou na fila.
+
+Ações que precisam estar gravadas antes da resposta (senhas, permissões,
+grupos e usuários; ver AUDITORIA_ACOES_SINCRONAS) chamam gravar() antes do
+próprio commit: o evento entra na mesma transação da ação e os dois são
+confirmados (ou desfeitos) juntos. Se a fila estiver cheia, registrar() grava
+diretamente em vez de descartar. No shutdown a fila é esvaziada.
+
+Configurável via variáveis de ambiente:
+- AUDITORIA_LOTE: eventos por INSERT / gatilho de gravação (default: 200)
+- AUDITORIA_INTERVALO_MS: espera máxima de um evento na fila (default: 500)
+- AUDITORIA_FILA_MAX: eventos pendentes antes de gravar de forma síncrona (default: 10000)
+- AUDITORIA_ACOES_SINCRONAS: ações (separadas por vírgula) sempre gravadas de
+  forma síncrona por main.audit()
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+AUDITORIA_LOTE = max(1, int(os.getenv("AUDITORIA_LOTE", "200")))
+AUDITORIA_INTERVALO_MS = max(10, int(os.getenv("AUDITORIA_INTERVALO_MS", "500")))
+AUDITORIA_FILA_MAX = max(AUDITORIA_LOTE, int(os.getenv("AUDITORIA_FILA_MAX", "10000")))
+AUDITORIA_ACOES_SINCRONAS = frozenset(
+    a.strip()
+    for a in os.getenv(
+        "AUDITORIA_ACOES_SINCRONAS",
+        "ALTERACAO_SENHA,RESET_SOLICITADO,RESET_CONCLUIDO,create,update,delete,link,unlink,clone,revisao_massa",
+    ).split(",")
+    if a.strip()
+)
+
+TABELA_LOGS = "auditoria_logs"
+TABELA_RVU = "auditoria_rvu"
+
+_COLUNAS = ("usuario_id", "acao", "entidade", "entidade_id", "detalhes")
+_tabelas = {
+    nome: sa.table(nome, *(sa.column(c) for c in _COLUNAS), sa.column("data_evento"))
+    for nome in (TABELA_LOGS, TABELA_RVU)
+}
+
+
+def _insert(tabela: str):
+    # data_evento calculado por linha: horário do banco menos o atraso na fila
+    return sa.insert(_tabelas[tabela]).values(
+        data_evento=sa.func.now() - sa.bindparam("atraso", type_=sa.Interval)
+    )
+
+
+def _linha(usuario_id, acao, entidade, entidade_id, detalhes) -> dict:
+    return {
+        "usuario_id": usuario_id,
+        "acao": acao,
+        "entidade": entidade,
+        "entidade_id": entidade_id,
+        "detalhes": detalhes,
+    }
+
+
+# -----------------------------
+# Modo síncrono
+# -----------------------------
+def gravar(
+    db: Session,
+    *,
+    acao: str,
+    entidade: str,
+    entidade_id: Optional[int] = None,
+    detalhes: Optional[str] = None,
+    usuario_id: Optional[int] = None,
+    tabela: str = TABELA_LOGS,
+):
+    """Insere o evento na transação do chamador, sem commit.
+
+    Só persiste junto com a ação se for chamado antes do commit que a confirma;
+    chamado depois, o evento fica numa transação própria (ver main.audit).
+    """
+    linha = _linha(usuario_id, acao, entidade, entidade_id, detalhes)
+    linha["atraso"] = timedelta(0)
+    db.execute(_insert(tabela), linha)
+
+
+# -----------------------------
+# Fila
+# -----------------------------
+_fila: deque = deque()
+_cond = threading.Condition()
+_parar = threading.Event()
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+_metricas_lock = threading.Lock()
+_metricas = {
+    "enfileirados": 0,
+    "gravados": 0,
+    "sincronos": 0,
+    "lotes": 0,
+    "falhas": 0,
+    "ultima_latencia_ms": 0.0,
+    "max_latencia_ms": 0.0,
+    "soma_latencia_ms": 0.0,
+    "max_espera_ms": 0.0,
+}
+
+
+def _contar(**valores):
+    with _metricas_lock:
+        for k, v in valores.items():
+            _metricas[k] += v
+
+
+def registrar(
+    *,
+    acao: str,
+    entidade: str,
+    entidade_id: Optional[int] = None,
+    detalhes: Optional[str] = None,
+    usuario_id: Optional[int] = None,
+    tabela: str = TABELA_LOGS,
+):
+    """Enfileira o evento para gravação em lote; não bloqueia o chamador."""
+    if tabela not in _tabelas:
+        raise ValueError(f"Tabela de auditoria desconhecida: {tabela}")
+    evento = (tabela, time.monotonic(), _linha(usuario_id, acao, entidade, entidade_id, detalhes))
+    with _cond:
+        cheia = len(_fila) >= AUDITORIA_FILA_MAX
+        if not cheia:
+            _fila.append(evento)
+            if len(_fila) >= AUDITORIA_LOTE:
+                _cond.notify()
+    if cheia:
+        # Banco lento ou fora: não descarta, grava no caminho da requisição
+        _gravar_lote([evento])
+        _contar(sincronos=1)
+        return
+    _contar(enfileirados=1)
+    _garantir_worker()
+
+
+def _gravar_lote(eventos: list) -> bool:
+    agora = time.monotonic()
+    por_tabela: dict[str, list[dict]] = {}
+    espera_max = 0.0
+    for tabela, instante, linha in eventos:
+        espera = max(0.0, agora - instante)
+        espera_max = max(espera_max, espera)
+        por_tabela.setdefault(tabela, []).append({**linha, "atraso": timedelta(seconds=espera)})
+    inicio = time.perf_counter()
+    try:
+        with engine.begin() as conn:
+            for tabela, linhas in por_tabela.items():
+                # executemany de insert() vira INSERT ... VALUES multi-linha no psycopg2
+                conn.execute(_insert(tabela), linhas)
+    except Exception:
+        logger.warning("Auditoria: falha ao gravar %d evento(s)", len(eventos), exc_info=True)
+        _contar(falhas=1)
+        return False
+    latencia = (time.perf_counter() - inicio) * 1000.0
+    with _metricas_lock:
+        _metricas["gravados"] += len(eventos)
+        _metricas["lotes"] += 1
+        _metricas["ultima_latencia_ms"] = latencia
+        _metricas["soma_latencia_ms"] += latencia
+        _metricas["max_latencia_ms"] = max(_metricas["max_latencia_ms"], latencia)
+        _metricas["max_espera_ms"] = max(_metricas["max_espera_ms"], espera_max * 1000.0)
+    return True
+
+
+def _retirar(limite: int) -> list:
+    with _cond:
+        return [_fila.popleft() for _ in range(min(limite, len(_fila)))]
+
+
+def _devolver(eventos: list):
+    # Falha de gravação: volta para o início da fila e tenta no próximo ciclo
+    with _cond:
+        _fila.extendleft(reversed(eventos))
+
+
+def descarregar() -> int:
+    """Grava tudo o que está na fila agora; devolve quantos eventos foram gravados."""
+    total = 0
+    while True:
+        lote = _retirar(AUDITORIA_LOTE)
+        if not lote:
+            return total
+        if not _gravar_lote(lote):
+            _devolver(lote)
+            return total
+        total += len(lote)
+
+
+def _loop():
+    intervalo = AUDITORIA_INTERVALO_MS / 1000.0
+    while not _parar.is_set():
+        with _cond:
+            if len(_fila) < AUDITORIA_LOTE:
+                _cond.wait(intervalo)
+        if descarregar() == 0 and _fila:
+            _parar.wait(intervalo)  # banco indisponível: espera antes de tentar de novo
+
+
+def _garantir_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _parar.is_set():
+            return
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_loop, name="auditoria-lote", daemon=True)
+            _worker.start()
+
+
+def iniciar():
+    _garantir_worker()
+
+
+def metricas() -> dict:
+    with _metricas_lock:
+        m = dict(_metricas)
+    with _cond:
+        m["profundidade"] = len(_fila)
+    soma = m.pop("soma_latencia_ms")
+    m["media_latencia_ms"] = round(soma / m["lotes"], 2) if m["lotes"] else 0.0
+    for k in ("ultima_latencia_ms", "max_latencia_ms", "max_espera_ms"):
+        m[k] = round(m[k], 2)
+    m["lote"] = AUDITORIA_LOTE
+    m["intervalo_ms"] = AUDITORIA_INTERVALO_MS
+    return m
+
+
+def shutdown(timeout: float = 10.0):
+    """Para a thread e grava os eventos restantes."""
+    _parar.set()
+    with _cond:
+        _cond.notify_all()
+    if _worker is not None:
+        _worker.join(timeout)
+    restantes = len(_fila)
+    gravados = descarregar()
+    if gravados < restantes:
+        logger.error("Auditoria: %d evento(s) não gravados no shutdown", restantes - gravados)
@@ -0,0 +1,467 @@
+"""
+Fila de envio de e-mails (tabela `emails_fila`) com worker em segundo plano.
+
+O envio de notificações apenas grava uma linha por destinatário e retorna;
+threads worker reivindicam lotes pendentes (`FOR UPDATE SKIP LOCKED`, seguro
+com vários processos), enviam reutilizando conexões SMTP de um pool e
+gravam o status de cada destinatário. Falhas temporárias são reagendadas
+com backoff exponencial; recusas permanentes (5xx) vão direto para Erro.
+
+Configurável via variáveis de ambiente (SMTP_* em config.py):
+- EMAIL_WORKERS: threads de envio neste processo; 0 desliga o worker (default: 2)
+- EMAIL_SMTP_CONEXOES: conexões SMTP mantidas no pool (default: EMAIL_WORKERS + 1)
+- EMAIL_SMTP_OCIOSA_SEGUNDOS: conexão ociosa por mais tempo é descartada (default: 60)
+- EMAIL_LOTE: mensagens reivindicadas por vez (default: 50)
+- EMAIL_MAX_TENTATIVAS: tentativas até marcar Erro (default: 5)
+- EMAIL_BACKOFF_SEGUNDOS: espera base entre tentativas, dobrada a cada falha (default: 30)
+- EMAIL_POLL_SEGUNDOS: intervalo de consulta à fila sem novos envios (default: 10)
+- EMAIL_STALE_SECONDS: mensagem em Enviando sem atualização por este tempo
+  volta para Pendente (processo encerrado no meio do lote) (default: 300)
+"""
+
+import logging
+import os
+import queue
+import smtplib
+import socket
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from .config import SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_USE_TLS, SMTP_USE_SSL, MAIL_FROM, MAIL_SENDER_NAME
+from .database import SessionLocal
+from .models import EmailFila as EmailFilaModel
+
+logger = logging.getLogger("mail")
+
+EMAIL_WORKERS = max(0, int(os.getenv("EMAIL_WORKERS", "2")))
+EMAIL_SMTP_CONEXOES = max(1, int(os.getenv("EMAIL_SMTP_CONEXOES", str(EMAIL_WORKERS + 1))))
+EMAIL_SMTP_OCIOSA_SEGUNDOS = int(os.getenv("EMAIL_SMTP_OCIOSA_SEGUNDOS", "60"))
+EMAIL_LOTE = max(1, int(os.getenv("EMAIL_LOTE", "50")))
+EMAIL_MAX_TENTATIVAS = max(1, int(os.getenv("EMAIL_MAX_TENTATIVAS", "5")))
+EMAIL_BACKOFF_SEGUNDOS = int(os.getenv("EMAIL_BACKOFF_SEGUNDOS", "30"))
+EMAIL_POLL_SEGUNDOS = float(os.getenv("EMAIL_POLL_SEGUNDOS", "10"))
+EMAIL_STALE_SECONDS = int(os.getenv("EMAIL_STALE_SECONDS", "300"))
+
+STATUS_PENDENTE = "Pendente"
+STATUS_ENVIANDO = "Enviando"
+STATUS_ENVIADO = "Enviado"
+STATUS_ERRO = "Erro"
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def mask_email(email: str) -> str:
+    try:
+        s = (email or "").strip()
+        if "@" not in s:
+            return "***"
+        local, domain = s.split("@", 1)
+        if not local:
+            return f"***@{domain}"
+        return f"{local[0]}***@{domain}"
+    except Exception:
+        return "***"
+
+
+def montar_mensagem(to: str, subject: str, body: str, html_body: Optional[str] = None) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = f"{MAIL_SENDER_NAME} <{MAIL_FROM}>"
+    msg["To"] = to
+    msg["Subject"] = subject
+    msg.set_content(body)
+    if html_body:
+        try:
+            msg.add_alternative(str(html_body), subtype="html")
+        except Exception:
+            pass
+    return msg
+
+
+def _conectar() -> smtplib.SMTP:
+    if SMTP_USE_SSL:
+        server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=30)
+    else:
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+        if SMTP_USE_TLS:
+            server.starttls(context=ssl.create_default_context())
+    if SMTP_USER:
+        server.login(SMTP_USER, SMTP_PASSWORD or "")
+    return server
+
+
+def _fechar(server: Optional[smtplib.SMTP]):
+    if server is None:
+        return
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+class ConexaoSMTP:
+    """Conexão reutilizável: reconecta uma vez se o servidor a derrubou."""
+
+    def __init__(self):
+        self.server: Optional[smtplib.SMTP] = None
+        self.usada_em = 0.0
+
+    def enviar(self, msg: EmailMessage) -> dict:
+        """Devolve os destinatários recusados (vazio = aceito)."""
+        for tentativa in (1, 2):
+            if self.server is None:
+                self.server = _conectar()
+            try:
+                refused = self.server.send_message(msg)
+                self.usada_em = time.monotonic()
+                return refused or {}
+            except smtplib.SMTPServerDisconnected:
+                self.server = None
+                if tentativa == 2:
+                    raise
+        return {}
+
+    def valida(self) -> bool:
+        if self.server is None:
+            return False
+        if time.monotonic() - self.usada_em > EMAIL_SMTP_OCIOSA_SEGUNDOS:
+            return False
+        try:
+            return self.server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def fechar(self):
+        _fechar(self.server)
+        self.server = None
+
+
+class PoolSMTP:
+    """Mantém até `tamanho` conexões autenticadas para reaproveitar entre lotes."""
+
+    def __init__(self, tamanho: int):
+        self._livres: "queue.LifoQueue[ConexaoSMTP]" = queue.LifoQueue()
+        self._vagas = threading.BoundedSemaphore(tamanho)
+
+    @contextmanager
+    def conexao(self):
+        self._vagas.acquire()
+        con = None
+        try:
+            while con is None:
+                try:
+                    candidata = self._livres.get_nowait()
+                except queue.Empty:
+                    con = ConexaoSMTP()
+                    break
+                if candidata.valida():
+                    con = candidata
+                else:
+                    candidata.fechar()
+            try:
+                yield con
+            except Exception:
+                con.fechar()
+                raise
+            if con.server is not None:
+                self._livres.put(con)
+        finally:
+            self._vagas.release()
+
+    def fechar(self):
+        while True:
+            try:
+                self._livres.get_nowait().fechar()
+            except queue.Empty:
+                return
+
+
+_pool = PoolSMTP(EMAIL_SMTP_CONEXOES)
+
+
+def enviar_agora(to: str, subject: str, body: str, html_body: Optional[str] = None) -> bool:
+    """Envio imediato (ex.: redefinição de senha) usando o mesmo pool de conexões."""
+    if not SMTP_HOST:
+        logger.warning("SMTP_HOST_not_set")
+        return False
+    try:
+        with _pool.conexao() as con:
+            refused = con.enviar(montar_mensagem(to, subject, body, html_body))
+        if refused:
+            logger.warning("SMTP_recipient_refused to=%s", mask_email(to))
+            return False
+        logger.info("SMTP_send_ok to=%s", mask_email(to))
+        return True
+    except Exception:
+        logger.exception(
+            "SMTP_send_failed host=%s port=%s ssl=%s tls=%s user=%s to=%s",
+            SMTP_HOST, SMTP_PORT, bool(SMTP_USE_SSL), bool(SMTP_USE_TLS), mask_email(SMTP_USER or ""), mask_email(to),
+        )
+        return False
+
+
+# -----------------------------
+# Fila
+# -----------------------------
+def enfileirar(db: Session, mensagens: list[dict], notificacao_id: Optional[str] = None) -> int:
+    """Insere as mensagens (destinatario, assunto, corpo, corpo_html, usuario_id) sem commit."""
+    if not mensagens:
+        return 0
+    now = datetime.utcnow()
+    db.execute(
+        sa.insert(EmailFilaModel.__table__),
+        [
+            {
+                "notificacao_id": notificacao_id,
+                "usuario_id": m.get("usuario_id"),
+                "destinatario": m["destinatario"][:255],
+                "assunto": m["assunto"][:255],
+                "corpo": m["corpo"],
+                "corpo_html": m.get("corpo_html"),
+                "status": STATUS_PENDENTE,
+                "tentativas": 0,
+                "proxima_tentativa_em": now,
+                "criado_em": now,
+                "atualizado_em": now,
+            }
+            for m in mensagens
+        ],
+    )
+    return len(mensagens)
+
+
+def resumo_notificacao(db: Session, notificacao_id: str) -> dict:
+    """Contagem por status e falhas definitivas dos e-mails de uma notificação."""
+    contagem = dict(
+        db.query(EmailFilaModel.status, sa.func.count(EmailFilaModel.id))
+        .filter(EmailFilaModel.notificacao_id == notificacao_id)
+        .group_by(EmailFilaModel.status)
+        .all()
+    )
+    falhas = (
+        db.query(EmailFilaModel.destinatario, EmailFilaModel.tentativas, EmailFilaModel.ultimo_erro)
+        .filter(EmailFilaModel.notificacao_id == notificacao_id, EmailFilaModel.status == STATUS_ERRO)
+        .order_by(EmailFilaModel.id)
+        .limit(200)
+        .all()
+    )
+    return {
+        "id": notificacao_id,
+        "total": sum(contagem.values()),
+        "pendentes": contagem.get(STATUS_PENDENTE, 0) + contagem.get(STATUS_ENVIANDO, 0),
+        "enviados": contagem.get(STATUS_ENVIADO, 0),
+        "falhas": contagem.get(STATUS_ERRO, 0),
+        "erros": [{"destinatario": d, "tentativas": t, "erro": e} for d, t, e in falhas],
+    }
+
+
+def _recuperar_orfas(db: Session):
+    limite = datetime.utcnow() - timedelta(seconds=EMAIL_STALE_SECONDS)
+    db.execute(
+        sa.update(EmailFilaModel)
+        .where(EmailFilaModel.status == STATUS_ENVIANDO, EmailFilaModel.atualizado_em < limite)
+        .values(status=STATUS_PENDENTE, worker=None)
+    )
+    db.commit()
+
+
+def _reivindicar(db: Session, limite: int) -> list:
+    now = datetime.utcnow()
+    ids = (
+        sa.select(EmailFilaModel.id)
+        .where(EmailFilaModel.status == STATUS_PENDENTE, EmailFilaModel.proxima_tentativa_em <= now)
+        .order_by(EmailFilaModel.id)
+        .limit(limite)
+        .with_for_update(skip_locked=True)
+    )
+    linhas = db.execute(
+        sa.update(EmailFilaModel)
+        .where(EmailFilaModel.id.in_(ids.scalar_subquery()))
+        .values(status=STATUS_ENVIANDO, worker=WORKER_ID, atualizado_em=now)
+        .returning(
+            EmailFilaModel.id,
+            EmailFilaModel.destinatario,
+            EmailFilaModel.assunto,
+            EmailFilaModel.corpo,
+            EmailFilaModel.corpo_html,
+            EmailFilaModel.tentativas,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return linhas
+
+
+def _falha_permanente(exc: Exception) -> bool:
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(int(code) >= 500 for code, _ in exc.recipients.values())
+    code = getattr(exc, "smtp_code", None)
+    return isinstance(code, int) and code >= 500
+
+
+def _enviar_lote(linhas) -> list[dict]:
+    resultados = []
+    try:
+        with _pool.conexao() as con:
+            for linha in linhas:
+                try:
+                    refused = con.enviar(montar_mensagem(linha.destinatario, linha.assunto, linha.corpo, linha.corpo_html))
+                    if refused:
+                        raise smtplib.SMTPRecipientsRefused(refused)
+                    resultados.append({"id": linha.id, "erro": None})
+                except smtplib.SMTPServerDisconnected:
+                    raise
+                except Exception as exc:
+                    resultados.append({"id": linha.id, "erro": exc, "tentativas": linha.tentativas})
+    except Exception as exc:
+        # Sem conexão (ou conexão perdida): o restante do lote volta para a fila
+        logger.warning("SMTP_batch_failed host=%s erro=%s", SMTP_HOST, exc.__class__.__name__)
+        feitos = {r["id"] for r in resultados}
+        resultados.extend(
+            {"id": linha.id, "erro": exc, "tentativas": linha.tentativas} for linha in linhas if linha.id not in feitos
+        )
+    return resultados
+
+
+def _gravar_resultados(db: Session, resultados: list[dict]) -> tuple[int, int]:
+    now = datetime.utcnow()
+    tbl = EmailFilaModel.__table__
+    enviados = [r["id"] for r in resultados if r["erro"] is None]
+    if enviados:
+        db.execute(
+            sa.update(tbl)
+            .where(tbl.c.id.in_(enviados))
+            .values(status=STATUS_ENVIADO, enviado_em=now, atualizado_em=now, ultimo_erro=None,
+                    tentativas=tbl.c.tentativas + 1)
+        )
+    falhas = []
+    for r in resultados:
+        if r["erro"] is None:
+            continue
+        tentativas = int(r["tentativas"] or 0) + 1
+        definitiva = tentativas >= EMAIL_MAX_TENTATIVAS or _falha_permanente(r["erro"])
+        espera = EMAIL_BACKOFF_SEGUNDOS * (2 ** (tentativas - 1))
+        falhas.append({
+            "b_id": r["id"],
+            "status": STATUS_ERRO if definitiva else STATUS_PENDENTE,
+            "tentativas": tentativas,
+            "proxima_tentativa_em": now + timedelta(seconds=espera),
+            "ultimo_erro": f"{r['erro'].__class__.__name__}: {r['erro']}"[:1000],
+            "atualizado_em": now,
+        })
+    if falhas:
+        db.execute(
+            sa.update(tbl)
+            .where(tbl.c.id == sa.bindparam("b_id"))
+            .values(
+                status=sa.bindparam("status"),
+                tentativas=sa.bindparam("tentativas"),
+                proxima_tentativa_em=sa.bindparam("proxima_tentativa_em"),
+                ultimo_erro=sa.bindparam("ultimo_erro"),
+                atualizado_em=sa.bindparam("atualizado_em"),
+                worker=None,
+            ),
+            falhas,
+        )
+    db.commit()
+    return len(enviados), len(falhas)
+
+
+def processar_lote(db: Session, limite: int = EMAIL_LOTE) -> int:
+    """Reivindica, envia e registra um lote; devolve quantas mensagens processou."""
+    linhas = _reivindicar(db, limite)
+    if not linhas:
+        return 0
+    enviados, falhas = _gravar_resultados(db, _enviar_lote(linhas))
+    logger.info("Fila de e-mail: lote de %d (enviados=%d falhas=%d)", len(linhas), enviados, falhas)
+    return len(linhas)
+
+
+def processar_fila(max_lotes: Optional[int] = None) -> int:
+    """Processa lotes até a fila (elegível) esvaziar; útil para scripts e testes."""
+    db = SessionLocal()
+    total = 0
+    try:
+        _recuperar_orfas(db)
+        lotes = 0
+        while max_lotes is None or lotes < max_lotes:
+            n = processar_lote(db)
+            if not n:
+                break
+            total += n
+            lotes += 1
+    finally:
+        db.close()
+    return total
+
+
+# -----------------------------
+# Worker
+# -----------------------------
+_acordar = threading.Event()
+_parar = threading.Event()
+_threads: list[threading.Thread] = []
+_threads_lock = threading.Lock()
+
+
+def notificar():
+    """Acorda os workers logo após um commit com novas mensagens."""
+    _acordar.set()
+
+
+def _loop():
+    ultima_recuperacao = 0.0
+    while not _parar.is_set():
+        processadas = 0
+        try:
+            if not SMTP_HOST:
+                logger.warning("SMTP_HOST_not_set")
+            else:
+                db = SessionLocal()
+                try:
+                    if time.monotonic() - ultima_recuperacao > EMAIL_STALE_SECONDS / 2:
+                        _recuperar_orfas(db)
+                        ultima_recuperacao = time.monotonic()
+                    processadas = processar_lote(db)
+                finally:
+                    db.close()
+        except Exception:
+            logger.exception("Fila de e-mail: falha no worker")
+        if processadas:
+            continue
+        _acordar.wait(EMAIL_POLL_SEGUNDOS if SMTP_HOST else max(EMAIL_POLL_SEGUNDOS, 60))
+        _acordar.clear()
+
+
+def iniciar():
+    if EMAIL_WORKERS <= 0:
+        return
+    with _threads_lock:
+        if _threads:
+            return
+        _parar.clear()
+        for i in range(EMAIL_WORKERS):
+            t = threading.Thread(target=_loop, name=f"fila-email-{i}", daemon=True)
+            t.start()
+            _threads.append(t)
+
+
+def shutdown():
+    """Sinaliza os workers e fecha o pool; mensagens em Enviando são recuperadas depois."""
+    _parar.set()
+    _acordar.set()
+    with _threads_lock:
+        for t in _threads:
+            t.join(timeout=5)
+        _threads.clear()
+    _pool.fechar()
@@ -0,0 +1,486 @@
+"""
+Motor de importação da base de itens de revisão (revisoes_itens).
+
+Lê arquivos CSV/XLSX de forma incremental (linha a linha), valida cada linha
+e grava os itens em lotes de tamanho fixo usando COPY do PostgreSQL
+(com fallback para INSERT multi-linhas quando o driver não suporta COPY).
+O consumo de memória depende apenas do tamanho do lote, não do arquivo.
+O relatório conta todas as rejeições e alertas, mas guarda só as primeiras
+mensagens de cada tipo.
+
+Configurável via variáveis de ambiente:
+- IMPORT_CHUNK_SIZE: linhas por lote gravado (default: 5000)
+- IMPORT_MAX_MENSAGENS: mensagens de erro/alerta guardadas no relatório (default: 1000)
+"""
+
+import calendar
+import csv
+import io
+import itertools
+import os
+import re
+import unicodedata
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Iterator, Optional
+
+import sqlalchemy as sa
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from .models import RevisaoItem as RevisaoItemModel
+from .versoes import marcar_alteracao
+
+# Tamanho do lote enviado ao banco a cada COPY/INSERT
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+# Mensagens guardadas por tipo no relatório; as demais só entram na contagem
+IMPORT_MAX_MENSAGENS = int(os.getenv("IMPORT_MAX_MENSAGENS", "1000"))
+
+REQUIRED_HEADERS = {
+    "numero_imobilizado",
+    "sub_numero",
+    "data_inicio_depreciacao",
+    "descricao",
+    "valor_aquisicao",
+    "depreciacao_acumulada",
+    "valor_contabil",
+    "centro_custo",
+    "classe",
+    "conta_contabil",
+    "descricao_conta_contabil",
+    "vida_util_anos",
+    "vida_util_periodos",
+}
+OPTIONAL_HEADERS = {"data_fim_depreciacao", "auxiliar2", "auxiliar3", "descricao_classe"}
+
+HEADER_SYNONYMS = {
+    'no_imobilizado': 'numero_imobilizado',
+    'n_imobilizado': 'numero_imobilizado',
+    'numero_do_imobilizado': 'numero_imobilizado',
+    'numero_imobilizado': 'numero_imobilizado',
+    'sub_no': 'sub_numero',
+    'sub_numero': 'sub_numero',
+    'data_inicio_da_depreciacao': 'data_inicio_depreciacao',
+    'data_inicio_de_depreciacao': 'data_inicio_depreciacao',
+    'data_inicio_depreciacao': 'data_inicio_depreciacao',
+    'descricao': 'descricao',
+    'valor_aquisicao': 'valor_aquisicao',
+    'depreciacao_acum': 'depreciacao_acumulada',
+    'depreciacao_acumulada': 'depreciacao_acumulada',
+    'valor_contabil': 'valor_contabil',
+    'centro_custos': 'centro_custo',
+    'centro_de_custos': 'centro_custo',
+    'centro_custo': 'centro_custo',
+    'classe': 'classe',
+    'desc_classe': 'descricao_classe',
+    'descricao_da_classe': 'descricao_classe',
+    'descricao_classe': 'descricao_classe',
+    'conta_contabil': 'conta_contabil',
+    'desc_conta_contabil': 'descricao_conta_contabil',
+    'descricao_conta_contabil': 'descricao_conta_contabil',
+    'vida_util_anos': 'vida_util_anos',
+    'vida_util_periodos': 'vida_util_periodos',
+    'data_fim_depreciacao': 'data_fim_depreciacao',
+    # auxiliares opcionais
+    'auxiliar_1': 'auxiliar2',
+    'aux_1': 'auxiliar2',
+    'auxiliar1': 'auxiliar2',
+    'auxiliar_2': 'auxiliar3',
+    'aux_2': 'auxiliar3',
+    'auxiliar2': 'auxiliar2',
+    'auxiliar3': 'auxiliar3',
+}
+
+# Ordem das colunas gravadas via COPY/INSERT
+ITEM_COLUMNS = (
+    "periodo_id",
+    "numero_imobilizado",
+    "sub_numero",
+    "descricao",
+    "data_inicio_depreciacao",
+    "data_fim_depreciacao",
+    "valor_aquisicao",
+    "depreciacao_acumulada",
+    "valor_contabil",
+    "centro_custo",
+    "classe",
+    "descricao_classe",
+    "conta_contabil",
+    "descricao_conta_contabil",
+    "vida_util_anos",
+    "vida_util_periodos",
+    "auxiliar2",
+    "auxiliar3",
+    "status",
+    "alterado",
+)
+
+
+def norm_key(k: str) -> str:
+    s = (k or "").strip().lower()
+    s = unicodedata.normalize('NFD', s)
+    s = ''.join(ch for ch in s if unicodedata.category(ch) != 'Mn')  # remove acentos
+    s = s.replace('º', 'o').replace('ª', 'a')
+    s = re.sub(r'[^a-z0-9]+', '_', s)  # troca não alfanum por _
+    s = re.sub(r'_+', '_', s).strip('_')
+    return HEADER_SYNONYMS.get(s, s)
+
+
+def parse_date_any(x) -> Optional[date]:
+    if isinstance(x, datetime):
+        return x.date()
+    if isinstance(x, date):
+        return x
+    s = str(x or "").strip()
+    if not s:
+        return None
+    # Excel serial date (1900 date system): number of days since 1899-12-30
+    try:
+        n = float(s)
+        if n > 20000 and n < 80000:
+            return date(1899, 12, 30) + timedelta(days=int(round(n)))
+    except Exception:
+        pass
+    # Try common explicit formats first (4-digit year)
+    for fmt in (
+        "%Y-%m-%d",
+        "%Y/%m/%d",
+        "%d/%m/%Y",
+        "%d-%m-%Y",
+        "%m/%d/%Y",
+        "%m-%d-%Y",
+    ):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except Exception:
+            pass
+    # Fallbacks that accept 2-digit years in either BR (dd/mm/yy) or US (mm/dd/yy)
+    for fmt in (
+        "%d/%m/%y",
+        "%d-%m-%y",
+        "%m/%d/%y",
+        "%m-%d-%y",
+        "%y-%m-%d",
+        "%y/%m/%d",
+    ):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except Exception:
+            pass
+    raise ValueError(f"Data inválida: {s}")
+
+
+def parse_int(x) -> int:
+    s = str(x).strip()
+    if s == "":
+        return 0
+    try:
+        return int(s)
+    except Exception:
+        try:
+            return int(float(s.replace(',', '.')))
+        except Exception:
+            raise ValueError(f"Valor inteiro inválido: {x}")
+
+
+def parse_decimal(x) -> Decimal:
+    # Handle numeric types from XLSX directly without string replacements
+    if x is None:
+        return Decimal("0")
+    if isinstance(x, (int, float, Decimal)):
+        return Decimal(str(x))
+    s = str(x).strip()
+    if s == "":
+        return Decimal("0")
+    # Remove currency symbols/spaces
+    s = s.replace("R$", "").replace(" ", "")
+    # If both separators appear, assume dot thousands and comma decimal (pt-BR)
+    if "," in s and "." in s:
+        s = s.replace(".", "").replace(",", ".")
+    # If only comma appears, treat as decimal comma
+    elif "," in s:
+        s = s.replace(",", ".")
+    # Else: only dots or plain digits; remove thousands commas if any
+    else:
+        s = s.replace(",", "")
+    return Decimal(s or "0")
+
+
+def add_months(d: date, months: int) -> date:
+    y = d.year + (d.month - 1 + months) // 12
+    m = (d.month - 1 + months) % 12 + 1
+    last_day = calendar.monthrange(y, m)[1]
+    day = min(d.day, last_day)
+    return date(y, m, day)
+
+
+def iter_rows(fileobj, filename: str) -> tuple[list[str], Iterator[dict], Optional[int]]:
+    """Retorna (cabeçalhos normalizados, iterador de linhas, total de linhas de dados)
+    sem carregar o arquivo inteiro. O total vem da dimensão declarada na planilha
+    XLSX (None para CSV ou quando a planilha não a declara)."""
+    if filename.endswith(".csv"):
+        text = io.TextIOWrapper(fileobj, encoding="utf-8", errors="replace", newline="")
+        first_line = text.readline()
+        try:
+            dialect = csv.Sniffer().sniff(first_line)
+        except Exception:
+            dialect = csv.excel
+        reader = csv.reader(itertools.chain([first_line], text), dialect=dialect)
+        try:
+            raw_headers = next(reader)
+        except StopIteration:
+            raw_headers = []
+        headers = [norm_key(h) for h in raw_headers]
+
+        def _csv_rows():
+            try:
+                for values in reader:
+                    if not values:
+                        continue
+                    yield {h: (values[idx] if idx < len(values) else None) for idx, h in enumerate(headers)}
+            finally:
+                # Sem detach, o wrapper coletado ao fim da leitura fecharia o arquivo do chamador
+                text.detach()
+
+        return headers, _csv_rows(), None
+
+    try:
+        from openpyxl import load_workbook
+    except Exception:
+        raise HTTPException(status_code=500, detail="Dependência 'openpyxl' não instalada para XLSX")
+    wb = load_workbook(fileobj, read_only=True)
+    ws = wb.active
+    rows = ws.iter_rows(values_only=True)
+    try:
+        header_row = next(rows)
+    except StopIteration:
+        header_row = ()
+    headers = [norm_key(str(h)) for h in header_row]
+    linhas_total = ws.max_row - 1 if ws.max_row else None
+
+    def _xlsx_rows():
+        try:
+            for r in rows:
+                yield {h: (r[idx] if idx < len(r) else None) for idx, h in enumerate(headers)}
+        finally:
+            wb.close()
+
+    return headers, _xlsx_rows(), linhas_total
+
+
+class RegistroMensagens:
+    """Conta todas as mensagens, mas guarda só as `limite` primeiras."""
+
+    def __init__(self, limite: int):
+        self.limite = max(0, int(limite))
+        self.total = 0
+        self.mensagens: list[str] = []
+
+    def append(self, mensagem: str):
+        self.total += 1
+        if len(self.mensagens) < self.limite:
+            self.mensagens.append(mensagem)
+
+
+def validate_row(row: dict, rev_id: int, idx: int, warnings_log: RegistroMensagens) -> tuple:
+    """Valida uma linha da planilha e devolve a tupla na ordem de ITEM_COLUMNS.
+
+    Levanta ValueError com a mensagem exibida no relatório de rejeições.
+    """
+    numero_imobilizado = str(row.get("numero_imobilizado", "")).strip()
+    sub_numero = str(row.get("sub_numero", "")).strip()
+    descricao = str(row.get("descricao", "")).strip()
+    if not (numero_imobilizado and sub_numero and descricao):
+        raise ValueError("Campos chave vazios")
+
+    data_inicio = parse_date_any(row.get("data_inicio_depreciacao"))
+    if not data_inicio:
+        raise ValueError("Data de início da depreciação em branco")
+
+    vida_util_anos = parse_int(row.get("vida_util_anos"))
+    vida_util_periodos = parse_int(row.get("vida_util_periodos"))
+    if vida_util_periodos == 0 and vida_util_anos > 0:
+        vida_util_periodos = vida_util_anos * 12
+    if vida_util_anos == 0 and vida_util_periodos > 0:
+        vida_util_anos = max(0, round(vida_util_periodos / 12))
+    if str(row.get("vida_util_anos", "")).strip() == "":
+        warnings_log.append(f"Linha {idx}: vida_util_anos vazio")
+    if str(row.get("vida_util_anos", "")).strip() == "" and str(row.get("vida_util_periodos", "")).strip() == "":
+        raise ValueError("Vida útil em branco: informe anos ou períodos")
+
+    valor_aquisicao = parse_decimal(row.get("valor_aquisicao"))
+    depreciacao_acumulada = parse_decimal(row.get("depreciacao_acumulada"))
+    valor_contabil = parse_decimal(row.get("valor_contabil"))
+
+    centro_custo = str(row.get("centro_custo", "")).strip()
+    classe = str(row.get("classe", "")).strip()
+    conta_contabil = str(row.get("conta_contabil", "")).strip()
+    descricao_cc = str(row.get("descricao_conta_contabil", "")).strip()
+    descricao_classe = str(row.get("descricao_classe", "")).strip()
+
+    data_fim = parse_date_any(row.get("data_fim_depreciacao"))
+    if not data_fim and data_inicio and vida_util_periodos:
+        data_fim = add_months(data_inicio, vida_util_periodos)
+
+    return (
+        rev_id,
+        numero_imobilizado,
+        sub_numero,
+        descricao,
+        data_inicio,
+        data_fim,
+        valor_aquisicao,
+        depreciacao_acumulada,
+        valor_contabil,
+        centro_custo,
+        classe,
+        (descricao_classe or None),
+        conta_contabil,
+        descricao_cc,
+        vida_util_anos,
+        vida_util_periodos,
+        str(row.get("auxiliar2", "")) or None,
+        str(row.get("auxiliar3", "")) or None,
+        "Pendente",
+        False,
+    )
+
+
+def _copy_value(v) -> str:
+    # Formato texto do COPY: NULL como \N e escape de barra, tab e quebras de linha
+    if v is None:
+        return "\\N"
+    if isinstance(v, bool):
+        return "t" if v else "f"
+    s = v.isoformat() if isinstance(v, date) else str(v)
+    return s.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class BulkItemWriter:
+    """Acumula itens validados e grava em lotes dentro da transação da sessão."""
+
+    def __init__(self, db: Session, chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.db = db
+        self.chunk_size = max(1, int(chunk_size))
+        self.buffer: list[tuple] = []
+        self.written = 0
+        self._use_copy: Optional[bool] = None
+
+    def add(self, values: tuple):
+        self.buffer.append(values)
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self._use_copy is None:
+            raw = self.db.connection().connection
+            self._use_copy = hasattr(raw.cursor(), "copy_expert")
+        if self._use_copy:
+            self._flush_copy()
+        else:
+            self._flush_insert()
+        self.written += len(self.buffer)
+        self.buffer = []
+
+    def _flush_copy(self):
+        payload = io.StringIO()
+        for values in self.buffer:
+            payload.write("\t".join(_copy_value(v) for v in values))
+            payload.write("\n")
+        payload.seek(0)
+        raw = self.db.connection().connection
+        cur = raw.cursor()
+        try:
+            cur.copy_expert(
+                f"COPY {RevisaoItemModel.__tablename__} ({', '.join(ITEM_COLUMNS)}) FROM STDIN",
+                payload,
+            )
+        finally:
+            cur.close()
+        # COPY não passa pela Session: invalida caches explicitamente (app/versoes.py)
+        marcar_alteracao(self.db, RevisaoItemModel.__tablename__)
+
+    def _flush_insert(self):
+        self.db.execute(
+            sa.insert(RevisaoItemModel.__table__),
+            [dict(zip(ITEM_COLUMNS, values)) for values in self.buffer],
+        )
+
+
+class ImportacaoCancelada(Exception):
+    """Levantada pelo callback de progresso para interromper a importação."""
+
+
+def importar_base(
+    db: Session,
+    rev_id: int,
+    fileobj,
+    filename: str,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    on_progress: Optional[Callable[[dict], None]] = None,
+    antes_do_commit: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """Importa a base do período e devolve o relatório importados/rejeitados/erros/alertas.
+
+    `erros` e `alertas` trazem no máximo IMPORT_MAX_MENSAGENS mensagens cada;
+    os totais são `rejeitados` (uma mensagem por linha) e `total_alertas`.
+
+    A gravação ocorre em lotes, mas o commit é único ao final: em caso de falha
+    ou cancelamento nada é persistido (mesma semântica do upload original).
+    on_progress, se informado, recebe as contagens parciais a cada lote lido
+    (e `linhas_total`, quando conhecido) e pode levantar ImportacaoCancelada
+    para abortar. antes_do_commit, se informado, recebe o relatório e grava
+    na mesma transação dos itens (ex.: o status do job de importação).
+    """
+    imported = 0
+    rejected = 0
+    errors_log = RegistroMensagens(IMPORT_MAX_MENSAGENS)
+    warnings_log = RegistroMensagens(IMPORT_MAX_MENSAGENS)
+
+    headers, rows, linhas_total = iter_rows(fileobj, filename)
+    missing = [h for h in sorted(REQUIRED_HEADERS) if h not in headers]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Cabeçalhos ausentes: {', '.join(missing)}")
+
+    def _progress():
+        if on_progress:
+            on_progress({
+                "linhas_lidas": imported + rejected,
+                "linhas_total": linhas_total,
+                "importados": imported,
+                "rejeitados": rejected,
+            })
+
+    writer = BulkItemWriter(db, chunk_size=chunk_size)
+    try:
+        for idx, row in enumerate(rows, start=2):  # start=2 considera header na linha 1
+            if (idx - 1) % writer.chunk_size == 0:
+                _progress()
+            try:
+                values = validate_row(row, rev_id, idx, warnings_log)
+            except Exception as ex:
+                rejected += 1
+                errors_log.append(f"Linha {idx}: {ex}")
+                continue
+            writer.add(values)
+            imported += 1
+        writer.flush()
+        _progress()
+        report = {
+            "periodo_id": rev_id,
+            "importados": imported,
+            "rejeitados": rejected,
+            "erros": errors_log.mensagens,
+            "alertas": warnings_log.mensagens,
+            "total_alertas": warnings_log.total,
+        }
+        if antes_do_commit:
+            antes_do_commit(report)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return report
@@ -0,0 +1,322 @@
+"""
+Execução assíncrona da importação da base de revisão.
+
+O upload apenas grava o arquivo em disco e registra um job em
+`importacoes_jobs`; um pool de threads processa os jobs com
+`importar_base` (streaming + COPY) e atualiza o progresso no próprio
+registro, de forma que o status sobrevive a reinícios do processo.
+
+Configurável via variáveis de ambiente:
+- IMPORT_JOB_WORKERS: threads de importação simultâneas (default: 2)
+- IMPORT_JOB_DIR: diretório dos arquivos enviados (default: <tmp>/assetlife_imports)
+  O diretório é local a cada host: o job guarda o host que recebeu o upload
+  (coluna `worker`) e só esse host o executa, recupera ou dá como perdido.
+- IMPORT_JOB_STALE_SECONDS: sem heartbeat por este tempo, um job em
+  processamento é considerado órfão e reenfileirado (default: 300)
+"""
+
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+import sqlalchemy as sa
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .importacao_base import ImportacaoCancelada, importar_base
+from .models import ImportacaoJob as ImportacaoJobModel
+
+logger = logging.getLogger(__name__)
+
+IMPORT_JOB_WORKERS = max(1, int(os.getenv("IMPORT_JOB_WORKERS", "2")))
+IMPORT_JOB_DIR = os.getenv("IMPORT_JOB_DIR") or os.path.join(tempfile.gettempdir(), "assetlife_imports")
+IMPORT_JOB_STALE_SECONDS = int(os.getenv("IMPORT_JOB_STALE_SECONDS", "300"))
+
+STATUS_PENDENTE = "Pendente"
+STATUS_PROCESSANDO = "Processando"
+STATUS_CONCLUIDO = "Concluido"
+STATUS_ERRO = "Erro"
+STATUS_CANCELADO = "Cancelado"
+STATUS_FINAIS = {STATUS_CONCLUIDO, STATUS_ERRO, STATUS_CANCELADO}
+
+HOST_ID = socket.gethostname()
+WORKER_ID = f"{HOST_ID}:{os.getpid()}"
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=IMPORT_JOB_WORKERS, thread_name_prefix="importacao")
+    return _executor
+
+
+def shutdown():
+    """Encerra o pool sem aguardar; jobs interrompidos são retomados no próximo startup."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def criar_job(db: Session, rev_id: int, fileobj, filename: str) -> ImportacaoJobModel:
+    """Grava o upload em disco (em blocos) e registra o job como Pendente."""
+    os.makedirs(IMPORT_JOB_DIR, exist_ok=True)
+    job_id = str(uuid.uuid4())
+    ext = ".xlsx" if filename.endswith(".xlsx") else ".csv"
+    path = os.path.join(IMPORT_JOB_DIR, f"{job_id}{ext}")
+    try:
+        with open(path, "wb") as out:
+            shutil.copyfileobj(fileobj, out, 1024 * 1024)
+        job = ImportacaoJobModel(
+            id=job_id,
+            periodo_id=rev_id,
+            nome_arquivo=filename[:255],
+            caminho_arquivo=path,
+            tamanho_bytes=os.path.getsize(path),
+            status=STATUS_PENDENTE,
+            worker=HOST_ID,
+            atualizado_em=datetime.utcnow(),
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+    except Exception:
+        db.rollback()
+        _remove_file(path)
+        raise
+    return job
+
+
+def enfileirar(job_id: str):
+    _get_executor().submit(_executar, job_id)
+
+
+def solicitar_cancelamento(db: Session, job: ImportacaoJobModel) -> ImportacaoJobModel:
+    """Cancela imediatamente se ainda não iniciado; caso contrário sinaliza o worker."""
+    if job.status in STATUS_FINAIS:
+        raise HTTPException(status_code=400, detail=f"Job já finalizado ({job.status})")
+    now = datetime.utcnow()
+    res = db.execute(
+        sa.update(ImportacaoJobModel)
+        .where(ImportacaoJobModel.id == job.id, ImportacaoJobModel.status == STATUS_PENDENTE)
+        .values(status=STATUS_CANCELADO, cancelamento_solicitado=True, mensagem="Cancelado pelo usuário",
+                finalizado_em=now, atualizado_em=now)
+    )
+    if res.rowcount == 0:
+        db.execute(
+            sa.update(ImportacaoJobModel)
+            .where(ImportacaoJobModel.id == job.id)
+            .values(cancelamento_solicitado=True)
+        )
+    db.commit()
+    db.refresh(job)
+    if job.status == STATUS_CANCELADO:
+        _remove_file(job.caminho_arquivo)
+    return job
+
+
+def serializar_job(job: ImportacaoJobModel) -> dict:
+    """Status do job no formato exposto pela API (inclui ETA estimada pelo avanço da leitura).
+
+    CSV avança pelos bytes lidos; XLSX (lido fora de ordem pelo openpyxl) pelas
+    linhas lidas sobre o total declarado na planilha.
+    """
+    if job.linhas_total:
+        total, lidos = int(job.linhas_total), int(job.linhas_lidas or 0)
+    else:
+        total, lidos = int(job.tamanho_bytes or 0), int(job.bytes_processados or 0)
+    if job.status == STATUS_CONCLUIDO:
+        progresso = 100.0
+    else:
+        progresso = round(min(lidos / total, 1.0) * 100, 1) if total else 0.0
+    erros = json.loads(job.erros) if job.erros else []
+    alertas = json.loads(job.alertas) if job.alertas else []
+    eta = None
+    if job.status == STATUS_PROCESSANDO and job.iniciado_em and 0 < lidos < total:
+        decorrido = (datetime.utcnow() - job.iniciado_em).total_seconds()
+        if decorrido > 0:
+            eta = int(decorrido * (total - lidos) / lidos)
+    return {
+        "job_id": job.id,
+        "periodo_id": job.periodo_id,
+        "nome_arquivo": job.nome_arquivo,
+        "status": job.status,
+        "progresso": progresso,
+        "eta_segundos": eta,
+        "linhas_lidas": job.linhas_lidas or 0,
+        "linhas_total": job.linhas_total,
+        "importados": job.linhas_importadas or 0,
+        "rejeitados": job.linhas_rejeitadas or 0,
+        "erros": erros,
+        "alertas": alertas,
+        # Listas limitadas a IMPORT_MAX_MENSAGENS; os totais são rejeitados/total_alertas
+        "total_alertas": job.total_alertas if job.total_alertas is not None else len(alertas),
+        "mensagem": job.mensagem,
+        "cancelamento_solicitado": bool(job.cancelamento_solicitado),
+        "criado_em": job.criado_em.isoformat() if job.criado_em else None,
+        "iniciado_em": job.iniciado_em.isoformat() if job.iniciado_em else None,
+        "finalizado_em": job.finalizado_em.isoformat() if job.finalizado_em else None,
+    }
+
+
+def _deste_host():
+    """Jobs recebidos por este host (worker = host, ou host:pid durante a execução)."""
+    return sa.or_(
+        ImportacaoJobModel.worker == HOST_ID,
+        ImportacaoJobModel.worker.startswith(f"{HOST_ID}:", autoescape=True),
+    )
+
+
+def recuperar_jobs():
+    """Reenfileira jobs pendentes e os órfãos de processos encerrados deste host.
+
+    A importação faz um único commit ao final, que já grava o job como
+    Concluido: um job ainda em processamento não deixou itens gravados e pode
+    ser reexecutado do início sem duplicar a base. Jobs de outros hosts não
+    são tocados: o arquivo deles está no disco de lá.
+    """
+    db = SessionLocal()
+    try:
+        limite = datetime.utcnow() - timedelta(seconds=IMPORT_JOB_STALE_SECONDS)
+        db.execute(
+            sa.update(ImportacaoJobModel)
+            .where(
+                ImportacaoJobModel.status == STATUS_PROCESSANDO,
+                _deste_host(),
+                sa.or_(ImportacaoJobModel.atualizado_em.is_(None), ImportacaoJobModel.atualizado_em < limite),
+            )
+            .values(status=STATUS_PENDENTE, worker=HOST_ID, bytes_processados=0, linhas_lidas=0,
+                    linhas_importadas=0, linhas_rejeitadas=0)
+        )
+        db.commit()
+        pendentes = (
+            db.query(ImportacaoJobModel)
+            .filter(
+                ImportacaoJobModel.status == STATUS_PENDENTE,
+                # worker nulo: jobs anteriores ao registro do host; só executa se o arquivo estiver aqui
+                sa.or_(_deste_host(), ImportacaoJobModel.worker.is_(None)),
+            )
+            .all()
+        )
+        recuperados = 0
+        for job in pendentes:
+            arquivo_local = os.path.exists(job.caminho_arquivo)
+            if job.worker is None and not arquivo_local:
+                continue
+            if job.cancelamento_solicitado or not arquivo_local:
+                job.status = STATUS_CANCELADO if job.cancelamento_solicitado else STATUS_ERRO
+                job.mensagem = job.mensagem or "Arquivo do upload não está mais disponível; reenvie a base"
+                job.finalizado_em = datetime.utcnow()
+                continue
+            enfileirar(job.id)
+            recuperados += 1
+        db.commit()
+        if recuperados:
+            logger.info("Importação: %d job(s) recuperado(s)", recuperados)
+    finally:
+        db.close()
+
+
+def _remove_file(path: Optional[str]):
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _finalizar(db: Session, job_id: str, commit: bool = True, **values):
+    now = datetime.utcnow()
+    values.setdefault("finalizado_em", now)
+    values["atualizado_em"] = now
+    db.execute(sa.update(ImportacaoJobModel).where(ImportacaoJobModel.id == job_id).values(**values))
+    if commit:
+        db.commit()
+
+
+def _executar(job_id: str):
+    # Sessão de controle (status/progresso) separada da sessão de importação,
+    # cuja transação só é confirmada ao final.
+    ctl = SessionLocal()
+    db = SessionLocal()
+    job = None
+    try:
+        now = datetime.utcnow()
+        claimed = ctl.execute(
+            sa.update(ImportacaoJobModel)
+            .where(ImportacaoJobModel.id == job_id, ImportacaoJobModel.status == STATUS_PENDENTE)
+            .values(status=STATUS_PROCESSANDO, worker=WORKER_ID, iniciado_em=now, atualizado_em=now)
+        ).rowcount
+        ctl.commit()
+        if not claimed:
+            return  # já executado/cancelado ou assumido por outro processo
+        job = ctl.get(ImportacaoJobModel, job_id)
+        # openpyxl (read_only) lê o zip fora de ordem: a posição no arquivo não mede o avanço
+        por_bytes = not job.nome_arquivo.endswith(".xlsx")
+
+        with open(job.caminho_arquivo, "rb") as fh:
+            def on_progress(stats: dict):
+                ctl.execute(
+                    sa.update(ImportacaoJobModel)
+                    .where(ImportacaoJobModel.id == job_id)
+                    .values(
+                        bytes_processados=fh.tell() if por_bytes else 0,
+                        linhas_total=stats.get("linhas_total"),
+                        linhas_lidas=stats["linhas_lidas"],
+                        linhas_importadas=stats["importados"],
+                        linhas_rejeitadas=stats["rejeitados"],
+                        atualizado_em=datetime.utcnow(),
+                    )
+                )
+                ctl.commit()
+                cancelar = ctl.execute(
+                    sa.select(ImportacaoJobModel.cancelamento_solicitado).where(ImportacaoJobModel.id == job_id)
+                ).scalar()
+                if cancelar:
+                    raise ImportacaoCancelada()
+
+            # Conclusão gravada na transação dos itens: um crash logo após o commit
+            # não deixa o job em processamento para ser reexecutado (base duplicada)
+            def concluir(report: dict):
+                _finalizar(
+                    db, job_id, commit=False,
+                    status=STATUS_CONCLUIDO,
+                    bytes_processados=job.tamanho_bytes,
+                    linhas_lidas=report["importados"] + report["rejeitados"],
+                    linhas_importadas=report["importados"],
+                    linhas_rejeitadas=report["rejeitados"],
+                    erros=json.dumps(report["erros"], ensure_ascii=False),
+                    alertas=json.dumps(report["alertas"], ensure_ascii=False),
+                    total_alertas=report["total_alertas"],
+                )
+
+            importar_base(db, job.periodo_id, fh, job.nome_arquivo, on_progress=on_progress, antes_do_commit=concluir)
+    except ImportacaoCancelada:
+        ctl.rollback()
+        _finalizar(ctl, job_id, status=STATUS_CANCELADO, linhas_importadas=0, mensagem="Cancelado pelo usuário")
+    except HTTPException as ex:
+        ctl.rollback()
+        _finalizar(ctl, job_id, status=STATUS_ERRO, linhas_importadas=0, mensagem=str(ex.detail))
+    except Exception as ex:
+        logger.exception("Importação: falha no job %s", job_id)
+        try:
+            ctl.rollback()
+            _finalizar(ctl, job_id, status=STATUS_ERRO, linhas_importadas=0, mensagem=f"Erro interno ao importar base: {ex.__class__.__name__}")
+        except Exception:
+            logger.exception("Importação: não foi possível registrar falha do job %s", job_id)
+    finally:
+        db.close()
+        ctl.close()
+        if job is not None:
+            _remove_file(job.caminho_arquivo)
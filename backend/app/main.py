@@ -4,7 +4,9 @@ import re
 import logging
 import uuid
 import json
+import hashlib
 from starlette.responses import Response
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional
@@ -15,13 +17,12 @@ from datetime import date
 import os
 
 from .database import SessionLocal, engine
-from .config import ALLOW_DDL, SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_USE_TLS, SMTP_USE_SSL, MAIL_FROM, MAIL_SENDER_NAME, SECRET_KEY, ALGORITHM, JWT_EXPIRE_MINUTES, RESET_TOKEN_EXPIRE_MINUTES
-from .dependencies import get_db, get_current_user, get_allowed_company_ids, check_permission, is_admin_user, get_header_company_id
+from .config import ALLOW_DDL, SMTP_HOST, SECRET_KEY, ALGORITHM, JWT_EXPIRE_MINUTES, RESET_TOKEN_EXPIRE_MINUTES
+from .dependencies import get_db, get_current_user, get_allowed_company_ids, check_permission, is_admin_user, get_header_company_id, invalidate_authorization_cache, get_current_principal, authorization_claims
 from .models import Base as SA_Base, Company as CompanyModel
 from .models import Employee as EmployeeModel, Vinculo as VinculoEnum, Status as StatusEnum
 from .models import ManagementUnit as UGModel
 from .models import Usuario as UsuarioModel
-import bcrypt
 from .models import RevisaoPeriodo as RevisaoPeriodoModel
 from .models import RevisaoItem as RevisaoItemModel
 from .models import RevisaoDelegacao as RevisaoDelegacaoModel
@@ -39,6 +40,19 @@ from .models import (
     NotificacaoDestinatario as NotificacaoDestinatarioModel,
 )
 from .models import TokenRedefinicao as TokenRedefinicaoModel
+from . import importacao_jobs
+from . import autenticacao
+from . import fila_email
+from . import notificacoes
+from . import eventos
+from . import fila_auditoria
+from . import armazenamento
+from . import busca
+from . import cache_http
+from .autenticacao import get_login_throttle, verificar_senha, verificar_senha_async, hash_senha, hash_senha_async, precisa_rehash
+from .consultas import DIAGNOSTICO_HEADER
+from . import versoes  # registra os eventos de versão de dados na sessão  # noqa: F401
+from .models import ImportacaoJob as ImportacaoJobModel
 from .models import Cronograma as CronogramaModel, CronogramaTarefa as CronogramaTarefaModel, CronogramaTarefaEvidencia as CronogramaTarefaEvidenciaModel
 from fastapi import UploadFile, File
 from datetime import datetime, timedelta
@@ -51,6 +65,7 @@ from .routes.assets import router as assets_router
 from .routes.reviews import router as reviews_router
 from .routes.simulador_depreciacao import router as simulador_depreciacao_router
 from .routes.auditoria import router as auditoria_router
+from .routes.eventos import router as eventos_router
 app = FastAPI(title="Asset Life API", version="0.2.0")
 app.include_router(relatorios_rvu_router)
 app.include_router(supervisao_rvu_router)
@@ -58,6 +73,7 @@ app.include_router(assets_router)
 app.include_router(reviews_router)
 app.include_router(simulador_depreciacao_router)
 app.include_router(auditoria_router)
+app.include_router(eventos_router)
 
 # Create tables if they don't exist
 # SA_Base.metadata.create_all(bind=engine)
@@ -97,6 +113,10 @@ if _frontend_origin:
 ORIGIN_REGEX = r"^https?://.+$"
 origin_re = re.compile(ORIGIN_REGEX)
 
+# GET condicional (ETag/304) das listagens de referência e de itens (app/cache_http.py).
+# Registrado antes do CORS para ficar por dentro dele: o 304 também recebe os cabeçalhos CORS.
+app.middleware("http")(cache_http.requisicao_condicional)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -104,7 +124,7 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["*"],
     allow_credentials=True,
-    expose_headers=["Content-Disposition", "Content-Type"],
+    expose_headers=["Content-Disposition", "Content-Type", "ETag", DIAGNOSTICO_HEADER],
 )
 
 # Complemento CORS para "Private Network Access" (PNA) em navegadores modernos.
@@ -128,7 +148,7 @@ async def allow_private_network(request: Request, call_next):
             if not response.headers.get("Access-Control-Allow-Credentials"):
                 response.headers["Access-Control-Allow-Credentials"] = "true"
             if not response.headers.get("Access-Control-Expose-Headers"):
-                response.headers["Access-Control-Expose-Headers"] = "Content-Disposition, Content-Type"
+                response.headers["Access-Control-Expose-Headers"] = f"Content-Disposition, Content-Type, {DIAGNOSTICO_HEADER}"
             if not response.headers.get("Access-Control-Allow-Methods"):
                 response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
             if not response.headers.get("Access-Control-Allow-Headers"):
@@ -138,6 +158,17 @@ async def allow_private_network(request: Request, call_next):
         pass
     return response
 
+
+@app.middleware("http")
+async def query_diagnostics(request: Request, call_next):
+    # Diagnóstico de consultas (opt-in via header, ver app/consultas.py) devolvido no header de resposta
+    response = await call_next(request)
+    if request.headers.get(DIAGNOSTICO_HEADER):
+        diagnosticos = getattr(request.state, "diagnosticos_consulta", None)
+        if diagnosticos:
+            response.headers[DIAGNOSTICO_HEADER] = json.dumps(diagnosticos, default=str, ensure_ascii=True)
+    return response
+
 @app.exception_handler(HTTPException)
 async def _http_exception_handler(request: Request, exc: HTTPException):
     origin = request.headers.get("origin")
@@ -193,8 +224,7 @@ security = HTTPBearer()
 JWT_EXPIRE_MINUTES = 60 * 8  # 8 horas
 RESET_TOKEN_EXPIRE_MINUTES = 30  # 30 minutos
 
-# Tentativas de login in-memory (substituir por campos na tabela usuarios posteriormente)
-login_attempts: dict[str, dict] = {}
+# Tentativas de login: ver app/autenticacao.py (LOGIN_THROTTLE_STORE)
 
 class LoginPayload(BaseModel):
     email: Optional[EmailStr] = None
@@ -214,14 +244,32 @@ def create_access_token(data: dict, expires_minutes: int = 60):
  
 # Dependencies are now imported from .dependencies
 
+def _buscar_usuario_login(db: Session, identifier: str, key: str):
+    # Identificar por email ou nome de usuário (case-insensitive)
+    if "@" in identifier:
+        return db.query(UsuarioModel).filter(sa.func.lower(UsuarioModel.email) == key).first()
+    return db.query(UsuarioModel).filter(sa.func.lower(UsuarioModel.nome_usuario) == key).first()
+
+
+def _throttle_seguro(metodo, *args):
+    # Falha do store (ex.: banco indisponível) não deve impedir o login
+    try:
+        return metodo(*args)
+    except Exception:
+        logging.getLogger("uvicorn.error").warning("Controle de tentativas de login indisponível", exc_info=True)
+        return None
+
+
 @app.post("/auth/login", response_model=TokenResponse)
-def login(payload: LoginPayload, request: Request, db: Session = Depends(get_db)):
+async def login(payload: LoginPayload, request: Request, db: Session = Depends(get_db)):
+    # async: consultas ao banco vão para o threadpool e o bcrypt para o executor
+    # dedicado (app/autenticacao.py), sem ocupar threads enquanto aguarda
     identifier = (payload.identificador or (payload.email or "")).strip()
     if not identifier:
         raise HTTPException(status_code=400, detail="Informe email ou usuário")
 
     key = identifier.lower()
-    la = login_attempts.get(key)
+    throttle = get_login_throttle()
     now = datetime.utcnow()
     client_ip = request.client.host if request.client else None
     is_local_ip = False
@@ -231,47 +279,41 @@ def login(payload: LoginPayload, request: Request, db: Session = Depends(get_db)
             is_local_ip = s == "127.0.0.1" or s == "::1" or s.startswith("192.168.") or s.startswith("10.") or s.startswith("172.")
     except Exception:
         is_local_ip = False
-    if la and la.get("blocked_until") and la["blocked_until"] > now:
+    blocked_until = await run_in_threadpool(_throttle_seguro, throttle.bloqueado_ate, key)
+    if blocked_until and blocked_until > now:
         if is_local_ip:
-            la["count"] = 0
-            la["blocked_until"] = None
-            login_attempts[key] = la
+            await run_in_threadpool(_throttle_seguro, throttle.limpar, key)
         else:
             raise HTTPException(status_code=403, detail="Usuário temporariamente bloqueado. Tente novamente mais tarde.")
 
-    # Identificar por email ou nome de usuário (case-insensitive)
-    if "@" in identifier:
-        user = db.query(UsuarioModel).filter(sa.func.lower(UsuarioModel.email) == key).first()
-    else:
-        user = db.query(UsuarioModel).filter(sa.func.lower(UsuarioModel.nome_usuario) == key).first()
+    user = await run_in_threadpool(_buscar_usuario_login, db, identifier, key)
 
-    if not user or not bcrypt.checkpw(payload.senha.encode("utf-8"), (user.senha_hash or "").encode("utf-8")):
+    if not user or not await verificar_senha_async(payload.senha, user.senha_hash or ""):
         # Atualizar tentativas
-        if not la:
-            la = {"count": 0, "blocked_until": None}
         if not is_local_ip:
-            la["count"] = la.get("count", 0) + 1
-            if la["count"] >= 3:
-                la["blocked_until"] = now + timedelta(minutes=15)
-            login_attempts[key] = la
+            await run_in_threadpool(_throttle_seguro, throttle.registrar_falha, key, now)
 
         # Auditoria (falha)
-        try:
-            audit(db, usuario_id=user.id if user else None, acao="LOGIN_FALHA", entidade="Usuario", entidade_id=user.id if user else None, detalhes=f"ip={client_ip}")
-        except Exception:
-            pass
+        await run_in_threadpool(audit, db, usuario_id=user.id if user else None, acao="LOGIN_FALHA", entidade="Usuario", entidade_id=user.id if user else None, detalhes=f"ip={client_ip}")
         raise HTTPException(status_code=401, detail="Credenciais inválidas")
 
     # Sucesso -> reset tentativas
-    login_attempts.pop(key, None)
+    await run_in_threadpool(_throttle_seguro, throttle.limpar, key)
+
+    # Custo do bcrypt alterado (BCRYPT_ROUNDS): regera o hash com a senha já validada
+    if precisa_rehash(user.senha_hash):
+        try:
+            user.senha_hash = await hash_senha_async(payload.senha)
+            await run_in_threadpool(db.commit)
+        except Exception:
+            await run_in_threadpool(db.rollback)
+            logging.getLogger("uvicorn.error").warning("Falha ao regerar hash de senha usuario_id=%s", user.id, exc_info=True)
 
-    token = create_access_token({"sub": str(user.id)}, expires_minutes=JWT_EXPIRE_MINUTES)
+    claims = await run_in_threadpool(authorization_claims, db, user)
+    token = create_access_token({"sub": str(user.id), **claims}, expires_minutes=JWT_EXPIRE_MINUTES)
 
     # Auditoria (sucesso)
-    try:
-        audit(db, usuario_id=user.id, acao="LOGIN_SUCESSO", entidade="Usuario", entidade_id=user.id, detalhes=f"ip={client_ip}")
-    except Exception:
-        pass
+    await run_in_threadpool(audit, db, usuario_id=user.id, acao="LOGIN_SUCESSO", entidade="Usuario", entidade_id=user.id, detalhes=f"ip={client_ip}")
     return TokenResponse(access_token=token)
 
 
@@ -303,73 +345,14 @@ def validate_password_strength(p: str):
         raise HTTPException(status_code=400, detail="Senha deve conter pelo menos um símbolo")
 
 
-from email.message import EmailMessage
-import smtplib
-import ssl
 from html import escape as html_escape
 
-def _mask_email(value: str) -> str:
-    try:
-        s = (value or "").strip()
-        if "@" not in s:
-            return "***"
-        local, domain = s.split("@", 1)
-        if not local:
-            return f"***@{domain}"
-        return f"{local[0]}***@{domain}"
-    except Exception:
-        return "***"
+def _mask_email(email: str) -> str:
+    return fila_email.mask_email(email)
 
 def _send_email(to: str, subject: str, body: str, html_body: Optional[str] = None):
-    if not SMTP_HOST:
-        logging.getLogger("mail").warning("SMTP_HOST_not_set")
-        return False
-    msg = EmailMessage()
-    msg["From"] = f"{MAIL_SENDER_NAME} <{MAIL_FROM}>"
-    msg["To"] = to
-    msg["Subject"] = subject
-    msg.set_content(body)
-    if html_body:
-        try:
-            msg.add_alternative(str(html_body), subtype="html")
-        except Exception:
-            pass
-    try:
-        refused = None
-        if SMTP_USE_SSL:
-            with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) as server:
-                if SMTP_USER:
-                    server.login(SMTP_USER, SMTP_PASSWORD or "")
-                refused = server.send_message(msg)
-        else:
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-                if SMTP_USE_TLS:
-                    server.starttls(context=ssl.create_default_context())
-                if SMTP_USER:
-                    server.login(SMTP_USER, SMTP_PASSWORD or "")
-                refused = server.send_message(msg)
-        if refused:
-            try:
-                logging.getLogger("mail").warning("SMTP_recipient_refused to=%s", _mask_email(to or ""))
-            except Exception:
-                pass
-            return False
-        try:
-            logging.getLogger("mail").info("SMTP_send_ok to=%s", _mask_email(to or ""))
-        except Exception:
-            pass
-        return True
-    except Exception:
-        logging.getLogger("mail").exception(
-            "SMTP_send_failed host=%s port=%s ssl=%s tls=%s user=%s to=%s",
-            SMTP_HOST,
-            SMTP_PORT,
-            bool(SMTP_USE_SSL),
-            bool(SMTP_USE_TLS),
-            _mask_email(SMTP_USER or ""),
-            _mask_email(to or ""),
-        )
-        return False
+    # Envio imediato reaproveitando o pool SMTP da fila (app/fila_email.py)
+    return fila_email.enviar_agora(to, subject, body, html_body)
 
 
 @app.post("/auth/forgot-password")
@@ -381,6 +364,7 @@ def forgot_password(payload: ForgotPasswordRequest, db: Session = Depends(get_db
         token = secrets.token_urlsafe(48)
         expires = datetime.utcnow() + timedelta(minutes=RESET_TOKEN_EXPIRE_MINUTES)
         db.add(TokenRedefinicaoModel(usuario_id=user.id, token=token, expiracao=expires, usado=False))
+        fila_auditoria.gravar(db, usuario_id=user.id, acao="RESET_SOLICITADO", entidade="Usuario", entidade_id=user.id)
         db.commit()
         base_url = os.getenv("FRONTEND_BASE_URL", "http://localhost:5173")
         link = f"{base_url}/reset-password?token={token}"
@@ -389,12 +373,7 @@ def forgot_password(payload: ForgotPasswordRequest, db: Session = Depends(get_db
             subject="Redefinição de Senha - Asset Life",
             body=f"Olá {user.nome_completo},\n\nRecebemos uma solicitação para redefinir sua senha. Use o link abaixo (válido por 30 minutos):\n{link}\n\nSe você não solicitou, ignore este email.",
         )
-        if ok:
-            try:
-                audit(db, usuario_id=user.id, acao="RESET_SOLICITADO", entidade="Usuario", entidade_id=user.id)
-            except Exception:
-                pass
-        else:
+        if not ok:
             logging.getLogger("mail").warning("forgot_password_email_not_sent to=%s", _mask_email(user.email or ""))
     return {"ok": True}
 
@@ -413,14 +392,12 @@ def reset_password(payload: ResetPasswordRequest, db: Session = Depends(get_db))
     if not user:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     # atualizar senha
-    new_hash = bcrypt.hashpw(payload.nova_senha.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    new_hash = hash_senha(payload.nova_senha)
     user.senha_hash = new_hash
     t.usado = True
+    fila_auditoria.gravar(db, usuario_id=user.id, acao="RESET_CONCLUIDO", entidade="Usuario", entidade_id=user.id)
     db.commit()
-    try:
-        audit(db, usuario_id=user.id, acao="RESET_CONCLUIDO", entidade="Usuario", entidade_id=user.id)
-    except Exception:
-        pass
+    invalidate_authorization_cache(user.id)
     return {"ok": True}
 
 
@@ -428,16 +405,14 @@ def reset_password(payload: ResetPasswordRequest, db: Session = Depends(get_db))
 def change_password(payload: ChangePasswordRequest, current_user: UsuarioModel = Depends(get_current_user), db: Session = Depends(get_db)):
     if payload.nova_senha != payload.confirmar_senha:
         raise HTTPException(status_code=400, detail="Confirmação de senha não confere")
-    if not bcrypt.checkpw(payload.senha_atual.encode("utf-8"), (current_user.senha_hash or "").encode("utf-8")):
+    if not verificar_senha(payload.senha_atual, current_user.senha_hash or ""):
         raise HTTPException(status_code=400, detail="Senha atual incorreta")
     validate_password_strength(payload.nova_senha)
-    new_hash = bcrypt.hashpw(payload.nova_senha.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    new_hash = hash_senha(payload.nova_senha)
     current_user.senha_hash = new_hash
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="ALTERACAO_SENHA", entidade="Usuario", entidade_id=current_user.id)
     db.commit()
-    try:
-        audit(db, usuario_id=current_user.id, acao="ALTERACAO_SENHA", entidade="Usuario", entidade_id=current_user.id)
-    except Exception:
-        pass
+    invalidate_authorization_cache(current_user.id)
     return {"ok": True}
 
 
@@ -598,43 +573,45 @@ def _send_notification_impl(payload: NotificationSendRequest, current_user: Usua
     if int(users_count or 0) <= 0:
         raise HTTPException(status_code=400, detail="Envio bloqueado: não há usuários cadastrados no projeto")
 
-    recipients_ids: set[int] = set()
-    if notify_all:
-        q = db.query(UsuarioModel.id)
-        if company_ids:
-            q = q.filter(UsuarioModel.empresa_id.in_(company_ids))
-        else:
-            q = q.filter(UsuarioModel.empresa_id.in_(sorted(allowed_company_ids)))
-        recipients_ids.update([int(r[0]) for r in q.all()])
-    else:
-        recipients_ids.update(user_ids)
-
-    recipients_ids.update(cc_user_ids)
-    recipients_ids.discard(int(getattr(current_user, "id", 0) or 0))
-
     try:
-        is_admin = bool(is_admin_user(current_user))
+        is_admin = bool(is_admin_user(db, current_user))
     except Exception:
         is_admin = False
-    if recipients_ids and not is_admin:
-        rows = (
-            db.query(UsuarioModel.id, UsuarioModel.empresa_id)
-            .filter(UsuarioModel.id.in_(sorted(recipients_ids)))
-            .all()
-        )
-        allowed_set = set(allowed_company_ids or [])
-        filtered = set()
-        for uid, emp_id in rows:
-            if emp_id is None or emp_id in allowed_set:
-                filtered.add(int(uid))
-        recipients_ids = filtered
-
-    if not recipients_ids and not cc_emails and not to_emails:
-        raise HTTPException(status_code=400, detail=f"Nenhum destinatário selecionado (error_id={error_id})")
+    # Destinatários resolvidos no banco (INSERT ... SELECT em notificacoes.distribuir)
+    recipients_sel = notificacoes.selecionar_destinatarios(
+        empresa_ids=(company_ids or sorted(allowed_company_ids)) if notify_all else None,
+        usuario_ids=([] if notify_all else user_ids) + cc_user_ids,
+        excluir_usuario_id=int(getattr(current_user, "id", 0) or 0),
+        empresas_permitidas=None if is_admin else allowed_company_ids,
+    )
 
     notif_id = str(uuid.uuid4())
-    email_sent = 0
-    email_failed = 0
+    email_queued = 0
+    recipients_count = 0
+    notif_ok = False
+
+    def _auditar_envio() -> None:
+        # Gravado na última transação do envio, antes do commit: a lista de
+        # enviadas lê este registro logo após o envio e ele não pode faltar
+        # nem sobrar em relação ao que foi confirmado.
+        fila_auditoria.gravar(
+            db,
+            usuario_id=current_user.id,
+            acao="NOTIFICACAO_ENVIO",
+            entidade="notificacao",
+            entidade_id=None,
+            detalhes=json.dumps(
+                {
+                    "id": notif_id,
+                    "titulo": title,
+                    "mensagem": message,
+                    "send_email": bool(send_email),
+                    "recipients": recipients_count,
+                    "email_queued": email_queued,
+                },
+                ensure_ascii=False,
+            ),
+        )
 
     try:
         notif = NotificacaoModel(
@@ -647,21 +624,21 @@ def _send_notification_impl(payload: NotificationSendRequest, current_user: Usua
             periodo_ids=json.dumps(period_ids, ensure_ascii=False),
         )
         db.add(notif)
-        for uid in sorted(recipients_ids):
-            db.add(
-                NotificacaoDestinatarioModel(
-                    notificacao_id=notif_id,
-                    usuario_id=int(uid),
-                    status="pendente",
-                )
-            )
-        db.commit()
-    except IntegrityError:
-        try:
+        db.flush()
+        recipients_count = notificacoes.distribuir(db, notif_id, recipients_sel)
+        if not recipients_count and not cc_emails and not to_emails:
             db.rollback()
-        except Exception:
-            pass
+            raise HTTPException(status_code=400, detail=f"Nenhum destinatário selecionado (error_id={error_id})")
+        if not send_email:
+            _auditar_envio()
+        db.commit()
+        notif_ok = True
+        notificacoes.invalidar_contador()
+        eventos.publicar(eventos.TIPO_NOTIFICACAO, id=notif_id, titulo=title)
+    except HTTPException:
+        raise
     except Exception:
+        recipients_count = 0
         try:
             db.rollback()
         except Exception:
@@ -671,17 +648,23 @@ def _send_notification_impl(payload: NotificationSendRequest, current_user: Usua
         if not SMTP_HOST:
             raise HTTPException(status_code=503, detail="SMTP não configurado no servidor")
 
-        recipient_emails: set[str] = set()
-        if recipients_ids:
-            users = db.query(UsuarioModel).filter(UsuarioModel.id.in_(sorted(recipients_ids))).all()
-            for u in users:
-                addr = (getattr(u, "email", None) or "").strip().lower()
+        # endereço -> usuario_id (None para e-mails avulsos em cc/to)
+        recipient_emails: dict[str, Optional[int]] = {}
+        if recipients_count:
+            users = (
+                db.query(UsuarioModel.id, UsuarioModel.email)
+                .join(NotificacaoDestinatarioModel, NotificacaoDestinatarioModel.usuario_id == UsuarioModel.id)
+                .filter(NotificacaoDestinatarioModel.notificacao_id == notif_id)
+                .all()
+            )
+            for uid, email in users:
+                addr = (email or "").strip().lower()
                 if addr:
-                    recipient_emails.add(addr)
+                    recipient_emails.setdefault(addr, int(uid))
         for e in cc_emails:
-            recipient_emails.add(e)
+            recipient_emails.setdefault(e, None)
         for e in to_emails:
-            recipient_emails.add(e)
+            recipient_emails.setdefault(e, None)
         if not recipient_emails:
             raise HTTPException(status_code=400, detail=f"Nenhum destinatário com e-mail válido (error_id={error_id})")
 
@@ -700,35 +683,24 @@ def _send_notification_impl(payload: NotificationSendRequest, current_user: Usua
                 f"<div style=\"margin-top:16px;color:#6b7280;font-size:12px\">Enviado por: {html_escape(getattr(current_user, 'nome_completo', '') or '')}<br/>ID: {html_escape(notif_id)}</div>"
                 "</div>"
             )
-        for addr in sorted(recipient_emails):
-            ok = _send_email(to=addr, subject=f"[Assets Life] {title}", body=body, html_body=html)
-            if ok:
-                email_sent += 1
-            else:
-                email_failed += 1
-
-    try:
-        audit(
-            db,
-            usuario_id=current_user.id,
-            acao="NOTIFICACAO_ENVIO",
-            entidade="notificacao",
-            entidade_id=None,
-            detalhes=json.dumps(
-                {
-                    "id": notif_id,
-                    "titulo": title,
-                    "mensagem": message,
-                    "send_email": bool(send_email),
-                    "recipients": len(recipients_ids),
-                    "email_sent": email_sent,
-                    "email_failed": email_failed,
-                },
-                ensure_ascii=False,
-            ),
-        )
-    except Exception:
-        pass
+        # Envio pelo worker da fila (app/fila_email.py); a requisição só grava as mensagens
+        subject = f"[Assets Life] {title}"
+        try:
+            email_queued = fila_email.enfileirar(
+                db,
+                [
+                    {"destinatario": addr, "usuario_id": uid, "assunto": subject, "corpo": body, "corpo_html": html}
+                    for addr, uid in sorted(recipient_emails.items())
+                ],
+                notificacao_id=notif_id if notif_ok else None,
+            )
+            _auditar_envio()
+            db.commit()
+        except Exception:
+            db.rollback()
+            logging.getLogger("mail").exception("notifications_email_queue_failed error_id=%s", error_id)
+            raise HTTPException(status_code=500, detail=f"Falha ao enfileirar e-mails (error_id={error_id})")
+        fila_email.notificar()
 
     return {
         "id": notif_id,
@@ -736,9 +708,8 @@ def _send_notification_impl(payload: NotificationSendRequest, current_user: Usua
         "mensagem": message,
         "enviar_email": send_email,
         "criado_em": datetime.utcnow().isoformat(),
-        "email_sent": email_sent,
-        "email_failed": email_failed,
-        "destinatarios": len(recipients_ids),
+        "email_queued": email_queued,
+        "destinatarios": recipients_count,
         "status": "enviada",
     }
 
@@ -754,6 +725,7 @@ class NotificationItem(BaseModel):
     enviar_email: Optional[bool] = None
     email_sent: Optional[int] = None
     email_failed: Optional[int] = None
+    email_queued: Optional[int] = None
     destinatarios: Optional[int] = None
     from_me: Optional[bool] = None
 
@@ -811,6 +783,10 @@ def _notification_from_audit_row(row, current_user: UsuarioModel) -> dict:
         recipients = int(data.get("recipients", 0)) if data.get("recipients") is not None else None
     except Exception:
         recipients = None
+    try:
+        email_queued = int(data.get("email_queued", 0)) if data.get("email_queued") is not None else None
+    except Exception:
+        email_queued = None
     send_email_val = data.get("send_email")
     enviar_email = None
     if isinstance(send_email_val, bool):
@@ -828,6 +804,7 @@ def _notification_from_audit_row(row, current_user: UsuarioModel) -> dict:
         "enviar_email": enviar_email,
         "email_sent": email_sent,
         "email_failed": email_failed,
+        "email_queued": email_queued,
         "destinatarios": recipients,
         "from_me": True,
     }
@@ -855,22 +832,14 @@ def list_notifications(
     q: Optional[str] = None,
     limit: int = 200,
     offset: int = 0,
-    current_user: UsuarioModel = Depends(get_current_user),
+    current_user: UsuarioModel = Depends(get_current_principal),
     db: Session = Depends(get_db),
 ):
     if limit <= 0 or limit > 500:
         limit = 200
     if offset < 0:
         offset = 0
-    s = (status or "").strip().lower()
-    if s in {"pending", "pendente"}:
-        s = "pendente"
-    elif s in {"read", "lida", "lido"}:
-        s = "lida"
-    elif s in {"archived", "arquivada", "arquivado"}:
-        s = "arquivada"
-    elif s in {"", "all", "todas", "todos"}:
-        s = ""
+    s = notificacoes.normalizar_status(status)
 
     query = (
         db.query(NotificacaoDestinatarioModel, NotificacaoModel, UsuarioModel)
@@ -879,14 +848,17 @@ def list_notifications(
         .filter(NotificacaoDestinatarioModel.usuario_id == current_user.id)
     )
     if s:
-        query = query.filter(sa.func.lower(NotificacaoDestinatarioModel.status) == s)
-    if q:
-        qq = f"%{q.strip()}%"
-        query = query.filter(
-            (NotificacaoModel.titulo.ilike(qq)) | (NotificacaoModel.mensagem.ilike(qq))
-        )
+        # status gravado já normalizado: usa o índice (usuario_id, status, criado_em)
+        query = query.filter(NotificacaoDestinatarioModel.status == s)
+    # Busca em título/mensagem (app/busca.py); buscas por palavras vêm por relevância
+    criterio, rank = busca.filtro(db, NotificacaoModel, q)
+    ordem = [NotificacaoDestinatarioModel.criado_em.desc(), NotificacaoDestinatarioModel.id.desc()]
+    if criterio is not None:
+        query = query.filter(criterio)
+    if rank is not None:
+        ordem.insert(0, rank.desc())
     rows = (
-        query.order_by(NotificacaoModel.criado_em.desc())
+        query.order_by(*ordem)
         .offset(offset)
         .limit(limit)
         .all()
@@ -921,12 +893,29 @@ def list_notificacoes(
     q: Optional[str] = None,
     limit: int = 200,
     offset: int = 0,
-    current_user: UsuarioModel = Depends(get_current_user),
+    current_user: UsuarioModel = Depends(get_current_principal),
     db: Session = Depends(get_db),
 ):
     return list_notifications(status=status, q=q, limit=limit, offset=offset, current_user=current_user, db=db)
 
 
+@app.get("/notifications/unread-count")
+def unread_notifications_count(
+    current_user: UsuarioModel = Depends(get_current_principal),
+    db: Session = Depends(get_db),
+):
+    # Badge do cabeçalho: contagem em cache (app/notificacoes.py), sem montar a lista
+    return {"nao_lidas": notificacoes.contar_nao_lidas(db, current_user.id)}
+
+
+@app.get("/notificacoes/nao-lidas")
+def unread_notificacoes_count(
+    current_user: UsuarioModel = Depends(get_current_principal),
+    db: Session = Depends(get_db),
+):
+    return unread_notifications_count(current_user=current_user, db=db)
+
+
 @app.get("/notifications/sent", response_model=List[NotificationItem])
 def list_notifications_sent(
     q: Optional[str] = None,
@@ -944,11 +933,14 @@ def list_notifications_sent(
         db.query(NotificacaoModel)
         .filter(NotificacaoModel.remetente_id == current_user.id)
     )
-    if q:
-        qq = f"%{q.strip()}%"
-        query = query.filter((NotificacaoModel.titulo.ilike(qq)) | (NotificacaoModel.mensagem.ilike(qq)))
+    criterio, rank = busca.filtro(db, NotificacaoModel, q)
+    ordem = [NotificacaoModel.criado_em.desc()]
+    if criterio is not None:
+        query = query.filter(criterio)
+    if rank is not None:
+        ordem.insert(0, rank.desc())
     rows = (
-        query.order_by(NotificacaoModel.criado_em.desc())
+        query.order_by(*ordem)
         .offset(offset)
         .limit(limit)
         .all()
@@ -1078,6 +1070,29 @@ def get_notificacao_item(
     return get_notification_item(notif_id, current_user=current_user, db=db)
 
 
+@app.get("/notifications/{notif_id}/emails")
+def get_notification_emails(
+    notif_id: str,
+    current_user: UsuarioModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    # Situação da entrega por e-mail (fila emails_fila) para o remetente
+    notif = db.query(NotificacaoModel).filter(NotificacaoModel.id == notif_id).first()
+    if not notif or getattr(notif, "remetente_id", None) != current_user.id:
+        raise HTTPException(status_code=404, detail="Notificação não encontrada")
+    _require_notifications_send(db, current_user)
+    return fila_email.resumo_notificacao(db, notif_id)
+
+
+@app.get("/notificacoes/{notif_id}/emails")
+def get_notificacao_emails(
+    notif_id: str,
+    current_user: UsuarioModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return get_notification_emails(notif_id, current_user=current_user, db=db)
+
+
 @app.post("/notifications/{notif_id}/read")
 def mark_notification_read(
     notif_id: str,
@@ -1094,10 +1109,11 @@ def mark_notification_read(
     )
     if dest:
         try:
-            if str(getattr(dest, "status", "")).lower() != "lida":
-                dest.status = "lida"
+            if getattr(dest, "status", None) != notificacoes.STATUS_LIDA:
+                dest.status = notificacoes.STATUS_LIDA
                 dest.lida_em = datetime.utcnow()
                 db.commit()
+                notificacoes.invalidar_contador(current_user.id)
         except Exception:
             try:
                 db.rollback()
@@ -1107,17 +1123,14 @@ def mark_notification_read(
             return get_notification_item(notif_id, current_user=current_user, db=db)
         except Exception:
             return {"ok": True}
-    try:
-        audit(
-            db,
-            usuario_id=current_user.id,
-            acao="NOTIFICACAO_LIDA",
-            entidade="notificacao",
-            entidade_id=None,
-            detalhes=json.dumps({"id": notif_id}, ensure_ascii=False),
-        )
-    except Exception:
-        pass
+    audit(
+        db,
+        usuario_id=current_user.id,
+        acao="NOTIFICACAO_LIDA",
+        entidade="notificacao",
+        entidade_id=None,
+        detalhes=json.dumps({"id": notif_id}, ensure_ascii=False),
+    )
     return {"ok": True}
 
 
@@ -1146,10 +1159,11 @@ def archive_notification_item(
     )
     if dest:
         try:
-            if str(getattr(dest, "status", "")).lower() != "arquivada":
-                dest.status = "arquivada"
+            if getattr(dest, "status", None) != notificacoes.STATUS_ARQUIVADA:
+                dest.status = notificacoes.STATUS_ARQUIVADA
                 dest.arquivada_em = datetime.utcnow()
                 db.commit()
+                notificacoes.invalidar_contador(current_user.id)
         except Exception:
             try:
                 db.rollback()
@@ -1159,17 +1173,14 @@ def archive_notification_item(
             return get_notification_item(notif_id, current_user=current_user, db=db)
         except Exception:
             return {"ok": True}
-    try:
-        audit(
-            db,
-            usuario_id=current_user.id,
-            acao="NOTIFICACAO_ARQUIVADA",
-            entidade="notificacao",
-            entidade_id=None,
-            detalhes=json.dumps({"id": notif_id}, ensure_ascii=False),
-        )
-    except Exception:
-        pass
+    audit(
+        db,
+        usuario_id=current_user.id,
+        acao="NOTIFICACAO_ARQUIVADA",
+        entidade="notificacao",
+        entidade_id=None,
+        detalhes=json.dumps({"id": notif_id}, ensure_ascii=False),
+    )
     return {"ok": True}
 
 
@@ -1257,7 +1268,8 @@ def on_startup():
                         nome_arquivo VARCHAR(255) NOT NULL,
                         content_type VARCHAR(100) NOT NULL,
                         tamanho_bytes INTEGER NOT NULL,
-                        conteudo BYTEA NOT NULL,
+                        conteudo BYTEA NULL,
+                        sha256 VARCHAR(64) NULL,
                         criado_em TIMESTAMP DEFAULT NOW() NOT NULL,
                         uploaded_by INTEGER NULL REFERENCES usuarios(id)
                     )
@@ -1269,6 +1281,25 @@ def on_startup():
             import traceback
             print("Schema tweak error (tipo coluna):", e)
             traceback.print_exc()
+        # Colunas/índices de busca (app/busca.py); só com ALLOW_DDL: a coluna gerada reescreve a tabela
+        for tabela in busca.ALVOS:
+            try:
+                with engine.begin() as conn:
+                    for comando in busca.ddl(tabela):
+                        conn.execute(sa.text(comando))
+            except Exception as e:
+                print(f"Search index setup error ({tabela}):", e)
+        # Busca por trecho do número/descrição dos itens de revisão (requer pg_trgm)
+        try:
+            with engine.begin() as conn:
+                conn.execute(sa.text(
+                    "DO $$ BEGIN IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN "
+                    "CREATE INDEX IF NOT EXISTS ix_revisoes_itens_busca_trgm ON revisoes_itens "
+                    "USING GIN ((numero_imobilizado || ' ' || descricao) gin_trgm_ops); "
+                    "END IF; END $$"
+                ))
+        except Exception as e:
+            print("Search index setup error (revisoes_itens):", e)
 
     # Executa ajustes mínimos de schema mesmo quando ALLOW_DDL=false (idempotentes e seguros)
     try:
@@ -1284,13 +1315,145 @@ def on_startup():
                     nome_arquivo VARCHAR(255) NOT NULL,
                     content_type VARCHAR(100) NOT NULL,
                     tamanho_bytes INTEGER NOT NULL,
-                    conteudo BYTEA NOT NULL,
+                    conteudo BYTEA NULL,
+                    sha256 VARCHAR(64) NULL,
                     criado_em TIMESTAMP DEFAULT NOW() NOT NULL,
                     uploaded_by INTEGER NULL REFERENCES usuarios(id)
                 )
                 """
             ))
             conn.execute(sa.text("CREATE UNIQUE INDEX IF NOT EXISTS ux_cronogramas_periodo ON cronogramas(periodo_id)"))
+            # Evidências endereçadas por SHA-256 fora do banco (ver app/armazenamento.py)
+            conn.execute(sa.text("ALTER TABLE cronogramas_tarefas_evidencias ADD COLUMN IF NOT EXISTS sha256 VARCHAR(64)"))
+            conn.execute(sa.text("ALTER TABLE cronogramas_tarefas_evidencias ALTER COLUMN conteudo DROP NOT NULL"))
+            conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_cronogramas_tarefas_evidencias_sha256 ON cronogramas_tarefas_evidencias(sha256)"))
+            conn.execute(sa.text(
+                """
+                CREATE TABLE IF NOT EXISTS importacoes_jobs (
+                    id VARCHAR(36) PRIMARY KEY,
+                    periodo_id INTEGER NOT NULL REFERENCES revisoes_periodos(id),
+                    nome_arquivo VARCHAR(255) NOT NULL,
+                    caminho_arquivo TEXT NOT NULL,
+                    tamanho_bytes BIGINT NOT NULL DEFAULT 0,
+                    status VARCHAR(20) NOT NULL DEFAULT 'Pendente',
+                    bytes_processados BIGINT NOT NULL DEFAULT 0,
+                    linhas_lidas INTEGER NOT NULL DEFAULT 0,
+                    linhas_importadas INTEGER NOT NULL DEFAULT 0,
+                    linhas_rejeitadas INTEGER NOT NULL DEFAULT 0,
+                    erros TEXT NULL,
+                    alertas TEXT NULL,
+                    mensagem TEXT NULL,
+                    cancelamento_solicitado BOOLEAN NOT NULL DEFAULT FALSE,
+                    worker VARCHAR(120) NULL,
+                    criado_em TIMESTAMP DEFAULT NOW() NOT NULL,
+                    iniciado_em TIMESTAMP NULL,
+                    finalizado_em TIMESTAMP NULL,
+                    atualizado_em TIMESTAMP NULL
+                )
+                """
+            ))
+            conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_importacoes_jobs_status ON importacoes_jobs(status)"))
+            conn.execute(sa.text("ALTER TABLE IF EXISTS importacoes_jobs ADD COLUMN IF NOT EXISTS linhas_total INTEGER NULL"))
+            conn.execute(sa.text("ALTER TABLE IF EXISTS importacoes_jobs ADD COLUMN IF NOT EXISTS total_alertas INTEGER NULL"))
+            conn.execute(sa.text(
+                """
+                CREATE TABLE IF NOT EXISTS emails_fila (
+                    id SERIAL PRIMARY KEY,
+                    notificacao_id VARCHAR(36) NULL REFERENCES notificacoes(id),
+                    usuario_id INTEGER NULL REFERENCES usuarios(id),
+                    destinatario VARCHAR(255) NOT NULL,
+                    assunto VARCHAR(255) NOT NULL,
+                    corpo TEXT NOT NULL,
+                    corpo_html TEXT NULL,
+                    status VARCHAR(20) NOT NULL DEFAULT 'Pendente',
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    proxima_tentativa_em TIMESTAMP DEFAULT NOW() NOT NULL,
+                    ultimo_erro TEXT NULL,
+                    worker VARCHAR(120) NULL,
+                    criado_em TIMESTAMP DEFAULT NOW() NOT NULL,
+                    enviado_em TIMESTAMP NULL,
+                    atualizado_em TIMESTAMP NULL
+                )
+                """
+            ))
+            conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_emails_fila_notificacao_id ON emails_fila(notificacao_id)"))
+            conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_emails_fila_status_proxima ON emails_fila(status, proxima_tentativa_em)"))
+            conn.execute(sa.text(
+                "UPDATE notificacoes_destinatarios SET status = LOWER(TRIM(status)) WHERE status <> LOWER(TRIM(status))"
+            ))
+            conn.execute(sa.text(
+                "CREATE INDEX IF NOT EXISTS ix_notif_dest_usuario_status_criado "
+                "ON notificacoes_destinatarios(usuario_id, status, criado_em)"
+            ))
+            conn.execute(sa.text(
+                "CREATE INDEX IF NOT EXISTS ix_auditoria_logs_data_evento_id ON auditoria_logs(data_evento, id)"
+            ))
+            # Listagem paginada de itens de revisão (routes/reviews.py): (periodo_id, ordenação, id)
+            conn.execute(sa.text(
+                "CREATE INDEX IF NOT EXISTS ix_revisoes_itens_periodo_vencimento "
+                "ON revisoes_itens(periodo_id, (coalesce(data_fim_revisada, data_fim_depreciacao, DATE '9999-12-31')), id)"
+            ))
+            for nome, coluna in (
+                ("numero", "numero_imobilizado"),
+                ("valor", "valor_contabil"),
+                ("classe", "classe"),
+                ("centro_custo", "centro_custo"),
+                ("status", "status"),
+            ):
+                conn.execute(sa.text(
+                    f"CREATE INDEX IF NOT EXISTS ix_revisoes_itens_periodo_{nome} ON revisoes_itens(periodo_id, {coluna}, id)"
+                ))
+            # Delegações do período (routes/reviews.py): paginação por id e verificação por item
+            conn.execute(sa.text(
+                "CREATE INDEX IF NOT EXISTS ix_revisoes_delegacoes_periodo_keyset ON revisoes_delegacoes(periodo_id, id)"
+            ))
+            conn.execute(sa.text(
+                "CREATE INDEX IF NOT EXISTS ix_revisoes_delegacoes_periodo_ativo ON revisoes_delegacoes(periodo_id, ativo_id)"
+            ))
+            # Marca de sincronização por txid (GET /revisoes/itens/{id}/changes): o trigger grava o
+            # txid da transação em cada INSERT/UPDATE, qualquer que seja o caminho da escrita
+            conn.execute(sa.text(
+                """
+                CREATE OR REPLACE FUNCTION fn_revisao_versao_txid() RETURNS trigger AS $$
+                BEGIN
+                    NEW.versao_txid := txid_current();
+                    RETURN NEW;
+                END
+                $$ LANGUAGE plpgsql
+                """
+            ))
+            for tabela, indice, colunas in (
+                ("revisoes_itens", "ix_revisoes_itens_periodo_versao", "periodo_id, versao_txid"),
+                ("revisoes_delegacoes", "ix_revisoes_delegacoes_periodo_revisor_versao", "periodo_id, revisor_id, versao_txid"),
+            ):
+                conn.execute(sa.text(f"ALTER TABLE IF EXISTS {tabela} ADD COLUMN IF NOT EXISTS versao_txid BIGINT NULL"))
+                conn.execute(sa.text(f"CREATE INDEX IF NOT EXISTS {indice} ON {tabela}({colunas})"))
+                conn.execute(sa.text(
+                    f"""
+                    DO $$
+                    BEGIN
+                        IF NOT EXISTS (
+                            SELECT 1 FROM pg_trigger
+                            WHERE tgname = 'trg_{tabela}_versao' AND tgrelid = '{tabela}'::regclass
+                        ) THEN
+                            CREATE TRIGGER trg_{tabela}_versao BEFORE INSERT OR UPDATE ON {tabela}
+                            FOR EACH ROW EXECUTE PROCEDURE fn_revisao_versao_txid();
+                        END IF;
+                    END $$;
+                    """
+                ))
+            conn.execute(sa.text(
+                """
+                CREATE TABLE IF NOT EXISTS dados_versoes (
+                    recurso VARCHAR(100) PRIMARY KEY,
+                    versao BIGINT NOT NULL DEFAULT 0,
+                    atualizado_em TIMESTAMP DEFAULT NOW() NOT NULL
+                )
+                """
+            ))
+            conn.execute(sa.text("ALTER TABLE IF EXISTS relatorios_rvu_logs ADD COLUMN IF NOT EXISTS cache VARCHAR(10)"))
+            conn.execute(sa.text("ALTER TABLE IF EXISTS usuarios ADD COLUMN IF NOT EXISTS versao_autorizacao INTEGER NOT NULL DEFAULT 0"))
+            conn.commit()
         print("Main: Schema adjusted", flush=True)
     except Exception as e:
         import traceback
@@ -1364,7 +1527,7 @@ def on_startup():
         ).first()
         if not exists:
             pwd = os.getenv("DEFAULT_ADMIN_PASSWORD", "admin123")
-            senha_hash = bcrypt.hashpw(pwd.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+            senha_hash = hash_senha(pwd)
             last = db.query(UsuarioModel.id).order_by(UsuarioModel.id.desc()).first()
             next_num = (last[0] if last else 0) + 1
             codigo = f"{next_num:06d}"
@@ -1427,8 +1590,27 @@ def on_startup():
             db.close()
         except Exception:
             pass
+    # Retoma importações pendentes/interrompidas (status persistido em importacoes_jobs)
+    try:
+        importacao_jobs.recuperar_jobs()
+    except Exception as e:
+        print("Import jobs recovery error:", e)
+    # Worker da fila de e-mails (mensagens persistidas em emails_fila)
+    try:
+        fila_email.iniciar()
+    except Exception as e:
+        print("Mail queue worker error:", e)
+    fila_auditoria.iniciar()
     print("Main: on_startup completed", flush=True)
 
+@app.on_event("shutdown")
+def on_shutdown():
+    importacao_jobs.shutdown()
+    autenticacao.shutdown()
+    fila_email.shutdown()
+    eventos.shutdown()
+    fila_auditoria.shutdown()
+
 @app.get("/health")
 def health():
     # Checagem real de conectividade com o banco
@@ -1454,6 +1636,16 @@ def health():
             headers={"X-Error-Id": error_id},
         )
 
+@app.get("/health/auth")
+def health_auth():
+    # Fila/tempos do executor de bcrypt usado no login
+    return {"status": "ok", "bcrypt": autenticacao.metricas_bcrypt()}
+
+@app.get("/health/auditoria")
+def health_auditoria():
+    # Profundidade da fila e latência das gravações em lote da auditoria
+    return {"status": "ok", "auditoria": fila_auditoria.metricas()}
+
 @app.get("/health/db")
 def health_db():
     try:
@@ -1501,19 +1693,22 @@ def debug_schema(table_name: str, db: Session = Depends(get_db)):
 # -----------------------------
 # Util: Auditoria
 # -----------------------------
-def audit(db: Session, *, usuario_id: int | None, acao: str, entidade: str, entidade_id: int | None, detalhes: str | None = None):
+def audit(db: Session, *, usuario_id: int | None, acao: str, entidade: str, entidade_id: int | None, detalhes: str | None = None, obrigatorio: bool = False):
+    # Ações críticas (ou obrigatorio=True) são gravadas agora; as demais vão para a fila em lote.
+    # Numa ação crítica prefira fila_auditoria.gravar(db, ...) antes do próprio commit:
+    # aqui a ação já foi confirmada e uma falha só pode virar 500.
+    evento = dict(usuario_id=usuario_id, acao=acao, entidade=entidade, entidade_id=entidade_id, detalhes=detalhes)
+    if not obrigatorio and acao not in fila_auditoria.AUDITORIA_ACOES_SINCRONAS:
+        fila_auditoria.registrar(**evento)
+        return
     try:
-        log = AuditoriaLogModel(
-            usuario_id=usuario_id,
-            acao=acao,
-            entidade=entidade,
-            entidade_id=entidade_id,
-            detalhes=detalhes,
-        )
-        db.add(log)
+        fila_auditoria.gravar(db, **evento)
         db.commit()
     except Exception:
         db.rollback()
+        error_id = uuid.uuid4().hex[:8]
+        logging.getLogger("uvicorn.error").exception("Falha ao gravar auditoria acao=%s error_id=%s", acao, error_id)
+        raise HTTPException(status_code=500, detail=f"Falha ao gravar auditoria (error_id={error_id})")
 
 
 @app.get("/auditoria/logs")
@@ -1667,7 +1862,7 @@ def list_companies(current_user: UsuarioModel = Depends(get_current_user), db: S
     return db.query(CompanyModel).filter(CompanyModel.id.in_(allowed)).all()
 
 @app.get("/companies/{company_id}", response_model=Company)
-def get_company(company_id: int, current_user: UsuarioModel = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_company(company_id: int, current_user: UsuarioModel = Depends(get_current_principal), db: Session = Depends(get_db)):
     c = db.query(CompanyModel).filter(CompanyModel.id == company_id).first()
     if not c:
         raise HTTPException(status_code=404, detail="Company not found")
@@ -1681,19 +1876,18 @@ def create_company(payload: CompanyCreate, db: Session = Depends(get_db), curren
     _require_permissions_admin(db, current_user)
     c = CompanyModel(**payload.dict())
     db.add(c)
+    db.flush()
+    fila_auditoria.gravar(
+        db,
+        usuario_id=current_user.id,
+        acao="create",
+        entidade="company",
+        entidade_id=c.id,
+        detalhes=f"status={c.status} branch_type={c.branch_type}",
+    )
     db.commit()
+    invalidate_authorization_cache()
     db.refresh(c)
-    try:
-        audit(
-            db,
-            usuario_id=current_user.id,
-            acao="create",
-            entidade="company",
-            entidade_id=c.id,
-            detalhes=f"status={c.status} branch_type={c.branch_type}",
-        )
-    except Exception:
-        pass
     return c
 
 @app.put("/companies/{company_id}", response_model=Company)
@@ -1706,19 +1900,16 @@ def update_company(company_id: int, payload: CompanyUpdate, db: Session = Depend
     changed_fields = sorted(data.keys())
     for k, v in data.items():
         setattr(c, k, v)
+    fila_auditoria.gravar(
+        db,
+        usuario_id=current_user.id,
+        acao="update",
+        entidade="company",
+        entidade_id=c.id,
+        detalhes=f"fields={','.join(changed_fields)} status={c.status} branch_type={c.branch_type}",
+    )
     db.commit()
     db.refresh(c)
-    try:
-        audit(
-            db,
-            usuario_id=current_user.id,
-            acao="update",
-            entidade="company",
-            entidade_id=c.id,
-            detalhes=f"fields={','.join(changed_fields)} status={c.status} branch_type={c.branch_type}",
-        )
-    except Exception:
-        pass
     return c
 
 @app.delete("/companies/{company_id}")
@@ -1730,18 +1921,16 @@ def delete_company(company_id: int, db: Session = Depends(get_db), current_user:
     status = getattr(c, "status", None)
     branch_type = getattr(c, "branch_type", None)
     db.delete(c)
+    fila_auditoria.gravar(
+        db,
+        usuario_id=current_user.id,
+        acao="delete",
+        entidade="company",
+        entidade_id=company_id,
+        detalhes=f"status={status} branch_type={branch_type}",
+    )
     db.commit()
-    try:
-        audit(
-            db,
-            usuario_id=current_user.id,
-            acao="delete",
-            entidade="company",
-            entidade_id=company_id,
-            detalhes=f"status={status} branch_type={branch_type}",
-        )
-    except Exception:
-        pass
+    invalidate_authorization_cache()
     return {"deleted": True}
 
 class Cronograma(BaseModel):
@@ -2667,35 +2856,33 @@ async def upload_evidencia(cronograma_id: int, tarefa_id: int, file: UploadFile
     exists = db.execute(sa.text("SELECT id FROM cronogramas_tarefas WHERE id=:id AND cronograma_id=:cid"), {"id": tarefa_id, "cid": cronograma_id}).scalar()
     if not exists:
         raise HTTPException(status_code=404, detail="Tarefa não encontrada")
-    content = await file.read()
-    if not content:
+    # Copiado em blocos para o store enquanto calcula o SHA-256 (sem carregar em memória)
+    sha256, tamanho = await run_in_threadpool(armazenamento.get_store().salvar, file.file)
+    if not tamanho:
         raise HTTPException(status_code=400, detail="Arquivo vazio")
     item = CronogramaTarefaEvidenciaModel(
         tarefa_id=tarefa_id,
         nome_arquivo=file.filename or "arquivo",
         content_type=file.content_type or "application/octet-stream",
-        tamanho_bytes=len(content),
-        conteudo=content,
+        tamanho_bytes=tamanho,
+        sha256=sha256,
         uploaded_by=getattr(current_user, "id", None),
     )
     db.add(item)
     db.commit()
     db.refresh(item)
-    try:
-        audit(
-            db,
-            usuario_id=current_user.id,
-            acao="EVIDENCIA_UPLOAD",
-            entidade="cronograma_tarefa",
-            entidade_id=tarefa_id,
-            detalhes=f"evidencia_id={item.id} tamanho_bytes={item.tamanho_bytes}",
-        )
-    except Exception:
-        pass
+    audit(
+        db,
+        usuario_id=current_user.id,
+        acao="EVIDENCIA_UPLOAD",
+        entidade="cronograma_tarefa",
+        entidade_id=tarefa_id,
+        detalhes=f"evidencia_id={item.id} tamanho_bytes={item.tamanho_bytes}",
+    )
     return item
 
 @app.get("/cronogramas/{cronograma_id}/tarefas/{tarefa_id}/evidencias/{evidencia_id}")
-def download_evidencia(cronograma_id: int, tarefa_id: int, evidencia_id: int, db: Session = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
+def download_evidencia(cronograma_id: int, tarefa_id: int, evidencia_id: int, request: Request, db: Session = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
     check_permission(db, current_user, "/reviews/cronogramas/edit")
     exists = db.execute(sa.text("SELECT id FROM cronogramas_tarefas WHERE id=:id AND cronograma_id=:cid"), {"id": tarefa_id, "cid": cronograma_id}).scalar()
     if not exists:
@@ -2703,7 +2890,26 @@ def download_evidencia(cronograma_id: int, tarefa_id: int, evidencia_id: int, db
     ev = db.query(CronogramaTarefaEvidenciaModel).filter(CronogramaTarefaEvidenciaModel.id == evidencia_id, CronogramaTarefaEvidenciaModel.tarefa_id == tarefa_id).first()
     if not ev:
         raise HTTPException(status_code=404, detail="Evidência não encontrada")
-    try:
+    existe = None
+    if ev.sha256:
+        store = armazenamento.get_store()
+        etag, abrir = ev.sha256, (lambda inicio, fim: store.abrir(ev.sha256, inicio, fim))
+        existe = lambda: store.existe(ev.sha256)
+    else:
+        # Linha ainda em BYTEA (antes de scripts/migrar_evidencias.py)
+        conteudo = bytes(ev.conteudo or b"")
+        etag, abrir = hashlib.sha256(conteudo).hexdigest(), armazenamento.abrir_bytes(conteudo)
+    resp = armazenamento.resposta_blob(
+        request,
+        etag=etag,
+        tamanho=int(ev.tamanho_bytes or 0),
+        media_type=ev.content_type or "application/octet-stream",
+        filename=ev.nome_arquivo,
+        abrir=abrir,
+        existe=existe,
+    )
+    # Continuações de download (Range a partir do meio) e revalidações não geram nova auditoria
+    if resp.status_code == 200 or resp.headers.get("content-range", "").startswith("bytes 0-"):
         audit(
             db,
             usuario_id=current_user.id,
@@ -2712,12 +2918,7 @@ def download_evidencia(cronograma_id: int, tarefa_id: int, evidencia_id: int, db
             entidade_id=tarefa_id,
             detalhes=f"evidencia_id={evidencia_id} tamanho_bytes={getattr(ev, 'tamanho_bytes', None)}",
         )
-    except Exception:
-        pass
-    headers = {
-        "Content-Disposition": f"attachment; filename=\"{ev.nome_arquivo}\""
-    }
-    return Response(content=ev.conteudo, media_type=ev.content_type or "application/octet-stream", headers=headers)
+    return resp
 
 @app.delete("/cronogramas/{cronograma_id}/tarefas/{tarefa_id}/evidencias/{evidencia_id}")
 def delete_evidencia(cronograma_id: int, tarefa_id: int, evidencia_id: int, db: Session = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
@@ -2730,17 +2931,16 @@ def delete_evidencia(cronograma_id: int, tarefa_id: int, evidencia_id: int, db:
         raise HTTPException(status_code=404, detail="Evidência não encontrada")
     db.delete(ev)
     db.commit()
-    try:
-        audit(
-            db,
-            usuario_id=current_user.id,
-            acao="EVIDENCIA_DELETE",
-            entidade="cronograma_tarefa",
-            entidade_id=tarefa_id,
-            detalhes=f"evidencia_id={evidencia_id}",
-        )
-    except Exception:
-        pass
+    # O blob fica no store: pode estar sendo reaproveitado por um upload concorrente (dedup).
+    # Sem referências, sai depois em armazenamento.coletar_orfaos.
+    audit(
+        db,
+        usuario_id=current_user.id,
+        acao="EVIDENCIA_DELETE",
+        entidade="cronograma_tarefa",
+        entidade_id=tarefa_id,
+        detalhes=f"evidencia_id={evidencia_id}",
+    )
     return {"deleted": True}
 
 @app.get("/cronogramas/{cronograma_id}/resumo", response_model=CronogramaResumo)
@@ -3000,7 +3200,7 @@ VALID_TYPES = {"Administrativa", "Produtiva", "Apoio", "Auxiliares"}
 @app.get("/unidades_gerenciais", response_model=List[UG])
 def list_ugs(
     empresa_id: Optional[int] = Depends(get_header_company_id),
-    current_user: UsuarioModel = Depends(get_current_user),
+    current_user: UsuarioModel = Depends(get_current_principal),
     db: Session = Depends(get_db),
 ):
     q = db.query(UGModel)
@@ -3134,7 +3334,7 @@ def list_centros_custos(
     ug_id: Optional[int] = None,
     nome: Optional[str] = None,
     status: Optional[str] = None,
-    current_user: UsuarioModel = Depends(get_current_user),
+    current_user: UsuarioModel = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     q = db.query(CentroCustoModel)
@@ -3804,7 +4004,7 @@ def create_usuario(payload: UsuarioCreate, db: Session = Depends(get_db), curren
         if not db.query(UGModel).filter(UGModel.id == payload.ug_id).first():
             raise HTTPException(status_code=400, detail="UG inválida")
 
-    senha_hash = bcrypt.hashpw(payload.senha.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    senha_hash = hash_senha(payload.senha)
     codigo = _generate_user_codigo(db)
     u = UsuarioModel(
         codigo=codigo,
@@ -3820,19 +4020,17 @@ def create_usuario(payload: UsuarioCreate, db: Session = Depends(get_db), curren
         status=payload.status,
     )
     db.add(u)
+    db.flush()
+    fila_auditoria.gravar(
+        db,
+        usuario_id=current_user.id,
+        acao="create",
+        entidade="usuario",
+        entidade_id=u.id,
+        detalhes=f"status={u.status} empresa_id={u.empresa_id}",
+    )
     db.commit()
     db.refresh(u)
-    try:
-        audit(
-            db,
-            usuario_id=current_user.id,
-            acao="create",
-            entidade="usuario",
-            entidade_id=u.id,
-            detalhes=f"status={u.status} empresa_id={u.empresa_id}",
-        )
-    except Exception:
-        pass
     return u
 
 
@@ -3872,7 +4070,7 @@ def update_usuario(user_id: int, payload: UsuarioUpdate, db: Session = Depends(g
     if data.get("senha") or data.get("confirmacao_senha"):
         if data.get("senha") != data.get("confirmacao_senha"):
             raise HTTPException(status_code=400, detail="Confirmação de senha não confere")
-        u.senha_hash = bcrypt.hashpw(data["senha"].encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+        u.senha_hash = hash_senha(data["senha"])
         # remove campos transitórios
         data.pop("senha", None)
         data.pop("confirmacao_senha", None)
@@ -3880,19 +4078,17 @@ def update_usuario(user_id: int, payload: UsuarioUpdate, db: Session = Depends(g
     for k, v in data.items():
         setattr(u, k, v)
 
+    fila_auditoria.gravar(
+        db,
+        usuario_id=current_user.id,
+        acao="update",
+        entidade="usuario",
+        entidade_id=u.id,
+        detalhes=f"fields={','.join(changed_fields)} password_changed={1 if password_changed else 0} status={u.status} empresa_id={u.empresa_id}",
+    )
     db.commit()
+    invalidate_authorization_cache(user_id)
     db.refresh(u)
-    try:
-        audit(
-            db,
-            usuario_id=current_user.id,
-            acao="update",
-            entidade="usuario",
-            entidade_id=u.id,
-            detalhes=f"fields={','.join(changed_fields)} password_changed={1 if password_changed else 0} status={u.status} empresa_id={u.empresa_id}",
-        )
-    except Exception:
-        pass
     return u
 
 
@@ -3904,18 +4100,16 @@ def delete_usuario(user_id: int, db: Session = Depends(get_db), current_user: Us
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     user_empresa_id = getattr(u, "empresa_id", None)
     db.delete(u)
+    fila_auditoria.gravar(
+        db,
+        usuario_id=current_user.id,
+        acao="delete",
+        entidade="usuario",
+        entidade_id=user_id,
+        detalhes=f"empresa_id={user_empresa_id}",
+    )
     db.commit()
-    try:
-        audit(
-            db,
-            usuario_id=current_user.id,
-            acao="delete",
-            entidade="usuario",
-            entidade_id=user_id,
-            detalhes=f"empresa_id={user_empresa_id}",
-        )
-    except Exception:
-        pass
+    invalidate_authorization_cache(user_id)
     return {"deleted": True}
 
 class RevisaoPeriodo(BaseModel):
@@ -4001,7 +4195,7 @@ def _generate_revisao_codigo(db: Session, ano: int) -> str:
     return f"{prefix}{count + 1:02d}"
 
 @app.get("/revisoes/periodos", response_model=List[RevisaoPeriodo])
-def list_revisoes(db: Session = Depends(get_db), current_user: UsuarioModel = Depends(get_current_user)):
+def list_revisoes(db: Session = Depends(get_db), current_user: UsuarioModel = Depends(get_current_principal)):
     allowed = get_allowed_company_ids(db, current_user)
     if not allowed:
         return []
@@ -4143,9 +4337,11 @@ def create_transacao(payload: TransacaoCreate, db: Session = Depends(get_db), cu
         raise HTTPException(status_code=400, detail="Rota já cadastrada")
     t = TransacaoModel(**payload.dict())
     db.add(t)
+    db.flush()
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="create", entidade="transacao", entidade_id=t.id, detalhes=f"rota={t.rota}")
     db.commit()
+    invalidate_authorization_cache()
     db.refresh(t)
-    audit(db, usuario_id=current_user.id, acao="create", entidade="transacao", entidade_id=t.id, detalhes=f"rota={t.rota}")
     return t
 
 @app.put("/permissoes/transacoes/{transacao_id}", response_model=Transacao)
@@ -4161,9 +4357,10 @@ def update_transacao(transacao_id: int, payload: TransacaoUpdate, db: Session =
             raise HTTPException(status_code=400, detail="Rota já cadastrada")
     for k, v in data.items():
         setattr(t, k, v)
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="update", entidade="transacao", entidade_id=t.id)
     db.commit()
+    invalidate_authorization_cache()
     db.refresh(t)
-    audit(db, usuario_id=current_user.id, acao="update", entidade="transacao", entidade_id=t.id)
     return t
 
 @app.delete("/permissoes/transacoes/{transacao_id}")
@@ -4173,8 +4370,9 @@ def delete_transacao(transacao_id: int, db: Session = Depends(get_db), current_u
     if not t:
         raise HTTPException(status_code=404, detail="Transação não encontrada")
     db.delete(t)
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="delete", entidade="transacao", entidade_id=transacao_id)
     db.commit()
-    audit(db, usuario_id=current_user.id, acao="delete", entidade="transacao", entidade_id=transacao_id)
+    invalidate_authorization_cache()
     return {"deleted": True}
 
 
@@ -4237,9 +4435,10 @@ def create_grupo(payload: GrupoPermissaoCreate, db: Session = Depends(get_db), c
         raise HTTPException(status_code=400, detail="Nome do grupo já existe")
     g = GrupoPermissaoModel(**payload.dict())
     db.add(g)
+    db.flush()
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="create", entidade="grupo", entidade_id=g.id, detalhes=f"nome={g.nome}")
     db.commit()
     db.refresh(g)
-    audit(db, usuario_id=current_user.id, acao="create", entidade="grupo", entidade_id=g.id, detalhes=f"nome={g.nome}")
     return g
 
 @app.put("/permissoes/grupos/{grupo_id}", response_model=GrupoPermissao)
@@ -4255,9 +4454,10 @@ def update_grupo(grupo_id: int, payload: GrupoPermissaoUpdate, db: Session = Dep
             raise HTTPException(status_code=400, detail="Nome do grupo já existe")
     for k, v in data.items():
         setattr(g, k, v)
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="update", entidade="grupo", entidade_id=g.id)
     db.commit()
+    invalidate_authorization_cache()
     db.refresh(g)
-    audit(db, usuario_id=current_user.id, acao="update", entidade="grupo", entidade_id=g.id)
     return g
 
 @app.delete("/permissoes/grupos/{grupo_id}")
@@ -4271,8 +4471,9 @@ def delete_grupo(grupo_id: int, db: Session = Depends(get_db), current_user: Usu
     db.query(GrupoTransacaoModel).filter(GrupoTransacaoModel.grupo_id == grupo_id).delete()
     db.query(GrupoUsuarioModel).filter(GrupoUsuarioModel.grupo_id == grupo_id).delete()
     db.delete(g)
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="delete", entidade="grupo", entidade_id=grupo_id)
     db.commit()
-    audit(db, usuario_id=current_user.id, acao="delete", entidade="grupo", entidade_id=grupo_id)
+    invalidate_authorization_cache()
     return {"deleted": True}
 
 # --- Associações ---
@@ -4296,11 +4497,13 @@ def add_grupo_empresa(grupo_id: int, payload: IdRef, db: Session = Depends(get_d
     link = GrupoEmpresaModel(grupo_id=grupo_id, empresa_id=payload.id)
     try:
         db.add(link)
-        db.commit()
+        db.flush()
     except Exception:
         db.rollback()
         raise HTTPException(status_code=400, detail="Associação já existe")
-    audit(db, usuario_id=current_user.id, acao="link", entidade="grupo_empresa", entidade_id=link.id, detalhes=f"grupo_id={grupo_id} empresa_id={payload.id}")
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="link", entidade="grupo_empresa", entidade_id=link.id, detalhes=f"grupo_id={grupo_id} empresa_id={payload.id}")
+    db.commit()
+    invalidate_authorization_cache()
     return {"linked": True}
 
 @app.delete("/permissoes/grupos/{grupo_id}/empresas/{empresa_id}")
@@ -4310,8 +4513,9 @@ def remove_grupo_empresa(grupo_id: int, empresa_id: int, db: Session = Depends(g
     if not link:
         return {"deleted": False}
     db.delete(link)
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="unlink", entidade="grupo_empresa", entidade_id=link.id, detalhes=f"grupo_id={grupo_id} empresa_id={empresa_id}")
     db.commit()
-    audit(db, usuario_id=current_user.id, acao="unlink", entidade="grupo_empresa", entidade_id=link.id, detalhes=f"grupo_id={grupo_id} empresa_id={empresa_id}")
+    invalidate_authorization_cache()
     return {"deleted": True}
 
 @app.get("/permissoes/grupos/{grupo_id}/transacoes", response_model=List[Transacao])
@@ -4331,11 +4535,13 @@ def add_grupo_transacao(grupo_id: int, payload: IdRef, db: Session = Depends(get
     link = GrupoTransacaoModel(grupo_id=grupo_id, transacao_id=payload.id)
     try:
         db.add(link)
-        db.commit()
+        db.flush()
     except Exception:
         db.rollback()
         raise HTTPException(status_code=400, detail="Associação já existe")
-    audit(db, usuario_id=current_user.id, acao="link", entidade="grupo_transacao", entidade_id=link.id, detalhes=f"grupo_id={grupo_id} transacao_id={payload.id}")
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="link", entidade="grupo_transacao", entidade_id=link.id, detalhes=f"grupo_id={grupo_id} transacao_id={payload.id}")
+    db.commit()
+    invalidate_authorization_cache()
     return {"linked": True}
 
 @app.delete("/permissoes/grupos/{grupo_id}/transacoes/{transacao_id}")
@@ -4345,8 +4551,9 @@ def remove_grupo_transacao(grupo_id: int, transacao_id: int, db: Session = Depen
     if not link:
         return {"deleted": False}
     db.delete(link)
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="unlink", entidade="grupo_transacao", entidade_id=link.id, detalhes=f"grupo_id={grupo_id} transacao_id={transacao_id}")
     db.commit()
-    audit(db, usuario_id=current_user.id, acao="unlink", entidade="grupo_transacao", entidade_id=link.id, detalhes=f"grupo_id={grupo_id} transacao_id={transacao_id}")
+    invalidate_authorization_cache()
     return {"deleted": True}
 
 class Usuario(BaseModel):
@@ -4381,11 +4588,13 @@ def add_grupo_usuario(grupo_id: int, payload: IdRef, db: Session = Depends(get_d
     link = GrupoUsuarioModel(grupo_id=grupo_id, usuario_id=payload.id)
     try:
         db.add(link)
-        db.commit()
+        db.flush()
     except Exception:
         db.rollback()
         raise HTTPException(status_code=400, detail="Associação já existe")
-    audit(db, usuario_id=current_user.id, acao="link", entidade="grupo_usuario", entidade_id=link.id, detalhes=f"grupo_id={grupo_id} usuario_id={payload.id}")
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="link", entidade="grupo_usuario", entidade_id=link.id, detalhes=f"grupo_id={grupo_id} usuario_id={payload.id}")
+    db.commit()
+    invalidate_authorization_cache(payload.id)
     return {"linked": True}
 
 @app.delete("/permissoes/grupos/{grupo_id}/usuarios/{usuario_id}")
@@ -4395,8 +4604,9 @@ def remove_grupo_usuario(grupo_id: int, usuario_id: int, db: Session = Depends(g
     if not link:
         return {"deleted": False}
     db.delete(link)
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="unlink", entidade="grupo_usuario", entidade_id=link.id, detalhes=f"grupo_id={grupo_id} usuario_id={usuario_id}")
     db.commit()
-    audit(db, usuario_id=current_user.id, acao="unlink", entidade="grupo_usuario", entidade_id=link.id, detalhes=f"grupo_id={grupo_id} usuario_id={usuario_id}")
+    invalidate_authorization_cache(usuario_id)
     return {"deleted": True}
 
 
@@ -4423,9 +4633,10 @@ def clonar_grupo(grupo_id: int, payload: ClonePayload, db: Session = Depends(get
         db.add(GrupoTransacaoModel(grupo_id=novo.id, transacao_id=gt.transacao_id))
     for gu in db.query(GrupoUsuarioModel).filter(GrupoUsuarioModel.grupo_id == grupo_id).all():
         db.add(GrupoUsuarioModel(grupo_id=novo.id, usuario_id=gu.usuario_id))
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="clone", entidade="grupo", entidade_id=novo.id, detalhes=f"from={grupo_id}")
     db.commit()
+    invalidate_authorization_cache()
     db.refresh(novo)
-    audit(db, usuario_id=current_user.id, acao="clone", entidade="grupo", entidade_id=novo.id, detalhes=f"from={grupo_id}")
     return novo
 
 # --- Consulta permissões de usuário ---
@@ -4485,7 +4696,7 @@ def fechar_revisao(rev_id: int, db: Session = Depends(get_db)):
     db.refresh(r)
     return r
 
-@app.post("/revisoes/upload_base/{rev_id}")
+@app.post("/revisoes/upload_base/{rev_id}", status_code=202)
 def upload_base(rev_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)):
     r = db.query(RevisaoPeriodoModel).filter(RevisaoPeriodoModel.id == rev_id).first()
     if not r:
@@ -4497,279 +4708,35 @@ def upload_base(rev_id: int, file: UploadFile = File(...), db: Session = Depends
     if not (filename.endswith(".csv") or filename.endswith(".xlsx")):
         raise HTTPException(status_code=400, detail="Formato inválido. Envie .csv ou .xlsx")
 
-    required = {
-        "numero_imobilizado",
-        "sub_numero",
-        "data_inicio_depreciacao",
-        "descricao",
-        "valor_aquisicao",
-        "depreciacao_acumulada",
-        "valor_contabil",
-        "centro_custo",
-        "classe",
-        "conta_contabil",
-        "descricao_conta_contabil",
-        "vida_util_anos",
-        "vida_util_periodos",
-    }
-    optional = {"data_fim_depreciacao", "auxiliar2", "auxiliar3", "descricao_classe"}
-
-    def norm_key(k: str) -> str:
-        import re, unicodedata
-        def clean(s: str) -> str:
-            s = (s or "").strip().lower()
-            s = unicodedata.normalize('NFD', s)
-            s = ''.join(ch for ch in s if unicodedata.category(ch) != 'Mn')  # remove acentos
-            s = s.replace('º', 'o').replace('ª', 'a')
-            s = re.sub(r'[^a-z0-9]+', '_', s)  # troca não alfanum por _
-            s = re.sub(r'_+', '_', s).strip('_')
-            return s
-        nk = clean(k)
-        synonyms = {
-            'no_imobilizado': 'numero_imobilizado',
-            'n_imobilizado': 'numero_imobilizado',
-            'numero_do_imobilizado': 'numero_imobilizado',
-            'numero_imobilizado': 'numero_imobilizado',
-            'sub_no': 'sub_numero',
-            'sub_numero': 'sub_numero',
-            'data_inicio_da_depreciacao': 'data_inicio_depreciacao',
-            'data_inicio_de_depreciacao': 'data_inicio_depreciacao',
-            'data_inicio_depreciacao': 'data_inicio_depreciacao',
-            'descricao': 'descricao',
-            'valor_aquisicao': 'valor_aquisicao',
-            'depreciacao_acum': 'depreciacao_acumulada',
-            'depreciacao_acumulada': 'depreciacao_acumulada',
-            'valor_contabil': 'valor_contabil',
-            'centro_custos': 'centro_custo',
-            'centro_de_custos': 'centro_custo',
-            'centro_custo': 'centro_custo',
-            'classe': 'classe',
-            'desc_classe': 'descricao_classe',
-            'descricao_da_classe': 'descricao_classe',
-            'descricao_classe': 'descricao_classe',
-            'conta_contabil': 'conta_contabil',
-            'desc_conta_contabil': 'descricao_conta_contabil',
-            'descricao_conta_contabil': 'descricao_conta_contabil',
-            'vida_util_anos': 'vida_util_anos',
-            'vida_util_periodos': 'vida_util_periodos',
-            'data_fim_depreciacao': 'data_fim_depreciacao',
-            # auxiliares opcionais
-            'auxiliar_1': 'auxiliar2',
-            'aux_1': 'auxiliar2',
-            'auxiliar1': 'auxiliar2',
-            'auxiliar_2': 'auxiliar3',
-            'aux_2': 'auxiliar3',
-            'auxiliar2': 'auxiliar2',
-            'auxiliar3': 'auxiliar3',
-        }
-        return synonyms.get(nk, nk)
-
-    from decimal import Decimal
-    import csv, io
-    from datetime import datetime as dt
-    import calendar
-
-    def parse_date_any(x) -> date:
-        if isinstance(x, date):
-            return x
-        s = str(x or "").strip()
-        if not s:
-            return None
-        # Excel serial date (1900 date system): number of days since 1899-12-30
+    # Processamento assíncrono: grava o arquivo e enfileira o job (ver app/importacao_jobs.py).
+    # O andamento e o relatório final ficam em GET /revisoes/import-jobs/{job_id}.
+    try:
+        job = importacao_jobs.criar_job(db, rev_id, file.file, filename)
+    finally:
         try:
-            n = float(s)
-            if n > 20000 and n < 80000:
-                from datetime import timedelta
-                return date(1899, 12, 30) + timedelta(days=int(round(n)))
+            file.file.close()
         except Exception:
             pass
-        # Try common explicit formats first (4-digit year)
-        for fmt in (
-            "%Y-%m-%d",
-            "%Y/%m/%d",
-            "%d/%m/%Y",
-            "%d-%m-%Y",
-            "%m/%d/%Y",
-            "%m-%d-%Y",
-        ):
-            try:
-                return dt.strptime(s, fmt).date()
-            except Exception:
-                pass
-        # Fallbacks that accept 2-digit years in either BR (dd/mm/yy) or US (mm/dd/yy)
-        for fmt in (
-            "%d/%m/%y",
-            "%d-%m-%y",
-            "%m/%d/%y",
-            "%m-%d-%y",
-            "%y-%m-%d",
-            "%y/%m/%d",
-        ):
-            try:
-                return dt.strptime(s, fmt).date()
-            except Exception:
-                pass
-        raise ValueError(f"Data inválida: {s}")
+    importacao_jobs.enfileirar(job.id)
+    return importacao_jobs.serializar_job(job)
 
-    def add_months(d: date, months: int) -> date:
-        y = d.year + (d.month - 1 + months) // 12
-        m = (d.month - 1 + months) % 12 + 1
-        last_day = calendar.monthrange(y, m)[1]
-        day = min(d.day, last_day)
-        return date(y, m, day)
 
-    imported = 0
-    rejected = 0
-    errors_log = []
-    warnings_log = []
+@app.get("/revisoes/import-jobs/{job_id}")
+def get_import_job(job_id: str, db: Session = Depends(get_db)):
+    job = db.query(ImportacaoJobModel).filter(ImportacaoJobModel.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job de importação não encontrado")
+    return importacao_jobs.serializar_job(job)
+
+
+@app.post("/revisoes/import-jobs/{job_id}/cancel")
+def cancel_import_job(job_id: str, db: Session = Depends(get_db)):
+    job = db.query(ImportacaoJobModel).filter(ImportacaoJobModel.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job de importação não encontrado")
+    return importacao_jobs.serializar_job(importacao_jobs.solicitar_cancelamento(db, job))
 
-    try:
-        content = file.file.read()
-        rows = []
-        headers = []
-        if filename.endswith(".csv"):
-            text = content.decode("utf-8", errors="replace")
-            try:
-                dialect = csv.Sniffer().sniff(text.splitlines()[0])
-            except Exception:
-                dialect = csv.excel
-            reader = csv.DictReader(io.StringIO(text), dialect=dialect)
-            headers = [norm_key(h) for h in reader.fieldnames or []]
-            for row in reader:
-                rows.append({norm_key(k): v for k, v in row.items()})
-        else:
-            try:
-                from openpyxl import load_workbook
-            except Exception:
-                raise HTTPException(status_code=500, detail="Dependência 'openpyxl' não instalada para XLSX")
-            wb = load_workbook(io.BytesIO(content), read_only=True)
-            ws = wb.active
-            header_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True))
-            headers = [norm_key(str(h)) for h in header_row]
-            for r in ws.iter_rows(min_row=2, values_only=True):
-                row = {}
-                for idx, h in enumerate(headers):
-                    row[h] = r[idx] if idx < len(r) else None
-                rows.append(row)
-
-        missing = [h for h in sorted(required) if h not in headers]
-        if missing:
-            raise HTTPException(status_code=400, detail=f"Cabeçalhos ausentes: {', '.join(missing)}")
-
-        # Limpa itens anteriores (opcional). Comentado por segurança.
-        # db.query(RevisaoItemModel).filter(RevisaoItemModel.periodo_id == rev_id).delete()
-
-        for idx, row in enumerate(rows, start=2):  # start=2 considera header na linha 1
-            try:
-                numero_imobilizado = str(row.get("numero_imobilizado", "")).strip()
-                sub_numero = str(row.get("sub_numero", "")).strip()
-                descricao = str(row.get("descricao", "")).strip()
-                if not (numero_imobilizado and sub_numero and descricao):
-                    raise ValueError("Campos chave vazios")
-
-                data_inicio = row.get("data_inicio_depreciacao")
-                data_inicio = parse_date_any(data_inicio)
-
-                def parse_int(x):
-                    s = str(x).strip()
-                    if s == "":
-                        return 0
-                    try:
-                        return int(s)
-                    except Exception:
-                        try:
-                            return int(float(s.replace(',', '.')))
-                        except Exception:
-                            raise ValueError(f"Valor inteiro inválido: {x}")
-
-                vida_util_anos = parse_int(row.get("vida_util_anos"))
-                vida_util_periodos = parse_int(row.get("vida_util_periodos"))
-                if vida_util_periodos == 0 and vida_util_anos > 0:
-                    vida_util_periodos = vida_util_anos * 12
-                if vida_util_anos == 0 and vida_util_periodos > 0:
-                    vida_util_anos = max(0, round(vida_util_periodos / 12))
-                if str(row.get("vida_util_anos", "")).strip() == "":
-                    warnings_log.append(f"Linha {idx}: vida_util_anos vazio")
-                if str(row.get("vida_util_anos", "")).strip() == "" and str(row.get("vida_util_periodos", "")).strip() == "":
-                    raise ValueError("Vida útil em branco: informe anos ou períodos")
-
-                def parse_decimal(x):
-                    # Handle numeric types from XLSX directly without string replacements
-                    if x is None:
-                        return Decimal("0")
-                    if isinstance(x, (int, float, Decimal)):
-                        return Decimal(str(x))
-                    s = str(x).strip()
-                    if s == "":
-                        return Decimal("0")
-                    # Remove currency symbols/spaces
-                    s = s.replace("R$", "").replace(" ", "")
-                    # If both separators appear, assume dot thousands and comma decimal (pt-BR)
-                    if "," in s and "." in s:
-                        s = s.replace(".", "").replace(",", ".")
-                    # If only comma appears, treat as decimal comma
-                    elif "," in s:
-                        s = s.replace(",", ".")
-                    # Else: only dots or plain digits; remove thousands commas if any
-                    else:
-                        s = s.replace(",", "")
-                    return Decimal(s or "0")
-
-                valor_aquisicao = parse_decimal(row.get("valor_aquisicao"))
-                depreciacao_acumulada = parse_decimal(row.get("depreciacao_acumulada"))
-                valor_contabil = parse_decimal(row.get("valor_contabil"))
-
-                centro_custo = str(row.get("centro_custo", "")).strip()
-                classe = str(row.get("classe", "")).strip()
-                conta_contabil = str(row.get("conta_contabil", "")).strip()
-                descricao_cc = str(row.get("descricao_conta_contabil", "")).strip()
-                descricao_classe = str(row.get("descricao_classe", "")).strip()
-
-                data_fim = row.get("data_fim_depreciacao")
-                data_fim = parse_date_any(data_fim)
-                if not data_fim and data_inicio and vida_util_periodos:
-                    data_fim = add_months(data_inicio, vida_util_periodos)
-
-                item = RevisaoItemModel(
-                    periodo_id=rev_id,
-                    numero_imobilizado=numero_imobilizado,
-                    sub_numero=sub_numero,
-                    descricao=descricao,
-                    data_inicio_depreciacao=data_inicio,
-                    data_fim_depreciacao=data_fim,
-                    valor_aquisicao=valor_aquisicao,
-                    depreciacao_acumulada=depreciacao_acumulada,
-                    valor_contabil=valor_contabil,
-                    centro_custo=centro_custo,
-                    classe=classe,
-                    descricao_classe=(descricao_classe or None),
-                    conta_contabil=conta_contabil,
-                    descricao_conta_contabil=descricao_cc,
-                    vida_util_anos=vida_util_anos,
-                    vida_util_periodos=vida_util_periodos,
-                    auxiliar2=str(row.get("auxiliar2", "")) or None,
-                    auxiliar3=str(row.get("auxiliar3", "")) or None,
-                    status="Pendente",
-                )
-                db.add(item)
-                imported += 1
-            except Exception as ex:
-                rejected += 1
-                errors_log.append(f"Linha {idx}: {ex}")
 
-        db.commit()
-        return {
-            "periodo_id": rev_id,
-            "importados": imported,
-            "rejeitados": rejected,
-            "erros": errors_log,
-            "alertas": warnings_log,
-        }
-    finally:
-        try:
-            file.file.close()
-        except Exception:
-            pass
 @app.get("/revisoes/itens/{rev_id}", response_model=List[RevisaoItemOut])
 def list_revisao_itens(rev_id: int, db: Session = Depends(get_db)):
     periodo = db.query(RevisaoPeriodoModel).filter(RevisaoPeriodoModel.id == rev_id).first()
@@ -5051,194 +5018,6 @@ def update_revisao_item(rev_id: int, item_id: int, payload: RevisaoItemUpdate, d
         criado_em=item.criado_em,
     )
 
-# --- Revisão em Massa ---
-class MassRevisionPayload(BaseModel):
-    ativos_ids: List[int]
-    incremento: Optional[str] = None  # Acréscimo | Decréscimo | Manter
-    nova_vida_util_anos: Optional[int] = None
-    nova_vida_util_meses: Optional[int] = None
-    nova_data_fim: Optional[date] = None
-    condicao_fisica: Optional[str] = None  # Bom | Regular | Ruim
-    motivo: Optional[str] = None
-    justificativa: Optional[str] = None
-
-class MassRevisionItemResult(BaseModel):
-    id: int
-    numero_imobilizado: str
-    changed: bool
-    error: Optional[str] = None
-    original_total_months: Optional[int] = None
-    revised_total_months: Optional[int] = None
-    original_end_date: Optional[date] = None
-    revised_end_date: Optional[date] = None
-    incremento: Optional[str] = None
-    motivo: Optional[str] = None
-
-class MassRevisionResponse(BaseModel):
-    total: int
-    updated: int
-    skipped: int
-    errors: List[str]
-    results: List[MassRevisionItemResult]
-
-@app.post("/revisoes/massa", response_model=MassRevisionResponse)
-def aplicar_revisao_massa(payload: MassRevisionPayload, current_user: UsuarioModel = Depends(get_current_user), db: Session = Depends(get_db)):
-    if not payload.ativos_ids:
-        raise HTTPException(status_code=400, detail="Lista de ativos vazia")
-
-    inc = payload.incremento
-    if inc is not None and inc not in {"Acréscimo", "Decréscimo", "Manter"}:
-        raise HTTPException(status_code=400, detail="Incremento inválido")
-
-    cf = payload.condicao_fisica
-    if cf is not None and cf not in {"Bom", "Regular", "Ruim"}:
-        raise HTTPException(status_code=400, detail="Condição física inválida")
-
-    # total de meses informado diretamente
-    meses_total_global: Optional[int] = None
-    if payload.nova_vida_util_anos is not None or payload.nova_vida_util_meses is not None:
-        anos = int(payload.nova_vida_util_anos or 0)
-        meses = int(payload.nova_vida_util_meses or 0)
-        meses_total_global = anos * 12 + meses
-        if meses_total_global <= 0 and inc != "Manter":
-            raise HTTPException(status_code=400, detail="Vida útil revisada deve ser maior que zero")
-
-    results: List[MassRevisionItemResult] = []
-    errors: List[str] = []
-    updated = 0
-    skipped = 0
-
-    now18m = _add_months(date.today(), 18)
-
-    for item_id in payload.ativos_ids:
-        item = db.query(RevisaoItemModel).filter(RevisaoItemModel.id == item_id).first()
-        if not item:
-            msg = f"Item {item_id} não encontrado"
-            errors.append(msg)
-            results.append(MassRevisionItemResult(id=item_id, numero_imobilizado=str(item_id), changed=False, error=msg))
-            skipped += 1
-            continue
-
-        # status bloqueado (se existir)
-        if (item.status or "").lower() == "travado":
-            msg = f"Item {item.id} está travado"
-            errors.append(msg)
-            results.append(MassRevisionItemResult(id=item.id, numero_imobilizado=item.numero_imobilizado, changed=False, error=msg))
-            skipped += 1
-            continue
-
-        original_end = item.data_fim_depreciacao
-        original_total = item.vida_util_periodos or ( _months_diff(item.data_inicio_depreciacao, item.data_fim_depreciacao) if item.data_fim_depreciacao else 0 )
-
-        vida_revisada: Optional[int] = None
-        nova_fim: Optional[date] = None
-
-        # Se nova data fim foi informada, calcular meses com base na data de início do próprio ativo
-        if payload.nova_data_fim is not None:
-            end = payload.nova_data_fim
-            start = item.data_inicio_depreciacao
-            vida_revisada = _months_diff(start, end)
-            nova_fim = end
-        elif meses_total_global is not None:
-            vida_revisada = meses_total_global
-            nova_fim = _add_months(item.data_inicio_depreciacao, vida_revisada)
-
-        # Coerência de incremento
-        revised_total = _months_diff(item.data_inicio_depreciacao, nova_fim) if nova_fim else None
-
-        try:
-            if inc == "Manter":
-                if revised_total is not None and original_total > 0 and revised_total != original_total:
-                    raise HTTPException(status_code=400, detail="Para 'Manter', não é permitido alterar a vida útil total")
-            elif inc == "Decréscimo":
-                if vida_revisada is None and nova_fim is None:
-                    raise HTTPException(status_code=400, detail="Para 'Decréscimo', informe a nova vida útil ou nova data fim")
-                if revised_total is not None and original_total > 0 and revised_total >= original_total:
-                    raise HTTPException(status_code=400, detail="Para 'Decréscimo', a vida útil total revisada deve ser menor que a original")
-            elif inc == "Acréscimo":
-                if vida_revisada is None and nova_fim is None:
-                    raise HTTPException(status_code=400, detail="Para 'Acréscimo', informe a nova vida útil ou nova data fim")
-                if revised_total is not None and original_total > 0 and revised_total <= original_total:
-                    raise HTTPException(status_code=400, detail="Para 'Acréscimo', a vida útil total revisada deve ser maior que a original")
-
-            # Validações gerais
-            if vida_revisada is not None and vida_revisada <= 0 and inc != "Manter":
-                raise HTTPException(status_code=400, detail="Vida útil revisada deve ser maior que zero")
-            if nova_fim and nova_fim < now18m and inc != "Manter" and not (payload.justificativa or "").strip():
-                raise HTTPException(status_code=400, detail="Justificativa obrigatória para vida útil com vencimento < 18 meses")
-
-            # Persistir alterações
-            if cf is not None:
-                item.condicao_fisica = cf
-            if inc is not None:
-                item.auxiliar2 = inc
-            if payload.motivo is not None:
-                item.auxiliar3 = payload.motivo
-
-            if vida_revisada is not None:
-                item.vida_util_revisada = vida_revisada
-                item.data_fim_revisada = nova_fim
-                original_periodos = item.vida_util_periodos or 0
-                item.alterado = (original_periodos == 0) or (vida_revisada != original_periodos)
-                item.status = "Revisado" if item.alterado else (item.status or "Pendente")
-            elif nova_fim is not None:
-                # vida não informada, só data fim revisada
-                item.data_fim_revisada = nova_fim
-
-            if inc == "Manter" and not (payload.justificativa or "").strip():
-                item.justificativa = item.justificativa or "A vida útil está correta"
-            elif payload.justificativa is not None:
-                item.justificativa = payload.justificativa
-
-            if inc == "Manter":
-                if not (item.status or '').strip() or (item.status or '').strip().lower() == 'pendente':
-                    item.status = 'Revisado'
-                effective_end = item.data_fim_revisada or item.data_fim_depreciacao
-                per = db.query(RevisaoPeriodoModel).filter(RevisaoPeriodoModel.id == item.periodo_id).first()
-                if effective_end and effective_end >= now18m and getattr(per, 'status', None) != 'Encerrado':
-                    item.status = 'Aprovado'
-
-            updated += 1
-            results.append(MassRevisionItemResult(
-                id=item.id,
-                numero_imobilizado=item.numero_imobilizado,
-                changed=bool(item.alterado),
-                original_total_months=original_total,
-                revised_total_months=revised_total,
-                original_end_date=original_end,
-                revised_end_date=item.data_fim_revisada,
-                incremento=item.auxiliar2,
-                motivo=item.auxiliar3,
-            ))
-        except HTTPException as ex:
-            msg = ex.detail
-            errors.append(f"Item {item.id}: {msg}")
-            results.append(MassRevisionItemResult(
-                id=item.id,
-                numero_imobilizado=item.numero_imobilizado,
-                changed=False,
-                error=msg,
-                original_total_months=original_total,
-                revised_total_months=revised_total,
-                original_end_date=original_end,
-                revised_end_date=nova_fim,
-                incremento=inc,
-                motivo=payload.motivo,
-            ))
-            skipped += 1
-
-    db.commit()
-    audit(db, usuario_id=current_user.id, acao="revisao_massa", entidade="revisao_item", entidade_id=None,
-          detalhes=f"itens={updated}/{len(payload.ativos_ids)} inc={inc} motivo={payload.motivo}")
-
-    return MassRevisionResponse(
-        total=len(payload.ativos_ids),
-        updated=updated,
-        skipped=skipped,
-        errors=errors,
-        results=results,
-    )
-
 # -----------------------------
 # Delegações de Revisão
 # -----------------------------
@@ -5264,80 +5043,6 @@ class DelegacaoCreate(BaseModel):
     revisor_id: int
     atribuido_por: int
 
-@app.get("/revisoes/delegacoes/{rev_id}", response_model=List[DelegacaoOut])
-def list_revisao_delegacoes(rev_id: int, db: Session = Depends(get_db)):
-    periodo = db.query(RevisaoPeriodoModel).filter(RevisaoPeriodoModel.id == rev_id).first()
-    if not periodo:
-        raise HTTPException(status_code=404, detail="Período de revisão não encontrado")
-
-    delegs = db.query(RevisaoDelegacaoModel).filter(RevisaoDelegacaoModel.periodo_id == rev_id).all()
-    result: List[DelegacaoOut] = []
-    delegated_item_ids = set()
-
-    for d in delegs:
-        delegated_item_ids.add(d.ativo_id)
-        item = db.query(RevisaoItemModel).filter(RevisaoItemModel.id == d.ativo_id).first()
-        revisor = db.query(UsuarioModel).filter(UsuarioModel.id == d.revisor_id).first()
-        result.append(
-            DelegacaoOut(
-                id=d.id,
-                periodo_id=d.periodo_id,
-                ativo_id=d.ativo_id,
-                revisor_id=d.revisor_id,
-                atribuido_por=d.atribuido_por,
-                data_atribuicao=d.data_atribuicao,
-                status=d.status,
-                numero_imobilizado=item.numero_imobilizado if item else None,
-                descricao=item.descricao if item else None,
-                revisor_nome=revisor.nome_completo if revisor else None,
-                classe=item.classe if item else None,
-                conta_contabil=item.conta_contabil if item else None,
-                centro_custo=item.centro_custo if item else None,
-                valor_contabil=(float(item.valor_contabil) if (hasattr(item, 'valor_contabil') and item.valor_contabil is not None) else None),
-            )
-        )
-    
-    # -------------------------------------------------------------------------
-    # FIX: Include 'Revertido' items that are missing delegation (orphaned)
-    # This ensures items reverted before the fix appear for their original revisor
-    # -------------------------------------------------------------------------
-    reverted_items = db.query(RevisaoItemModel).filter(
-        RevisaoItemModel.periodo_id == rev_id,
-        RevisaoItemModel.status == 'Revertido'
-    ).all()
-
-    from datetime import datetime
-    
-    for it in reverted_items:
-        if it.id in delegated_item_ids:
-            continue
-        
-        target_revisor_id = getattr(it, 'criado_por', None)
-        if target_revisor_id:
-            revisor = db.query(UsuarioModel).filter(UsuarioModel.id == target_revisor_id).first()
-            if revisor:
-                # Create virtual delegation (ID is negative to indicate virtual)
-                result.append(
-                    DelegacaoOut(
-                        id=-(it.id),
-                        periodo_id=rev_id,
-                        ativo_id=it.id,
-                        revisor_id=target_revisor_id,
-                        atribuido_por=periodo.responsavel_id or 0,
-                        data_atribuicao=datetime.now(),
-                        status='Ativo',
-                        numero_imobilizado=it.numero_imobilizado,
-                        descricao=it.descricao,
-                        revisor_nome=revisor.nome_completo,
-                        classe=it.classe,
-                        conta_contabil=it.conta_contabil,
-                        centro_custo=it.centro_custo,
-                        valor_contabil=(float(it.valor_contabil) if (hasattr(it, 'valor_contabil') and it.valor_contabil is not None) else None),
-                    )
-                )
-
-    return result
-
 @app.post("/revisoes/delegacoes", response_model=DelegacaoOut)
 def create_revisao_delegacao(payload: DelegacaoCreate, db: Session = Depends(get_db)):
     periodo = db.query(RevisaoPeriodoModel).filter(RevisaoPeriodoModel.id == payload.periodo_id).first()
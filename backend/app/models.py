@@ -22,9 +22,9 @@ class Company(Base):
     status = Column(String(32), nullable=False)  # Ativo | Inativo
     data_adocao_ifrs = Column(Date, nullable=True)
 
-from sqlalchemy import Date, Text, ForeignKey, Enum as SAEnum, DateTime, func, Numeric, Boolean
-from sqlalchemy.orm import relationship
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Date, Text, ForeignKey, Enum as SAEnum, DateTime, func, Numeric, Boolean, BigInteger
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy import UniqueConstraint, Index, text, FetchedValue
 import enum
 
 class Vinculo(str, enum.Enum):
@@ -114,6 +114,8 @@ class Usuario(Base):
     centro_custo_id = Column(Integer, nullable=True)
 
     status = Column(String(10), nullable=False, default="Ativo")
+    # Avança em troca de senha/grupos; invalida snapshots de autorização em tokens emitidos
+    versao_autorizacao = Column(Integer, nullable=False, default=0, server_default="0")
 
     data_criacao = Column(DateTime, server_default=func.now(), nullable=False)
     data_atualizacao = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -150,6 +152,10 @@ class RevisaoPeriodo(Base):
 # -----------------------------
 # Itens da Revisão (base importada)
 # -----------------------------
+# Fim de vida útil efetivo (revisado, senão original; sem data vai para o fim da ordenação)
+REVISAO_ITEM_VENCIMENTO_SQL = "coalesce(data_fim_revisada, data_fim_depreciacao, DATE '9999-12-31')"
+
+
 class RevisaoItem(Base):
     __tablename__ = "revisoes_itens"
 
@@ -188,6 +194,20 @@ class RevisaoItem(Base):
     justificativa = Column(Text, nullable=True)
     alterado = Column(Boolean, nullable=False, default=False)
     criado_por = Column(Integer, ForeignKey("usuarios.id"), nullable=True, index=True)
+    # txid da transação que gravou a linha, definido pelo trigger trg_revisoes_itens_versao
+    # (sincronização incremental em GET /revisoes/itens/{id}/changes)
+    versao_txid = Column(BigInteger, server_default=FetchedValue(), server_onupdate=FetchedValue(), nullable=True)
+
+    # Listagem paginada por chave (periodo_id, ordenação, id); ver routes/reviews.py
+    __table_args__ = (
+        Index("ix_revisoes_itens_periodo_versao", "periodo_id", "versao_txid"),
+        Index("ix_revisoes_itens_periodo_vencimento", "periodo_id", text(REVISAO_ITEM_VENCIMENTO_SQL), "id"),
+        Index("ix_revisoes_itens_periodo_numero", "periodo_id", "numero_imobilizado", "id"),
+        Index("ix_revisoes_itens_periodo_valor", "periodo_id", "valor_contabil", "id"),
+        Index("ix_revisoes_itens_periodo_classe", "periodo_id", "classe", "id"),
+        Index("ix_revisoes_itens_periodo_centro_custo", "periodo_id", "centro_custo", "id"),
+        Index("ix_revisoes_itens_periodo_status", "periodo_id", "status", "id"),
+    )
 
 
 class RevisaoDelegacao(Base):
@@ -201,12 +221,20 @@ class RevisaoDelegacao(Base):
     data_atribuicao = Column(DateTime, server_default=func.now(), nullable=False)
     atribuido_por = Column(Integer, ForeignKey("usuarios.id"), nullable=False, index=True)
     status = Column(String(20), nullable=False, default="Ativo")
+    # txid da transação que gravou a linha (trigger trg_revisoes_delegacoes_versao)
+    versao_txid = Column(BigInteger, server_default=FetchedValue(), server_onupdate=FetchedValue(), nullable=True)
 
     periodo = relationship("RevisaoPeriodo", backref="delegacoes")
     ativo = relationship("RevisaoItem", backref="delegacoes")
     revisor = relationship("Usuario", foreign_keys=[revisor_id], backref="delegacoes_recebidas")
     atribuidor = relationship("Usuario", foreign_keys=[atribuido_por], backref="delegacoes_atribuidas")
 
+    __table_args__ = (
+        Index("ix_revisoes_delegacoes_periodo_keyset", "periodo_id", "id"),
+        Index("ix_revisoes_delegacoes_periodo_ativo", "periodo_id", "ativo_id"),
+        Index("ix_revisoes_delegacoes_periodo_revisor_versao", "periodo_id", "revisor_id", "versao_txid"),
+    )
+
 class Cronograma(Base):
     __tablename__ = "cronogramas"
 
@@ -254,7 +282,10 @@ class CronogramaTarefaEvidencia(Base):
     nome_arquivo = Column(String(255), nullable=False)
     content_type = Column(String(100), nullable=False)
     tamanho_bytes = Column(Integer, nullable=False)
-    conteudo = Column(LargeBinary, nullable=False)
+    # Legado: conteúdo em BYTEA (deferred para listagens não carregarem o binário).
+    # Novos uploads ficam no store de app/armazenamento.py, referenciados por sha256.
+    conteudo = deferred(Column(LargeBinary, nullable=True))
+    sha256 = Column(String(64), nullable=True, index=True)
     criado_em = Column(DateTime, server_default=func.now(), nullable=False)
     uploaded_by = Column(Integer, ForeignKey("usuarios.id"), nullable=True, index=True)
 
@@ -430,6 +461,48 @@ class GrupoUsuario(Base):
     usuario = relationship("Usuario", backref="grupos")
 
 
+# -----------------------------
+# Jobs de importação da base de revisão
+# -----------------------------
+class ImportacaoJob(Base):
+    __tablename__ = "importacoes_jobs"
+
+    id = Column(String(36), primary_key=True, index=True)
+    periodo_id = Column(Integer, ForeignKey("revisoes_periodos.id"), nullable=False, index=True)
+    nome_arquivo = Column(String(255), nullable=False)
+    caminho_arquivo = Column(Text, nullable=False)
+    tamanho_bytes = Column(BigInteger, nullable=False, default=0)
+    status = Column(String(20), nullable=False, default="Pendente", index=True)  # Pendente, Processando, Concluido, Erro, Cancelado
+    bytes_processados = Column(BigInteger, nullable=False, default=0)
+    linhas_lidas = Column(Integer, nullable=False, default=0)
+    linhas_total = Column(Integer, nullable=True)  # XLSX: total declarado na planilha (progresso por linhas)
+    linhas_importadas = Column(Integer, nullable=False, default=0)
+    linhas_rejeitadas = Column(Integer, nullable=False, default=0)
+    erros = Column(Text, nullable=True)  # JSON (lista de mensagens)
+    alertas = Column(Text, nullable=True)  # JSON (lista de mensagens)
+    total_alertas = Column(Integer, nullable=True)  # alertas guarda só as primeiras mensagens
+    mensagem = Column(Text, nullable=True)
+    cancelamento_solicitado = Column(Boolean, nullable=False, default=False)
+    worker = Column(String(120), nullable=True)
+    criado_em = Column(DateTime, server_default=func.now(), nullable=False)
+    iniciado_em = Column(DateTime, nullable=True)
+    finalizado_em = Column(DateTime, nullable=True)
+    atualizado_em = Column(DateTime, nullable=True)
+
+    periodo = relationship("RevisaoPeriodo")
+
+
+# -----------------------------
+# Versões de dados por recurso (invalidação de caches)
+# -----------------------------
+class DadoVersao(Base):
+    __tablename__ = "dados_versoes"
+
+    recurso = Column(String(100), primary_key=True)
+    versao = Column(BigInteger, nullable=False, default=0)
+    atualizado_em = Column(DateTime, server_default=func.now(), nullable=False)
+
+
 # -----------------------------
 # Logs de Auditoria (ações críticas)
 # -----------------------------
@@ -444,6 +517,9 @@ class AuditoriaLog(Base):
     detalhes = Column(Text, nullable=True)
     data_evento = Column(DateTime, server_default=func.now(), nullable=False)
 
+    # Listagem/exportação paginadas por chave (data_evento, id), mais recentes primeiro
+    __table_args__ = (Index("ix_auditoria_logs_data_evento_id", "data_evento", "id"),)
+
 # -----------------------------
 # Tokens de Redefinição de Senha
 # -----------------------------
@@ -487,7 +563,33 @@ class NotificacaoDestinatario(Base):
 
     __table_args__ = (
         UniqueConstraint("notificacao_id", "usuario_id", name="uq_notificacao_usuario"),
+        # caixa de entrada / contagem de não lidas (status sempre minúsculo)
+        Index("ix_notif_dest_usuario_status_criado", "usuario_id", "status", "criado_em"),
     )
 
     notificacao = relationship("Notificacao", backref="destinatarios")
     usuario = relationship("Usuario", backref="notificacoes_recebidas")
+
+
+class EmailFila(Base):
+    __tablename__ = "emails_fila"
+
+    id = Column(Integer, primary_key=True, index=True)
+    notificacao_id = Column(String(36), ForeignKey("notificacoes.id"), nullable=True, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=True)
+    destinatario = Column(String(255), nullable=False)
+    assunto = Column(String(255), nullable=False)
+    corpo = Column(Text, nullable=False)
+    corpo_html = Column(Text, nullable=True)
+    status = Column(String(20), nullable=False, default="Pendente")  # Pendente, Enviando, Enviado, Erro
+    tentativas = Column(Integer, nullable=False, default=0)
+    proxima_tentativa_em = Column(DateTime, nullable=False, server_default=func.now())
+    ultimo_erro = Column(Text, nullable=True)
+    worker = Column(String(120), nullable=True)
+    criado_em = Column(DateTime, server_default=func.now(), nullable=False)
+    enviado_em = Column(DateTime, nullable=True)
+    atualizado_em = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_emails_fila_status_proxima", "status", "proxima_tentativa_em"),
+    )
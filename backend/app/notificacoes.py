@@ -0,0 +1,137 @@
+"""
+Distribuição de notificações aos destinatários e contagem de não lidas.
+
+Os destinatários são gravados com um único INSERT ... SELECT a partir de
+`usuarios` (sem carregar os ids na aplicação). O status em
+notificacoes_destinatarios é sempre minúsculo (pendente, lida, arquivada), de
+modo que os filtros usam o índice (usuario_id, status, criado_em) diretamente.
+
+A contagem de não lidas, consultada a todo momento pelo badge do cabeçalho,
+fica num cache por processo invalidado pelas escritas deste processo; entre
+workers a defasagem é limitada pelo TTL.
+
+Configurável via variáveis de ambiente:
+- NOTIF_CONTADOR_TTL_SECONDS: validade da contagem em cache (default: 30)
+"""
+
+import os
+import threading
+import time
+from typing import Iterable, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from .models import (
+    NotificacaoDestinatario as NotificacaoDestinatarioModel,
+    Usuario as UsuarioModel,
+)
+
+NOTIF_CONTADOR_TTL_SECONDS = int(os.getenv("NOTIF_CONTADOR_TTL_SECONDS", "30"))
+
+STATUS_PENDENTE = "pendente"
+STATUS_LIDA = "lida"
+STATUS_ARQUIVADA = "arquivada"
+
+_SINONIMOS = {
+    "pending": STATUS_PENDENTE,
+    "pendente": STATUS_PENDENTE,
+    "read": STATUS_LIDA,
+    "lida": STATUS_LIDA,
+    "lido": STATUS_LIDA,
+    "archived": STATUS_ARQUIVADA,
+    "arquivada": STATUS_ARQUIVADA,
+    "arquivado": STATUS_ARQUIVADA,
+}
+
+
+def normalizar_status(status: Optional[str]) -> Optional[str]:
+    """Status canônico; None para vazio/'todas' ou valor desconhecido em minúsculas."""
+    s = (status or "").strip().lower()
+    if s in {"", "all", "todas", "todos"}:
+        return None
+    return _SINONIMOS.get(s, s)
+
+
+def selecionar_destinatarios(
+    *,
+    empresa_ids: Optional[Iterable[int]] = None,
+    usuario_ids: Optional[Iterable[int]] = None,
+    excluir_usuario_id: Optional[int] = None,
+    empresas_permitidas: Optional[Iterable[int]] = None,
+):
+    """SELECT dos ids de usuários destinatários (não executa).
+
+    empresa_ids: todos os usuários dessas empresas (notificar todos);
+    usuario_ids: usuários escolhidos. empresas_permitidas restringe aos
+    usuários dessas empresas ou sem empresa (None = sem restrição, admin).
+    """
+    empresa_ids = sorted(set(empresa_ids or []))
+    usuario_ids = sorted(set(usuario_ids or []))
+    criterios = []
+    if empresa_ids:
+        criterios.append(UsuarioModel.empresa_id.in_(empresa_ids))
+    if usuario_ids:
+        criterios.append(UsuarioModel.id.in_(usuario_ids))
+    sel = sa.select(UsuarioModel.id).where(sa.or_(*criterios) if criterios else sa.false())
+    if excluir_usuario_id:
+        sel = sel.where(UsuarioModel.id != int(excluir_usuario_id))
+    if empresas_permitidas is not None:
+        sel = sel.where(
+            sa.or_(UsuarioModel.empresa_id.is_(None), UsuarioModel.empresa_id.in_(sorted(set(empresas_permitidas))))
+        )
+    return sel
+
+
+def distribuir(db: Session, notificacao_id: str, destinatarios) -> int:
+    """INSERT ... SELECT dos destinatários como pendentes (sem commit); devolve quantos.
+
+    Após o commit o chamador deve chamar invalidar_contador().
+    """
+    ids = destinatarios.subquery()
+    res = db.execute(
+        sa.insert(NotificacaoDestinatarioModel.__table__).from_select(
+            ["notificacao_id", "usuario_id", "status"],
+            sa.select(sa.literal(notificacao_id), ids.c.id, sa.literal(STATUS_PENDENTE)),
+        )
+    )
+    return int(res.rowcount or 0)
+
+
+# -----------------------------
+# Contagem de não lidas
+# -----------------------------
+_contadores: dict[int, tuple[float, int]] = {}
+_contadores_lock = threading.Lock()
+
+
+def contar_nao_lidas(db: Session, usuario_id: int) -> int:
+    agora = time.monotonic()
+    with _contadores_lock:
+        item = _contadores.get(usuario_id)
+    if item and agora - item[0] < NOTIF_CONTADOR_TTL_SECONDS:
+        return item[1]
+    total = int(
+        # count(*): atendido só pelo índice (usuario_id, status, criado_em)
+        db.query(sa.func.count())
+        .select_from(NotificacaoDestinatarioModel)
+        .filter(
+            NotificacaoDestinatarioModel.usuario_id == usuario_id,
+            NotificacaoDestinatarioModel.status == STATUS_PENDENTE,
+        )
+        .scalar()
+        or 0
+    )
+    with _contadores_lock:
+        _contadores[usuario_id] = (agora, total)
+    return total
+
+
+def invalidar_contador(usuario_id: Optional[int] = None):
+    """Descarta a contagem de um usuário (ou de todos, após uma distribuição)."""
+    with _contadores_lock:
+        if usuario_id is None:
+            _contadores.clear()
+        else:
+            _contadores.pop(int(usuario_id), None)
+
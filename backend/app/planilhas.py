@@ -0,0 +1,78 @@
+"""
+Exportação de planilhas XLSX em streaming.
+
+Usa workbooks `write_only` do openpyxl: cada linha é gravada assim que
+produzida (o openpyxl mantém as abas em arquivos temporários) e o arquivo final
+vai para disco (salvar_temporario); quem chama o entrega e o remove ou o move
+para o cache de relatórios. O consumo de memória não depende da quantidade de
+linhas.
+
+O layout segue o que o pandas (`DataFrame.to_excel(index=False)`) gerava:
+cabeçalho na linha 1 com os nomes das colunas e dados a partir da linha 2.
+"""
+
+import os
+import tempfile
+from typing import Iterable, Sequence
+
+from fastapi import HTTPException
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def nova_planilha():
+    try:
+        from openpyxl import Workbook
+    except Exception:
+        raise HTTPException(status_code=500, detail="Dependência 'openpyxl' não instalada no servidor.")
+    return Workbook(write_only=True)
+
+
+def adicionar_aba(
+    wb,
+    titulo: str,
+    cabecalhos: Sequence[str],
+    linhas: Iterable[Sequence],
+    mensagem_vazia: tuple[str, str] | None = None,
+) -> int:
+    """Grava uma aba com cabeçalho + linhas e devolve a quantidade de linhas.
+
+    Se não houver linhas e `mensagem_vazia` = (coluna, texto) for informada, a
+    aba recebe apenas essa coluna com o texto, como nas exportações anteriores.
+    """
+    ws = wb.create_sheet(title=titulo)
+    it = iter(linhas)
+    primeira = next(it, None)
+    if primeira is None:
+        if mensagem_vazia:
+            ws.append([mensagem_vazia[0]])
+            ws.append([mensagem_vazia[1]])
+        else:
+            ws.append(list(cabecalhos))
+        return 0
+    ws.append(list(cabecalhos))
+    ws.append(list(primeira))
+    total = 1
+    for linha in it:
+        ws.append(list(linha))
+        total += 1
+    return total
+
+
+def salvar_temporario(wb) -> str:
+    """Salva o workbook em arquivo temporário e devolve o caminho."""
+    fd, path = tempfile.mkstemp(suffix=".xlsx", prefix="assetlife_")
+    os.close(fd)
+    try:
+        wb.save(path)
+    except Exception:
+        _remover(path)
+        raise
+    return path
+
+
+def _remover(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -1,12 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+import sqlalchemy as sa
 from sqlalchemy import desc
 from typing import List, Optional
 import csv
 import io
+import json
+import zlib
 from datetime import datetime
+from decimal import Decimal
 
+from .. import busca
+from ..database import SessionLocal
+from ..consultas import estimar_linhas
 from ..models import AuditoriaLog as AuditoriaLogModel, Usuario as UsuarioModel
 from ..dependencies import get_db, get_current_user, check_permission
 
@@ -16,6 +23,15 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+LISTAGEM_LIMITE_MAXIMO = 1000
+# Linhas lidas por vez do cursor no servidor durante a exportação
+EXPORT_YIELD_PER = 2000
+# Bytes acumulados antes de enviar um pedaço da exportação
+EXPORT_BLOCO = 64 * 1024
+
+_COLUNAS_EXPORT = ["id", "data_evento", "usuario_id", "usuario_nome", "acao", "entidade", "entidade_id", "detalhes"]
+
+
 def _require_logs_access(db: Session, current_user: UsuarioModel):
     allowed_routes = ["/permissions/logs", "/permissions", "/permissions/groups", "/auditoria/logs"]
     for route in allowed_routes:
@@ -26,124 +42,148 @@ def _require_logs_access(db: Session, current_user: UsuarioModel):
             continue
     raise HTTPException(status_code=403, detail="Acesso negado")
 
+
+def _filtrar(
+    db: Session,
+    stmt,
+    acao: Optional[str],
+    entidade: Optional[str],
+    usuario_id: Optional[int],
+    q: Optional[str],
+    data_ini: Optional[datetime],
+    data_fim: Optional[datetime],
+):
+    if acao:
+        stmt = stmt.where(AuditoriaLogModel.acao.ilike(f"%{acao}%"))
+    if entidade:
+        stmt = stmt.where(AuditoriaLogModel.entidade.ilike(f"%{entidade}%"))
+    if usuario_id:
+        stmt = stmt.where(AuditoriaLogModel.usuario_id == usuario_id)
+    if data_ini:
+        stmt = stmt.where(AuditoriaLogModel.data_evento >= data_ini)
+    if data_fim:
+        stmt = stmt.where(AuditoriaLogModel.data_evento <= data_fim)
+    # Busca em detalhes, ação ou entidade: operador e índice escolhidos em app/busca.py
+    criterio, rank = busca.filtro(db, AuditoriaLogModel, q)
+    if criterio is not None:
+        stmt = stmt.where(criterio)
+    return stmt, rank
+
+
+def _select_logs():
+    return (
+        sa.select(
+            AuditoriaLogModel.id,
+            AuditoriaLogModel.usuario_id,
+            AuditoriaLogModel.acao,
+            AuditoriaLogModel.entidade,
+            AuditoriaLogModel.entidade_id,
+            AuditoriaLogModel.detalhes,
+            AuditoriaLogModel.data_evento,
+            UsuarioModel.nome_completo.label("usuario_nome"),
+        )
+        .outerjoin(UsuarioModel, AuditoriaLogModel.usuario_id == UsuarioModel.id)
+    )
+
+
+def _parse_cursor(cursor: Optional[str], com_rank: bool) -> Optional[tuple]:
+    """Cursor "data_id" (cronológico) ou "rank_data_id" (relevância)."""
+    if not cursor:
+        return None
+    try:
+        partes = cursor.split("_")
+        if len(partes) != (3 if com_rank else 2):
+            raise ValueError(cursor)
+        pos = (datetime.fromisoformat(partes[-2]), int(partes[-1]))
+        return (Decimal(partes[0]), *pos) if com_rank else pos
+    except (ValueError, ArithmeticError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _formatar(log) -> dict:
+    return {
+        "id": log.id,
+        "usuario_id": log.usuario_id,
+        "usuario_nome": log.usuario_nome or "Sistema/Desconhecido",
+        "acao": log.acao,
+        "entidade": log.entidade,
+        "entidade_id": log.entidade_id,
+        "detalhes": log.detalhes,
+        "data_evento": log.data_evento.isoformat() if log.data_evento else None,
+    }
+
+
 @router.get("/logs")
 def list_audit_logs(
     acao: Optional[str] = None,
     entidade: Optional[str] = None,
     usuario_id: Optional[int] = None,
     q: Optional[str] = None,
+    data_ini: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
     limit: int = 100,
-    offset: int = 0,
+    cursor: Optional[str] = None,
+    estimar_total: bool = False,
+    ordenar: Optional[str] = None,
     current_user: UsuarioModel = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Listar logs de auditoria do sistema.
+
+    Paginação por chave (data_evento, id): `proximo_cursor` retoma a partir do
+    último log devolvido, com custo constante em qualquer página. Com
+    `estimar_total=true` devolve `total_estimado` (estatísticas do planner,
+    sem COUNT). Buscas por palavras (`q`) vêm por relevância, a menos que
+    `ordenar=data`.
     """
     _require_logs_access(db, current_user)
-    query = db.query(
-        AuditoriaLogModel.id,
-        AuditoriaLogModel.usuario_id,
-        AuditoriaLogModel.acao,
-        AuditoriaLogModel.entidade,
-        AuditoriaLogModel.entidade_id,
-        AuditoriaLogModel.detalhes,
-        AuditoriaLogModel.data_evento,
-        UsuarioModel.nome_completo.label("usuario_nome")
-    ).outerjoin(UsuarioModel, AuditoriaLogModel.usuario_id == UsuarioModel.id)
+    limit = max(1, min(int(limit or 100), LISTAGEM_LIMITE_MAXIMO))
+    stmt, rank = _filtrar(db, _select_logs(), acao, entidade, usuario_id, q, data_ini, data_fim)
+    por_relevancia = rank is not None and (ordenar or "relevancia").strip().lower() == "relevancia"
 
-    if acao:
-        query = query.filter(AuditoriaLogModel.acao.ilike(f"%{acao}%"))
-    if entidade:
-        query = query.filter(AuditoriaLogModel.entidade.ilike(f"%{entidade}%"))
-    if usuario_id:
-        query = query.filter(AuditoriaLogModel.usuario_id == usuario_id)
-    if q:
-        # Busca genérica em detalhes, ação ou entidade
-        search = f"%{q}%"
-        query = query.filter(
-            (AuditoriaLogModel.detalhes.ilike(search)) |
-            (AuditoriaLogModel.acao.ilike(search)) |
-            (AuditoriaLogModel.entidade.ilike(search))
+    total_estimado = None
+    if estimar_total:
+        filtrado = any(v for v in (acao, entidade, usuario_id, q, data_ini, data_fim))
+        total_estimado = (
+            estimar_linhas(db, stmt) if filtrado else estimar_linhas(db, tabela=AuditoriaLogModel.__tablename__)
         )
 
-    # Ordenação por data decrescente
-    query = query.order_by(desc(AuditoriaLogModel.data_evento))
-    
-    # Paginação
-    total = query.count()
-    logs = query.limit(limit).offset(offset).all()
-
-    # Formatar resposta
-    result = []
-    for log in logs:
-        result.append({
-            "id": log.id,
-            "usuario_id": log.usuario_id,
-            "usuario_nome": log.usuario_nome or "Sistema/Desconhecido",
-            "acao": log.acao,
-            "entidade": log.entidade,
-            "entidade_id": log.entidade_id,
-            "detalhes": log.detalhes,
-            "data_evento": log.data_evento.isoformat() if log.data_evento else None
-        })
-
-    return result
+    # Mais recentes primeiro; (data_evento, id) é único e usa o índice ix_auditoria_logs_data_evento_id
+    chave = [AuditoriaLogModel.data_evento, AuditoriaLogModel.id]
+    if por_relevancia:
+        chave.insert(0, rank)
+        stmt = stmt.add_columns(rank.label("relevancia"))
+    stmt = stmt.order_by(*(desc(c) for c in chave))
+    pos = _parse_cursor(cursor, por_relevancia)
+    if pos:
+        stmt = stmt.where(sa.tuple_(*chave) < sa.tuple_(*pos))
+    # Uma linha a mais indica se há próxima página
+    logs = db.execute(stmt.limit(limit + 1)).all()
+    proximo_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        ultimo = logs[-1]
+        proximo_cursor = f"{ultimo.data_evento.isoformat()}_{ultimo.id}"
+        if por_relevancia:
+            proximo_cursor = f"{ultimo.relevancia}_{proximo_cursor}"
 
-@router.get("/logs/export")
-def export_audit_logs_csv(
-    acao: Optional[str] = None,
-    entidade: Optional[str] = None,
-    usuario_id: Optional[int] = None,
-    q: Optional[str] = None,
-    limit: int = 5000,
-    current_user: UsuarioModel = Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
-    _require_logs_access(db, current_user)
-    if limit <= 0 or limit > 20000:
-        limit = 5000
-
-    query = db.query(
-        AuditoriaLogModel.id,
-        AuditoriaLogModel.usuario_id,
-        AuditoriaLogModel.acao,
-        AuditoriaLogModel.entidade,
-        AuditoriaLogModel.entidade_id,
-        AuditoriaLogModel.detalhes,
-        AuditoriaLogModel.data_evento,
-        UsuarioModel.nome_completo.label("usuario_nome"),
-    ).outerjoin(UsuarioModel, AuditoriaLogModel.usuario_id == UsuarioModel.id)
-
-    if acao:
-        query = query.filter(AuditoriaLogModel.acao.ilike(f"%{acao}%"))
-    if entidade:
-        query = query.filter(AuditoriaLogModel.entidade.ilike(f"%{entidade}%"))
-    if usuario_id:
-        query = query.filter(AuditoriaLogModel.usuario_id == usuario_id)
-    if q:
-        search = f"%{q}%"
-        query = query.filter(
-            (AuditoriaLogModel.detalhes.ilike(search))
-            | (AuditoriaLogModel.acao.ilike(search))
-            | (AuditoriaLogModel.entidade.ilike(search))
-        )
+    return {
+        "itens": [_formatar(log) for log in logs],
+        "proximo_cursor": proximo_cursor,
+        "total_estimado": total_estimado,
+    }
 
-    rows = query.order_by(desc(AuditoriaLogModel.data_evento)).limit(limit).all()
 
-    out = io.StringIO()
-    w = csv.writer(out, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL, lineterminator="\n")
-    w.writerow(["id", "data_evento", "usuario_id", "usuario_nome", "acao", "entidade", "entidade_id", "detalhes"])
+def _linhas_csv(rows):
+    buf = io.StringIO()
+    w = csv.writer(buf, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL, lineterminator="\n")
+    w.writerow(_COLUNAS_EXPORT)
     for r in rows:
-        dt = None
-        try:
-            dt = r.data_evento.isoformat() if r.data_evento else ""
-        except Exception:
-            dt = ""
         w.writerow(
             [
                 r.id,
-                dt,
+                r.data_evento.isoformat() if r.data_evento else "",
                 r.usuario_id if r.usuario_id is not None else "",
                 r.usuario_nome or "Sistema/Desconhecido",
                 r.acao,
@@ -152,8 +192,82 @@ def export_audit_logs_csv(
                 r.detalhes if isinstance(r.detalhes, str) else (str(r.detalhes) if r.detalhes is not None else ""),
             ]
         )
+        if buf.tell() >= EXPORT_BLOCO:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def _linhas_ndjson(rows):
+    partes: List[str] = []
+    tamanho = 0
+    for r in rows:
+        linha = json.dumps(_formatar(r), ensure_ascii=False, default=str) + "\n"
+        partes.append(linha)
+        tamanho += len(linha)
+        if tamanho >= EXPORT_BLOCO:
+            yield "".join(partes)
+            partes, tamanho = [], 0
+    if partes:
+        yield "".join(partes)
+
+
+def _gzip(pedacos):
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    for pedaco in pedacos:
+        dados = comp.compress(pedaco)
+        if dados:
+            yield dados
+    yield comp.flush()
+
+
+@router.get("/logs/export")
+def export_audit_logs_csv(
+    acao: Optional[str] = None,
+    entidade: Optional[str] = None,
+    usuario_id: Optional[int] = None,
+    q: Optional[str] = None,
+    data_ini: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
+    limit: Optional[int] = Query(None, description="Opcional; sem limite exporta todos os logs filtrados"),
+    formato: str = "csv",
+    gzip: bool = False,
+    current_user: UsuarioModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Exporta os logs filtrados em CSV ou NDJSON, gerados sob demanda a partir de
+    um cursor no servidor (memória constante, sem teto de linhas). Com
+    gzip=true o arquivo é compactado durante o envio (.gz).
+    """
+    _require_logs_access(db, current_user)
+    formato = (formato or "csv").strip().lower()
+    if formato not in {"csv", "ndjson"}:
+        raise HTTPException(status_code=400, detail="Formato inválido. Use csv ou ndjson")
+
+    stmt, _rank = _filtrar(db, _select_logs(), acao, entidade, usuario_id, q, data_ini, data_fim)
+    stmt = stmt.order_by(desc(AuditoriaLogModel.data_evento), desc(AuditoriaLogModel.id))
+    if limit is not None and limit > 0:
+        stmt = stmt.limit(int(limit))
+
+    def gerar():
+        # Sessão própria: a resposta continua sendo gerada após o retorno da rota
+        stream_db = SessionLocal()
+        try:
+            rows = stream_db.execute(stmt.execution_options(stream_results=True, yield_per=EXPORT_YIELD_PER))
+            linhas = _linhas_csv(rows) if formato == "csv" else _linhas_ndjson(rows)
+            pedacos = (p.encode("utf-8") for p in linhas)
+            yield from (_gzip(pedacos) if gzip else pedacos)
+        finally:
+            stream_db.close()
 
-    content = out.getvalue()
-    filename = f"auditoria_logs_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
+    extensao = "csv" if formato == "csv" else "ndjson"
+    media_type = "text/csv; charset=utf-8" if formato == "csv" else "application/x-ndjson"
+    filename = f"auditoria_logs_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{extensao}"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
     headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
-    return Response(content=content, media_type="text/csv; charset=utf-8", headers=headers)
+    return StreamingResponse(gerar(), media_type=media_type, headers=headers)
@@ -0,0 +1,123 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime, timedelta
+from jose import jwt, JWTError
+import asyncio
+import time
+
+from .. import eventos
+from ..config import SECRET_KEY, ALGORITHM
+from ..database import SessionLocal
+from ..dependencies import (
+    TIPO_TOKEN_EVENTOS,
+    authorization_version,
+    get_allowed_company_ids,
+    get_current_principal,
+    is_admin_user,
+    reload_authorization_context,
+)
+from ..models import Usuario as UsuarioModel
+
+router = APIRouter(prefix="/events", tags=["Eventos"])
+
+
+@router.post("/ticket")
+def emitir_ticket(current_user=Depends(get_current_principal)):
+    """Ticket curto e de uso exclusivo do /events/stream.
+
+    EventSource não envia headers, então a credencial vai na query string (e
+    acaba em logs de proxy e no histórico): por isso o stream não aceita o JWT
+    de login, só este ticket, que expira em EVENTOS_TICKET_SEGUNDOS.
+    """
+    expira = datetime.utcnow() + timedelta(seconds=eventos.EVENTOS_TICKET_SEGUNDOS)
+    ticket = jwt.encode({"sub": str(current_user.id), "typ": TIPO_TOKEN_EVENTOS, "exp": expira}, SECRET_KEY, algorithm=ALGORITHM)
+    return {"ticket": ticket, "expira_em": eventos.EVENTOS_TICKET_SEGUNDOS}
+
+
+def _usuario_do_ticket(ticket: str) -> int:
+    try:
+        payload = jwt.decode(ticket, SECRET_KEY, algorithms=[ALGORITHM])
+        if payload.get("typ") != TIPO_TOKEN_EVENTOS:
+            raise ValueError("tipo")
+        return int(payload.get("sub"))
+    except (JWTError, ValueError, TypeError):
+        raise HTTPException(status_code=401, detail="Ticket inválido ou expirado")
+
+
+def _escopo(usuario_id: int, recarregar: bool = False):
+    """(versão de autorização, empresas, admin) numa sessão curta; None se o usuário não existe mais."""
+    db = SessionLocal()
+    try:
+        user = db.query(UsuarioModel).filter(UsuarioModel.id == usuario_id).first()
+        if not user:
+            return None
+        versao = authorization_version(db, usuario_id, usar_cache=not recarregar)
+        if recarregar:
+            ctx = reload_authorization_context(db, user)
+            return versao, ctx.empresa_ids, ctx.admin
+        return versao, get_allowed_company_ids(db, user), is_admin_user(db, user)
+    finally:
+        db.close()
+
+
+def _versao_atual(usuario_id: int):
+    db = SessionLocal()
+    try:
+        return authorization_version(db, usuario_id)
+    finally:
+        db.close()
+
+
+@router.get("/stream")
+async def stream(
+    request: Request,
+    ticket: str = Query(...),
+):
+    usuario_id = _usuario_do_ticket(ticket)
+    escopo = await run_in_threadpool(_escopo, usuario_id)
+    if escopo is None:
+        raise HTTPException(status_code=401, detail="Usuário não encontrado")
+    versao, empresa_ids, admin = escopo
+    try:
+        assinatura = eventos.assinar(usuario_id, empresa_ids, admin)
+    except eventos.LimiteConexoes:
+        raise HTTPException(status_code=503, detail="Limite de conexões de eventos atingido", headers={"Retry-After": "30"})
+
+    async def gerar():
+        nonlocal versao
+        proxima_verificacao = time.monotonic() + eventos.EVENTOS_HEARTBEAT_SEGUNDOS
+        try:
+            yield "retry: 5000\n\n"
+            yield eventos.formatar_sse({"tipo": "pronto"})
+            while True:
+                if await request.is_disconnected():
+                    break
+                if time.monotonic() >= proxima_verificacao:
+                    # Permissões alteradas durante a conexão: recalcula o escopo (ou encerra)
+                    atual = await run_in_threadpool(_versao_atual, usuario_id)
+                    if atual is not None and atual != versao:
+                        novo = await run_in_threadpool(_escopo, usuario_id, True)
+                        if novo is None:
+                            break
+                        versao, empresa_ids, admin = novo
+                        assinatura.atualizar_escopo(empresa_ids, admin)
+                        yield eventos.formatar_sse({"tipo": eventos.TIPO_RESYNC})
+                    proxima_verificacao = time.monotonic() + eventos.EVENTOS_HEARTBEAT_SEGUNDOS
+                try:
+                    evento = await asyncio.wait_for(assinatura.fila.get(), timeout=eventos.EVENTOS_HEARTBEAT_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                # Evento enfileirado antes de uma revogação não sai mais
+                if not assinatura.ve_empresa(evento.get("empresa_id")):
+                    continue
+                yield eventos.formatar_sse(evento)
+        finally:
+            eventos.cancelar(assinatura)
+
+    return StreamingResponse(
+        gerar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
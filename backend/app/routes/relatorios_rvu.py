@@ -1,6 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from ..database import SessionLocal
+from ..dependencies import get_db, get_current_user, get_allowed_company_ids
+from ..planilhas import nova_planilha, adicionar_aba, salvar_temporario, XLSX_MEDIA_TYPE
+from .. import cache_relatorios
+from ..consultas import FiltroItens, diagnosticar
+from ..depreciacao import add_months as _add_months, months_diff as _months_diff, cronograma_mensal, centavos, parcela_centavos
 from ..models import (
     Company as CompanyModel,
     Employee as EmployeeModel,
@@ -9,52 +17,16 @@ from ..models import (
     ManagementUnit as UGModel,
     Usuario as UsuarioModel,
     RevisaoDelegacao as RevisaoDelegacaoModel,
-    GrupoUsuario as GrupoUsuarioModel,
-    GrupoEmpresa as GrupoEmpresaModel,
 )
 import sqlalchemy as sa
 from datetime import date, datetime
 import io
+import json
 import os
 import traceback
 import logging
-from jose import jwt, JWTError
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-
 router = APIRouter(prefix="/relatorios/rvu", tags=["Relatórios RVU"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-security = HTTPBearer()
-SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-in-prod")
-ALGORITHM = "HS256"
-
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    token = credentials.credentials
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = int(payload.get("sub"))
-    except (JWTError, ValueError):
-        raise HTTPException(status_code=401, detail="Token inválido")
-    user = db.query(UsuarioModel).filter(UsuarioModel.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="Usuário não encontrado")
-    return user
-
-def get_allowed_company_ids(db: Session, current_user: UsuarioModel) -> list[int]:
-    links = db.query(GrupoUsuarioModel).filter(GrupoUsuarioModel.usuario_id == current_user.id).all()
-    grupo_ids = [l.grupo_id for l in links]
-    emp_links = db.query(GrupoEmpresaModel).filter(GrupoEmpresaModel.grupo_id.in_(grupo_ids)).all()
-    empresas_ids = {e.empresa_id for e in emp_links}
-    if getattr(current_user, 'empresa_id', None) is not None:
-        empresas_ids.add(current_user.empresa_id)
-    return sorted(empresas_ids)
-
 
 def _log_relatorio(
     db: Session,
@@ -63,6 +35,7 @@ def _log_relatorio(
     tipo_arquivo: str,
     parametros_usados: str,
     caminho_arquivo: str | None,
+    cache: str | None = None,
 ):
     try:
         with db.connection() as conn:
@@ -87,6 +60,9 @@ def _log_relatorio(
             if 'data_emissao' in cols:
                 fields.append('data_emissao')
                 values['data_emissao'] = datetime.utcnow()
+            if 'cache' in cols and cache:
+                fields.append('cache')
+                values['cache'] = cache
             if not fields:
                 return
             placeholders = ", ".join(f":{f}" for f in fields)
@@ -96,93 +72,68 @@ def _log_relatorio(
     except Exception:
         pass
 
-def _filters_query(db: Session, params: dict, allowed_company_ids: list[int]):
-    print(f"DEBUG _filters_query: params={params}, allowed_companies={allowed_company_ids}")
-    q = db.query(RevisaoItemModel)
-    
-    # Debug helper
-    def debug_count(label):
-        try:
-            c = q.count()
-            print(f"DEBUG _filters_query [{label}]: {c} items")
-        except Exception as e:
-            print(f"DEBUG _filters_query [{label}]: error counting - {e}")
-
-    debug_count("Initial")
-
-    # Filtros por empresa/UG via período
-    q = q.join(RevisaoPeriodoModel, RevisaoPeriodoModel.id == RevisaoItemModel.periodo_id)
-    
-    if allowed_company_ids:
-        q = q.filter(RevisaoPeriodoModel.empresa_id.in_(allowed_company_ids))
-        debug_count("Allowed Companies")
-        
-    if params.get('empresa_id'):
-        q = q.filter(RevisaoPeriodoModel.empresa_id == int(params['empresa_id']))
-        debug_count("Empresa ID")
-        
-    if params.get('ug_id'):
-        # Permite período específico da UG OU período global (ug_id IS NULL)
-        ug_val = int(params['ug_id'])
-        q = q.filter(sa.or_(RevisaoPeriodoModel.ug_id == ug_val, RevisaoPeriodoModel.ug_id == None))
-        debug_count("UG ID")
-        
-    # Classe contábil (string na base importada)
-    if params.get('classe_id') and str(params['classe_id']).lower() not in ['todos', '']:
-        # Converte para string pois o campo na base é String e o front pode enviar int
-        classe_val = str(params['classe_id'])
-        q = q.filter(RevisaoItemModel.classe == classe_val)
-        debug_count("Classe ID")
-        
-    # Revisor: filtra por delegações ativas para o item
-    if params.get('revisor_id'):
-        q = q.join(
-            RevisaoDelegacaoModel,
-            sa.and_(
-                RevisaoDelegacaoModel.ativo_id == RevisaoItemModel.id,
-                RevisaoDelegacaoModel.status == 'Ativo',
-                RevisaoDelegacaoModel.revisor_id == int(params['revisor_id'])
-            )
-        )
-        debug_count("Revisor ID")
-        
-    # Filtro explícito por Período de Revisão
-    if params.get('periodo_id'):
-        q = q.filter(RevisaoItemModel.periodo_id == int(params['periodo_id']))
-        debug_count("Periodo ID")
-
-    # Período: usar data de início de depreciação (somente se não filtrar por ID de período ou se quiser filtrar dentro do período)
-    if params.get('periodo_inicio'):
-        q = q.filter(RevisaoItemModel.data_inicio_depreciacao >= params['periodo_inicio'])
-    if params.get('periodo_fim'):
-        q = q.filter(RevisaoItemModel.data_inicio_depreciacao <= params['periodo_fim'])
-    # Status do item
-    if params.get('status') and params['status'] != 'Todos':
-        q = q.filter(RevisaoItemModel.status == params['status'])
-    
-    print(f"DEBUG _filters_query: SQL generated count check...")
+def _log_emissao(db: Session, current_user, params: dict, tipo_arquivo: str, cache: str | None):
+    """Registra a emissão no log com os parâmetros usados e o resultado do cache (hit/miss)."""
     try:
-        # Debug SQL
-        # print(str(q.statement.compile(compile_kwargs={"literal_binds": True})))
-        count = q.count()
-        print(f"DEBUG _filters_query: Found {count} items matching filters.")
-    except Exception as e:
-        print(f"DEBUG _filters_query: Error counting items: {e}")
-        
-    return q
-
-# Helpers de cronograma
-def _add_months(d: date, months: int) -> date:
-    year = d.year + (d.month - 1 + months) // 12
-    month = (d.month - 1 + months) % 12 + 1
-    day = min(d.day, [31,
-                      29 if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0) else 28,
-                      31, 30, 31, 30, 31, 31, 30, 31, 30, 31][month - 1])
-    return date(year, month, day)
+        empresa_log = int(params['empresa_id']) if params.get('empresa_id') is not None else None
+    except Exception:
+        empresa_log = None
+    _log_relatorio(
+        db,
+        usuario_id=current_user.id if getattr(current_user, 'id', None) is not None else None,
+        empresa_id=empresa_log,
+        tipo_arquivo=tipo_arquivo,
+        parametros_usados=",".join(f"{k}={v}" for k, v in params.items()),
+        caminho_arquivo=None,
+        cache=cache,
+    )
+
+
+def _resposta_json(chave: str | None, data) -> Response:
+    """Serializa como o JSONResponse padrão e guarda no cache quando houver chave."""
+    conteudo = json.dumps(
+        jsonable_encoder(data), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+    if chave:
+        cache_relatorios.gravar_bytes(chave, conteudo, 'application/json')
+    return Response(content=conteudo, media_type='application/json')
+
+
+def _resposta_arquivo(chave: str | None, path: str, media_type: str, filename: str | None) -> Response:
+    """Entrega o arquivo gerado, movendo-o para o cache quando houver chave."""
+    entrada = cache_relatorios.gravar_arquivo(chave, path, media_type, filename) if chave else None
+    if entrada:
+        return cache_relatorios.resposta(entrada)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=500, detail='Erro interno ao gravar o relatório')
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'} if filename else None
+    return FileResponse(path, media_type=media_type, headers=headers, background=BackgroundTask(_remover_arquivo, path))
+
+
+def _remover_arquivo(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
 
-def _months_diff(start: date, end: date) -> int:
-    return (end.year - start.year) * 12 + (end.month - start.month)
+def _filters_query(db: Session, params: dict, allowed_company_ids: list[int]):
+    """Itens filtrados pelos parâmetros dos relatórios (apenas compõe a consulta)."""
+    q = db.query(RevisaoItemModel).join(RevisaoPeriodoModel, RevisaoPeriodoModel.id == RevisaoItemModel.periodo_id)
+    return (
+        FiltroItens(q)
+        .empresas_permitidas(allowed_company_ids)
+        .empresa(params.get('empresa_id'))
+        # Período específico da UG OU período global (ug_id IS NULL)
+        .ug(params.get('ug_id'), incluir_globais=True)
+        .classe(params.get('classe_id'))
+        .revisor_delegado(params.get('revisor_id'))
+        .periodo(params.get('periodo_id'))
+        .inicio_depreciacao(params.get('periodo_inicio'), params.get('periodo_fim'))
+        .status(params.get('status'))
+        .query
+    )
 
+# Helpers de cronograma
 def _vida_total_meses(it) -> int:
     atual_total = (getattr(it, 'vida_util_periodos', None) or 0)
     if atual_total == 0 and (getattr(it, 'vida_util_anos', None) or 0) > 0:
@@ -233,7 +184,7 @@ def _data_fim(it) -> date | None:
     return None
 
 @router.get('/resumo')
-def resumo(empresa_id: int | None = None, ug_id: int | None = None, classe_id: int | None = None, revisor_id: int | None = None,
+def resumo(request: Request, empresa_id: int | None = None, ug_id: int | None = None, classe_id: int | None = None, revisor_id: int | None = None,
            periodo_id: int | None = None,
            periodo_inicio: date | None = None, periodo_fim: date | None = None, status: str | None = None,
            current_user: UsuarioModel = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -250,7 +201,14 @@ def resumo(empresa_id: int | None = None, ug_id: int | None = None, classe_id: i
         'periodo_fim': periodo_fim,
         'status': status,
     }
+    chave = cache_relatorios.chave(db, 'resumo', params, allowed)
+    entrada = cache_relatorios.obter(chave)
+    if entrada:
+        _log_emissao(db, current_user, params, 'json_resumo', 'hit')
+        return cache_relatorios.resposta(entrada)
+
     q = _filters_query(db, params, allowed)
+    diagnosticar(request, db, current_user, q, 'relatorios_rvu.resumo')
     items = q.all()
     item_ids = [getattr(it, 'id', None) for it in items if getattr(it, 'id', None) is not None]
     periodo_ids = {getattr(it, 'periodo_id', None) for it in items if getattr(it, 'periodo_id', None) is not None}
@@ -321,10 +279,152 @@ def resumo(empresa_id: int | None = None, ug_id: int | None = None, classe_id: i
             'revisor': revisor_nome,
             'status': getattr(it, 'status', None),
         })
-    return data
+    if chave:
+        _log_emissao(db, current_user, params, 'json_resumo', 'miss')
+    return _resposta_json(chave, data)
+
+# Cronograma: colunas necessárias e leitura das séries em lotes por id (keyset)
+_CRONOGRAMA_COLUNAS = (
+    RevisaoItemModel.id,
+    RevisaoItemModel.numero_imobilizado,
+    RevisaoItemModel.sub_numero,
+    RevisaoItemModel.descricao,
+    RevisaoItemModel.classe,
+    RevisaoItemModel.valor_aquisicao,
+    RevisaoItemModel.data_inicio_depreciacao,
+    RevisaoItemModel.data_fim_depreciacao,
+    RevisaoItemModel.data_fim_revisada,
+    RevisaoItemModel.vida_util_anos,
+    RevisaoItemModel.vida_util_periodos,
+    RevisaoItemModel.vida_util_revisada,
+)
+CRONOGRAMA_LOTE_ITENS = 1000
+CRONOGRAMA_LIMITE_PADRAO = 5000
+CRONOGRAMA_LIMITE_MAXIMO = 50000
+
+
+def _iter_itens_keyset(q, inicio_id: int | None = None, lote: int = CRONOGRAMA_LOTE_ITENS):
+    """Percorre o resultado ordenado por id em lotes, sem OFFSET nem carregar tudo."""
+    ultimo = None
+    while True:
+        qq = q
+        if ultimo is not None:
+            qq = qq.filter(RevisaoItemModel.id > ultimo)
+        elif inicio_id is not None:
+            qq = qq.filter(RevisaoItemModel.id >= inicio_id)
+        batch = qq.order_by(RevisaoItemModel.id).limit(lote).all()
+        yield from batch
+        if len(batch) < lote:
+            return
+        ultimo = batch[-1].id
+
+
+def _cronograma_serie(it) -> tuple[date, int, float] | None:
+    """(início, total de meses, valor) da série do item, ou None se não há cronograma."""
+    start = getattr(it, 'data_inicio_depreciacao', None)
+    end = _data_fim(it)
+    if not start or not end:
+        # pula itens sem período definido
+        return None
+    total_meses = _months_diff(start, end)
+    # Base de cálculo: valor de aquisição (sem valor residual na base atual)
+    valor_aquisicao = float(getattr(it, 'valor_aquisicao', 0) or 0)
+    if total_meses <= 0 or valor_aquisicao <= 0:
+        return None
+    return start, total_meses, valor_aquisicao
+
+
+def _cronograma_linhas(it, desde: int = 0):
+    """Linhas mensais (índice do mês, dict) do item a partir do mês `desde`."""
+    serie = _cronograma_serie(it)
+    if serie is None:
+        return
+    start, total_meses, valor_aquisicao = serie
+    # Parcela fixa com ajuste do último mês para zerar o saldo (ver app/depreciacao.py)
+    for i, periodo_data, saldo_inicial, dep_mes, saldo_final in cronograma_mensal(valor_aquisicao, start, total_meses, desde=desde):
+        yield i, {
+            'numero_imobilizado': getattr(it, 'numero_imobilizado', None),
+            'sub_numero': getattr(it, 'sub_numero', None),
+            'descricao': getattr(it, 'descricao', None),
+            'classe': getattr(it, 'classe', None),
+            'periodo': periodo_data,
+            'saldo_inicial': saldo_inicial,
+            'depreciacao_mes': dep_mes,
+            'saldo_final': saldo_final,
+        }
+
+
+def _cronograma_agregado(itens) -> list[dict]:
+    """Totais por mês e classe sem expandir as linhas de cada item.
+
+    Cada série contribui com a parcela fixa nos meses [início, fim - 1) e com o
+    resíduo no último mês; acumulam-se apenas as variações (em centavos) nos
+    meses de início/fim e os totais saem por soma prefixada. O saldo inicial do
+    mês é (valor dos itens já iniciados) - (depreciação acumulada até o mês
+    anterior), já que itens encerrados estão totalmente depreciados.
+    """
+    por_classe: dict[str, dict] = {}
+    for it in itens:
+        serie = _cronograma_serie(it)
+        if serie is None:
+            continue
+        start, total_meses, valor_aquisicao = serie
+        vc = centavos(valor_aquisicao)
+        mensal = parcela_centavos(vc, total_meses)
+        ultimo = vc - (total_meses - 1) * mensal
+        m0 = start.year * 12 + start.month - 1
+        m_ultimo = m0 + total_meses - 1
+        agg = por_classe.setdefault(str(getattr(it, 'classe', '') or ''), {
+            'parcela': {}, 'residuo': {}, 'valor': {}, 'ativos': {}, 'min': m0, 'max': m_ultimo,
+        })
+        for chave, mes, delta in (
+            ('parcela', m0, mensal), ('parcela', m_ultimo, -mensal),
+            ('residuo', m_ultimo, ultimo),
+            ('valor', m0, vc),
+            ('ativos', m0, 1), ('ativos', m_ultimo + 1, -1),
+        ):
+            agg[chave][mes] = agg[chave].get(mes, 0) + delta
+        agg['min'] = min(agg['min'], m0)
+        agg['max'] = max(agg['max'], m_ultimo)
+
+    rows = []
+    for classe in sorted(por_classe):
+        agg = por_classe[classe]
+        parcela = valor = ativos = acumulada = 0
+        for mes in range(agg['min'], agg['max'] + 1):
+            parcela += agg['parcela'].get(mes, 0)
+            valor += agg['valor'].get(mes, 0)
+            ativos += agg['ativos'].get(mes, 0)
+            dep = parcela + agg['residuo'].get(mes, 0)
+            saldo_inicial = valor - acumulada
+            acumulada += dep
+            if ativos <= 0:
+                continue
+            rows.append({
+                'periodo': date(mes // 12, mes % 12 + 1, 1),
+                'classe': classe,
+                'quantidade_ativos': ativos,
+                'saldo_inicial': saldo_inicial / 100,
+                'depreciacao_mes': dep / 100,
+                'saldo_final': (saldo_inicial - dep) / 100,
+            })
+    rows.sort(key=lambda r: (r['periodo'], r['classe']))
+    return rows
+
+
+def _parse_cursor(cursor: str | None) -> tuple[int, int] | None:
+    if not cursor:
+        return None
+    try:
+        item_id, mes = cursor.split(':', 1)
+        return int(item_id), int(mes)
+    except ValueError:
+        raise HTTPException(status_code=400, detail='Cursor inválido')
+
 
 @router.get('/cronograma')
 def cronograma(
+    request: Request,
     empresa_id: int | None = None,
     ug_id: int | None = None,
     classe_id: int | None = None,
@@ -333,12 +433,26 @@ def cronograma(
     periodo_fim: date | None = None,
     status: str | None = None,
     item_id: int | None = None,
+    formato: str = 'json',
+    cursor: str | None = None,
+    limite: int = CRONOGRAMA_LIMITE_PADRAO,
     current_user: UsuarioModel = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """Cronograma mensal de depreciação dos itens filtrados.
+
+    formato:
+    - json: página de até `limite` linhas; `proximo_cursor` (item_id:mês) retoma
+      a partir da última linha devolvida.
+    - ndjson: todas as linhas, uma por linha JSON, geradas sob demanda.
+    - agregado: totais por mês e classe.
+    """
     allowed = get_allowed_company_ids(db, current_user)
     if empresa_id is not None and allowed and empresa_id not in allowed:
         raise HTTPException(status_code=403, detail='Acesso negado ao cronograma da empresa informada')
+    formato = (formato or 'json').strip().lower()
+    if formato not in {'json', 'ndjson', 'agregado'}:
+        raise HTTPException(status_code=400, detail='Formato inválido. Use json, ndjson ou agregado')
     params = {
         'empresa_id': empresa_id,
         'ug_id': ug_id,
@@ -348,56 +462,122 @@ def cronograma(
         'periodo_fim': periodo_fim,
         'status': status,
     }
-    q = _filters_query(db, params, allowed)
+    q = _filters_query(db, params, allowed).with_entities(*_CRONOGRAMA_COLUNAS)
     if item_id is not None:
         q = q.filter(RevisaoItemModel.id == int(item_id))
-    itens = q.all()
+
+    chave = None
+    if formato != 'ndjson':
+        chave = cache_relatorios.chave(
+            db, f'cronograma_{formato}', {**params, 'item_id': item_id, 'cursor': cursor, 'limite': limite}, allowed
+        )
+        entrada = cache_relatorios.obter(chave)
+        if entrada:
+            _log_emissao(db, current_user, params, f'json_cronograma_{formato}', 'hit')
+            return cache_relatorios.resposta(entrada)
+
+    diagnosticar(request, db, current_user, q, f'relatorios_rvu.cronograma_{formato}')
+    if formato == 'agregado':
+        data = _cronograma_agregado(_iter_itens_keyset(q))
+        if chave:
+            _log_emissao(db, current_user, params, 'json_cronograma_agregado', 'miss')
+        return _resposta_json(chave, data)
+
+    if formato == 'ndjson':
+        def gerar():
+            # Sessão própria: a resposta continua sendo gerada após o retorno da rota
+            stream_db = SessionLocal()
+            try:
+                for it in _iter_itens_keyset(q.with_session(stream_db)):
+                    for _i, row in _cronograma_linhas(it):
+                        yield json.dumps(row, default=str, ensure_ascii=False) + '\n'
+            finally:
+                stream_db.close()
+
+        return StreamingResponse(gerar(), media_type='application/x-ndjson')
+
+    limite = max(1, min(int(limite or CRONOGRAMA_LIMITE_PADRAO), CRONOGRAMA_LIMITE_MAXIMO))
+    pos = _parse_cursor(cursor)
     rows = []
-    for it in itens:
-        start = getattr(it, 'data_inicio_depreciacao', None)
-        end = _data_fim(it)
-        if not start or not end:
-            # pula itens sem período definido
-            continue
-        total_meses = _months_diff(start, end)
-        # Base de cálculo: valor de aquisição (sem valor residual na base atual)
-        valor_aquisicao = float(getattr(it, 'valor_aquisicao', 0) or 0)
-        if total_meses <= 0 or valor_aquisicao <= 0:
-            continue
-        depreciacao_mensal = round(valor_aquisicao / total_meses, 2)
-        saldo = valor_aquisicao
-        for i in range(total_meses):
-            periodo_data = _add_months(start, i)
-            dep_mes = depreciacao_mensal
-            # Ajuste do último mês para zerar o saldo evitando resíduos de arredondamento
-            if i == total_meses - 1:
-                dep_mes = round(saldo, 2)
-            saldo_final = round(saldo - dep_mes, 2)
-            rows.append({
-                'numero_imobilizado': getattr(it, 'numero_imobilizado', None),
-                'sub_numero': getattr(it, 'sub_numero', None),
-                'descricao': getattr(it, 'descricao', None),
-                'classe': getattr(it, 'classe', None),
-                'periodo': periodo_data,
-                'saldo_inicial': round(saldo, 2),
-                'depreciacao_mes': dep_mes,
-                'saldo_final': saldo_final,
-            })
-            saldo = saldo_final
-    return rows
+    proximo_cursor = None
+    # Uma linha a mais indica se há próxima página (cursor na última linha devolvida)
+    for it in _iter_itens_keyset(q, inicio_id=pos[0] if pos else None):
+        desde = pos[1] + 1 if pos and it.id == pos[0] else 0
+        for i, row in _cronograma_linhas(it, desde=desde):
+            rows.append(row)
+            if len(rows) > limite:
+                break
+            ultima_posicao = f"{it.id}:{i}"
+        if len(rows) > limite:
+            break
+    if len(rows) > limite:
+        rows = rows[:limite]
+        proximo_cursor = ultima_posicao
+    if chave:
+        _log_emissao(db, current_user, params, 'json_cronograma_json', 'miss')
+    return _resposta_json(chave, {'itens': rows, 'proximo_cursor': proximo_cursor})
+
+_EXCEL_DETALHAMENTO_COLUNAS = [
+    'Nº Imobilizado', 'Subnº', 'Descrição', 'Classe', 'Valor Aquisição', 'Depreciação Acumulada',
+    'Valor Contábil', 'Vida Útil Atual (a)', 'Vida Útil Atual (m)', 'Vida Útil Revisada (a)',
+    'Vida Útil Revisada (m)', 'Data Início', 'Data Fim Atual', 'Data Fim Revisada', 'Revisor', 'Status',
+]
+_EXCEL_CRONOGRAMA_COLUNAS = [
+    'Nº Imobilizado', 'Subnº', 'Descrição', 'Classe', 'Período', 'Saldo Inicial', 'Depreciação do Mês', 'Saldo Final',
+]
+# Linhas lidas por vez do cursor no servidor durante as exportações
+EXPORT_YIELD_PER = 2000
+
+
+def _linhas_detalhamento(q):
+    for it, revisor_nome in q:
+        atual_total = (it.vida_util_periodos or 0)
+        if atual_total == 0 and (it.vida_util_anos or 0) > 0:
+            atual_total = (it.vida_util_anos or 0) * 12
+        atual_anos = (atual_total // 12) if atual_total is not None else 0
+        atual_meses = (atual_total % 12) if atual_total is not None else 0
+        revisada_total = it.vida_util_revisada or 0
+        revisada_anos = (revisada_total // 12) if revisada_total else 0
+        revisada_meses = (revisada_total % 12) if revisada_total else 0
+        yield (
+            getattr(it, 'numero_imobilizado', None),
+            getattr(it, 'sub_numero', None),
+            getattr(it, 'descricao', None),
+            getattr(it, 'classe', None),
+            float(getattr(it, 'valor_aquisicao', 0) or 0),
+            float(getattr(it, 'depreciacao_acumulada', 0) or 0),
+            float(getattr(it, 'valor_contabil', 0) or 0),
+            atual_anos,
+            atual_meses,
+            revisada_anos,
+            revisada_meses,
+            getattr(it, 'data_inicio_depreciacao', None),
+            getattr(it, 'data_fim_depreciacao', None),
+            getattr(it, 'data_fim_revisada', None),
+            revisor_nome,
+            getattr(it, 'status', None),
+        )
+
+
+def _linhas_cronograma_excel(q):
+    for it in q:
+        for _i, row in _cronograma_linhas(it):
+            yield (
+                row['numero_imobilizado'],
+                row['sub_numero'],
+                row['descricao'],
+                row['classe'],
+                row['periodo'],
+                row['saldo_inicial'],
+                row['depreciacao_mes'],
+                row['saldo_final'],
+            )
+
 
 @router.get('/excel')
-def excel(empresa_id: int | None = None, ug_id: int | None = None, classe_id: int | None = None, revisor_id: int | None = None,
+def excel(request: Request, empresa_id: int | None = None, ug_id: int | None = None, classe_id: int | None = None, revisor_id: int | None = None,
           periodo_inicio: date | None = None, periodo_fim: date | None = None, status: str | None = None,
           current_user: UsuarioModel = Depends(get_current_user), db: Session = Depends(get_db)):
-    try:
-        import pandas as pd
-    except ImportError:
-        raise HTTPException(status_code=500, detail="Dependência 'pandas' não instalada no servidor.")
-    except Exception as e:
-        print(f"Erro ao importar pandas: {e}")
-        raise HTTPException(status_code=500, detail="Erro interno ao carregar dependências.")
-
     try:
         allowed = get_allowed_company_ids(db, current_user)
         if empresa_id is not None and allowed and empresa_id not in allowed:
@@ -413,69 +593,35 @@ def excel(empresa_id: int | None = None, ug_id: int | None = None, classe_id: in
             'status': status,
         }
         
-        q = _filters_query(db, params, allowed)
-        
-        # Eager load created_by user to avoid N+1
-        # However, created_by is an ID field, not a relationship in the model definition shown (it says criado_por: int)
-        # So we need to join manually or fetch users.
-        # Let's fetch all relevant users in one go.
-        items = q.all()
-        
-        user_ids = {it.criado_por for it in items if it.criado_por}
-        users_map = {}
-        if user_ids:
-            users = db.query(UsuarioModel).filter(UsuarioModel.id.in_(user_ids)).all()
-            users_map = {u.id: getattr(u, 'nome_completo', None) for u in users}
-
-        rows = []
-        for it in items:
-            atual_total = (it.vida_util_periodos or 0)
-            if atual_total == 0 and (it.vida_util_anos or 0) > 0:
-                atual_total = (it.vida_util_anos or 0) * 12
-            atual_anos = (atual_total // 12) if atual_total is not None else 0
-            atual_meses = (atual_total % 12) if atual_total is not None else 0
-            revisada_total = it.vida_util_revisada or 0
-            revisada_anos = (revisada_total // 12) if revisada_total else 0
-            revisada_meses = (revisada_total % 12) if revisada_total else 0
-            
-            revisor_nome = users_map.get(it.criado_por)
+        params_str = (
+            f"empresa_id={empresa_id},ug_id={ug_id},classe_id={classe_id},"
+            f"revisor_id={revisor_id},periodo_inicio={periodo_inicio},"
+            f"periodo_fim={periodo_fim},status={status}"
+        )
+        chave = cache_relatorios.chave(db, 'excel_resumo', params, allowed)
+        entrada = cache_relatorios.obter(chave)
+        if entrada:
+            _log_emissao(db, current_user, params, 'excel_resumo', 'hit')
+            return cache_relatorios.resposta(entrada)
+
+        # Nome do revisor (criado_por) no próprio SELECT; linhas lidas do cursor em lotes
+        q = (
+            _filters_query(db, params, allowed)
+            .outerjoin(UsuarioModel, UsuarioModel.id == RevisaoItemModel.criado_por)
+            .add_columns(UsuarioModel.nome_completo)
+            .yield_per(EXPORT_YIELD_PER)
+        )
+        diagnosticar(request, db, current_user, q, 'relatorios_rvu.excel')
 
-            rows.append({
-                'Nº Imobilizado': getattr(it, 'numero_imobilizado', None),
-                'Subnº': getattr(it, 'sub_numero', None),
-                'Descrição': getattr(it, 'descricao', None),
-                'Classe': getattr(it, 'classe', None),
-                'Valor Aquisição': float(getattr(it, 'valor_aquisicao', 0) or 0),
-                'Depreciação Acumulada': float(getattr(it, 'depreciacao_acumulada', 0) or 0),
-                'Valor Contábil': float(getattr(it, 'valor_contabil', 0) or 0),
-                'Vida Útil Atual (a)': atual_anos,
-                'Vida Útil Atual (m)': atual_meses,
-                'Vida Útil Revisada (a)': revisada_anos,
-                'Vida Útil Revisada (m)': revisada_meses,
-                'Data Início': getattr(it, 'data_inicio_depreciacao', None),
-                'Data Fim Atual': getattr(it, 'data_fim_depreciacao', None),
-                'Data Fim Revisada': getattr(it, 'data_fim_revisada', None),
-                'Revisor': revisor_nome,
-                'Status': getattr(it, 'status', None),
-            })
-        
-        if not rows:
-             # Retornar planilha vazia com cabeçalhos se não houver itens
-             rows = [{'Mensagem': 'Nenhum item encontrado com os filtros aplicados'}]
-             
-        df = pd.DataFrame(rows)
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Aba 2: Detalhamento (implementação base)
-            df.to_excel(writer, index=False, sheet_name='Detalhamento dos Ativos')
-            # Demais abas como placeholders simples
-            pd.DataFrame({'Info': ['Resumo Geral (placeholder)']}).to_excel(writer, index=False, sheet_name='Resumo Geral')
-        
-        output.seek(0)
-        headers = {
-            'Content-Disposition': 'attachment; filename="Relatorio_RVU.xlsx"'
-        }
-        content = output.getvalue()
+        wb = nova_planilha()
+        # Aba 2: Detalhamento (implementação base); vazia -> mensagem
+        adicionar_aba(
+            wb, 'Detalhamento dos Ativos', _EXCEL_DETALHAMENTO_COLUNAS, _linhas_detalhamento(q),
+            mensagem_vazia=('Mensagem', 'Nenhum item encontrado com os filtros aplicados'),
+        )
+        # Demais abas como placeholders simples
+        adicionar_aba(wb, 'Resumo Geral', ['Info'], [['Resumo Geral (placeholder)']])
+        path = salvar_temporario(wb)
 
         try:
             empresa_log = None
@@ -485,11 +631,6 @@ def excel(empresa_id: int | None = None, ug_id: int | None = None, classe_id: in
             except Exception:
                 empresa_log = None
 
-            params_str = (
-                f"empresa_id={empresa_id},ug_id={ug_id},classe_id={classe_id},"
-                f"revisor_id={revisor_id},periodo_inicio={periodo_inicio},"
-                f"periodo_fim={periodo_fim},status={status}"
-            )
             _log_relatorio(
                 db,
                 usuario_id=current_user.id if getattr(current_user, 'id', None) is not None else None,
@@ -497,11 +638,12 @@ def excel(empresa_id: int | None = None, ug_id: int | None = None, classe_id: in
                 tipo_arquivo="excel_resumo",
                 parametros_usados=params_str,
                 caminho_arquivo=None,
+                cache='miss' if chave else None,
             )
         except Exception:
             pass
 
-        return Response(content=content, media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers=headers)
+        return _resposta_arquivo(chave, path, XLSX_MEDIA_TYPE, 'Relatorio_RVU.xlsx')
         
     except HTTPException:
         raise
@@ -514,6 +656,7 @@ def excel(empresa_id: int | None = None, ug_id: int | None = None, classe_id: in
 
 @router.get('/cronograma/excel')
 def cronograma_excel(
+    request: Request,
     empresa_id: int | None = None,
     ug_id: int | None = None,
     classe_id: int | None = None,
@@ -525,14 +668,6 @@ def cronograma_excel(
     current_user: UsuarioModel = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    try:
-        import pandas as pd
-    except ImportError:
-        raise HTTPException(status_code=500, detail="Dependência 'pandas' não instalada no servidor.")
-    except Exception as e:
-        print(f"Erro ao importar pandas: {e}")
-        raise HTTPException(status_code=500, detail="Erro interno ao carregar dependências.")
-
     try:
         allowed = get_allowed_company_ids(db, current_user)
         if empresa_id is not None and allowed and empresa_id not in allowed:
@@ -548,52 +683,24 @@ def cronograma_excel(
             'status': status,
         }
         
-        q = _filters_query(db, params, allowed)
+        chave = cache_relatorios.chave(db, 'excel_cronograma', {**params, 'item_id': item_id}, allowed)
+        entrada = cache_relatorios.obter(chave)
+        if entrada:
+            _log_emissao(db, current_user, {**params, 'item_id': item_id}, 'excel_cronograma', 'hit')
+            return cache_relatorios.resposta(entrada)
+
+        q = _filters_query(db, params, allowed).with_entities(*_CRONOGRAMA_COLUNAS)
         if item_id is not None:
             q = q.filter(RevisaoItemModel.id == int(item_id))
-            
-        itens = q.all()
-        rows = []
-        for it in itens:
-            start = getattr(it, 'data_inicio_depreciacao', None)
-            end = _data_fim(it)
-            if not start or not end:
-                continue
-            total_meses = _months_diff(start, end)
-            valor_aquisicao = float(getattr(it, 'valor_aquisicao', 0) or 0)
-            if total_meses <= 0 or valor_aquisicao <= 0:
-                continue
-            depreciacao_mensal = round(valor_aquisicao / total_meses, 2)
-            saldo = valor_aquisicao
-            for i in range(total_meses):
-                periodo_data = _add_months(start, i)
-                dep_mes = depreciacao_mensal
-                if i == total_meses - 1:
-                    dep_mes = round(saldo, 2)
-                saldo_final = round(saldo - dep_mes, 2)
-                rows.append({
-                    'Nº Imobilizado': getattr(it, 'numero_imobilizado', None),
-                    'Subnº': getattr(it, 'sub_numero', None),
-                    'Descrição': getattr(it, 'descricao', None),
-                    'Classe': getattr(it, 'classe', None),
-                    'Período': periodo_data,
-                    'Saldo Inicial': round(saldo, 2),
-                    'Depreciação do Mês': dep_mes,
-                    'Saldo Final': saldo_final,
-                })
-        
-        if not rows:
-             rows = [{'Mensagem': 'Nenhum cronograma gerado para os filtros aplicados'}]
-
-        df = pd.DataFrame(rows)
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Cronograma Mensal')
-        output.seek(0)
-        
-        headers = {
-            'Content-Disposition': 'attachment; filename="Cronograma_RVU.xlsx"'
-        }
+        diagnosticar(request, db, current_user, q, 'relatorios_rvu.cronograma_excel')
+
+        wb = nova_planilha()
+        adicionar_aba(
+            wb, 'Cronograma Mensal', _EXCEL_CRONOGRAMA_COLUNAS,
+            _linhas_cronograma_excel(q.yield_per(EXPORT_YIELD_PER)),
+            mensagem_vazia=('Mensagem', 'Nenhum cronograma gerado para os filtros aplicados'),
+        )
+        path = salvar_temporario(wb)
         
         try:
             empresa_log = None
@@ -615,11 +722,12 @@ def cronograma_excel(
                 tipo_arquivo="excel_cronograma",
                 parametros_usados=params_str,
                 caminho_arquivo=None,
+                cache='miss' if chave else None,
             )
         except Exception:
             pass
 
-        return Response(content=output.read(), media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers=headers)
+        return _resposta_arquivo(chave, path, XLSX_MEDIA_TYPE, 'Cronograma_RVU.xlsx')
 
     except HTTPException:
         raise
@@ -631,7 +739,7 @@ def cronograma_excel(
         raise HTTPException(status_code=500, detail="Erro interno ao gerar Excel Cronograma")
 
 @router.get('/pdf')
-def pdf(empresa_id: int | None = None, ug_id: int | None = None, classe_id: int | None = None, revisor_id: int | None = None,
+def pdf(request: Request, empresa_id: int | None = None, ug_id: int | None = None, classe_id: int | None = None, revisor_id: int | None = None,
         periodo_inicio: date | None = None, periodo_fim: date | None = None, status: str | None = None,
         periodo_id: int | None = None,
         current_user: UsuarioModel = Depends(get_current_user),
@@ -659,7 +767,14 @@ def pdf(empresa_id: int | None = None, ug_id: int | None = None, classe_id: int
             'status': status,
             'periodo_id': periodo_id,
         }
+        chave = cache_relatorios.chave(db, 'pdf_resumo', params, allowed)
+        entrada = cache_relatorios.obter(chave)
+        if entrada:
+            _log_emissao(db, current_user, params, 'pdf_resumo', 'hit')
+            return cache_relatorios.resposta(entrada)
+
         q = _filters_query(db, params, allowed)
+        diagnosticar(request, db, current_user, q, 'relatorios_rvu.pdf')
         items = q.all()
 
         buffer = io.BytesIO()
@@ -756,10 +871,13 @@ def pdf(empresa_id: int | None = None, ug_id: int | None = None, classe_id: int
                 tipo_arquivo="pdf_resumo",
                 parametros_usados=params_str,
                 caminho_arquivo=None,
+                cache='miss' if chave else None,
             )
         except Exception:
             pass
 
+        if chave:
+            cache_relatorios.gravar_bytes(chave, pdf_bytes, 'application/pdf')
         return Response(content=pdf_bytes, media_type='application/pdf')
 
     except HTTPException:
@@ -785,7 +903,8 @@ def list_log(current_user: UsuarioModel = Depends(get_current_user), db: Session
             if missing:
                 return []
 
-            sql = "SELECT id, data_emissao, usuario_id, empresa_id, tipo_arquivo, parametros_usados, caminho_arquivo FROM relatorios_rvu_logs ORDER BY data_emissao DESC"
+            extra = ", cache" if 'cache' in cols else ""
+            sql = f"SELECT id, data_emissao, usuario_id, empresa_id, tipo_arquivo, parametros_usados, caminho_arquivo{extra} FROM relatorios_rvu_logs ORDER BY data_emissao DESC"
             rows = conn.execute(sa.text(sql)).mappings().all()
             return [dict(r) for r in rows]
     except Exception:
@@ -1,18 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional, Any
 from datetime import date, datetime, timedelta
+from decimal import Decimal
+import base64
 import shutil
 import os
 import pandas as pd
 import numpy as np
 from pydantic import BaseModel
 import traceback
+from types import SimpleNamespace
 import json
 import sqlalchemy as sa
 
 from ..database import SessionLocal
 from ..models import (
+    REVISAO_ITEM_VENCIMENTO_SQL,
     Usuario as UsuarioModel,
     RevisaoPeriodo as RevisaoPeriodoModel,
     RevisaoItem as RevisaoItemModel,
@@ -23,6 +28,9 @@ from ..models import (
     Asset as AssetModel
 )
 from ..dependencies import get_db, get_current_user, get_allowed_company_ids, is_admin_user
+from .. import eventos, fila_auditoria, serializacao
+from ..busca import escapar_like
+from ..depreciacao import add_months
 
 router = APIRouter(
     prefix="/revisoes",
@@ -297,19 +305,39 @@ class RevisaoItemResponse(BaseModel):
     class Config:
         from_attributes = True
 
-from fastapi.responses import JSONResponse
+# Colunas da listagem de itens, na ordem das chaves do JSON. valor_contabil vem
+# convertido para double no próprio banco (o driver já entrega float) e as datas
+# seguem como date: serializacao.dumps gera o mesmo ISO de isoformat().
+_ITENS_COLUNAS = (
+    RevisaoItemModel.id,
+    RevisaoItemModel.periodo_id,
+    RevisaoItemModel.numero_imobilizado,
+    RevisaoItemModel.sub_numero,
+    RevisaoItemModel.descricao,
+    RevisaoItemModel.data_inicio_depreciacao,
+    RevisaoItemModel.data_fim_depreciacao,
+    sa.func.coalesce(sa.cast(RevisaoItemModel.valor_contabil, sa.Float), 0.0).label("valor_contabil"),
+    RevisaoItemModel.centro_custo,
+    RevisaoItemModel.classe,
+    RevisaoItemModel.descricao_classe,
+    RevisaoItemModel.vida_util_anos,
+    RevisaoItemModel.vida_util_periodos,
+    RevisaoItemModel.vida_util_revisada,
+    RevisaoItemModel.data_fim_revisada,
+    RevisaoItemModel.condicao_fisica,
+    RevisaoItemModel.justificativa,
+    RevisaoItemModel.auxiliar2,
+    RevisaoItemModel.auxiliar3,
+    RevisaoItemModel.status,
+    RevisaoItemModel.alterado,
+    RevisaoItemModel.criado_por,
+)
+_ITENS_CAMPOS = tuple(c.key for c in _ITENS_COLUNAS)
+_codificar_item = serializacao.codificador_linhas(_ITENS_CAMPOS)
 
-@router.get("/itens/{periodo_id}")
-def listar_itens_revisao(
-    periodo_id: int,
-    db: Session = Depends(get_db),
-    current_user: UsuarioModel = Depends(get_current_user)
-):
-    """
-    Lista itens de um período de revisão.
-    Filtra por delegações se o usuário não for responsável/admin.
-    Otimizado para grandes volumes de dados (retorna JSON direto).
-    """
+
+def _periodo_itens(db: Session, periodo_id: int, current_user: UsuarioModel):
+    """(período, responsável ou admin) após checar existência e acesso à empresa."""
     periodo = db.query(RevisaoPeriodoModel).filter(RevisaoPeriodoModel.id == periodo_id).first()
     if not periodo:
         raise HTTPException(status_code=404, detail="Período não encontrado")
@@ -320,84 +348,253 @@ def listar_itens_revisao(
     
     # Verifica se usuário é responsável ou admin
     is_responsible = (periodo.responsavel_id == current_user.id) or is_admin_user(db, current_user)
+    return periodo, is_responsible
+
+
+def _filtro_delegacao(periodo_id: int, usuario_id: int):
+    """Itens delegados (ativos) ao usuário OU revertidos por ele."""
+    delegation_subquery = sa.select(RevisaoDelegacaoModel.ativo_id).where(
+        RevisaoDelegacaoModel.periodo_id == periodo_id,
+        RevisaoDelegacaoModel.revisor_id == usuario_id,
+        RevisaoDelegacaoModel.status == 'Ativo'
+    )
+    return sa.or_(
+        RevisaoItemModel.id.in_(delegation_subquery),
+        sa.and_(
+            RevisaoItemModel.status == 'Revertido',
+            RevisaoItemModel.criado_por == usuario_id
+        )
+    )
+
+
+@router.get("/itens/{periodo_id}")
+def listar_itens_revisao(
+    periodo_id: int,
+    db: Session = Depends(get_db),
+    current_user: UsuarioModel = Depends(get_current_user)
+):
+    """
+    Lista itens de um período de revisão.
+    Filtra por delegações se o usuário não for responsável/admin.
+    Otimizado para grandes volumes de dados: tuplas com só as colunas da
+    resposta, codificadas direto em bytes JSON (app/serializacao.py).
+    """
+    periodo, is_responsible = _periodo_itens(db, periodo_id, current_user)
     
-    # Query otimizada selecionando apenas colunas necessárias
-    query = db.query(
-        RevisaoItemModel.id,
-        RevisaoItemModel.periodo_id,
-        RevisaoItemModel.numero_imobilizado,
-        RevisaoItemModel.sub_numero,
-        RevisaoItemModel.descricao,
-        RevisaoItemModel.data_inicio_depreciacao,
-        RevisaoItemModel.data_fim_depreciacao,
-        RevisaoItemModel.valor_contabil,
-        RevisaoItemModel.centro_custo,
-        RevisaoItemModel.classe,
-        RevisaoItemModel.descricao_classe,
-        RevisaoItemModel.vida_util_anos,
-        RevisaoItemModel.vida_util_periodos,
-        RevisaoItemModel.vida_util_revisada,
-        RevisaoItemModel.data_fim_revisada,
-        RevisaoItemModel.condicao_fisica,
-        RevisaoItemModel.justificativa,
-        RevisaoItemModel.auxiliar2,
-        RevisaoItemModel.auxiliar3,
-        RevisaoItemModel.status,
-        RevisaoItemModel.alterado,
-        RevisaoItemModel.criado_por
-    ).filter(RevisaoItemModel.periodo_id == periodo_id)
-    
-    # Filtro de delegação OTIMIZADO
+    stmt = sa.select(*_ITENS_COLUNAS).where(RevisaoItemModel.periodo_id == periodo_id)
     if not is_responsible:
-        # Subquery para delegações ativas do usuário
-        delegation_subquery = db.query(RevisaoDelegacaoModel.ativo_id).filter(
-            RevisaoDelegacaoModel.periodo_id == periodo_id,
-            RevisaoDelegacaoModel.revisor_id == current_user.id,
-            RevisaoDelegacaoModel.status == 'Ativo'
-        )
+        stmt = stmt.where(_filtro_delegacao(periodo_id, current_user.id))
         
-        # Filtra itens que estão delegados OU foram revertidos pelo usuário
-        query = query.filter(
-            sa.or_(
-                RevisaoItemModel.id.in_(delegation_subquery),
-                sa.and_(
-                    RevisaoItemModel.status == 'Revertido',
-                    RevisaoItemModel.criado_por == current_user.id
-                )
+    # Tuplas puras (sem Row/ORM) e um único dumps para o array inteiro
+    linhas = db.execute(stmt).tuples()
+    return serializacao.RespostaJSON(serializacao.dumps(list(map(_codificar_item, linhas))))
+
+
+ITENS_PAGINA_LIMITE_MAXIMO = 1000
+
+# Ordenações da listagem paginada: chave SQL e conversão do valor no cursor.
+# Cada uma tem índice (periodo_id, chave, id) em revisoes_itens (ver models.RevisaoItem).
+_ITENS_ORDENACOES = {
+    "vencimento": (sa.literal_column(REVISAO_ITEM_VENCIMENTO_SQL), date.fromisoformat),
+    "numero_imobilizado": (RevisaoItemModel.numero_imobilizado, str),
+    "valor_contabil": (RevisaoItemModel.valor_contabil, Decimal),
+    "classe": (RevisaoItemModel.classe, str),
+    "centro_custo": (RevisaoItemModel.centro_custo, str),
+    "status": (RevisaoItemModel.status, str),
+}
+
+# Mesma regra de isItemRevisado nas telas de revisão
+_STATUS_REVISADOS = ("revisado", "revisada", "aprovado", "concluido", "concluído")
+_ITEM_REVISADO = sa.and_(
+    sa.func.lower(RevisaoItemModel.status) != "revertido",
+    sa.or_(
+        sa.func.lower(RevisaoItemModel.status).in_(_STATUS_REVISADOS),
+        RevisaoItemModel.alterado.is_(True),
+        sa.func.trim(sa.func.coalesce(RevisaoItemModel.justificativa, "")) != "",
+        sa.func.trim(sa.func.coalesce(RevisaoItemModel.condicao_fisica, "")) != "",
+    ),
+)
+
+
+def _cursor_itens(ordenar: str, chave, item_id: int) -> str:
+    bruto = serializacao.dumps([ordenar, str(chave), item_id])
+    return base64.urlsafe_b64encode(bruto).decode("ascii").rstrip("=")
+
+
+def _parse_cursor_itens(cursor: Optional[str], ordenar: str) -> Optional[tuple]:
+    if not cursor:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ordem, chave, item_id = json.loads(bruto)
+        if ordem != ordenar:
+            raise ValueError(ordem)
+        return _ITENS_ORDENACOES[ordenar][1](chave), int(item_id)
+    except (ValueError, TypeError, ArithmeticError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+@router.get("/itens/{periodo_id}/pagina")
+def listar_itens_revisao_pagina(
+    periodo_id: int,
+    limit: int = 200,
+    cursor: Optional[str] = None,
+    ordenar: str = "vencimento",
+    direcao: str = "asc",
+    classe: Optional[str] = None,
+    centro_custo: Optional[str] = None,
+    status: Optional[str] = None,
+    situacao: Optional[str] = None,
+    incremento: Optional[str] = None,
+    vencimento_18m: bool = False,
+    q: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: UsuarioModel = Depends(get_current_user)
+):
+    """
+    Variante paginada de /revisoes/itens/{periodo_id}, com filtros e ordenação no servidor.
+
+    Paginação por chave (ordenação, id): `proximo_cursor` retoma a partir do
+    último item devolvido, usando os índices (periodo_id, chave, id) — a
+    primeira página custa o mesmo em qualquer tamanho de período.
+    - ordenar: vencimento (fim de vida útil revisado ou original), numero_imobilizado,
+      valor_contabil, classe, centro_custo ou status; direcao: asc | desc
+    - classe, centro_custo, status: valor exato
+    - situacao: pendentes | revisados (mesma regra das abas das telas)
+    - incremento: Manter | Acréscimo | Decréscimo (sem valor conta como Manter)
+    - vencimento_18m: só itens com fim de vida útil nos próximos 18 meses
+    - q: trecho do número do imobilizado ou da descrição
+    Os itens têm os mesmos campos da listagem completa.
+    """
+    ordenar = (ordenar or "vencimento").strip().lower()
+    if ordenar not in _ITENS_ORDENACOES:
+        raise HTTPException(status_code=400, detail=f"Ordenação inválida. Use: {', '.join(_ITENS_ORDENACOES)}")
+    direcao = (direcao or "asc").strip().lower()
+    if direcao not in {"asc", "desc"}:
+        raise HTTPException(status_code=400, detail="Direção inválida. Use asc ou desc")
+    situacao = (situacao or "").strip().lower() or None
+    if situacao not in {None, "pendentes", "revisados"}:
+        raise HTTPException(status_code=400, detail="Situação inválida. Use pendentes ou revisados")
+    limit = max(1, min(int(limit or 200), ITENS_PAGINA_LIMITE_MAXIMO))
+
+    periodo, is_responsible = _periodo_itens(db, periodo_id, current_user)
+
+    chave_sql = _ITENS_ORDENACOES[ordenar][0]
+    stmt = sa.select(*_ITENS_COLUNAS, chave_sql.label("chave")).where(RevisaoItemModel.periodo_id == periodo_id)
+    if not is_responsible:
+        stmt = stmt.where(_filtro_delegacao(periodo_id, current_user.id))
+
+    if classe:
+        stmt = stmt.where(RevisaoItemModel.classe == classe)
+    if centro_custo:
+        stmt = stmt.where(RevisaoItemModel.centro_custo == centro_custo)
+    if status:
+        stmt = stmt.where(RevisaoItemModel.status == status)
+    if situacao == "revisados":
+        stmt = stmt.where(_ITEM_REVISADO)
+    elif situacao == "pendentes":
+        stmt = stmt.where(sa.not_(_ITEM_REVISADO))
+    if incremento:
+        if incremento.strip().lower() == "manter":
+            stmt = stmt.where(sa.or_(RevisaoItemModel.auxiliar2.is_(None), RevisaoItemModel.auxiliar2 == "Manter"))
+        else:
+            stmt = stmt.where(RevisaoItemModel.auxiliar2 == incremento)
+    if vencimento_18m:
+        # Meses até o vencimento entre 0 e 18, como o alerta das telas
+        hoje = date.today()
+        vencimento = _ITENS_ORDENACOES["vencimento"][0]
+        stmt = stmt.where(vencimento >= hoje, vencimento < add_months(hoje, 19))
+    termo = (q or "").strip()
+    if termo:
+        # Mesma expressão do índice trigram ix_revisoes_itens_busca_trgm
+        texto = RevisaoItemModel.numero_imobilizado.op("||")(" ").op("||")(RevisaoItemModel.descricao)
+        stmt = stmt.where(texto.ilike(f"%{escapar_like(termo)}%"))
+
+    ordem = sa.asc if direcao == "asc" else sa.desc
+    stmt = stmt.order_by(ordem(chave_sql), ordem(RevisaoItemModel.id))
+    pos = _parse_cursor_itens(cursor, ordenar)
+    if pos:
+        limite = sa.tuple_(chave_sql, RevisaoItemModel.id)
+        stmt = stmt.where(limite > sa.tuple_(*pos) if direcao == "asc" else limite < sa.tuple_(*pos))
+
+    # Uma linha a mais indica se há próxima página
+    linhas = db.execute(stmt.limit(limit + 1)).tuples().all()
+    proximo_cursor = None
+    if len(linhas) > limit:
+        linhas = linhas[:limit]
+        ultimo = linhas[-1]
+        proximo_cursor = _cursor_itens(ordenar, ultimo[-1], ultimo[0])
+
+    # A coluna extra "chave" (última) fica fora do JSON: o codificador só lê os campos da listagem
+    return serializacao.RespostaJSON(serializacao.dumps({
+        "itens": list(map(_codificar_item, linhas)),
+        "proximo_cursor": proximo_cursor,
+    }))
+
+def _marca_txid(since: Optional[str]) -> Optional[int]:
+    """Marca `since` (xmin de um snapshot anterior); None = carga completa.
+
+    Marcas em formato antigo (timestamp) também caem na carga completa.
+    """
+    if not since:
+        return None
+    try:
+        marca = int(since)
+    except ValueError:
+        return None
+    if marca < 0:
+        raise HTTPException(status_code=400, detail="Marca 'since' inválida")
+    return marca
+
+
+@router.get("/itens/{periodo_id}/changes")
+def listar_alteracoes_itens_revisao(
+    periodo_id: int,
+    since: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: UsuarioModel = Depends(get_current_user)
+):
+    """
+    Sincronização incremental dos itens de um período.
+
+    Devolve {itens, proximo_since}: os itens (mesmos campos da listagem completa)
+    alterados desde a marca `since` e a marca a usar na próxima chamada. Sem
+    `since`, devolve todos os itens visíveis, como carga inicial. Para revisores,
+    inclui também os itens delegados a eles desde a marca. Itens nunca são
+    removidos de um período; delegações revogadas exigem recarregar a lista.
+
+    A marca é o xmin do snapshot (txid mais antigo ainda em andamento) e cada
+    escrita grava o txid da sua transação em versao_txid (trigger). Uma
+    transação que ainda não tinha confirmado na chamada anterior tem txid >=
+    aquele xmin, então aparece na seguinte, não importa quanto tempo tenha
+    durado; ao custo de alguns itens repetidos.
+    """
+    desde = _marca_txid(since)
+
+    periodo, is_responsible = _periodo_itens(db, periodo_id, current_user)
+
+    # Antes da consulta: o que confirmar entre as duas leituras volta de novo na próxima
+    marca = db.execute(sa.select(sa.func.txid_snapshot_xmin(sa.func.txid_current_snapshot()))).scalar_one()
+    stmt = sa.select(*_ITENS_COLUNAS).where(RevisaoItemModel.periodo_id == periodo_id)
+    if not is_responsible:
+        stmt = stmt.where(_filtro_delegacao(periodo_id, current_user.id))
+    if desde is not None:
+        # Índice ix_revisoes_itens_periodo_versao
+        alterado = RevisaoItemModel.versao_txid >= desde
+        if not is_responsible:
+            delegados = sa.select(RevisaoDelegacaoModel.ativo_id).where(
+                RevisaoDelegacaoModel.periodo_id == periodo_id,
+                RevisaoDelegacaoModel.revisor_id == current_user.id,
+                RevisaoDelegacaoModel.versao_txid >= desde,
             )
-        )
-        
-    results = query.all()
-    
-    # Serialização manual para performance
-    data = []
-    for row in results:
-        data.append({
-            "id": row.id,
-            "periodo_id": row.periodo_id,
-            "numero_imobilizado": row.numero_imobilizado,
-            "sub_numero": row.sub_numero,
-            "descricao": row.descricao,
-            "data_inicio_depreciacao": row.data_inicio_depreciacao.isoformat() if row.data_inicio_depreciacao else None,
-            "data_fim_depreciacao": row.data_fim_depreciacao.isoformat() if row.data_fim_depreciacao else None,
-            "valor_contabil": float(row.valor_contabil) if row.valor_contabil is not None else 0.0,
-            "centro_custo": row.centro_custo,
-            "classe": row.classe,
-            "descricao_classe": row.descricao_classe,
-            "vida_util_anos": row.vida_util_anos,
-            "vida_util_periodos": row.vida_util_periodos,
-            "vida_util_revisada": row.vida_util_revisada,
-            "data_fim_revisada": row.data_fim_revisada.isoformat() if row.data_fim_revisada else None,
-            "condicao_fisica": row.condicao_fisica,
-            "justificativa": row.justificativa,
-            "auxiliar2": row.auxiliar2,
-            "auxiliar3": row.auxiliar3,
-            "status": row.status,
-            "alterado": row.alterado,
-            "criado_por": row.criado_por
-        })
-        
-    return JSONResponse(content=data)
+            alterado = sa.or_(alterado, RevisaoItemModel.id.in_(delegados))
+        stmt = stmt.where(alterado)
+
+    linhas = db.execute(stmt).tuples()
+    return serializacao.RespostaJSON(serializacao.dumps({
+        "itens": list(map(_codificar_item, linhas)),
+        "proximo_since": str(marca),
+    }))
 
 class RevisaoItemUpdate(BaseModel):
     vida_util_nova_anos: Optional[float] = None
@@ -485,110 +682,371 @@ def update_item_revisao(
         
     db.commit()
     db.refresh(item)
+    eventos.publicar_status_itens(periodo.empresa_id, periodo_id, {item.id: item.status})
     
     return item
 
 class MassRevisionPayload(BaseModel):
+    periodo_id: int
     ativos_ids: List[int]
-    incremento: Optional[str] = None # 'Manter', 'Aumentar', 'Diminuir'
-    nova_vida_util_anos: Optional[float] = None
-    nova_vida_util_meses: Optional[float] = None
+    incremento: Optional[str] = None  # Acréscimo | Decréscimo | Manter
+    nova_vida_util_anos: Optional[int] = None
+    nova_vida_util_meses: Optional[int] = None
     nova_data_fim: Optional[date] = None
-    condicao_fisica: Optional[str] = None
+    condicao_fisica: Optional[str] = None  # Bom | Regular | Ruim
     motivo: Optional[str] = None
     justificativa: Optional[str] = None
-    periodo_id: int
 
-@router.post("/massa")
+class MassRevisionItemResult(BaseModel):
+    id: int
+    numero_imobilizado: str
+    changed: bool
+    error: Optional[str] = None
+    original_total_months: Optional[int] = None
+    revised_total_months: Optional[int] = None
+    original_end_date: Optional[date] = None
+    revised_end_date: Optional[date] = None
+    incremento: Optional[str] = None
+    motivo: Optional[str] = None
+
+class MassRevisionResponse(BaseModel):
+    total: int
+    updated: int
+    skipped: int
+    errors: List[str]
+    results: List[MassRevisionItemResult]
+
+# Colunas gravadas pela revisão em massa e seus tipos no VALUES do UPDATE em lote
+_MASSA_COLUNAS = (
+    ("condicao_fisica", "VARCHAR(20)"),
+    ("auxiliar2", "TEXT"),
+    ("auxiliar3", "TEXT"),
+    ("vida_util_revisada", "INTEGER"),
+    ("data_fim_revisada", "DATE"),
+    ("alterado", "BOOLEAN"),
+    ("status", "VARCHAR(20)"),
+    ("justificativa", "TEXT"),
+)
+MASSA_LOTE_LEITURA = 5000
+MASSA_LOTE_UPDATE = 1000
+
+
+def _meses_entre(start: date, end: date) -> int:
+    """Diferença em meses ajustada pelo dia do mês (nunca negativa)."""
+    months = (end.year - start.year) * 12 + (end.month - start.month)
+    if end.day < start.day:
+        months -= 1
+    return max(0, months)
+
+
+def _carregar_itens_massa(db: Session, periodo_id: int, ids: List[int]) -> dict:
+    """Estado atual dos itens do período (id -> SimpleNamespace) lido em poucas consultas por colunas."""
+    colunas = [
+        RevisaoItemModel.id,
+        RevisaoItemModel.numero_imobilizado,
+        RevisaoItemModel.data_inicio_depreciacao,
+        RevisaoItemModel.data_fim_depreciacao,
+        RevisaoItemModel.vida_util_periodos,
+        RevisaoItemModel.criado_por,
+    ] + [getattr(RevisaoItemModel, nome) for nome, _tipo in _MASSA_COLUNAS]
+    unicos = list(dict.fromkeys(ids))
+    itens = {}
+    for i in range(0, len(unicos), MASSA_LOTE_LEITURA):
+        lote = unicos[i:i + MASSA_LOTE_LEITURA]
+        stmt = sa.select(*colunas).where(RevisaoItemModel.periodo_id == periodo_id, RevisaoItemModel.id.in_(lote))
+        for row in db.execute(stmt):
+            itens[row.id] = SimpleNamespace(**row._asdict())
+    return itens
+
+
+def _gravar_itens_massa(db: Session, itens: list):
+    """UPDATE revisoes_itens ... FROM (VALUES ...) em lotes, um comando por lote."""
+    nomes = [nome for nome, _tipo in _MASSA_COLUNAS]
+    atribuicoes = ", ".join(f"{nome} = v.{nome}" for nome in nomes)
+    for i in range(0, len(itens), MASSA_LOTE_UPDATE):
+        lote = itens[i:i + MASSA_LOTE_UPDATE]
+        valores = []
+        params = {}
+        for n, it in enumerate(lote):
+            marcadores = [f"CAST(:id_{n} AS INTEGER)"]
+            params[f"id_{n}"] = it.id
+            for nome, tipo in _MASSA_COLUNAS:
+                marcadores.append(f"CAST(:{nome}_{n} AS {tipo})")
+                params[f"{nome}_{n}"] = getattr(it, nome)
+            valores.append(f"({', '.join(marcadores)})")
+        db.execute(
+            sa.text(
+                f"UPDATE revisoes_itens AS r SET {atribuicoes} "
+                f"FROM (VALUES {', '.join(valores)}) AS v(id, {', '.join(nomes)}) "
+                "WHERE r.id = v.id"
+            ),
+            params,
+        )
+
+
+@router.post("/massa", response_model=MassRevisionResponse)
 def apply_mass_revision(
     payload: MassRevisionPayload,
     db: Session = Depends(get_db),
     current_user: UsuarioModel = Depends(get_current_user)
 ):
     """
-    Aplica revisão em massa para uma lista de ativos.
+    Aplica revisão em massa para uma lista de ativos do período.
+
+    Os itens são lidos por colunas em poucas consultas, as regras de incremento
+    rodam em memória e o estado final vai num UPDATE ... FROM (VALUES ...) por
+    lote, tudo numa única transação. Revisores só alteram itens delegados a
+    eles (ou revertidos que criaram); os demais voltam como erro no resultado.
     """
+    if not payload.ativos_ids:
+        raise HTTPException(status_code=400, detail="Lista de ativos vazia")
+
+    inc = payload.incremento
+    if inc is not None and inc not in {"Acréscimo", "Decréscimo", "Manter"}:
+        raise HTTPException(status_code=400, detail="Incremento inválido")
+
+    cf = payload.condicao_fisica
+    if cf is not None and cf not in {"Bom", "Regular", "Ruim"}:
+        raise HTTPException(status_code=400, detail="Condição física inválida")
+
     periodo = db.query(RevisaoPeriodoModel).filter(RevisaoPeriodoModel.id == payload.periodo_id).first()
     if not periodo:
         raise HTTPException(status_code=404, detail="Período não encontrado")
     if periodo.data_fechamento is not None or str(periodo.status or "").strip().lower() in {"fechado", "encerrado"}:
         raise HTTPException(status_code=400, detail="Período encerrado. Revisões em massa estão bloqueadas.")
-        
+
     allowed_companies = get_allowed_company_ids(db, current_user)
     if periodo.empresa_id not in allowed_companies:
         raise HTTPException(status_code=403, detail="Acesso negado")
-        
+
     # Verificar permissões (responsável ou delegado)
     is_responsible = (periodo.responsavel_id == current_user.id) or is_admin_user(db, current_user)
-    
-    # Pre-fetch delegations if not responsible to avoid N+1 queries
     delegated_item_ids = set()
     if not is_responsible:
-        delegations = db.query(RevisaoDelegacaoModel.ativo_id).filter(
-            RevisaoDelegacaoModel.periodo_id == payload.periodo_id,
-            RevisaoDelegacaoModel.revisor_id == current_user.id,
-            RevisaoDelegacaoModel.status == 'Ativo'
-        ).all()
-        delegated_item_ids = {d[0] for d in delegations}
-
-    # Buscar itens
-    items = db.query(RevisaoItemModel).filter(
-        RevisaoItemModel.periodo_id == payload.periodo_id,
-        RevisaoItemModel.id.in_(payload.ativos_ids)
-    ).all()
-    
-    count = 0
-    for item in items:
-        # Check delegation if not responsible
-        if not is_responsible:
-             is_delegated = item.id in delegated_item_ids
-             is_reverted_by_user = (item.status == 'Revertido' and item.criado_por == current_user.id)
-             
-             if not is_delegated and not is_reverted_by_user:
-                 continue # Skip unauthorized items
-        
-        # Apply changes
-        if payload.nova_vida_util_anos is not None:
-            item.vida_util_revisada = int(payload.nova_vida_util_anos * 12) 
-        if payload.nova_vida_util_meses is not None:
-            item.vida_util_revisada = payload.nova_vida_util_meses
+        delegated_item_ids = set(db.execute(
+            sa.select(RevisaoDelegacaoModel.ativo_id).where(
+                RevisaoDelegacaoModel.periodo_id == payload.periodo_id,
+                RevisaoDelegacaoModel.revisor_id == current_user.id,
+                RevisaoDelegacaoModel.status == "Ativo",
+            )
+        ).scalars())
+
+    # total de meses informado diretamente
+    meses_total_global: Optional[int] = None
+    if payload.nova_vida_util_anos is not None or payload.nova_vida_util_meses is not None:
+        anos = int(payload.nova_vida_util_anos or 0)
+        meses = int(payload.nova_vida_util_meses or 0)
+        meses_total_global = anos * 12 + meses
+        if meses_total_global <= 0 and inc != "Manter":
+            raise HTTPException(status_code=400, detail="Vida útil revisada deve ser maior que zero")
+
+    results: List[MassRevisionItemResult] = []
+    errors: List[str] = []
+    updated = 0
+    skipped = 0
+
+    now18m = add_months(date.today(), 18)
+
+    # Itens carregados de uma vez; regras aplicadas em memória
+    itens = _carregar_itens_massa(db, payload.periodo_id, payload.ativos_ids)
+    alterados = {}
+
+    for item_id in payload.ativos_ids:
+        item = itens.get(item_id)
+        if not item:
+            msg = f"Item {item_id} não encontrado"
+            errors.append(msg)
+            results.append(MassRevisionItemResult(id=item_id, numero_imobilizado=str(item_id), changed=False, error=msg))
+            skipped += 1
+            continue
+
+        if not is_responsible and item.id not in delegated_item_ids and not (
+            item.status == "Revertido" and item.criado_por == current_user.id
+        ):
+            msg = f"Item {item.id} não está delegado a você"
+            errors.append(msg)
+            results.append(MassRevisionItemResult(id=item.id, numero_imobilizado=item.numero_imobilizado, changed=False, error=msg))
+            skipped += 1
+            continue
+
+        # status bloqueado (se existir)
+        if (item.status or "").lower() == "travado":
+            msg = f"Item {item.id} está travado"
+            errors.append(msg)
+            results.append(MassRevisionItemResult(id=item.id, numero_imobilizado=item.numero_imobilizado, changed=False, error=msg))
+            skipped += 1
+            continue
+
+        original_end = item.data_fim_depreciacao
+        original_total = item.vida_util_periodos or (_meses_entre(item.data_inicio_depreciacao, item.data_fim_depreciacao) if item.data_fim_depreciacao else 0)
+
+        vida_revisada: Optional[int] = None
+        nova_fim: Optional[date] = None
+
+        # Se nova data fim foi informada, calcular meses com base na data de início do próprio ativo
         if payload.nova_data_fim is not None:
-            item.data_fim_revisada = payload.nova_data_fim
-        if payload.condicao_fisica is not None:
-            item.condicao_fisica = payload.condicao_fisica
-        if payload.motivo is not None:
-            item.auxiliar2 = payload.motivo
-        if payload.justificativa is not None:
-            item.justificativa = payload.justificativa
-            
-        item.alterado = True
-        item.criado_por = current_user.id
-        item.status = 'Revisado'
-        
-        count += 1
-        
+            end = payload.nova_data_fim
+            start = item.data_inicio_depreciacao
+            vida_revisada = _meses_entre(start, end)
+            nova_fim = end
+        elif meses_total_global is not None:
+            vida_revisada = meses_total_global
+            nova_fim = add_months(item.data_inicio_depreciacao, vida_revisada)
+
+        # Coerência de incremento
+        revised_total = _meses_entre(item.data_inicio_depreciacao, nova_fim) if nova_fim else None
+
+        try:
+            if inc == "Manter":
+                if revised_total is not None and original_total > 0 and revised_total != original_total:
+                    raise HTTPException(status_code=400, detail="Para 'Manter', não é permitido alterar a vida útil total")
+            elif inc == "Decréscimo":
+                if vida_revisada is None and nova_fim is None:
+                    raise HTTPException(status_code=400, detail="Para 'Decréscimo', informe a nova vida útil ou nova data fim")
+                if revised_total is not None and original_total > 0 and revised_total >= original_total:
+                    raise HTTPException(status_code=400, detail="Para 'Decréscimo', a vida útil total revisada deve ser menor que a original")
+            elif inc == "Acréscimo":
+                if vida_revisada is None and nova_fim is None:
+                    raise HTTPException(status_code=400, detail="Para 'Acréscimo', informe a nova vida útil ou nova data fim")
+                if revised_total is not None and original_total > 0 and revised_total <= original_total:
+                    raise HTTPException(status_code=400, detail="Para 'Acréscimo', a vida útil total revisada deve ser maior que a original")
+
+            # Validações gerais
+            if vida_revisada is not None and vida_revisada <= 0 and inc != "Manter":
+                raise HTTPException(status_code=400, detail="Vida útil revisada deve ser maior que zero")
+            if nova_fim and nova_fim < now18m and inc != "Manter" and not (payload.justificativa or "").strip():
+                raise HTTPException(status_code=400, detail="Justificativa obrigatória para vida útil com vencimento < 18 meses")
+
+            # Persistir alterações
+            if cf is not None:
+                item.condicao_fisica = cf
+            if inc is not None:
+                item.auxiliar2 = inc
+            if payload.motivo is not None:
+                item.auxiliar3 = payload.motivo
+
+            if vida_revisada is not None:
+                item.vida_util_revisada = vida_revisada
+                item.data_fim_revisada = nova_fim
+                original_periodos = item.vida_util_periodos or 0
+                item.alterado = (original_periodos == 0) or (vida_revisada != original_periodos)
+                item.status = "Revisado" if item.alterado else (item.status or "Pendente")
+            elif nova_fim is not None:
+                # vida não informada, só data fim revisada
+                item.data_fim_revisada = nova_fim
+
+            if inc == "Manter" and not (payload.justificativa or "").strip():
+                item.justificativa = item.justificativa or "A vida útil está correta"
+            elif payload.justificativa is not None:
+                item.justificativa = payload.justificativa
+
+            if inc == "Manter":
+                if not (item.status or "").strip() or (item.status or "").strip().lower() == "pendente":
+                    item.status = "Revisado"
+                effective_end = item.data_fim_revisada or item.data_fim_depreciacao
+                if effective_end and effective_end >= now18m:
+                    item.status = "Aprovado"
+
+            alterados[item.id] = item
+            updated += 1
+            results.append(MassRevisionItemResult(
+                id=item.id,
+                numero_imobilizado=item.numero_imobilizado,
+                changed=bool(item.alterado),
+                original_total_months=original_total,
+                revised_total_months=revised_total,
+                original_end_date=original_end,
+                revised_end_date=item.data_fim_revisada,
+                incremento=item.auxiliar2,
+                motivo=item.auxiliar3,
+            ))
+        except HTTPException as ex:
+            msg = ex.detail
+            errors.append(f"Item {item.id}: {msg}")
+            results.append(MassRevisionItemResult(
+                id=item.id,
+                numero_imobilizado=item.numero_imobilizado,
+                changed=False,
+                error=msg,
+                original_total_months=original_total,
+                revised_total_months=revised_total,
+                original_end_date=original_end,
+                revised_end_date=nova_fim,
+                incremento=inc,
+                motivo=payload.motivo,
+            ))
+            skipped += 1
+
+    _gravar_itens_massa(db, list(alterados.values()))
+    fila_auditoria.gravar(db, usuario_id=current_user.id, acao="revisao_massa", entidade="revisao_item", entidade_id=None,
+                          detalhes=f"periodo_id={payload.periodo_id} itens={updated}/{len(payload.ativos_ids)} inc={inc} motivo={payload.motivo}")
     db.commit()
-    return {"message": f"{count} itens atualizados com sucesso"}
+    eventos.publicar_status_itens(periodo.empresa_id, payload.periodo_id, {it.id: it.status for it in alterados.values()})
 
-class DelegationResponse(BaseModel):
-    id: int
-    periodo_id: int
-    ativo_id: int
-    revisor_id: int # Corrigido de usuario_id
-    status: str
-    data_atribuicao: datetime
-    usuario_nome: Optional[str] = None
-    ativo_codigo: Optional[str] = None
-    
-    class Config:
-        from_attributes = True
+    return MassRevisionResponse(
+        total=len(payload.ativos_ids),
+        updated=updated,
+        skipped=skipped,
+        errors=errors,
+        results=results,
+    )
 
-@router.get("/delegacoes/{periodo_id}", response_model=List[DelegationResponse])
-def list_delegations(
-    periodo_id: int,
-    db: Session = Depends(get_db),
-    current_user: UsuarioModel = Depends(get_current_user)
-):
+# Linhas lidas por vez do cursor no servidor ao gerar a listagem completa
+DELEGACOES_YIELD_PER = 2000
+DELEGACOES_PAGINA_LIMITE_MAXIMO = 1000
+
+
+def _select_delegacoes(periodo):
+    """Delegações do período com item e revisor (um único SELECT), mais os itens
+    revertidos sem delegação, atribuídos a quem os criou (id negativo = virtual).
+
+    Colunas na ordem de _DELEGACOES_CAMPOS, mais item_status no fim (só para o resumo).
+    """
+    d, i, u = RevisaoDelegacaoModel, RevisaoItemModel, UsuarioModel
+    delegadas = (
+        sa.select(
+            d.id, d.periodo_id, d.ativo_id, d.revisor_id, d.atribuido_por, d.data_atribuicao, d.status,
+            i.numero_imobilizado, i.sub_numero, i.descricao, u.nome_completo.label("revisor_nome"),
+            i.classe, i.descricao_classe, i.conta_contabil, i.centro_custo,
+            sa.cast(i.valor_contabil, sa.Float).label("valor_contabil"),
+            u.nome_completo.label("usuario_nome"), i.numero_imobilizado.label("ativo_codigo"),
+            i.status.label("item_status"),
+        )
+        .select_from(d)
+        .outerjoin(i, i.id == d.ativo_id)
+        .outerjoin(u, u.id == d.revisor_id)
+        .where(d.periodo_id == periodo.id)
+    )
+    sem_delegacao = ~sa.exists().where(d.periodo_id == periodo.id, d.ativo_id == i.id)
+    orfaos = (
+        sa.select(
+            (-i.id).label("id"), i.periodo_id, i.id.label("ativo_id"), i.criado_por.label("revisor_id"),
+            sa.literal(periodo.responsavel_id or 0, sa.Integer).label("atribuido_por"),
+            sa.func.localtimestamp().label("data_atribuicao"), sa.literal("Ativo", sa.String).label("status"),
+            i.numero_imobilizado, i.sub_numero, i.descricao, u.nome_completo.label("revisor_nome"),
+            i.classe, i.descricao_classe, i.conta_contabil, i.centro_custo,
+            sa.cast(i.valor_contabil, sa.Float).label("valor_contabil"),
+            u.nome_completo.label("usuario_nome"), i.numero_imobilizado.label("ativo_codigo"),
+            i.status.label("item_status"),
+        )
+        .select_from(i)
+        .join(u, u.id == i.criado_por)
+        # Índice ix_revisoes_itens_periodo_status
+        .where(i.periodo_id == periodo.id, i.status == "Revertido", sem_delegacao)
+    )
+    return sa.union_all(delegadas, orfaos).subquery("delegacoes")
+
+
+_DELEGACOES_CAMPOS = (
+    "id", "periodo_id", "ativo_id", "revisor_id", "atribuido_por", "data_atribuicao", "status",
+    "numero_imobilizado", "sub_numero", "descricao", "revisor_nome",
+    "classe", "descricao_classe", "conta_contabil", "centro_custo", "valor_contabil",
+    "usuario_nome", "ativo_codigo",
+)
+_codificar_delegacao = serializacao.codificador_linhas(_DELEGACOES_CAMPOS)
+
+
+def _periodo_delegacoes(db: Session, periodo_id: int, current_user: UsuarioModel):
     # Validar período e empresa
     periodo = db.query(RevisaoPeriodoModel).filter(RevisaoPeriodoModel.id == periodo_id).first()
     if not periodo:
@@ -597,36 +1055,112 @@ def list_delegations(
     allowed_companies = get_allowed_company_ids(db, current_user)
     if periodo.empresa_id not in allowed_companies:
         raise HTTPException(status_code=403, detail="Acesso negado")
-        
-    # Buscar delegações com joins simplificados
-    results = (
-        db.query(
-            RevisaoDelegacaoModel,
-            UsuarioModel.nome_completo.label("usuario_nome"),
-            RevisaoItemModel.numero_imobilizado.label("ativo_codigo")
+    return periodo
+
+
+@router.get("/delegacoes/{periodo_id}")
+def list_delegations(
+    periodo_id: int,
+    db: Session = Depends(get_db),
+    current_user: UsuarioModel = Depends(get_current_user)
+):
+    """
+    Lista as delegações do período (com dados do item e do revisor) e os itens
+    revertidos sem delegação. Um único SELECT, lido por cursor no servidor e
+    enviado em pedaços: memória constante em qualquer tamanho de período.
+    Campos `usuario_nome`/`ativo_codigo` mantidos por compatibilidade.
+    """
+    periodo = _periodo_delegacoes(db, periodo_id, current_user)
+    base = _select_delegacoes(periodo)
+    stmt = sa.select(*(base.c[c] for c in _DELEGACOES_CAMPOS)).order_by(base.c.id)
+
+    def gerar():
+        # Sessão própria: a resposta continua sendo gerada após o retorno da rota
+        stream_db = SessionLocal()
+        try:
+            linhas = stream_db.execute(stmt.execution_options(stream_results=True, yield_per=DELEGACOES_YIELD_PER))
+            yield b"["
+            primeiro = True
+            for lote in linhas.tuples().partitions():
+                # Array do lote sem os colchetes, emendado aos anteriores
+                corpo = serializacao.dumps(list(map(_codificar_delegacao, lote)))[1:-1]
+                if corpo:
+                    yield corpo if primeiro else b"," + corpo
+                    primeiro = False
+            yield b"]"
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(gerar(), media_type="application/json")
+
+
+@router.get("/delegacoes/{periodo_id}/pagina")
+def list_delegations_pagina(
+    periodo_id: int,
+    limit: int = 500,
+    cursor: Optional[int] = None,
+    revisor_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: UsuarioModel = Depends(get_current_user)
+):
+    """
+    Variante paginada de /revisoes/delegacoes/{periodo_id}: {itens, proximo_cursor},
+    paginação por chave no id (virtuais, negativos, primeiro); filtro opcional por revisor.
+    """
+    limit = max(1, min(int(limit or 500), DELEGACOES_PAGINA_LIMITE_MAXIMO))
+    periodo = _periodo_delegacoes(db, periodo_id, current_user)
+    base = _select_delegacoes(periodo)
+    stmt = sa.select(*(base.c[c] for c in _DELEGACOES_CAMPOS)).order_by(base.c.id)
+    if revisor_id:
+        stmt = stmt.where(base.c.revisor_id == revisor_id)
+    if cursor is not None:
+        stmt = stmt.where(base.c.id > cursor)
+
+    # Uma linha a mais indica se há próxima página
+    linhas = db.execute(stmt.limit(limit + 1)).tuples().all()
+    proximo_cursor = None
+    if len(linhas) > limit:
+        linhas = linhas[:limit]
+        proximo_cursor = linhas[-1][0]
+    return serializacao.RespostaJSON(serializacao.dumps({
+        "itens": list(map(_codificar_delegacao, linhas)),
+        "proximo_cursor": proximo_cursor,
+    }))
+
+
+@router.get("/delegacoes/{periodo_id}/resumo")
+def resumo_delegations(
+    periodo_id: int,
+    db: Session = Depends(get_db),
+    current_user: UsuarioModel = Depends(get_current_user)
+):
+    """
+    Totais por revisor das delegações ativas (incluindo os revertidos sem
+    delegação): quantidade de itens, valor contábil e situação dos itens,
+    agregados no banco.
+    """
+    periodo = _periodo_delegacoes(db, periodo_id, current_user)
+    base = _select_delegacoes(periodo)
+
+    def contar(*status_item):
+        return sa.func.count().filter(base.c.item_status.in_(status_item))
+
+    stmt = (
+        sa.select(
+            base.c.revisor_id,
+            sa.func.max(base.c.revisor_nome).label("revisor_nome"),
+            sa.func.count().label("total_itens"),
+            sa.func.coalesce(sa.func.sum(base.c.valor_contabil), 0.0).label("valor_contabil_total"),
+            contar("Pendente").label("pendentes"),
+            contar("Revisado").label("revisados"),
+            contar("Aprovado").label("aprovados"),
+            contar("Revertido").label("revertidos"),
         )
-        .join(UsuarioModel, RevisaoDelegacaoModel.revisor_id == UsuarioModel.id) # Corrigido de usuario_id
-        .join(RevisaoItemModel, RevisaoDelegacaoModel.ativo_id == RevisaoItemModel.id)
-        # Removido joins desnecessários com RevisaoPeriodoModel e AssetModel
-        .filter(RevisaoDelegacaoModel.periodo_id == periodo_id)
-        .all()
+        .where(base.c.status == "Ativo")
+        .group_by(base.c.revisor_id)
+        .order_by(sa.func.max(base.c.revisor_nome), base.c.revisor_id)
     )
-    
-    response = []
-    for d, u_nome, a_cod in results:
-        d_dict = {
-            "id": d.id,
-            "periodo_id": d.periodo_id,
-            "ativo_id": d.ativo_id,
-            "revisor_id": d.revisor_id,
-            "status": d.status,
-            "data_atribuicao": d.data_atribuicao,
-            "usuario_nome": u_nome,
-            "ativo_codigo": a_cod
-        }
-        response.append(DelegationResponse(**d_dict))
-        
-    return response
+    return [dict(r._mapping) for r in db.execute(stmt)]
 
 class DelegationCreate(BaseModel):
     periodo_id: int
@@ -1,92 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import List, NamedTuple, Optional
 from sqlalchemy.orm import Session
 import sqlalchemy as sa
 from datetime import date
 import io
 import json
 
-from ..database import SessionLocal
+import numpy as np
+
+from .. import fila_auditoria
+from ..consultas import FiltroItens, diagnosticar
+from ..dependencies import get_db, get_current_user, get_allowed_company_ids
+from ..depreciacao import (
+    add_months as _add_months,
+    months_diff as _months_diff,
+    datas_lote,
+    meses_antes_lote,
+    parcela_centavos_lote,
+    soma_intervalo_lote,
+)
 from ..models import (
     RevisaoItem as RevisaoItemModel,
     RevisaoPeriodo as RevisaoPeriodoModel,
     ClasseContabil as ClasseContabilModel,
     Usuario as UsuarioModel,
-    GrupoUsuario as GrupoUsuarioModel,
-    GrupoEmpresa as GrupoEmpresaModel,
-    AuditoriaLog as AuditoriaLogModel,
 )
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
-import os
 
 router = APIRouter(prefix="/simulador/depreciacao", tags=["Simulador Depreciação"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-security = HTTPBearer()
-SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-in-prod")
-ALGORITHM = "HS256"
-
-
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    token = credentials.credentials
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = int(payload.get("sub"))
-    except (JWTError, ValueError):
-        raise HTTPException(status_code=401, detail="Token inválido")
-    user = db.query(UsuarioModel).filter(UsuarioModel.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="Usuário não encontrado")
-    return user
-
-
-def get_allowed_company_ids(db: Session, current_user: UsuarioModel) -> list[int]:
-    links = db.query(GrupoUsuarioModel).filter(GrupoUsuarioModel.usuario_id == current_user.id).all()
-    grupo_ids = [l.grupo_id for l in links]
-    emp_links = db.query(GrupoEmpresaModel).filter(GrupoEmpresaModel.grupo_id.in_(grupo_ids)).all()
-    empresas_ids = {e.empresa_id for e in emp_links}
-    if getattr(current_user, "empresa_id", None) is not None:
-        empresas_ids.add(current_user.empresa_id)
-    return sorted(empresas_ids)
-
-
-def _add_months(d: date, months: int) -> date:
-    year = d.year + (d.month - 1 + months) // 12
-    month = (d.month - 1 + months) % 12 + 1
-    day = min(
-        d.day,
-        [
-            31,
-            29 if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0) else 28,
-            31,
-            30,
-            31,
-            30,
-            31,
-            31,
-            30,
-            31,
-            30,
-            31,
-        ][month - 1],
-    )
-    return date(year, month, day)
-
-
-def _months_diff(start: date, end: date) -> int:
-    return (end.year - start.year) * 12 + (end.month - start.month)
-
-
 def _vida_original_meses(it: RevisaoItemModel) -> int:
     total = it.vida_util_periodos or 0
     if total == 0 and (it.vida_util_anos or 0) > 0:
@@ -113,6 +56,59 @@ def _is_revised(it: RevisaoItemModel) -> bool:
     return False
 
 
+def _depreciacao_periodo_lote(
+    valor_centavos: np.ndarray,
+    inicio_original: np.ndarray,
+    meses_original: np.ndarray,
+    calcula_original: np.ndarray,
+    base: np.ndarray,
+    meses_revisada: np.ndarray,
+    calcula_revisada: np.ndarray,
+    janela_inicio: np.ndarray,
+    janela_fim: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Depreciação original e revisada dentro da janela, em centavos, para todos os itens.
+
+    Equivale ao cronograma linear mês a mês (ver app/depreciacao.py), usando
+    apenas a contagem de meses de cada série que cai antes da data base e
+    dentro de [janela_inicio, janela_fim].
+    """
+    # Série original
+    mensal_o = parcela_centavos_lote(valor_centavos, meses_original)
+    ultimo_o = valor_centavos - (meses_original - 1) * mensal_o
+    ok_o = calcula_original & (meses_original > 0)
+    ate_base = np.where(
+        ok_o,
+        soma_intervalo_lote(np.zeros_like(meses_original), meses_antes_lote(inicio_original, base), meses_original, mensal_o, ultimo_o),
+        0,
+    )
+    dep_original = np.where(
+        ok_o,
+        soma_intervalo_lote(
+            meses_antes_lote(inicio_original, janela_inicio),
+            meses_antes_lote(inicio_original, janela_fim, True),
+            meses_original, mensal_o, ultimo_o,
+        ),
+        0,
+    )
+
+    # Série revisada, a partir da data base com o saldo remanescente
+    saldo_base = np.where(ate_base > 0, np.maximum(valor_centavos - ate_base, 0), valor_centavos)
+    mensal_r = parcela_centavos_lote(saldo_base, meses_revisada)
+    ultimo_r = saldo_base - (meses_revisada - 1) * mensal_r
+    dep_revisada = np.where(
+        meses_revisada > 0,
+        soma_intervalo_lote(
+            meses_antes_lote(base, janela_inicio),
+            meses_antes_lote(base, janela_fim, True),
+            meses_revisada, mensal_r, ultimo_r,
+        ),
+        0,
+    )
+    dep_revisada = np.where(calcula_revisada, dep_revisada, dep_original)
+    return dep_original, dep_revisada
+
+
 def _log_simulacao(db: Session, usuario_id: int, empresa_id: int, filtros: dict):
     try:
         detalhes = json.dumps(
@@ -122,20 +118,15 @@ def _log_simulacao(db: Session, usuario_id: int, empresa_id: int, filtros: dict)
             },
             default=str,
         )
-        log = AuditoriaLogModel(
+        fila_auditoria.registrar(
             usuario_id=usuario_id,
             acao="simulador_depreciacao",
             entidade="simulador_depreciacao",
             entidade_id=None,
             detalhes=detalhes,
         )
-        db.add(log)
-        db.commit()
     except Exception:
-        try:
-            db.rollback()
-        except Exception:
-            pass
+        pass
 
 
 class SimuladorFiltroPayload(BaseModel):
@@ -184,6 +175,21 @@ class SimuladorResponse(BaseModel):
     aviso: str
 
 
+class _ItemSimulado(NamedTuple):
+    """Item selecionado para a simulação, com as datas/prazos das duas séries."""
+    item: RevisaoItemModel
+    classe_desc: Optional[str]
+    revised_flag: bool
+    original_total: int
+    revised_total: int
+    start_original: date
+    end_original: Optional[date]
+    base_start: date
+    end_revisada: Optional[date]
+    effective_start: date
+    valor_centavos: int
+
+
 def _run_simulacao(
     db: Session,
     current_user: UsuarioModel,
@@ -194,6 +200,7 @@ def _run_simulacao(
     classe_id: Optional[str],
     ug_id: Optional[int],
     centro_custo: Optional[str],
+    request: Optional[Request] = None,
 ) -> SimuladorResponse:
     if periodo_fim < periodo_inicio:
         raise HTTPException(status_code=400, detail="Período final menor que o inicial")
@@ -218,25 +225,21 @@ def _run_simulacao(
         )
     )
 
-    if allowed:
-        q = q.filter(RevisaoPeriodoModel.empresa_id.in_(allowed))
-
-    q = q.filter(RevisaoPeriodoModel.empresa_id == int(empresa_id))
-
-    if ug_id is not None:
-        q = q.filter(RevisaoPeriodoModel.ug_id == int(ug_id))
-
-    if classe_id:
-        q = q.filter(RevisaoItemModel.classe == str(classe_id))
-
-    if centro_custo:
-        q = q.filter(RevisaoItemModel.centro_custo == centro_custo)
+    q = (
+        FiltroItens(q)
+        .empresas_permitidas(allowed)
+        .empresa(empresa_id)
+        .ug(ug_id)
+        .classe(classe_id)
+        .centro_custo(centro_custo)
+        .query
+    )
+    diagnosticar(request, db, current_user, q, "simulador_depreciacao")
 
     itens = q.all()
 
-    analitico_rows: List[SimuladorAnaliticoItem] = []
-    sintetico_map: dict[str, dict] = {}
-
+    # 1) Seleciona os itens e prepara as datas/prazos de cada série
+    selecionados = []
     for it, periodo, classe_desc in itens:
         revised_flag = _is_revised(it)
         if status_revisao:
@@ -276,45 +279,56 @@ def _run_simulacao(
         if base_start and base_start > effective_start:
             effective_start = base_start
 
-        dep_original_periodo = 0.0
-        dep_revisada_periodo = 0.0
-        dep_ate_base = 0.0
-
-        if end_original and end_original > effective_start:
-            total_meses_original = _months_diff(start_original, end_original)
-            if total_meses_original > 0:
-                dep_mensal_original = round(valor_aquisicao / total_meses_original, 2)
-                saldo = valor_aquisicao
-                for i in range(total_meses_original):
-                    periodo_data = _add_months(start_original, i)
-                    dep_mes = dep_mensal_original
-                    if i == total_meses_original - 1:
-                        dep_mes = round(saldo, 2)
-                    if base_start and periodo_data < base_start:
-                        dep_ate_base += dep_mes
-                    if periodo_data >= effective_start and periodo_data <= periodo_fim:
-                        dep_original_periodo += dep_mes
-                    saldo = round(saldo - dep_mes, 2)
-
-        saldo_base = valor_aquisicao
-        if dep_ate_base > 0:
-            saldo_base = round(max(0.0, valor_aquisicao - dep_ate_base), 2)
-
-        if end_revisada and end_revisada > effective_start:
-            total_meses_revisada = _months_diff(base_start, end_revisada)
-            if total_meses_revisada > 0:
-                dep_mensal_revisada = round(saldo_base / total_meses_revisada, 2)
-                saldo_r = saldo_base
-                for i in range(total_meses_revisada):
-                    periodo_data = _add_months(base_start, i)
-                    dep_mes = dep_mensal_revisada
-                    if i == total_meses_revisada - 1:
-                        dep_mes = round(saldo_r, 2)
-                    if periodo_data >= effective_start and periodo_data <= periodo_fim:
-                        dep_revisada_periodo += dep_mes
-                    saldo_r = round(saldo_r - dep_mes, 2)
-        else:
-            dep_revisada_periodo = dep_original_periodo
+        selecionados.append(
+            _ItemSimulado(
+                item=it,
+                classe_desc=classe_desc,
+                revised_flag=revised_flag,
+                original_total=original_total,
+                revised_total=revised_total,
+                start_original=start_original,
+                end_original=end_original,
+                base_start=base_start,
+                end_revisada=end_revisada,
+                effective_start=effective_start,
+                valor_centavos=int(round(valor_aquisicao * 100)),
+            )
+        )
+
+    # 2) Depreciação no período de todos os itens de uma vez (ver _depreciacao_periodo_lote)
+    n = len(selecionados)
+    dep_original_c, dep_revisada_c = _depreciacao_periodo_lote(
+        valor_centavos=np.array([sel.valor_centavos for sel in selecionados], dtype=np.int64),
+        inicio_original=datas_lote((sel.start_original for sel in selecionados), n),
+        meses_original=np.array(
+            [_months_diff(sel.start_original, sel.end_original) if sel.end_original else 0 for sel in selecionados],
+            dtype=np.int64,
+        ),
+        calcula_original=np.array(
+            [bool(sel.end_original and sel.end_original > sel.effective_start) for sel in selecionados], dtype=bool
+        ),
+        base=datas_lote((sel.base_start for sel in selecionados), n),
+        meses_revisada=np.array(
+            [_months_diff(sel.base_start, sel.end_revisada) if sel.end_revisada else 0 for sel in selecionados],
+            dtype=np.int64,
+        ),
+        calcula_revisada=np.array(
+            [bool(sel.end_revisada and sel.end_revisada > sel.effective_start) for sel in selecionados], dtype=bool
+        ),
+        janela_inicio=datas_lote((sel.effective_start for sel in selecionados), n),
+        janela_fim=np.tile(np.array([periodo_fim.year, periodo_fim.month, periodo_fim.day], dtype=np.int64), (n, 1)),
+    )
+
+    # 3) Monta as linhas analíticas e o agrupamento por classe
+    analitico_rows: List[SimuladorAnaliticoItem] = []
+    sintetico_map: dict[str, dict] = {}
+
+    for idx, sel in enumerate(selecionados):
+        it, classe_desc, revised_flag = sel.item, sel.classe_desc, sel.revised_flag
+        original_total, revised_total = sel.original_total, sel.revised_total
+        start_original, end_original, end_revisada = sel.start_original, sel.end_original, sel.end_revisada
+        dep_original_periodo = int(dep_original_c[idx]) / 100
+        dep_revisada_periodo = int(dep_revisada_c[idx]) / 100
 
         diff_valor = dep_revisada_periodo - dep_original_periodo
         diff_percentual = 0.0
@@ -420,6 +434,7 @@ def _run_simulacao(
 @router.post("", response_model=SimuladorResponse)
 def simular(
     payload: SimuladorFiltroPayload,
+    request: Request,
     current_user: UsuarioModel = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
@@ -433,6 +448,7 @@ def simular(
         classe_id=payload.classe_id,
         ug_id=payload.ug_id,
         centro_custo=payload.centro_custo,
+        request=request,
     )
     filtros = {
         "periodo_inicio": payload.periodo_inicio,
@@ -448,6 +464,7 @@ def simular(
 
 @router.get("/excel")
 def simular_excel(
+    request: Request,
     empresa_id: int,
     periodo_inicio: date,
     periodo_fim: date,
@@ -473,6 +490,7 @@ def simular_excel(
         classe_id=classe_id,
         ug_id=ug_id,
         centro_custo=centro_custo,
+        request=request,
     )
 
     rows = []
@@ -525,6 +543,7 @@ def simular_excel(
 
 @router.get("/pdf")
 def simular_pdf(
+    request: Request,
     empresa_id: int,
     periodo_inicio: date,
     periodo_fim: date,
@@ -553,6 +572,7 @@ def simular_pdf(
         classe_id=classe_id,
         ug_id=ug_id,
         centro_custo=centro_custo,
+        request=request,
     )
 
     buffer = io.BytesIO()
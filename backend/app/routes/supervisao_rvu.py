@@ -1,15 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from typing import Optional, List
 from sqlalchemy.orm import Session
 import sqlalchemy as sa
 import logging
+import os
 from datetime import date, datetime
-from jose import jwt, JWTError
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-from ..database import SessionLocal, engine
+from ..database import engine
 from ..config import ALLOW_DDL
+from ..consultas import FiltroItens, diagnosticar
+from ..dependencies import get_db, get_current_user, get_allowed_company_ids
+from .. import eventos, fila_auditoria
 from ..models import (
     Company as CompanyModel,
     Employee as EmployeeModel,
@@ -17,50 +19,12 @@ from ..models import (
     RevisaoPeriodo as RevisaoPeriodoModel,
     ManagementUnit as UGModel,
     Usuario as UsuarioModel,
-    GrupoUsuario as GrupoUsuarioModel,
-    GrupoEmpresa as GrupoEmpresaModel,
     RevisaoDelegacao as RevisaoDelegacaoModel,
 )
 
 router = APIRouter(prefix="/supervisao/rvu", tags=["Supervisão RVU"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-# Segurança simples via Bearer JWT (consistente com relatorios_rvu)
-security = HTTPBearer()
-import os
-SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-in-prod")
-ALGORITHM = "HS256"
-
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    token = credentials.credentials
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = int(payload.get("sub"))
-    except (JWTError, ValueError):
-        raise HTTPException(status_code=401, detail="Token inválido")
-    user = db.query(UsuarioModel).filter(UsuarioModel.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="Usuário não encontrado")
-    return user
-
-def get_allowed_company_ids(db: Session, current_user: UsuarioModel) -> list[int]:
-    links = db.query(GrupoUsuarioModel).filter(GrupoUsuarioModel.usuario_id == current_user.id).all()
-    grupo_ids = [l.grupo_id for l in links]
-    emp_links = db.query(GrupoEmpresaModel).filter(GrupoEmpresaModel.grupo_id.in_(grupo_ids)).all()
-    empresas_ids = {e.empresa_id for e in emp_links}
-    if getattr(current_user, 'empresa_id', None) is not None:
-        empresas_ids.add(current_user.empresa_id)
-    return sorted(empresas_ids)
-
-
 _tables_ensured = False
 
 def ensure_tables():
@@ -219,6 +183,7 @@ class AprovarMassaCreate(BaseModel):
 
 @router.get('/listar')
 def listar(
+    request: Request,
     empresa_id: Optional[int] = None,
     ug_id: Optional[int] = None,
     periodo_id: Optional[int] = None,
@@ -245,57 +210,21 @@ def listar(
         UsuarioModel, RevisaoPeriodoModel.responsavel_id == UsuarioModel.id
     )
 
-    # Filtros (incorporando lógica de _filters_query)
-    # Empresas permitidas
-    if allowed:
-        q = q.filter(RevisaoPeriodoModel.empresa_id.in_(allowed))
-    
-    # Filtros explícitos
-    if empresa_id:
-        q = q.filter(RevisaoPeriodoModel.empresa_id == int(empresa_id))
-    if ug_id:
-        q = q.filter(RevisaoPeriodoModel.ug_id == int(ug_id))
-    if revisor_id:
-        q = q.filter(RevisaoPeriodoModel.responsavel_id == int(revisor_id))
-    if periodo_id:
-        q = q.filter(RevisaoItemModel.periodo_id == int(periodo_id))
-    
-    # Filtro por data de início de depreciação
-    if periodo_inicio:
-        q = q.filter(RevisaoItemModel.data_inicio_depreciacao >= periodo_inicio)
-    if periodo_fim:
-        q = q.filter(RevisaoItemModel.data_inicio_depreciacao <= periodo_fim)
-        
-    # Status
-    if status and status != 'Todos':
-        q = q.filter(RevisaoItemModel.status == status)
+    q = (
+        FiltroItens(q)
+        .empresas_permitidas(allowed)
+        .empresa(empresa_id)
+        .ug(ug_id)
+        .responsavel_periodo(revisor_id)
+        .periodo(periodo_id)
+        .inicio_depreciacao(periodo_inicio, periodo_fim)
+        .status(status)
+        .query
+        .order_by(RevisaoItemModel.id.desc())
+    )
+    diagnosticar(request, db, current_user, q, 'supervisao_rvu.listar')
+    results = q.all()
 
-    # Ordenação e execução
-    results = q.order_by(RevisaoItemModel.id.desc()).all()
-    
-    # --- DEBUG LOG START ---
-    try:
-        debug_groups = {}
-        for row in results:
-            it = row[0]
-            key = str(it.numero_imobilizado or '')
-            if key not in debug_groups:
-                debug_groups[key] = []
-            debug_groups[key].append(it)
-        
-        debug_fully_depreciated = 0
-        for key, group in debug_groups.items():
-            # Check if main item exists (sub=0)
-            main_item = next((x for x in group if float(str(x.sub_numero or 0)) == 0), None)
-            if main_item:
-                total_val = sum(float(x.valor_contabil or 0) for x in group)
-                if abs(total_val) < 0.01:
-                    debug_fully_depreciated += 1
-        print(f"DEBUG /supervisao/rvu/listar: Returning {len(results)} items. Server-side calc fully depreciated: {debug_fully_depreciated}")
-    except Exception as e:
-        print(f"DEBUG /supervisao/rvu/listar error in debug calc: {e}")
-    # --- DEBUG LOG END ---
-    
     # Carregamento em lote dos comentários
     comments_map = {}
     item_ids = [row[0].id for row in results]
@@ -393,18 +322,23 @@ def comentar(payload: ComentarioCreate, current_user: UsuarioModel = Depends(get
         'tipo': 'acompanhamento' if closed else 'normal',
     })
     db.commit()
+    eventos.publicar(
+        eventos.TIPO_COMENTARIO,
+        empresa_id=getattr(per_check, 'empresa_id', None),
+        periodo_id=payload.periodo_id or it.periodo_id,
+        ativo_id=payload.ativo_id,
+        revisor_id=payload.revisor_id,
+        status='Pendente',
+    )
     # notificação por e-mail (placeholder - auditoria)
-    db.execute(sa.text(
-        """
-        INSERT INTO auditoria_rvu (usuario_id, acao, entidade, entidade_id, detalhes)
-        VALUES (:usuario_id, 'notify', 'revisao_item', :entidade_id, :detalhes)
-        """
-    ), {
-        'usuario_id': payload.supervisor_id,
-        'entidade_id': payload.ativo_id,
-        'detalhes': f"Comentario enviado ao revisor {payload.revisor_id}"
-    })
-    db.commit()
+    fila_auditoria.registrar(
+        tabela=fila_auditoria.TABELA_RVU,
+        usuario_id=payload.supervisor_id,
+        acao='notify',
+        entidade='revisao_item',
+        entidade_id=payload.ativo_id,
+        detalhes=f"Comentario enviado ao revisor {payload.revisor_id}",
+    )
     return { 'ok': True }
 
 
@@ -484,19 +418,18 @@ def reverter(payload: ReverterCreate, current_user: UsuarioModel = Depends(get_c
         elif deleg.status != 'Ativo':
             deleg.status = 'Ativo'
 
+    # auditoria (mesma transação da reversão)
+    fila_auditoria.gravar(
+        db,
+        tabela=fila_auditoria.TABELA_RVU,
+        usuario_id=payload.supervisor_id,
+        acao='reverter',
+        entidade='revisao_item',
+        entidade_id=payload.ativo_id,
+        detalhes=f"Reversao realizada. Motivo: {payload.motivo_reversao}",
+    )
     db.commit()
-    # auditoria
-    db.execute(sa.text(
-        """
-        INSERT INTO auditoria_rvu (usuario_id, acao, entidade, entidade_id, detalhes)
-        VALUES (:usuario_id, 'reverter', 'revisao_item', :entidade_id, :detalhes)
-        """
-    ), {
-        'usuario_id': payload.supervisor_id,
-        'entidade_id': payload.ativo_id,
-        'detalhes': f"Reversao realizada. Motivo: {payload.motivo_reversao}"
-    })
-    db.commit()
+    eventos.publicar_status_itens(getattr(per_check, 'empresa_id', None), target_periodo_id, {it.id: 'Revertido'})
     return { 'ok': True }
 
 
@@ -521,6 +454,7 @@ def aprovar(payload: AprovarCreate, current_user: UsuarioModel = Depends(get_cur
         # marca como aprovado
         it.status = 'Aprovado'
         db.commit()
+        eventos.publicar_status_itens(getattr(per_check, 'empresa_id', None), it.periodo_id, {it.id: 'Aprovado'})
         # histórico
         revisada_total = int(it.vida_util_revisada or 0)
         # Use current_user.id instead of payload.supervisor_id to ensure validity
@@ -573,6 +507,73 @@ def aprovar(payload: AprovarCreate, current_user: UsuarioModel = Depends(get_cur
         raise HTTPException(status_code=500, detail="Erro interno")
 
 
+# Aprovação em massa: itens processados em transações de até APROVACAO_LOTE itens
+APROVACAO_LOTE = int(os.getenv("APROVACAO_MASSA_LOTE", "2000"))
+APROVACAO_LOTE_LEITURA = 5000
+
+_historico_tbl = sa.table(
+    'revisoes_historico',
+    sa.column('ativo_id'), sa.column('supervisor_id'), sa.column('revisor_id'),
+    sa.column('vida_util_anterior'), sa.column('vida_util_revisada'),
+    sa.column('acao'), sa.column('status'), sa.column('motivo_reversao'),
+)
+_auditoria_rvu_tbl = sa.table(
+    'auditoria_rvu',
+    sa.column('usuario_id'), sa.column('acao'), sa.column('entidade'),
+    sa.column('entidade_id'), sa.column('detalhes'),
+)
+
+
+def _aprovar_lote(db: Session, lote: list, supervisor_id: int, motivo: str) -> set[int]:
+    """Aprova um lote numa transação: 1 UPDATE + INSERTs multi-linha. Devolve os ids aprovados agora."""
+    aprovados = {
+        r[0] for r in db.execute(
+            sa.text(
+                "UPDATE revisoes_itens SET status = 'Aprovado' "
+                "WHERE id IN :ids AND status IS DISTINCT FROM 'Aprovado' RETURNING id"
+            ).bindparams(sa.bindparam('ids', expanding=True)),
+            {'ids': [it.id for it, _revisor, _anterior in lote]},
+        )
+    }
+    historico = []
+    auditoria = []
+    for it, revisor_id, vida_anterior in lote:
+        if it.id not in aprovados:
+            continue  # aprovado por outra requisição entre a leitura e o UPDATE
+        historico.append({
+            'ativo_id': it.id,
+            'supervisor_id': supervisor_id,
+            'revisor_id': revisor_id,
+            'vida_util_anterior': vida_anterior,
+            'vida_util_revisada': int(it.vida_util_revisada or 0),
+            'acao': 'aprovado',
+            'status': 'aprovado',
+            'motivo_reversao': motivo,
+        })
+        auditoria.append({
+            'usuario_id': supervisor_id,
+            'acao': 'aprovar',
+            'entidade': 'revisao_item',
+            'entidade_id': it.id,
+            'detalhes': f"Aprovacao em massa. {motivo}",
+        })
+    if historico:
+        # executemany de insert() vira INSERT ... VALUES multi-linha no psycopg2
+        db.execute(sa.insert(_historico_tbl), historico)
+        db.execute(sa.insert(_auditoria_rvu_tbl), auditoria)
+    db.commit()
+    return aprovados
+
+
+def _publicar_aprovados(periods_map: dict, itens: list):
+    por_periodo: dict = {}
+    for it in itens:
+        por_periodo.setdefault(it.periodo_id, {})[it.id] = 'Aprovado'
+    for periodo_id, status_por_item in por_periodo.items():
+        per = periods_map.get(periodo_id)
+        eventos.publicar_status_itens(getattr(per, 'empresa_id', None), periodo_id, status_por_item)
+
+
 @router.post('/aprovar-massa')
 def aprovar_massa(payload: AprovarMassaCreate, current_user: UsuarioModel = Depends(get_current_user), db: Session = Depends(get_db)):
     ensure_tables()
@@ -580,8 +581,23 @@ def aprovar_massa(payload: AprovarMassaCreate, current_user: UsuarioModel = Depe
     if not payload.ativos_ids:
         raise HTTPException(status_code=400, detail="Nenhum item selecionado")
 
-    # Fetch items
-    items = db.query(RevisaoItemModel).filter(RevisaoItemModel.id.in_(payload.ativos_ids)).all()
+    logger = logging.getLogger("uvicorn.error")
+
+    # Somente as colunas usadas; ids lidos em blocos para não montar IN gigantes
+    colunas = (
+        RevisaoItemModel.id,
+        RevisaoItemModel.numero_imobilizado,
+        RevisaoItemModel.periodo_id,
+        RevisaoItemModel.status,
+        RevisaoItemModel.criado_por,
+        RevisaoItemModel.vida_util_revisada,
+        RevisaoItemModel.vida_util_periodos,
+        RevisaoItemModel.vida_util_anos,
+    )
+    ids = list(dict.fromkeys(payload.ativos_ids))
+    items = []
+    for i in range(0, len(ids), APROVACAO_LOTE_LEITURA):
+        items.extend(db.query(*colunas).filter(RevisaoItemModel.id.in_(ids[i:i + APROVACAO_LOTE_LEITURA])).all())
     if not items:
         return {'ok': True, 'count': 0, 'errors': []}
 
@@ -589,93 +605,54 @@ def aprovar_massa(payload: AprovarMassaCreate, current_user: UsuarioModel = Depe
     
     # Pre-fetch periods to minimize queries
     period_ids = {it.periodo_id for it in items if it.periodo_id}
-    periods = db.query(RevisaoPeriodoModel).filter(RevisaoPeriodoModel.id.in_(period_ids)).all()
+    periods = db.query(
+        RevisaoPeriodoModel.id, RevisaoPeriodoModel.empresa_id, RevisaoPeriodoModel.status, RevisaoPeriodoModel.responsavel_id
+    ).filter(RevisaoPeriodoModel.id.in_(period_ids)).all()
     periods_map = {p.id: p for p in periods}
+    db.commit()  # encerra a transação de leitura; cada lote abre a sua
     
     success_count = 0
     errors = []
+    pendentes = []
 
     safe_supervisor_id = current_user.id
 
+    # Validações em memória, na mesma ordem e com as mesmas mensagens por item
     for it in items:
-        try:
-            # Check company permission
-            per = periods_map.get(it.periodo_id)
-            if allowed and per and per.empresa_id not in allowed:
-                errors.append(f"Item {it.numero_imobilizado}: Acesso negado à empresa")
-                continue
-
-            # Check period status
-            if per and per.status == 'Encerrado':
-                errors.append(f"Item {it.numero_imobilizado}: Período encerrado")
-                continue
-            
-            # Skip if already approved (optional, but good practice)
-            if it.status == 'Aprovado':
-                # Already approved, maybe just count it or skip?
-                # Let's count it as success or just skip updates
-                success_count += 1
-                continue
-
-            # Update status
-            it.status = 'Aprovado'
-            
-            # History
-            revisada_total = int(it.vida_util_revisada or 0)
-            revisor_id = getattr(it, 'criado_por', None)
-            if not revisor_id and per:
-                revisor_id = getattr(per, 'responsavel_id', None)
-            
-            # Determine previous useful life
-            vida_anterior = (it.vida_util_periodos or 0)
-            if vida_anterior == 0 and (it.vida_util_anos or 0) > 0:
-                vida_anterior = (it.vida_util_anos or 0) * 12
-
-            # Insert history
-            db.execute(sa.text(
-                """
-                INSERT INTO revisoes_historico (ativo_id, supervisor_id, revisor_id, vida_util_anterior, vida_util_revisada, acao, status, motivo_reversao)
-                VALUES (:ativo_id, :supervisor_id, :revisor_id, :vida_util_anterior, :vida_util_revisada, 'aprovado', 'aprovado', :motivo)
-                """
-            ), {
-                'ativo_id': it.id,
-                'supervisor_id': safe_supervisor_id,
-                'revisor_id': revisor_id,
-                'vida_util_anterior': vida_anterior,
-                'vida_util_revisada': revisada_total,
-                'motivo': payload.motivo or ''
-            })
-            
-            # Insert audit
-            db.execute(sa.text(
-                """
-                INSERT INTO auditoria_rvu (usuario_id, acao, entidade, entidade_id, detalhes)
-                VALUES (:usuario_id, 'aprovar', 'revisao_item', :entidade_id, :detalhes)
-                """
-            ), {
-                'usuario_id': safe_supervisor_id,
-                'entidade_id': it.id,
-                'detalhes': f"Aprovacao em massa. {payload.motivo or ''}"
-            })
-
+        per = periods_map.get(it.periodo_id)
+        if allowed and per and per.empresa_id not in allowed:
+            errors.append(f"Item {it.numero_imobilizado}: Acesso negado à empresa")
+            continue
+        if per and per.status == 'Encerrado':
+            errors.append(f"Item {it.numero_imobilizado}: Período encerrado")
+            continue
+        # Já aprovado: conta como sucesso, sem novo histórico
+        if it.status == 'Aprovado':
             success_count += 1
-        except Exception as e:
-            try:
-                logging.getLogger("uvicorn.error").exception("Erro aprovar_massa item_id=%s", getattr(it, "id", None))
-            except Exception:
-                pass
-            errors.append(f"Item {it.numero_imobilizado}: Erro ao aprovar")
             continue
-    
-    try:
-        db.commit()
-    except Exception as e:
-        db.rollback()
+
+        revisor_id = it.criado_por
+        if not revisor_id and per:
+            revisor_id = per.responsavel_id
+        vida_anterior = (it.vida_util_periodos or 0)
+        if vida_anterior == 0 and (it.vida_util_anos or 0) > 0:
+            vida_anterior = (it.vida_util_anos or 0) * 12
+        pendentes.append((it, revisor_id, vida_anterior))
+
+    motivo = payload.motivo or ''
+    total_lotes = (len(pendentes) + APROVACAO_LOTE - 1) // APROVACAO_LOTE
+    for n, i in enumerate(range(0, len(pendentes), APROVACAO_LOTE), start=1):
+        lote = pendentes[i:i + APROVACAO_LOTE]
         try:
-            logging.getLogger("uvicorn.error").exception("Erro ao salvar aprovações em massa")
+            aprovados = _aprovar_lote(db, lote, safe_supervisor_id, motivo)
+            success_count += len(lote)
+            _publicar_aprovados(periods_map, [it for it, _revisor, _anterior in lote if it.id in aprovados])
         except Exception:
-            pass
-        raise HTTPException(status_code=500, detail="Erro ao salvar aprovações em massa")
+            db.rollback()
+            logger.exception("Erro aprovar_massa lote %s/%s", n, total_lotes)
+            errors.extend(f"Item {it.numero_imobilizado}: Erro ao aprovar" for it, _revisor, _anterior in lote)
+        if total_lotes > 1:
+            logger.info("aprovar_massa: lote %s/%s (%s de %s itens)", n, total_lotes, min(i + len(lote), len(pendentes)), len(pendentes))
 
     return {
         'ok': True,
@@ -793,16 +770,21 @@ def responder_comentario(payload: ComentarioResponder, current_user: UsuarioMode
         """
     ), { 'resposta': payload.resposta, 'revisor_id': payload.revisor_id, 'id': payload.comentario_id })
     db.commit()
+    eventos.publicar(
+        eventos.TIPO_COMENTARIO,
+        empresa_id=getattr(per, 'empresa_id', None),
+        periodo_id=getattr(per, 'id', None),
+        ativo_id=row['ativo_id'],
+        comentario_id=payload.comentario_id,
+        status='Respondido',
+    )
     # auditoria
-    db.execute(sa.text(
-        """
-        INSERT INTO auditoria_rvu (usuario_id, acao, entidade, entidade_id, detalhes)
-        VALUES (:usuario_id, 'responder_comentario', 'revisoes_comentarios', :entidade_id, :detalhes)
-        """
-    ), {
-        'usuario_id': payload.revisor_id,
-        'entidade_id': payload.comentario_id,
-        'detalhes': 'Resposta registrada e supervisor notificado.'
-    })
-    db.commit()
+    fila_auditoria.registrar(
+        tabela=fila_auditoria.TABELA_RVU,
+        usuario_id=payload.revisor_id,
+        acao='responder_comentario',
+        entidade='revisoes_comentarios',
+        entidade_id=payload.comentario_id,
+        detalhes='Resposta registrada e supervisor notificado.',
+    )
     return { 'ok': True }
@@ -0,0 +1,64 @@
+"""
+Serialização JSON rápida para listagens grandes.
+
+As rotas de listagem com dezenas de milhares de linhas projetam só as colunas
+necessárias (tuplas, sem objetos ORM) e devolvem bytes prontos, sem passar pela
+validação de response_model do FastAPI nem pelo json.dumps do JSONResponse.
+
+- codificador_linhas(colunas) devolve a função que transforma a tupla da
+  linha no dict com as chaves do contrato;
+- dumps() usa orjson quando instalado (datas/datetimes em ISO 8601, UTF-8 sem
+  escapes), com json da biblioteca padrão como alternativa de saída idêntica
+  para os tipos usados nas listagens (str, int, float, bool, None, date).
+"""
+
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Sequence
+
+from fastapi.responses import Response
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson está em requirements.txt
+    orjson = None
+    logger.info("orjson não instalado; serialização rápida usando json da biblioteca padrão")
+
+
+def _padrao(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Tipo não serializável: {type(obj).__name__}")
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_padrao)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_padrao).encode("utf-8")
+
+
+def codificador_linhas(colunas: Sequence[str]) -> Callable[[Sequence], dict]:
+    """Função linha -> dict com as chaves `colunas`, na ordem das colunas da consulta."""
+    chaves = tuple(colunas)
+
+    def codificar(linha: Sequence) -> dict:
+        return dict(zip(chaves, linha))
+
+    return codificar
+
+
+class RespostaJSON(Response):
+    """Response para conteúdo já codificado por dumps() (ou serializável por dumps)."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        return dumps(content)
@@ -0,0 +1,147 @@
+"""
+Versão dos dados por recurso (tabela), usada para invalidar caches e
+calcular ETags (app/cache_http.py).
+
+Cada recurso monitorado tem um contador em `dados_versoes`. Os eventos da
+sessão registram quais tabelas monitoradas foram escritas na transação (flush
+do ORM, UPDATE/INSERT/DELETE via Session.execute, inclusive SQL textual e
+DML dentro de CTE `WITH ...`) e,
+somente depois do commit, incrementam os contadores numa conexão própria.
+Incrementar após o commit garante que uma versão nunca é associada a dados
+que ainda não estavam visíveis: no pior caso um cache é regenerado à toa.
+
+Escritas que não passam por Session.execute (COPY no cursor psycopg2,
+Session.connection().execute, engine.begin()) não são vistas: devem chamar
+marcar_alteracao() ou incrementar() explicitamente.
+"""
+
+import logging
+import re
+from typing import Iterable, Optional
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+RECURSOS_VERSIONADOS = {
+    "revisoes_itens",
+    "revisoes_delegacoes",
+    "revisoes_periodos",
+    "usuarios",
+    # Cadastros de referência e acessos (ETags de app/cache_http.py)
+    "companies",
+    "unidades_gerenciais",
+    "centros_custos",
+    "classes_contabeis",
+    "contas_contabeis",
+    "grupos_permissao",
+    "grupo_empresa",
+    "grupo_usuario",
+    "grupo_transacao",
+}
+
+_INFO_KEY = "recursos_alterados"
+# Procurado em todo o texto (não só no início) para pegar DML em CTE `WITH x AS (UPDATE ...)`;
+# falsos positivos (ex.: "DO UPDATE SET") são descartados por RECURSOS_VERSIONADOS
+_DML_TEXTO = re.compile(r"\b(?:insert\s+into|update|delete\s+from)\s+\"?(\w+)\"?", re.IGNORECASE)
+_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+
+
+def marcar_alteracao(session: Session, *recursos: str):
+    """Registra na sessão que os recursos foram alterados na transação corrente.
+
+    Os eventos abaixo só enxergam o que passa por Session.flush/Session.execute.
+    Escritas em Session.connection().execute, no cursor DBAPI (COPY) ou em
+    engine.begin() precisam desta chamada (mesma sessão, antes do commit) ou,
+    fora de uma sessão, de incrementar() após o commit.
+    """
+    alterados = session.info.setdefault(_INFO_KEY, set())
+    alterados.update(r for r in recursos if r in RECURSOS_VERSIONADOS)
+
+
+def _tabelas_dml(sql: str) -> set[str]:
+    """Tabelas escritas por um SQL textual (literais de string ignorados)."""
+    return {t.lower() for t in _DML_TEXTO.findall(_LITERAL_TEXTO.sub("''", sql))}
+
+
+def obter_versoes(db: Session, recursos: Iterable[str]) -> Optional[dict[str, int]]:
+    """Versão atual de cada recurso (0 se nunca alterado); None se indisponível."""
+    recursos = sorted(set(recursos))
+    try:
+        rows = db.execute(
+            sa.text("SELECT recurso, versao FROM dados_versoes WHERE recurso IN :recursos")
+            .bindparams(sa.bindparam("recursos", expanding=True)),
+            {"recursos": recursos},
+        ).all()
+    except Exception:
+        logger.warning("Versões de dados indisponíveis (tabela dados_versoes)", exc_info=True)
+        try:
+            db.rollback()
+        except Exception:
+            pass
+        return None
+    atuais = {r: 0 for r in recursos}
+    atuais.update({str(rec): int(v) for rec, v in rows})
+    return atuais
+
+
+def incrementar(recursos: Iterable[str]):
+    recursos = sorted(set(recursos))
+    if not recursos:
+        return
+    try:
+        with engine.begin() as conn:
+            for recurso in recursos:
+                conn.execute(
+                    sa.text(
+                        """
+                        INSERT INTO dados_versoes (recurso, versao, atualizado_em)
+                        VALUES (:recurso, 1, NOW())
+                        ON CONFLICT (recurso) DO UPDATE
+                        SET versao = dados_versoes.versao + 1, atualizado_em = NOW()
+                        """
+                    ),
+                    {"recurso": recurso},
+                )
+    except Exception:
+        logger.warning("Falha ao incrementar versões de dados: %s", recursos, exc_info=True)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _registrar_flush(session, flush_context):
+    tabelas = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is not None:
+            tabelas.add(table.name)
+    marcar_alteracao(session, *tabelas)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _registrar_execute(orm_execute_state):
+    stmt = orm_execute_state.statement
+    if isinstance(stmt, sa.sql.elements.TextClause):
+        tabelas = _tabelas_dml(stmt.text)
+        if tabelas:
+            marcar_alteracao(orm_execute_state.session, *tabelas)
+    elif orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(stmt, "table", None)
+        if table is not None:
+            marcar_alteracao(orm_execute_state.session, table.name)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _incrementar_apos_commit(session):
+    alterados = session.info.pop(_INFO_KEY, None)
+    if alterados:
+        incrementar(alterados)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _descartar_apos_rollback(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop(_INFO_KEY, None)
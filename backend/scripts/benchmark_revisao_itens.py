@@ -0,0 +1,161 @@
+"""
+Compara o custo de serialização da listagem de itens de revisão
+(/revisoes/itens/{id}) com linhas sintéticas, sem banco de dados:
+
+- modelo: objeto -> RevisaoItemOut por linha + revalidação do response_model
+  (List[RevisaoItemOut]) + JSONResponse, como em main.list_revisao_itens;
+- dicts: dict montado à mão por linha + JSONResponse (json.dumps), caminho
+  anterior de routes/reviews.py;
+- rapido: tuplas + serializacao.codificador_linhas + serializacao.dumps (atual).
+
+Confere também que "dicts" e "rapido" produzem exatamente os mesmos bytes.
+
+Uso (a partir de backend/):
+    python scripts/benchmark_revisao_itens.py [--linhas 200000] [--repeticoes 3]
+"""
+
+import argparse
+import sys
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+# Add backend directory to sys.path
+backend_path = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_path))
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app import serializacao
+from app.main import RevisaoItemOut
+from app.routes.reviews import _ITENS_CAMPOS, _codificar_item
+
+
+def gerar_linhas(n: int):
+    """Tuplas na ordem de _ITENS_CAMPOS (valor_contabil já como float, como vem do banco)."""
+    base = date(2018, 1, 1)
+    linhas = []
+    for i in range(n):
+        revisado = i % 4 == 0
+        linhas.append((
+            i + 1, 7, f"{1000000 + i}", str(i % 3), f"Equipamento de produção nº {i} – linha ç/ã",
+            base + timedelta(days=i % 1500), base + timedelta(days=3650 + i % 1500),
+            round(1000 + (i * 37.13) % 250000, 2), f"CC{i % 40:03d}", f"CL{i % 12}", "Máquinas e equipamentos",
+            10, 120, 96 if revisado else None, base + timedelta(days=4000) if revisado else None,
+            "Bom" if revisado else None, "Revisão anual" if revisado else None, None, "aux",
+            "Revisado" if revisado else "Pendente", revisado, 3 if revisado else None,
+        ))
+    return linhas
+
+
+def caminho_modelo(linhas):
+    # Objetos com todos os campos de RevisaoItemOut (como a entidade ORM carregada)
+    objetos = []
+    for r in linhas:
+        d = dict(zip(_ITENS_CAMPOS, r))
+        d["valor_contabil"] = Decimal(str(d["valor_contabil"]))
+        objetos.append(SimpleNamespace(
+            **d,
+            valor_aquisicao=d["valor_contabil"] * 2,
+            depreciacao_acumulada=d["valor_contabil"],
+            conta_contabil="1.2.3.01",
+            descricao_conta_contabil="Imobilizado",
+            criado_em=datetime(2024, 5, 1, 12, 30),
+        ))
+    inicio = time.perf_counter()
+    saida = [
+        RevisaoItemOut(
+            id=o.id, periodo_id=o.periodo_id, numero_imobilizado=o.numero_imobilizado, sub_numero=o.sub_numero,
+            descricao=o.descricao, data_inicio_depreciacao=o.data_inicio_depreciacao,
+            data_fim_depreciacao=o.data_fim_depreciacao, data_fim_revisada=o.data_fim_revisada,
+            valor_aquisicao=float(o.valor_aquisicao), depreciacao_acumulada=float(o.depreciacao_acumulada),
+            valor_contabil=float(o.valor_contabil), centro_custo=o.centro_custo, classe=o.classe,
+            descricao_classe=o.descricao_classe, conta_contabil=o.conta_contabil,
+            descricao_conta_contabil=o.descricao_conta_contabil, vida_util_anos=o.vida_util_anos,
+            vida_util_periodos=o.vida_util_periodos, vida_util_revisada=o.vida_util_revisada,
+            condicao_fisica=o.condicao_fisica, justificativa=o.justificativa, alterado=o.alterado,
+            auxiliar2=o.auxiliar2, auxiliar3=o.auxiliar3, status=o.status, criado_em=o.criado_em,
+        )
+        for o in objetos
+    ]
+    # O FastAPI revalida o retorno contra response_model e serializa em modo JSON
+    adaptador = TypeAdapter(List[RevisaoItemOut])
+    conteudo = adaptador.dump_python(adaptador.validate_python(saida), mode="json")
+    return JSONResponse(content=conteudo).body, time.perf_counter() - inicio
+
+
+def caminho_dicts(linhas):
+    # Linhas com acesso por atributo e valor_contabil em Decimal, como vinham do driver
+    Linha = namedtuple("Linha", _ITENS_CAMPOS)
+    i_valor = _ITENS_CAMPOS.index("valor_contabil")
+    results = [Linha(*r[:i_valor], Decimal(str(r[i_valor])), *r[i_valor + 1:]) for r in linhas]
+    inicio = time.perf_counter()
+    data = []
+    for row in results:
+        data.append({
+            "id": row.id,
+            "periodo_id": row.periodo_id,
+            "numero_imobilizado": row.numero_imobilizado,
+            "sub_numero": row.sub_numero,
+            "descricao": row.descricao,
+            "data_inicio_depreciacao": row.data_inicio_depreciacao.isoformat() if row.data_inicio_depreciacao else None,
+            "data_fim_depreciacao": row.data_fim_depreciacao.isoformat() if row.data_fim_depreciacao else None,
+            "valor_contabil": float(row.valor_contabil) if row.valor_contabil is not None else 0.0,
+            "centro_custo": row.centro_custo,
+            "classe": row.classe,
+            "descricao_classe": row.descricao_classe,
+            "vida_util_anos": row.vida_util_anos,
+            "vida_util_periodos": row.vida_util_periodos,
+            "vida_util_revisada": row.vida_util_revisada,
+            "data_fim_revisada": row.data_fim_revisada.isoformat() if row.data_fim_revisada else None,
+            "condicao_fisica": row.condicao_fisica,
+            "justificativa": row.justificativa,
+            "auxiliar2": row.auxiliar2,
+            "auxiliar3": row.auxiliar3,
+            "status": row.status,
+            "alterado": row.alterado,
+            "criado_por": row.criado_por,
+        })
+    return JSONResponse(content=data).body, time.perf_counter() - inicio
+
+
+def caminho_rapido(linhas):
+    inicio = time.perf_counter()
+    corpo = serializacao.RespostaJSON(serializacao.dumps(list(map(_codificar_item, linhas)))).body
+    return corpo, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da serialização de /revisoes/itens/{id}")
+    parser.add_argument("--linhas", type=int, default=200000, help="itens sintéticos (default: 200000)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="execuções por caminho; vale a melhor (default: 3)")
+    args = parser.parse_args()
+
+    linhas = gerar_linhas(args.linhas)
+    print(f"{args.linhas} itens, melhor de {args.repeticoes} (orjson: {'sim' if serializacao.orjson else 'não'})")
+
+    resultados = {}
+    for nome, caminho in (("modelo", caminho_modelo), ("dicts", caminho_dicts), ("rapido", caminho_rapido)):
+        tempos = []
+        for _ in range(args.repeticoes):
+            corpo, tempo = caminho(linhas)
+            tempos.append(tempo)
+        resultados[nome] = (corpo, min(tempos))
+
+    base = resultados["rapido"][1]
+    for nome, (corpo, tempo) in resultados.items():
+        print(f"  {nome:<7} {tempo * 1000:9.1f} ms  {len(corpo) / 1e6:7.2f} MB  {tempo / base:5.1f}x")
+
+    if resultados["dicts"][0] != resultados["rapido"][0]:
+        print("ERRO: saída do caminho rápido difere da anterior")
+        sys.exit(1)
+    print("Saída idêntica ao caminho anterior (bytes)")
+
+
+if __name__ == "__main__":
+    main()
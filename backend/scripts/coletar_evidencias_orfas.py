@@ -0,0 +1,45 @@
+"""
+Remove do store de evidências (EVIDENCIAS_STORE / EVIDENCIAS_DIR, ver
+app/armazenamento.py) os blobs que nenhuma evidência referencia mais.
+
+Uso (a partir de backend/):
+    python scripts/coletar_evidencias_orfas.py [--carencia-horas 24]
+
+Excluir uma evidência não apaga o blob na hora (pode haver um upload do mesmo
+conteúdo em andamento); agende este script (cron) para liberar o espaço.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add backend directory to sys.path
+backend_path = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_path))
+
+from app.database import SessionLocal
+from app import armazenamento
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove blobs de evidências sem referência")
+    parser.add_argument(
+        "--carencia-horas", type=float, default=24,
+        help="ignora blobs gravados/reaproveitados há menos que isso (default: 24)",
+    )
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        removidos = armazenamento.coletar_orfaos(db, carencia_horas=max(0.0, args.carencia_horas))
+        print(f"{removidos} blob(s) órfão(s) removido(s) do store ({armazenamento.EVIDENCIAS_STORE}).")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
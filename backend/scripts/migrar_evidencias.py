@@ -0,0 +1,42 @@
+"""
+Move o conteúdo das evidências de cronograma ainda gravado em BYTEA para o
+store de arquivos (EVIDENCIAS_STORE / EVIDENCIAS_DIR, ver app/armazenamento.py).
+
+Uso (a partir de backend/):
+    python scripts/migrar_evidencias.py [--lote 50] [--limite N]
+
+Pode ser interrompido e executado de novo: cada lote é confirmado separadamente.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add backend directory to sys.path
+backend_path = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_path))
+
+from app.database import SessionLocal
+from app import armazenamento
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra evidências BYTEA para o store de arquivos")
+    parser.add_argument("--lote", type=int, default=50, help="linhas por commit (default: 50)")
+    parser.add_argument("--limite", type=int, default=None, help="máximo de linhas nesta execução")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        movidas = armazenamento.migrar_bytea(db, lote=max(1, args.lote), limite=args.limite)
+        print(f"{movidas} evidência(s) movida(s) para o store ({armazenamento.EVIDENCIAS_STORE}).")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
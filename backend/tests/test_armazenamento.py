@@ -0,0 +1,86 @@
+"""
+Store de evidências (app/armazenamento.py): coleta de blobs órfãos com
+carência e 404 para blob ausente, sobre o store local e SQLite em memória.
+"""
+
+import io
+import os
+import time
+
+import pytest
+import sqlalchemy as sa
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.requests import Request
+
+from app import armazenamento
+from app.models import CronogramaTarefaEvidencia as EvidenciaModel
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    s = armazenamento.LocalBlobStore(str(tmp_path))
+    monkeypatch.setattr(armazenamento, "_store", s)
+    return s
+
+
+@pytest.fixture
+def db():
+    engine = sa.create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    EvidenciaModel.__table__.create(engine)
+    sessao = sessionmaker(bind=engine)()
+    yield sessao
+    sessao.close()
+    engine.dispose()
+
+
+def _envelhecer(store, chave, horas):
+    t = time.time() - horas * 3600
+    os.utime(store._path(chave), (t, t))
+
+
+def _evidencia(db, chave):
+    db.add(EvidenciaModel(tarefa_id=1, nome_arquivo="a.txt", content_type="text/plain", tamanho_bytes=1, sha256=chave))
+    db.commit()
+
+
+def test_coleta_respeita_referencias_e_carencia(store, db):
+    referenciado, _ = store.salvar(io.BytesIO(b"em uso"))
+    orfao, _ = store.salvar(io.BytesIO(b"excluido"))
+    recente, _ = store.salvar(io.BytesIO(b"upload em andamento"))
+    _evidencia(db, referenciado)
+    _envelhecer(store, referenciado, 48)
+    _envelhecer(store, orfao, 48)
+
+    assert armazenamento.coletar_orfaos(db, carencia_horas=24) == 1
+    assert store.existe(referenciado)
+    assert not store.existe(orfao)
+    assert store.existe(recente)
+
+
+def test_dedup_renova_a_carencia(store, db):
+    chave, _ = store.salvar(io.BytesIO(b"conteudo"))
+    _envelhecer(store, chave, 48)
+    # Evidência excluída e, em seguida, o mesmo arquivo enviado de novo (linha ainda não gravada)
+    assert store.salvar(io.BytesIO(b"conteudo"))[0] == chave
+
+    assert armazenamento.coletar_orfaos(db, carencia_horas=24) == 0
+    assert store.existe(chave)
+
+
+def test_blob_ausente_responde_404(store):
+    chave, tamanho = store.salvar(io.BytesIO(b"abc"))
+    store.remover(chave)
+    request = Request({"type": "http", "method": "GET", "headers": []})
+    with pytest.raises(HTTPException) as exc:
+        armazenamento.resposta_blob(
+            request,
+            etag=chave,
+            tamanho=tamanho,
+            media_type="text/plain",
+            filename="a.txt",
+            abrir=lambda inicio, fim: store.abrir(chave, inicio, fim),
+            existe=lambda: store.existe(chave),
+        )
+    assert exc.value.status_code == 404
@@ -0,0 +1,35 @@
+"""
+main.audit(): eventos obrigatórios não podem ser perdidos em silêncio.
+"""
+
+import pytest
+import sqlalchemy as sa
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+
+from app import fila_auditoria, main
+
+
+@pytest.fixture
+def db_sem_tabelas():
+    # Sem auditoria_logs: qualquer gravação síncrona falha
+    engine = sa.create_engine("sqlite://")
+    sessao = sessionmaker(bind=engine)()
+    yield sessao
+    sessao.close()
+    engine.dispose()
+
+
+@pytest.mark.parametrize("kwargs", [{"acao": "delete"}, {"acao": "NOTIFICACAO_ENVIO", "obrigatorio": True}])
+def test_falha_em_evento_obrigatorio_vira_500(db_sem_tabelas, kwargs):
+    assert kwargs.get("obrigatorio") or kwargs["acao"] in fila_auditoria.AUDITORIA_ACOES_SINCRONAS
+    with pytest.raises(HTTPException) as exc:
+        main.audit(db_sem_tabelas, usuario_id=1, entidade="grupo", entidade_id=1, **kwargs)
+    assert exc.value.status_code == 500
+
+
+def test_evento_comum_vai_para_a_fila(db_sem_tabelas, monkeypatch):
+    enfileirados = []
+    monkeypatch.setattr(fila_auditoria, "registrar", lambda **evento: enfileirados.append(evento))
+    main.audit(db_sem_tabelas, usuario_id=1, acao="EVIDENCIA_DOWNLOAD", entidade="cronograma_tarefa", entidade_id=1)
+    assert [e["acao"] for e in enfileirados] == ["EVIDENCIA_DOWNLOAD"]
@@ -0,0 +1,232 @@
+"""
+Propriedades de app/depreciacao.py: as somas em forma fechada e as variantes
+NumPy devem reproduzir, centavo a centavo, o cronograma mês a mês original
+(cópia abaixo do laço usado pelo simulador e pelos relatórios RVU).
+"""
+
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from app.depreciacao import (
+    add_months,
+    centavos,
+    cronograma_mensal,
+    datas_lote,
+    depreciacao_ate,
+    depreciacao_janela,
+    meses_antes,
+    meses_antes_lote,
+    months_diff,
+    parcela_centavos_lote,
+    soma_intervalo_centavos,
+    soma_intervalo_lote,
+)
+from app.routes.simulador_depreciacao import _depreciacao_periodo_lote
+
+CASOS_ALEATORIOS = 3000
+
+
+# -----------------------------
+# Implementação iterativa original
+# -----------------------------
+def _serie_antiga(valor: float, inicio: date, meses: int):
+    """(data, saldo_inicial, depreciacao_mes, saldo_final) de cada mês, como no laço original."""
+    linhas = []
+    if meses <= 0:
+        return linhas
+    mensal = round(valor / meses, 2)
+    saldo = valor
+    for i in range(meses):
+        dep_mes = mensal
+        if i == meses - 1:
+            dep_mes = round(saldo, 2)
+        saldo_final = round(saldo - dep_mes, 2)
+        linhas.append((add_months(inicio, i), round(saldo, 2), dep_mes, saldo_final))
+        saldo = saldo_final
+    return linhas
+
+
+def _janela_antiga(valor, inicio, meses, janela_inicio, janela_fim) -> int:
+    return centavos(sum(dep for data, _, dep, _ in _serie_antiga(valor, inicio, meses) if janela_inicio <= data <= janela_fim))
+
+
+def _ate_antiga(valor, inicio, meses, ref) -> int:
+    return centavos(sum(dep for data, _, dep, _ in _serie_antiga(valor, inicio, meses) if data < ref))
+
+
+def _simulador_antigo(valor, inicio_original, fim_original, base, fim_revisada, janela_inicio, janela_fim):
+    """Depreciação original e revisada na janela (centavos), como no simulador antes da forma fechada."""
+    inicio_efetivo = max(janela_inicio, base)
+    dep_original = 0.0
+    ate_base = 0.0
+    if fim_original and fim_original > inicio_efetivo:
+        for data, _, dep, _ in _serie_antiga(valor, inicio_original, months_diff(inicio_original, fim_original)):
+            if data < base:
+                ate_base += dep
+            if inicio_efetivo <= data <= janela_fim:
+                dep_original += dep
+    saldo_base = round(max(0.0, valor - ate_base), 2) if ate_base > 0 else valor
+    if fim_revisada and fim_revisada > inicio_efetivo:
+        dep_revisada = sum(
+            dep
+            for data, _, dep, _ in _serie_antiga(saldo_base, base, months_diff(base, fim_revisada))
+            if inicio_efetivo <= data <= janela_fim
+        )
+    else:
+        dep_revisada = dep_original
+    return centavos(dep_original), centavos(dep_revisada)
+
+
+# -----------------------------
+# Geradores
+# -----------------------------
+def _data(rng: random.Random, ano_min=2000, ano_max=2040) -> date:
+    d = date(rng.randint(ano_min, ano_max), rng.randint(1, 12), 1)
+    # Dias de fim de mês (29-31) aparecem com frequência: é onde add_months ajusta o dia
+    if rng.random() < 0.4:
+        return add_months(d, 1) - timedelta(days=rng.randint(1, 3))
+    return d + timedelta(days=rng.randint(0, 27))
+
+
+def _valor(rng: random.Random) -> float:
+    if rng.random() < 0.2:
+        return rng.randint(1, 99) / 100  # menos de um centavo por mês em séries longas
+    return rng.randint(1, 10**9) / 100
+
+
+def _meses(rng: random.Random) -> int:
+    return rng.choice([0, 1, 2, 3, rng.randint(1, 36), rng.randint(1, 600)])
+
+
+# -----------------------------
+# Escalares
+# -----------------------------
+@pytest.mark.parametrize("semente", range(3))
+def test_janela_e_acumulado_iguais_ao_laco(semente):
+    rng = random.Random(semente)
+    for _ in range(CASOS_ALEATORIOS):
+        valor, inicio, meses = _valor(rng), _data(rng), _meses(rng)
+        a, b = sorted((_data(rng), _data(rng)))
+        vc = centavos(valor)
+        assert depreciacao_janela(vc, inicio, meses, a, b) == _janela_antiga(valor, inicio, meses, a, b), (valor, inicio, meses, a, b)
+        assert depreciacao_ate(vc, inicio, meses, a) == _ate_antiga(valor, inicio, meses, a), (valor, inicio, meses, a)
+
+
+@pytest.mark.parametrize("semente", range(3))
+def test_cronograma_mensal_igual_ao_laco(semente):
+    rng = random.Random(semente)
+    for _ in range(CASOS_ALEATORIOS // 3):
+        valor, inicio, meses = _valor(rng), _data(rng), _meses(rng)
+        desde = rng.randint(0, meses + 1)
+        esperado = [(i, *linha) for i, linha in enumerate(_serie_antiga(valor, inicio, meses))][desde:]
+        assert list(cronograma_mensal(valor, inicio, meses, desde)) == esperado, (valor, inicio, meses, desde)
+
+
+@pytest.mark.parametrize(
+    "valor, inicio, meses, janela_inicio, janela_fim",
+    [
+        # Início da série depois da janela
+        (1200.00, date(2030, 1, 15), 12, date(2024, 1, 1), date(2024, 12, 31)),
+        # Janela terminando exatamente no mês do resíduo (última parcela)
+        (100.00, date(2024, 1, 10), 3, date(2024, 1, 1), date(2024, 3, 10)),
+        (100.00, date(2024, 1, 10), 3, date(2024, 1, 1), date(2024, 3, 9)),
+        (100.00, date(2024, 1, 10), 3, date(2024, 3, 10), date(2024, 3, 10)),
+        # Vida útil zero e de um mês
+        (500.00, date(2024, 5, 1), 0, date(2024, 1, 1), date(2024, 12, 31)),
+        (500.00, date(2024, 5, 1), 1, date(2024, 1, 1), date(2024, 12, 31)),
+        (500.00, date(2024, 5, 1), 1, date(2024, 5, 2), date(2024, 12, 31)),
+        # Arredondamento de centavos na última parcela
+        (0.05, date(2024, 1, 1), 3, date(2024, 1, 1), date(2024, 12, 31)),
+        (0.01, date(2024, 1, 1), 7, date(2024, 1, 1), date(2024, 12, 31)),
+        (1000.00, date(2024, 1, 1), 7, date(2024, 7, 1), date(2024, 7, 1)),
+        (0.03, date(2024, 1, 1), 2, date(2024, 2, 1), date(2024, 2, 1)),
+        # Dia 31 e 29/02 ajustados ao fim do mês
+        (3650.00, date(2024, 1, 31), 24, date(2024, 2, 29), date(2025, 2, 28)),
+        (3650.00, date(2023, 3, 31), 24, date(2024, 2, 28), date(2024, 2, 29)),
+    ],
+)
+def test_casos_limite(valor, inicio, meses, janela_inicio, janela_fim):
+    vc = centavos(valor)
+    assert depreciacao_janela(vc, inicio, meses, janela_inicio, janela_fim) == _janela_antiga(valor, inicio, meses, janela_inicio, janela_fim)
+    for ref in (janela_inicio, janela_fim):
+        assert depreciacao_ate(vc, inicio, meses, ref) == _ate_antiga(valor, inicio, meses, ref)
+    assert list(cronograma_mensal(valor, inicio, meses)) == [(i, *l) for i, l in enumerate(_serie_antiga(valor, inicio, meses))]
+
+
+def test_ultima_parcela_absorve_o_residuo():
+    linhas = list(cronograma_mensal(100.00, date(2024, 1, 1), 3))
+    assert [dep for _, _, _, dep, _ in linhas] == [33.33, 33.33, 33.34]
+    assert linhas[-1][4] == 0.0
+    assert soma_intervalo_centavos(10000, 3, 0, 3) == 10000
+
+
+def test_referencia_antes_do_inicio_nao_deprecia():
+    inicio = date(2024, 6, 15)
+    assert meses_antes(inicio, date(2020, 1, 1)) == 0
+    assert depreciacao_ate(120000, inicio, 12, date(2024, 6, 15)) == 0
+    assert depreciacao_ate(120000, inicio, 12, date(2024, 6, 16)) == 10000
+
+
+# -----------------------------
+# Variantes NumPy
+# -----------------------------
+@pytest.mark.parametrize("semente", range(3))
+def test_lote_igual_ao_escalar(semente):
+    rng = random.Random(semente)
+    n = CASOS_ALEATORIOS
+    valores = [_valor(rng) for _ in range(n)]
+    inicios = [_data(rng) for _ in range(n)]
+    meses = [_meses(rng) for _ in range(n)]
+    janelas = [sorted((_data(rng), _data(rng))) for _ in range(n)]
+
+    vc = np.array([centavos(v) for v in valores], dtype=np.int64)
+    m = np.array(meses, dtype=np.int64)
+    ini = datas_lote(inicios, n)
+    ja = datas_lote((j[0] for j in janelas), n)
+    jb = datas_lote((j[1] for j in janelas), n)
+
+    a = meses_antes_lote(ini, ja)
+    b = meses_antes_lote(ini, jb, True)
+    assert a.tolist() == [meses_antes(i, j[0]) for i, j in zip(inicios, janelas)]
+    assert b.tolist() == [meses_antes(i, j[1], inclusive=True) for i, j in zip(inicios, janelas)]
+
+    mensal = parcela_centavos_lote(vc, m)
+    ultimo = vc - (m - 1) * mensal
+    obtido = np.where(m > 0, soma_intervalo_lote(a, b, m, mensal, ultimo), 0)
+    esperado = [_janela_antiga(v, i, k, j[0], j[1]) for v, i, k, j in zip(valores, inicios, meses, janelas)]
+    assert obtido.tolist() == esperado
+
+
+@pytest.mark.parametrize("semente", range(3))
+def test_simulador_lote_igual_ao_laco(semente):
+    rng = random.Random(semente)
+    casos = []
+    for _ in range(CASOS_ALEATORIOS // 3):
+        valor = _valor(rng)
+        inicio = _data(rng, 2000, 2030)
+        fim = add_months(inicio, rng.randint(1, 240)) if rng.random() < 0.95 else None
+        # Data base antes do início do ativo também ocorre (período antigo, ativo novo)
+        base = _data(rng, 1995, 2035)
+        fim_revisada = add_months(base, rng.choice([0, 1, rng.randint(1, 240)])) if rng.random() < 0.9 else None
+        janela_inicio = _data(rng, 2000, 2035)
+        janela_fim = add_months(janela_inicio, rng.randint(0, 36)) + timedelta(days=rng.randint(0, 27))
+        casos.append((valor, inicio, fim, base, fim_revisada, janela_inicio, janela_fim))
+
+    n = len(casos)
+    efetivos = [max(c[5], c[3]) for c in casos]
+    dep_original, dep_revisada = _depreciacao_periodo_lote(
+        valor_centavos=np.array([centavos(c[0]) for c in casos], dtype=np.int64),
+        inicio_original=datas_lote((c[1] for c in casos), n),
+        meses_original=np.array([months_diff(c[1], c[2]) if c[2] else 0 for c in casos], dtype=np.int64),
+        calcula_original=np.array([bool(c[2] and c[2] > e) for c, e in zip(casos, efetivos)], dtype=bool),
+        base=datas_lote((c[3] for c in casos), n),
+        meses_revisada=np.array([months_diff(c[3], c[4]) if c[4] else 0 for c in casos], dtype=np.int64),
+        calcula_revisada=np.array([bool(c[4] and c[4] > e) for c, e in zip(casos, efetivos)], dtype=bool),
+        janela_inicio=datas_lote(efetivos, n),
+        janela_fim=datas_lote((c[6] for c in casos), n),
+    )
+    esperado = [_simulador_antigo(*c) for c in casos]
+    assert list(zip(dep_original.tolist(), dep_revisada.tolist())) == esperado
@@ -0,0 +1,168 @@
+"""
+Fila de e-mails (app/fila_email.py) contra um servidor SMTP local (aiosmtpd).
+
+A fila roda sobre SQLite em memória: o UPDATE ... RETURNING da reivindicação
+é suportado e o FOR UPDATE SKIP LOCKED (só relevante com vários processos)
+não é emitido nesse dialeto.
+"""
+
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller  # noqa: E402
+
+from app import fila_email  # noqa: E402
+from app.models import EmailFila as EmailFilaModel  # noqa: E402
+
+
+class ServidorTeste:
+    """Aceita tudo, exceto destinatários temp* (450) e perm* (550)."""
+
+    def __init__(self):
+        self.entregues: list[str] = []
+        self.sessoes: set[int] = set()
+        self.recusar_temporario = True
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        self.sessoes.add(id(session))
+        if address.startswith("temp") and self.recusar_temporario:
+            return "450 Caixa indisponível, tente mais tarde"
+        if address.startswith("perm"):
+            return "550 Caixa inexistente"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.entregues.extend(envelope.rcpt_tos)
+        return "250 Mensagem aceita"
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    servidor = ServidorTeste()
+    porta = _porta_livre()
+    controller = Controller(servidor, hostname="127.0.0.1", port=porta)
+    controller.start()
+    monkeypatch.setattr(fila_email, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(fila_email, "SMTP_PORT", porta)
+    monkeypatch.setattr(fila_email, "SMTP_USE_SSL", False)
+    monkeypatch.setattr(fila_email, "SMTP_USE_TLS", False)
+    monkeypatch.setattr(fila_email, "SMTP_USER", None)
+    pool = fila_email.PoolSMTP(1)
+    monkeypatch.setattr(fila_email, "_pool", pool)
+    yield servidor
+    pool.fechar()
+    controller.stop()
+
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = sa.create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    EmailFilaModel.__table__.create(engine)
+    Sessao = sessionmaker(bind=engine)
+    monkeypatch.setattr(fila_email, "SessionLocal", Sessao)
+    sessao = Sessao()
+    yield sessao
+    sessao.close()
+    engine.dispose()
+
+
+def _enfileirar(db, *destinatarios):
+    fila_email.enfileirar(
+        db, [{"destinatario": d, "assunto": "Aviso", "corpo": f"Olá {d}"} for d in destinatarios]
+    )
+    db.commit()
+
+
+def _situacao(db) -> dict:
+    db.expire_all()
+    return {e.destinatario: e for e in db.query(EmailFilaModel).all()}
+
+
+def _tornar_elegivel(db):
+    db.execute(sa.update(EmailFilaModel).values(proxima_tentativa_em=datetime.utcnow() - timedelta(seconds=1)))
+    db.commit()
+
+
+def test_status_por_destinatario(smtp, db):
+    _enfileirar(db, "ana@exemplo.com", "temp@exemplo.com", "perm@exemplo.com", "bia@exemplo.com")
+
+    assert fila_email.processar_fila() == 4
+
+    s = _situacao(db)
+    assert sorted(smtp.entregues) == ["ana@exemplo.com", "bia@exemplo.com"]
+    assert s["ana@exemplo.com"].status == fila_email.STATUS_ENVIADO
+    assert s["bia@exemplo.com"].status == fila_email.STATUS_ENVIADO
+    assert s["ana@exemplo.com"].enviado_em is not None
+    assert s["temp@exemplo.com"].status == fila_email.STATUS_PENDENTE
+    assert s["perm@exemplo.com"].status == fila_email.STATUS_ERRO
+    assert s["perm@exemplo.com"].tentativas == 1
+    assert "550" in s["perm@exemplo.com"].ultimo_erro
+
+
+def test_recusa_temporaria_reagendada_com_backoff(smtp, db):
+    _enfileirar(db, "temp@exemplo.com")
+
+    inicio = datetime.utcnow()
+    fila_email.processar_fila()
+    e = _situacao(db)["temp@exemplo.com"]
+    assert (e.status, e.tentativas) == (fila_email.STATUS_PENDENTE, 1)
+    espera = (e.proxima_tentativa_em - inicio).total_seconds()
+    assert fila_email.EMAIL_BACKOFF_SEGUNDOS <= espera < fila_email.EMAIL_BACKOFF_SEGUNDOS + 5
+
+    # Antes do horário reagendado a mensagem não é reivindicada
+    assert fila_email.processar_fila() == 0
+
+    # Segunda falha dobra a espera
+    _tornar_elegivel(db)
+    inicio = datetime.utcnow()
+    fila_email.processar_fila()
+    e = _situacao(db)["temp@exemplo.com"]
+    assert (e.status, e.tentativas) == (fila_email.STATUS_PENDENTE, 2)
+    espera = (e.proxima_tentativa_em - inicio).total_seconds()
+    assert 2 * fila_email.EMAIL_BACKOFF_SEGUNDOS <= espera < 2 * fila_email.EMAIL_BACKOFF_SEGUNDOS + 5
+
+    # Servidor volta a aceitar: entregue na tentativa seguinte
+    smtp.recusar_temporario = False
+    _tornar_elegivel(db)
+    fila_email.processar_fila()
+    e = _situacao(db)["temp@exemplo.com"]
+    assert (e.status, e.tentativas) == (fila_email.STATUS_ENVIADO, 3)
+    assert smtp.entregues == ["temp@exemplo.com"]
+
+
+def test_recusa_temporaria_esgota_tentativas(smtp, db, monkeypatch):
+    monkeypatch.setattr(fila_email, "EMAIL_MAX_TENTATIVAS", 2)
+    _enfileirar(db, "temp@exemplo.com")
+
+    fila_email.processar_fila()
+    _tornar_elegivel(db)
+    fila_email.processar_fila()
+
+    e = _situacao(db)["temp@exemplo.com"]
+    assert (e.status, e.tentativas) == (fila_email.STATUS_ERRO, 2)
+
+
+def test_conexao_reutilizada_no_lote_e_entre_lotes(smtp, db):
+    destinatarios = [f"user{i}@exemplo.com" for i in range(20)]
+    _enfileirar(db, *destinatarios)
+    fila_email.processar_fila()
+
+    # Um lote com recusas no meio também segue na mesma conexão
+    _enfileirar(db, "temp@exemplo.com", "perm@exemplo.com", "ultimo@exemplo.com")
+    fila_email.processar_fila()
+
+    assert sorted(smtp.entregues) == sorted(destinatarios + ["ultimo@exemplo.com"])
+    assert len(smtp.sessoes) == 1
@@ -0,0 +1,116 @@
+"""
+Jobs de importação: a conclusão é gravada no mesmo commit dos itens, então um
+crash logo depois não faz a recuperação reexecutar o job e duplicar a base.
+"""
+
+import io
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateTable
+
+from app import importacao_base, importacao_jobs
+from app.models import ImportacaoJob, RevisaoItem
+
+CSV = (
+    "numero_imobilizado;sub_numero;descricao;data_inicio_depreciacao;valor_aquisicao;"
+    "depreciacao_acumulada;valor_contabil;centro_custo;classe;conta_contabil;"
+    "descricao_conta_contabil;vida_util_anos;vida_util_periodos\n"
+    "1;0;Ativo A;01/01/2020;1000;100;900;CC;C;1;Conta;10;120\n"
+    "2;0;Ativo B;01/01/2021;2000;200;1800;CC;C;1;Conta;5;60\n"
+)
+
+
+class Crash(BaseException):
+    """Simula o processo morrendo: não é tratada pelos `except Exception` do worker."""
+
+
+@pytest.fixture
+def Sessao(monkeypatch, tmp_path):
+    engine = sa.create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        # Só as tabelas: alguns índices usam expressões do PostgreSQL
+        for modelo in (ImportacaoJob, RevisaoItem):
+            conn.execute(CreateTable(modelo.__table__))
+    Sessao = sessionmaker(bind=engine)
+    monkeypatch.setattr(importacao_jobs, "SessionLocal", Sessao)
+    monkeypatch.setattr(importacao_jobs, "IMPORT_JOB_DIR", str(tmp_path))
+    monkeypatch.setattr(importacao_jobs, "IMPORT_JOB_STALE_SECONDS", 0)
+    yield Sessao
+    engine.dispose()
+
+
+def _criar_job(Sessao) -> str:
+    db = Sessao()
+    try:
+        return importacao_jobs.criar_job(db, 10, io.BytesIO(CSV.encode()), "base.csv").id
+    finally:
+        db.close()
+
+
+def test_job_concluido_no_commit_dos_itens(Sessao, monkeypatch):
+    job_id = _criar_job(Sessao)
+    importar = importacao_jobs.importar_base
+
+    def importar_e_cair(*args, **kwargs):
+        importar(*args, **kwargs)
+        raise Crash()
+
+    monkeypatch.setattr(importacao_jobs, "importar_base", importar_e_cair)
+    with pytest.raises(Crash):
+        importacao_jobs._executar(job_id)
+
+    enfileirados = []
+    monkeypatch.setattr(importacao_jobs, "enfileirar", enfileirados.append)
+    importacao_jobs.recuperar_jobs()
+
+    db = Sessao()
+    job = db.get(ImportacaoJob, job_id)
+    assert job.status == importacao_jobs.STATUS_CONCLUIDO
+    assert job.linhas_importadas == 2
+    assert enfileirados == []
+    assert db.query(RevisaoItem).count() == 2
+    db.close()
+
+
+def test_job_interrompido_antes_do_commit_e_reexecutado(Sessao, monkeypatch):
+    job_id = _criar_job(Sessao)
+
+    def cair(*args, **kwargs):
+        raise Crash()
+
+    monkeypatch.setattr(importacao_jobs, "importar_base", cair)
+    monkeypatch.setattr(importacao_jobs, "_remove_file", lambda path: None)
+    with pytest.raises(Crash):
+        importacao_jobs._executar(job_id)
+
+    enfileirados = []
+    monkeypatch.setattr(importacao_jobs, "enfileirar", enfileirados.append)
+    importacao_jobs.recuperar_jobs()
+
+    db = Sessao()
+    assert db.get(ImportacaoJob, job_id).status == importacao_jobs.STATUS_PENDENTE
+    assert enfileirados == [job_id]
+    assert db.query(RevisaoItem).count() == 0
+    db.close()
+
+
+def test_relatorio_guarda_so_as_primeiras_mensagens(Sessao, monkeypatch):
+    monkeypatch.setattr(importacao_base, "IMPORT_MAX_MENSAGENS", 1)
+    invalidas = "".join(f"{n};0;;01/01/2020;1;0;1;CC;C;1;Conta;10;120\n" for n in (3, 4, 5))
+    com_alerta = "".join(f"{n};0;Ativo;01/01/2020;1;0;1;CC;C;1;Conta;;12\n" for n in (6, 7))
+    db = Sessao()
+    job_id = importacao_jobs.criar_job(db, 10, io.BytesIO((CSV + invalidas + com_alerta).encode()), "base.csv").id
+    db.close()
+    importacao_jobs._executar(job_id)
+
+    db = Sessao()
+    status = importacao_jobs.serializar_job(db.get(ImportacaoJob, job_id))
+    db.close()
+    assert status["status"] == importacao_jobs.STATUS_CONCLUIDO
+    assert (status["importados"], status["rejeitados"]) == (4, 3)
+    assert status["erros"] == ["Linha 4: Campos chave vazios"]
+    assert status["alertas"] == ["Linha 7: vida_util_anos vazio"]
+    assert status["total_alertas"] == 2
@@ -0,0 +1,121 @@
+"""
+POST /revisoes/massa pela aplicação (roteamento, permissões e regras), sobre
+SQLite em memória. O UPDATE ... FROM (VALUES ...) AS v(colunas) não existe no
+SQLite: a gravação em lote é capturada em vez de executada.
+"""
+
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+import sqlalchemy as sa
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateTable
+
+from app import dependencies, fila_auditoria
+from app.main import app
+from app.models import RevisaoDelegacao, RevisaoItem, RevisaoPeriodo
+from app.routes import reviews
+
+RESPONSAVEL, REVISOR = 1, 2
+
+
+@pytest.fixture
+def db():
+    engine = sa.create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        # Só as tabelas: alguns índices usam expressões do PostgreSQL
+        for modelo in (RevisaoPeriodo, RevisaoItem, RevisaoDelegacao):
+            conn.execute(CreateTable(modelo.__table__))
+    Sessao = sessionmaker(bind=engine)
+    sessao = Sessao()
+    hoje = date.today()
+    sessao.add(RevisaoPeriodo(
+        id=10, codigo="P10", descricao="Período", data_abertura=hoje, data_fechamento_prevista=hoje,
+        empresa_id=1, responsavel_id=RESPONSAVEL, status="Aberto",
+    ))
+    for item_id, inicio, meses in ((100, hoje, 120), (101, hoje - timedelta(days=3650), 121), (102, hoje, 60)):
+        sessao.add(RevisaoItem(
+            id=item_id, periodo_id=10, numero_imobilizado=str(item_id), sub_numero="0", descricao="Ativo",
+            data_inicio_depreciacao=inicio, data_fim_depreciacao=reviews.add_months(inicio, meses),
+            valor_aquisicao=1000, depreciacao_acumulada=0, valor_contabil=1000, centro_custo="CC", classe="C",
+            conta_contabil="1", descricao_conta_contabil="Conta", vida_util_anos=meses // 12,
+            vida_util_periodos=meses, status="Pendente",
+        ))
+    sessao.add(RevisaoDelegacao(periodo_id=10, ativo_id=102, revisor_id=REVISOR, atribuido_por=RESPONSAVEL, status="Ativo"))
+    sessao.commit()
+    yield Sessao
+    sessao.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def cliente(db, monkeypatch):
+    usuario = SimpleNamespace(id=RESPONSAVEL)
+    gravados = []
+
+    def _db():
+        sessao = db()
+        try:
+            yield sessao
+        finally:
+            sessao.close()
+
+    monkeypatch.setattr(reviews, "get_allowed_company_ids", lambda _db, _u: [1])
+    monkeypatch.setattr(reviews, "is_admin_user", lambda _db, _u: False)
+    monkeypatch.setattr(reviews, "_gravar_itens_massa", lambda _db, itens: gravados.extend(itens))
+    monkeypatch.setattr(fila_auditoria, "gravar", lambda _db, **evento: None)
+    app.dependency_overrides[dependencies.get_db] = _db
+    app.dependency_overrides[dependencies.get_current_user] = lambda: usuario
+    try:
+        yield SimpleNamespace(http=TestClient(app), usuario=usuario, gravados=gravados)
+    finally:
+        app.dependency_overrides.clear()
+
+
+def _post(cliente, **payload):
+    return cliente.http.post("/revisoes/massa", json={"periodo_id": 10, **payload})
+
+
+def test_manter_pelo_responsavel(cliente):
+    r = _post(cliente, ativos_ids=[100, 101, 999], incremento="Manter")
+    assert r.status_code == 200, r.text
+    corpo = r.json()
+    assert (corpo["total"], corpo["updated"], corpo["skipped"]) == (3, 2, 1)
+    assert corpo["errors"] == ["Item 999 não encontrado"]
+
+    estado = {it.id: it for it in cliente.gravados}
+    # Vencimento além de 18 meses é aprovado direto; o item já vencido fica Revisado
+    assert estado[100].status == "Aprovado"
+    assert estado[101].status == "Revisado"
+    assert estado[100].justificativa == "A vida útil está correta"
+    assert estado[100].auxiliar2 == "Manter"
+
+
+def test_acrescimo_valida_a_regra_por_item(cliente):
+    r = _post(cliente, ativos_ids=[100, 102], incremento="Acréscimo", nova_vida_util_meses=100, justificativa="x")
+    corpo = r.json()
+    # 100 tinha 120 meses (100 não é acréscimo); 102 tinha 60
+    assert corpo["updated"] == 1
+    assert corpo["results"][0]["error"].startswith("Para 'Acréscimo'")
+    [item] = cliente.gravados
+    assert (item.id, item.vida_util_revisada, item.alterado, item.status) == (102, 100, True, "Revisado")
+
+
+def test_revisor_so_altera_itens_delegados(cliente):
+    cliente.usuario.id = REVISOR
+    corpo = _post(cliente, ativos_ids=[100, 102], incremento="Manter").json()
+    assert corpo["updated"] == 1
+    assert corpo["errors"] == ["Item 100 não está delegado a você"]
+    assert [it.id for it in cliente.gravados] == [102]
+
+
+def test_periodo_encerrado_bloqueia(cliente, db):
+    with db() as sessao:
+        sessao.execute(sa.update(RevisaoPeriodo).values(status="Encerrado"))
+        sessao.commit()
+    r = _post(cliente, ativos_ids=[100], incremento="Manter")
+    assert r.status_code == 400
+    assert cliente.gravados == []
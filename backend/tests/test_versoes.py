@@ -0,0 +1,65 @@
+"""
+versoes: quais escritas marcam os recursos para incremento após o commit.
+"""
+
+import pytest
+import sqlalchemy as sa
+
+from app import versoes
+from app.database import SessionLocal
+
+
+@pytest.fixture
+def db():
+    engine = sa.create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(sa.text("CREATE TABLE usuarios (id INTEGER PRIMARY KEY, nome TEXT)"))
+        conn.execute(sa.text("CREATE TABLE revisoes_itens (id INTEGER PRIMARY KEY, status TEXT)"))
+        conn.execute(sa.text("INSERT INTO revisoes_itens (id, status) VALUES (1, 'Pendente')"))
+    sessao = SessionLocal(bind=engine)
+    yield sessao
+    sessao.close()
+    engine.dispose()
+
+
+def _marcados(sessao):
+    return sessao.info.get(versoes._INFO_KEY, set())
+
+
+def test_sql_textual_marca_a_tabela(db):
+    db.execute(sa.text("UPDATE revisoes_itens SET status = 'Revisado' WHERE id = 1"))
+    assert _marcados(db) == {"revisoes_itens"}
+
+
+def test_dml_em_cte_marca_as_tabelas():
+    # SQLite não aceita DML em CTE: o reconhecimento é testado direto no texto
+    sql = (
+        "WITH alterados AS (UPDATE revisoes_itens SET status = 'Aprovado' WHERE id = 1 RETURNING id) "
+        "INSERT INTO usuarios (id, nome) SELECT id, 'x' FROM alterados"
+    )
+    assert versoes._tabelas_dml(sql) == {"revisoes_itens", "usuarios"}
+
+
+def test_select_nao_marca(db):
+    db.execute(sa.text("SELECT id FROM revisoes_itens WHERE status = 'update usuarios'"))
+    db.execute(sa.text("SELECT id FROM revisoes_itens"))
+    assert _marcados(db) == set()
+
+
+def test_escrita_pela_conexao_exige_marcacao_explicita(db):
+    # Limite documentado em marcar_alteracao: Session.connection() não passa pelos eventos
+    db.connection().execute(sa.text("UPDATE revisoes_itens SET status = 'Revisado' WHERE id = 1"))
+    assert _marcados(db) == set()
+    versoes.marcar_alteracao(db, "revisoes_itens")
+    assert _marcados(db) == {"revisoes_itens"}
+
+
+def test_incrementa_somente_apos_commit(db, monkeypatch):
+    incrementados = []
+    monkeypatch.setattr(versoes, "incrementar", lambda recursos: incrementados.append(set(recursos)))
+    db.execute(sa.text("UPDATE revisoes_itens SET status = 'Revisado' WHERE id = 1"))
+    db.rollback()
+    db.execute(sa.text("DELETE FROM revisoes_itens WHERE id = 1"))
+    assert incrementados == []
+    db.commit()
+    assert incrementados == [{"revisoes_itens"}]
@@ -732,7 +732,9 @@ export async function reopenReviewPeriod(id) {
 }
 
 // Upload de base (.csv/.xlsx) para um período específico
-export async function uploadReviewBase(periodoId, file) {
+// A importação roda em segundo plano no servidor: a resposta traz o job_id e o
+// status é consultado até terminar (onProgress recebe cada atualização).
+export async function uploadReviewBase(periodoId, file, onProgress) {
   const base = await resolveBase();
   if (!base) {
     throw new Error('Nenhuma URL de API configurada. Configure VITE_API_URL na Vercel.');
@@ -789,13 +791,31 @@ export async function uploadReviewBase(periodoId, file) {
       }
       throw new Error(detail ? `${detail}` : `HTTP ${res.status}`);
     }
-    return res.json();
+    let job = await res.json();
+    while (job && ['Pendente', 'Processando'].includes(job.status)) {
+      if (typeof onProgress === 'function') onProgress(job);
+      await new Promise((r) => setTimeout(r, 2000));
+      job = await getImportJob(job.job_id);
+    }
+    if (typeof onProgress === 'function') onProgress(job);
+    if (job?.status !== 'Concluido') {
+      throw new Error(job?.mensagem || `Importação ${String(job?.status || 'falhou').toLowerCase()}`);
+    }
+    return job;
   } catch (err) {
     clearTimeout(timeoutId);
     throw err;
   }
 }
 
+export async function getImportJob(jobId) {
+  return request(`/revisoes/import-jobs/${jobId}`);
+}
+
+export async function cancelImportJob(jobId) {
+  return request(`/revisoes/import-jobs/${jobId}/cancel`, { method: 'POST' });
+}
+
 // Listar itens importados de um período específico
 export async function getReviewItems(periodoId) {
   if (!periodoId || (Array.isArray(periodoId) && periodoId.length === 0)) {
@@ -812,6 +832,25 @@ export async function getReviewItems(periodoId) {
   return request(`/revisoes/itens/${pid}`, { timeout: 60000 });
 }
 
+// Itens alterados desde a marca `since`: { itens, proximo_since }. Sem `since` devolve todos (carga inicial)
+export async function getReviewItemChanges(periodoId, since) {
+  const q = since ? `?since=${encodeURIComponent(since)}` : '';
+  return request(`/revisoes/itens/${periodoId}/changes${q}`, { timeout: since ? 30000 : 60000 });
+}
+
+// Aplica o retorno de getReviewItemChanges sobre a lista em memória (substitui por id, acrescenta novos)
+export function mergeReviewItems(prev, changed) {
+  if (!Array.isArray(changed) || changed.length === 0) return prev;
+  const byId = new Map(changed.map((it) => [it.id, it]));
+  const merged = (prev || []).map((it) => {
+    const novo = byId.get(it.id);
+    if (!novo) return it;
+    byId.delete(it.id);
+    return { ...it, ...novo };
+  });
+  return byId.size ? merged.concat(Array.from(byId.values())) : merged;
+}
+
 // Atualizar item de revisão (útil para ajustar vida útil, data fim e metadados)
 export async function updateReviewItem(periodoId, itemId, payload) {
   return request(`/revisoes/${periodoId}/itens/${itemId}`, { method: 'PUT', body: JSON.stringify(payload) });
@@ -819,7 +858,7 @@ export async function updateReviewItem(periodoId, itemId, payload) {
 
 // Aplicar revisão em massa
 export async function applyMassRevision(payload) {
-  // payload: { ativos_ids: number[], incremento?, nova_vida_util_anos?, nova_vida_util_meses?, nova_data_fim?, condicao_fisica?, motivo?, justificativa? }
+  // payload: { periodo_id: number, ativos_ids: number[], incremento?, nova_vida_util_anos?, nova_vida_util_meses?, nova_data_fim?, condicao_fisica?, motivo?, justificativa? }
   return request('/revisoes/massa', { method: 'POST', body: JSON.stringify(payload), timeout: 60000 });
 }
 
@@ -1079,6 +1118,25 @@ export async function deletePermissionGroup(id) {
   return request(`/permissoes/grupos/${id}`, { method: 'DELETE' });
 }
 
+// Canal SSE do servidor (/events/stream). EventSource não envia headers: a query leva
+// um ticket curto emitido por POST /events/ticket, nunca o token de login. Quando o
+// ticket expira o navegador não consegue reconectar sozinho (readyState CLOSED) e
+// quem chamou deve abrir de novo.
+export async function openEventStream() {
+  if (typeof window === 'undefined' || typeof window.EventSource === 'undefined') return null;
+  if (!getToken()) return null;
+  const base = await resolveBase();
+  if (!base) return null;
+  const { ticket } = await request('/events/ticket', { method: 'POST' });
+  if (!ticket) return null;
+  return new window.EventSource(`${base}/events/stream?ticket=${encodeURIComponent(ticket)}`);
+}
+
+export async function getUnreadNotificationsCount() {
+  const r = await request('/notifications/unread-count');
+  return Number(r?.nao_lidas ?? 0);
+}
+
 export async function getNotifications(params = {}) {
   const q = new URLSearchParams(Object.entries(params).filter(([_, v]) => v != null && v !== '')).toString();
   const mapStatus = (s) => {
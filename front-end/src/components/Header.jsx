@@ -3,7 +3,7 @@ import { useTranslation } from 'react-i18next';
 import ThemeToggle from './ThemeToggle';
 import { Bell, LogOut, PanelLeftClose, PanelLeft, Wifi, WifiOff, Loader2, Globe, Check, ChevronDown } from 'lucide-react';
 import { useNavigate, useLocation } from 'react-router-dom';
-import { getNotifications, getCompanies } from '../apiClient';
+import { getNotifications, getCompanies, getUnreadNotificationsCount, openEventStream } from '../apiClient';
 import { useSidebar } from '../contexts/SidebarContext';
 
 export default function Header({ backendStatus, language, onLanguageChange, onLogout, onChangeCompany }) {
@@ -21,7 +21,10 @@ export default function Header({ backendStatus, language, onLanguageChange, onLo
   const [langOpen, setLangOpen] = React.useState(false);
   const [bellOpen, setBellOpen] = React.useState(false);
   const [notifications, setNotifications] = React.useState([]);
-  const unreadCount = React.useMemo(() => notifications.filter((n) => String(n.status).toLowerCase() === 'pendente').length, [notifications]);
+  const [serverUnread, setServerUnread] = React.useState(null);
+  const [unreadTick, setUnreadTick] = React.useState(0);
+  const localUnread = React.useMemo(() => notifications.filter((n) => String(n.status).toLowerCase() === 'pendente').length, [notifications]);
+  const unreadCount = serverUnread ?? localUnread;
 
   const initials = React.useMemo(() => {
     const name = String(user?.nome || '').trim();
@@ -39,6 +42,58 @@ export default function Header({ backendStatus, language, onLanguageChange, onLo
     return () => window.removeEventListener('storage', handler);
   }, []);
 
+  React.useEffect(() => {
+    // Badge: contagem barata no servidor, sem carregar a lista
+    let active = true;
+    (async () => {
+      try {
+        const n = await getUnreadNotificationsCount();
+        if (active) setServerUnread(n);
+      } catch {
+        if (active) setServerUnread(null);
+      }
+    })();
+    return () => { active = false; };
+  }, [bellOpen, unreadTick]);
+
+  React.useEffect(() => {
+    // Com SSE ativo a contagem só é recarregada quando chega uma notificação;
+    // o polling fica como fallback enquanto o canal não está aberto
+    let active = true;
+    let source = null;
+    let connected = false;
+    let retryTimer = null;
+    const refresh = () => setUnreadTick((t) => t + 1);
+    const timer = setInterval(() => { if (!connected) refresh(); }, 60000);
+    const connect = () => {
+      openEventStream().then((es) => {
+        if (!es) return;
+        if (!active) { es.close(); return; }
+        source = es;
+        es.onopen = () => { connected = true; };
+        es.onerror = () => {
+          connected = false;
+          // Ticket expirado (401) encerra o EventSource: pede outro ticket e reconecta
+          if (es.readyState === 2 && active) {
+            es.close();
+            retryTimer = setTimeout(connect, 5000);
+          }
+        };
+        es.addEventListener('notificacao', refresh);
+        es.addEventListener('resync', refresh);
+      }).catch(() => {
+        if (active) retryTimer = setTimeout(connect, 60000);
+      });
+    };
+    connect();
+    return () => {
+      active = false;
+      clearInterval(timer);
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, []);
+
   React.useEffect(() => {
     if (!bellOpen) return;
     let active = true;
@@ -10,6 +10,8 @@ export default function LogsCenter() {
   const [auditLogs, setAuditLogs] = useState([]);
   const [auditLoading, setAuditLoading] = useState(false);
   const [auditExporting, setAuditExporting] = useState(false);
+  const [auditCursor, setAuditCursor] = useState(null);
+  const [auditTotal, setAuditTotal] = useState(null);
   const [auditError, setAuditError] = useState('');
   const [auditFilters, setAuditFilters] = useState({
     acao: '',
@@ -34,7 +36,8 @@ export default function LogsCenter() {
     refreshReports();
   }, []);
 
-  const refreshAudit = async () => {
+  // cursor: continua a partir da última página carregada (paginação por chave)
+  const refreshAudit = async (cursor = null) => {
     setAuditLoading(true);
     setAuditError('');
     try {
@@ -42,11 +45,16 @@ export default function LogsCenter() {
       if (auditFilters.acao) params.acao = auditFilters.acao;
       if (auditFilters.entidade) params.entidade = auditFilters.entidade;
       if (auditFilters.q) params.q = auditFilters.q;
+      if (cursor) params.cursor = cursor;
+      else params.estimar_total = true;
       const res = await listAuditLogs(params);
-      setAuditLogs(Array.isArray(res) ? res : []);
+      const itens = Array.isArray(res?.itens) ? res.itens : [];
+      setAuditLogs((prev) => (cursor ? [...prev, ...itens] : itens));
+      setAuditCursor(res?.proximo_cursor || null);
+      if (!cursor) setAuditTotal(res?.total_estimado ?? null);
     } catch (err) {
       setAuditError(err?.message || 'Erro ao carregar logs de auditoria');
-      setAuditLogs([]);
+      if (!cursor) setAuditLogs([]);
     } finally {
       setAuditLoading(false);
     }
@@ -188,7 +196,7 @@ export default function LogsCenter() {
               </button>
               <button
                 type="button"
-                onClick={refreshAudit}
+                onClick={() => refreshAudit()}
                 className="px-3 py-2 rounded-md bg-indigo-600 text-white text-sm hover:bg-indigo-700"
               >
                 {auditLoading ? (t('loading') || 'Carregando…') : (t('refresh') || 'Atualizar')}
@@ -246,6 +254,22 @@ export default function LogsCenter() {
               </tbody>
             </table>
           </div>
+          <div className="flex items-center justify-between mt-2 text-sm text-slate-600 dark:text-slate-300">
+            <span>
+              {(auditLogs || []).length}
+              {auditTotal != null ? ` de ~${auditTotal.toLocaleString('pt-BR')}` : ''}
+            </span>
+            {auditCursor && (
+              <button
+                type="button"
+                onClick={() => refreshAudit(auditCursor)}
+                disabled={auditLoading}
+                className="px-3 py-1.5 rounded-md border border-slate-300 dark:border-slate-700 hover:bg-slate-50 dark:hover:bg-slate-900 disabled:opacity-60"
+              >
+                {auditLoading ? (t('loading') || 'Carregando…') : (t('load_more') || 'Carregar mais')}
+              </button>
+            )}
+          </div>
         </div>
       )}
 
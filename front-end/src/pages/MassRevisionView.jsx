@@ -4,13 +4,15 @@ import { useTranslation } from 'react-i18next';
 import Table from '../components/ui/Table';
 import Input from '../components/ui/Input';
 import Select from '../components/ui/Select';
-import { getReviewPeriods, getReviewItems, applyMassRevision, getReviewDelegations, getManagementUnits, getCostCenters } from '../apiClient';
+import { getReviewPeriods, getReviewItemChanges, mergeReviewItems, applyMassRevision, getReviewDelegations, getManagementUnits, getCostCenters } from '../apiClient';
 
 export default function MassRevisionView() {
   const { t } = useTranslation();
   const [periodos, setPeriodos] = React.useState([]);
   const [periodoId, setPeriodoId] = React.useState(null);
   const [items, setItems] = React.useState([]);
+  // Marca da última sincronização dos itens (GET /revisoes/itens/{id}/changes)
+  const itemsSinceRef = React.useRef(null);
   const [filter, setFilter] = React.useState({ texto: '' });
   const [loading, setLoading] = React.useState(false);
   const [error, setError] = React.useState('');
@@ -88,7 +90,9 @@ export default function MassRevisionView() {
       setLoading(true);
       setError('');
       try {
-        const data = await getReviewItems(periodoId);
+        const sync = await getReviewItemChanges(periodoId);
+        const data = sync?.itens || [];
+        itemsSinceRef.current = sync?.proximo_since || null;
         console.log('[MassRevisionView] Loaded items:', data?.length);
         setItems(data);
         setSelected(new Set());
@@ -166,8 +170,9 @@ export default function MassRevisionView() {
       if (id) {
         setPeriodoId(id);
         setLoading(true);
-        const data = await getReviewItems(id);
-        setItems(data);
+        const sync = await getReviewItemChanges(id);
+        itemsSinceRef.current = sync?.proximo_since || null;
+        setItems(sync?.itens || []);
       }
     } catch (err) {
       setError(String(err?.message || err));
@@ -591,6 +596,7 @@ export default function MassRevisionView() {
     }
     try {
       const payload = {
+        periodo_id: Number(periodoId),
         ativos_ids: Array.from(selected),
         incremento: form.incremento || 'Manter',
         condicao_fisica: form.condicao_fisica || undefined,
@@ -607,8 +613,10 @@ export default function MassRevisionView() {
       }
       const res = await applyMassRevision(payload);
       setResultSummary({ total: res.total, updated: res.updated, skipped: res.skipped, errors: res.errors });
-      const data = await getReviewItems(periodoId);
-      setItems(data);
+      // Só os itens alterados desde a última carga (inclui os de outros revisores)
+      const delta = await getReviewItemChanges(periodoId, itemsSinceRef.current);
+      itemsSinceRef.current = delta?.proximo_since || itemsSinceRef.current;
+      setItems((prev) => mergeReviewItems(prev, delta?.itens));
       clearSelection();
       setPreviewOpen(false);
       setMassDialogOpen(false);
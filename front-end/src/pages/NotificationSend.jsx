@@ -164,8 +164,12 @@ export default function NotificationSendPage() {
       const res = await createNotification(payload);
       const sent = Number(res?.email_sent ?? res?.emailSent ?? 0);
       const failed = Number(res?.email_failed ?? res?.emailFailed ?? 0);
+      const queued = Number(res?.email_queued ?? res?.emailQueued ?? 0);
       if (payload.enviar_email || payload.send_email) {
-        if (sent > 0 && failed === 0) {
+        if (queued > 0) {
+          // envio em segundo plano pelo servidor
+          toast.success(`${tt('sent', 'Enviado')} (${queued} e-mail(s) na fila)`);
+        } else if (sent > 0 && failed === 0) {
           toast.success(tt('sent', 'Enviado'));
         } else if (sent > 0 && failed > 0) {
           toast.success(`${tt('sent', 'Enviado')} (${sent} ok, ${failed} falha)`);
@@ -15,6 +15,7 @@ import {
   updateReviewPeriod,
   deleteReviewPeriod,
   uploadReviewBase,
+  cancelImportJob,
   closeReviewPeriod,
   getEmployees,
   getCompanies,
@@ -45,6 +46,8 @@ export default function ReviewsPage() {
   const [uploadFile, setUploadFile] = React.useState(null);
   const [uploadResult, setUploadResult] = React.useState(null);
   const [isUploading, setIsUploading] = React.useState(false);
+  const [importJob, setImportJob] = React.useState(null);
+  const [isCancellingImport, setIsCancellingImport] = React.useState(false);
   const [blankYearsCount, setBlankYearsCount] = React.useState(0);
   const [blankYearsSamples, setBlankYearsSamples] = React.useState([]);
   const [blankConfirmOpen, setBlankConfirmOpen] = React.useState(false);
@@ -217,6 +220,27 @@ export default function ReviewsPage() {
     setIsUploading(false);
     setUploadFile(null);
     setUploadResult(null);
+    setImportJob(null);
+  };
+
+  const cancelImport = async () => {
+    if (!importJob?.job_id) return;
+    try {
+      setIsCancellingImport(true);
+      const job = await cancelImportJob(importJob.job_id);
+      setImportJob(job);
+    } catch (err) {
+      toast.error(err.message || t('import_cancel_failed') || 'Não foi possível cancelar a importação');
+    } finally {
+      setIsCancellingImport(false);
+    }
+  };
+
+  const formatEta = (secs) => {
+    if (secs == null) return '';
+    const m = Math.floor(secs / 60);
+    const s = secs % 60;
+    return m > 0 ? `${m}min ${s}s` : `${s}s`;
   };
 
   const handleFilePicked = (file) => {
@@ -281,9 +305,10 @@ export default function ReviewsPage() {
     if (!uploadFile) return toast.error(t('select_file_msg') || 'Selecione um arquivo');
     try {
       setIsUploading(true);
-            const result = await uploadReviewBase(editingId, uploadFile);
+      setImportJob(null);
+            const result = await uploadReviewBase(editingId, uploadFile, setImportJob);
             setUploadResult(result);
-            const warns = Array.isArray(result.alertas) ? result.alertas.length : 0;
+            const warns = result.total_alertas ?? (Array.isArray(result.alertas) ? result.alertas.length : 0);
             const summary = `Importação: ${result.importados} importados, ${result.rejeitados} rejeitados` + (warns ? `, ${warns} alertas` : '.');
             toast.success(summary);
 
@@ -316,6 +341,10 @@ export default function ReviewsPage() {
       } catch {}
           } catch (err) {
             const raw = String(err?.message || '');
+            if (/^Cancelado/i.test(raw)) {
+              toast(t('import_cancelled') || 'Importação cancelada.');
+              return;
+            }
             const isTimeout = err?.name === 'AbortError' || /Tempo limite|aborted|AbortError/i.test(raw);
             const netFail = /Failed to fetch|net::ERR_FAILED/i.test(raw);
             const fileChanged = /ERR_UPLOAD_FILE_CHANGED/i.test(raw);
@@ -790,6 +819,30 @@ export default function ReviewsPage() {
                   <Button variant="primary" onClick={startUpload} disabled={!uploadFile || isUploading} className="px-3 py-2">{isUploading ? (t('sending') || 'Enviando...') : (t('send_file') || 'Enviar arquivo')}</Button>
                 </div>
 
+                {isUploading && importJob && (
+                  <div className="mt-2 text-sm">
+                    <div className="flex items-center justify-between text-slate-700 dark:text-slate-300">
+                      <span>
+                        {importJob.status === 'Pendente'
+                          ? (t('import_queued') || 'Na fila de importação...')
+                          : `${t('import_progress') || 'Importando'}: ${importJob.progresso}% • ${importJob.linhas_lidas} ${t('rows_read') || 'linhas lidas'}`}
+                        {importJob.eta_segundos != null && ` • ${t('eta') || 'restante'} ~${formatEta(importJob.eta_segundos)}`}
+                      </span>
+                      <Button
+                        variant="secondary"
+                        onClick={cancelImport}
+                        disabled={isCancellingImport || importJob.cancelamento_solicitado}
+                        className="px-2 py-1"
+                      >
+                        {importJob.cancelamento_solicitado ? (t('cancelling') || 'Cancelando...') : (t('cancel') || 'Cancelar')}
+                      </Button>
+                    </div>
+                    <div className="mt-1 h-2 w-full rounded bg-slate-200 dark:bg-slate-700">
+                      <div className="h-2 rounded bg-blue-600 transition-all" style={{ width: `${importJob.progresso || 0}%` }} />
+                    </div>
+                  </div>
+                )}
+
                 {uploadResult && (
                   <div className="mt-2 text-sm">
                     <div className="font-medium">{t('import_result_title') || 'Resultado da importação'}</div>
@@ -3,13 +3,15 @@ import { useTranslation } from 'react-i18next';
 import Table from '../components/ui/Table';
 import Input from '../components/ui/Input';
 import Select from '../components/ui/Select';
-import { getReviewPeriods, getReviewItems, updateReviewItem, getManagementUnits, getCostCenters, listarComentariosRVU, responderComentarioRVU, getReviewDelegations, getClassesContabeis } from '../apiClient';
+import { getReviewPeriods, getReviewItemChanges, mergeReviewItems, updateReviewItem, getManagementUnits, getCostCenters, listarComentariosRVU, responderComentarioRVU, getReviewDelegations, getClassesContabeis } from '../apiClient';
 
 export default function RevisaoVidasUteis() {
   const { t } = useTranslation();
   const [periodos, setPeriodos] = React.useState([]);
   const [periodoId, setPeriodoId] = React.useState(null);
   const [items, setItems] = React.useState([]);
+  // Marca da última sincronização dos itens (GET /revisoes/itens/{id}/changes)
+  const itemsSinceRef = React.useRef(null);
   const [delegacoes, setDelegacoes] = React.useState([]);
   // Filtros avançados (mesmos da tela de Revisões em Massa)
   const [filterType, setFilterType] = React.useState('cc'); // 'ug' | 'cc' | 'classe' | 'valor'
@@ -74,10 +76,12 @@ export default function RevisaoVidasUteis() {
       setLoading(true);
       setError('');
       try {
-        const [data, ds] = await Promise.all([
-          getReviewItems(periodoId),
+        const [sync, ds] = await Promise.all([
+          getReviewItemChanges(periodoId),
           getReviewDelegations(periodoId),
         ]);
+        const data = sync?.itens || [];
+        itemsSinceRef.current = sync?.proximo_since || null;
         console.log('[RevisaoVidasUteis] Loaded items:', data?.length, 'delegations:', ds?.length);
         setItems(data);
         setDelegacoes(Array.isArray(ds) ? ds : []);
@@ -659,10 +663,11 @@ export default function RevisaoVidasUteis() {
         alert(t('item_auto_approved_msg') || 'Item aprovado automaticamente (sem alterações e vida útil > 18 meses).');
       }
 
-      // Após salvar, recarrega itens do período para refletir campos calculados no backend
+      // Após salvar, busca só os itens alterados (este e os dos colegas) para refletir campos calculados no backend
       try {
-        const refreshed = await getReviewItems(periodoId);
-        setItems(refreshed);
+        const delta = await getReviewItemChanges(periodoId, itemsSinceRef.current);
+        itemsSinceRef.current = delta?.proximo_since || itemsSinceRef.current;
+        setItems((prev) => mergeReviewItems(prev, delta?.itens));
       } catch (e) {
         // Se falhar o refresh, mantém merge local para não interromper fluxo
       }